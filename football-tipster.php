@@ -79,9 +79,10 @@ class FootballTipster {
         add_shortcode('football_predictions_advanced', array($this, 'render_predictions_advanced'));
         
         // Tareas cron
-        add_action('ft_update_xg_daily', array('FT_XG_Scraper', 'update_missing_xg'));
+        add_action('ft_update_xg_daily', array('FT_XG_Scraper', 'scheduled_update'));
         add_action('ft_retrain_model_weekly', array($this, 'auto_retrain_model'));
         add_action('ft_update_stats', array('FT_Predictor', 'update_team_stats'));
+        add_action('ft_sync_csv_nightly', array($this, 'nightly_csv_sync'));
     }
     
     /**
@@ -91,6 +92,10 @@ class FootballTipster {
         // Cargar traducciones
         load_plugin_textdomain('football-tipster', false, dirname(plugin_basename(__FILE__)) . '/languages/');
         
+        // Programar las tareas que falten: las instalaciones actualizadas sin
+        // reactivar el plugin no reciben las añadidas después (ft_sync_csv_nightly)
+        $this->setup_cron_jobs();
+        
         // Inicializar AJAX handlers
       //  FT_Ajax_Handlers::init();
     }
@@ -136,6 +141,7 @@ if (!get_option('ft_bankroll')) {
         wp_clear_scheduled_hook('ft_update_xg_daily');
         wp_clear_scheduled_hook('ft_retrain_model_weekly');
         wp_clear_scheduled_hook('ft_update_stats');
+        wp_clear_scheduled_hook('ft_sync_csv_nightly');
         
         // Flush rewrite rules
         flush_rewrite_rules();
@@ -395,6 +401,11 @@ dbDelta($sql_value_bets);
         if (!wp_next_scheduled('ft_update_stats')) {
             wp_schedule_event(time(), 'twicedaily', 'ft_update_stats');
         }
+        
+        // Descargar los CSV de football-data de todas las divisiones cada noche
+        if (!wp_next_scheduled('ft_sync_csv_nightly')) {
+            wp_schedule_event(strtotime('tomorrow 03:00'), 'daily', 'ft_sync_csv_nightly');
+        }
     }
     
     /**
@@ -3024,6 +3035,26 @@ private function get_value_bets_stats() {
         }
     }
     
+    /**
+     * Sincronización nocturna de los CSV de football-data (todas las
+     * divisiones, descargas en paralelo y caché HTTP en python/csv_ingest.py)
+     */
+    public function nightly_csv_sync() {
+        $python_script = FT_PYTHON_PATH . 'csv_ingest.py';
+        $command = 'cd ' . escapeshellarg(FT_PYTHON_PATH) . ' && /usr/bin/python3.8 ' . escapeshellarg($python_script) . ' 2>&1';
+        
+        $output = shell_exec($command);
+        // Solo la última línea es el JSON: antes puede haber avisos en stderr
+        $lines = $output ? explode("\n", trim($output)) : array();
+        $result = $lines ? json_decode(end($lines), true) : null;
+        
+        if (is_array($result) && !empty($result['success'])) {
+            error_log('Football Tipster: Sincronización CSV completada - ' . $result['message']);
+        } else {
+            error_log('Football Tipster: Error en sincronización CSV - ' . ($output ?: 'Sin output'));
+        }
+    }
+    
     /**
      * Funciones de utilidad
      */
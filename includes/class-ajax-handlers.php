@@ -165,9 +165,16 @@ class FT_Ajax_Handlers {
             $config_file = FT_PYTHON_PATH . 'db_config_temp.json';
             file_put_contents($config_file, json_encode($db_config));
             
-            // Ejecutar script Python
-            $python_script = FT_PYTHON_PATH . 'train_model_advanced.py';
-            $command = "cd " . FT_PYTHON_PATH . " && /usr/bin/python3.8 " . $python_script . " 2>&1";
+            // Ejecutar script Python (el mismo que usa la importación de CSV
+            // para la actualización incremental; lee db_config.json)
+            $python_script = FT_PYTHON_PATH . 'train_model_fixed.py';
+            $command = "cd " . FT_PYTHON_PATH . " && /usr/bin/python3.8 " . $python_script;
+            
+            // Solo los partidos nuevos desde el último entrenamiento
+            if (!empty($_POST['incremental'])) {
+                $command .= " --incremental";
+            }
+            $command .= " 2>&1";
             
             error_log('FT: Ejecutando comando: ' . $command);
             
@@ -218,8 +225,23 @@ class FT_Ajax_Handlers {
                 require_once FT_PLUGIN_PATH . 'includes/class-xg-calculator.php';
             }
             
-            $calculator = new FootballTipster_xG_Calculator();
-            $updated = $calculator->update_missing_xG();
+            // Todos los partidos sin xG de una vez (xg_backfill.py); si Python
+            // no está disponible, los 100 siguientes con la calculadora PHP
+            $updated = null;
+            if (function_exists('shell_exec')) {
+                $command = "cd " . FT_PYTHON_PATH . " && /usr/bin/python3.8 xg_backfill.py 2>&1";
+                $output = shell_exec($command);
+                // Solo la última línea es el JSON: antes puede haber avisos en stderr
+                $lines = $output ? explode("\n", trim($output)) : array();
+                $result = $lines ? json_decode(end($lines), true) : null;
+                if (is_array($result) && !empty($result['success'])) {
+                    $updated = intval($result['matches']);
+                }
+            }
+            if ($updated === null) {
+                $calculator = new FootballTipster_xG_Calculator();
+                $updated = $calculator->update_missing_xG();
+            }
             
             // También intentar scraping si está disponible
             $scraped = 0;
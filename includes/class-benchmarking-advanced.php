@@ -360,7 +360,8 @@ public function verify_season_data_detailed($season = null) {
                 'exclude_draws' => false,
                 'include_over_under' => true,
                 'include_asian_handicap' => true,
-                'detailed_analysis' => true
+                'detailed_analysis' => true,
+                'walk_forward' => false
             ];
             
             $options = array_merge($default_options, $options);
@@ -398,6 +399,69 @@ public function verify_season_data_detailed($season = null) {
         }
     }
     
+    /**
+     * Ejecutar en paralelo una rejilla de temporadas x modelos x ligas
+     *
+     * Una sola ejecución de benchmark_grid.py calcula las features una vez y
+     * reparte las celdas entre varios procesos; se guarda cada celda correcta.
+     */
+    public function run_benchmark_grid($seasons, $model_types = ['with_xg', 'without_xg'], $leagues = ['all'], $processes = 0) {
+        $python_script = FT_PYTHON_PATH . 'benchmark_grid.py';
+        
+        if (!file_exists($python_script)) {
+            return ['error' => 'Script benchmark_grid.py no encontrado en ' . FT_PYTHON_PATH];
+        }
+        
+        $this->update_db_config();
+        
+        $command = sprintf(
+            'cd %s && /usr/bin/python3.8 benchmark_grid.py %s %s %s %s 2>&1',
+            FT_PYTHON_PATH,
+            escapeshellarg(is_array($seasons) ? implode(',', $seasons) : $seasons),
+            escapeshellarg(implode(',', (array) $model_types)),
+            escapeshellarg(is_array($leagues) ? implode(',', $leagues) : $leagues),
+            escapeshellarg(intval($processes))
+        );
+        
+        error_log("FT Advanced Benchmark: Ejecutando rejilla: " . $command);
+        
+        $output = shell_exec($command);
+        
+        // El JSON es la última línea de la salida
+        $result = null;
+        $lines = array_reverse(explode("\n", trim((string) $output)));
+        foreach ($lines as $line) {
+            $line = trim($line);
+            if (substr($line, 0, 1) === '{') {
+                $result = json_decode($line, true);
+                break;
+            }
+        }
+        
+        if (!$result) {
+            return ['error' => 'Error procesando respuesta del script. Output: ' . substr((string) $output, 0, 1000)];
+        }
+        
+        if (isset($result['error'])) {
+            return $result;
+        }
+        
+        foreach ($result['cells'] as $cell) {
+            if (isset($cell['error'])) {
+                continue;
+            }
+            $this->save_advanced_benchmark_results(
+                $cell['season'],
+                $cell['model_type'],
+                $cell['test_metrics'],
+                $cell['value_betting'],
+                $cell['betting_details']
+            );
+        }
+        
+        return $result;
+    }
+    
     /**
      * Ejecutar script Python avanzado
      */
@@ -416,13 +480,17 @@ private function execute_advanced_benchmark_script($season, $model_type, $option
     
     $exclude_draws = $options['exclude_draws'] ? 'true' : 'false';
     
+    // Walk-forward: reentrenamiento incremental semana a semana
+    $walk_forward = !empty($options['walk_forward']) ? ' --walk-forward' : '';
+    
     $command = sprintf(
-        'cd %s && /usr/bin/python3.8 benchmark_season.py %s %s %s %s 2>&1',
+        'cd %s && /usr/bin/python3.8 benchmark_season.py %s %s %s %s%s 2>&1',
         FT_PYTHON_PATH,
         escapeshellarg($season),
         escapeshellarg($model_type),
         escapeshellarg($options['league']),
-        escapeshellarg($exclude_draws)
+        escapeshellarg($exclude_draws),
+        $walk_forward
     );
     
     error_log("FT Advanced Benchmark: Ejecutando comando: " . $command);
@@ -496,6 +564,10 @@ private function execute_advanced_benchmark_script($season, $model_type, $option
             if (isset($result['error'])) {
                 return ['error' => $result['error']];
             } elseif (isset($result['test_metrics'])) {
+                // Tiempos por etapa del script (instrumentation.py)
+                if (isset($result['timings']['total'])) {
+                    error_log("FT Advanced Benchmark: Tiempos: " . json_encode($result['timings']));
+                }
                 return $result;
             }
         } else {
@@ -336,6 +336,16 @@ class FT_CSV_Importer {
                 }
             }
 
+            // Los resultados nuevos invalidan las predicciones en caché
+            if (($this->processed > 0 || $this->updated > 0) && class_exists('FT_Predictor')) {
+                FT_Predictor::invalidate_prediction_cache();
+            }
+
+            // Partidos nuevos: actualizar el modelo sin reentrenar desde cero
+            if ($this->processed > 0) {
+                $this->refresh_model_incremental();
+            }
+
             return array(
                 'success' => true,
                 'message' => $message,
@@ -350,6 +360,19 @@ class FT_CSV_Importer {
         }
     }
 
+    /**
+     * Añade al modelo árboles entrenados solo con los partidos importados
+     * (train_model_fixed.py --incremental), en segundo plano
+     */
+    private function refresh_model_incremental() {
+        if (!defined('FT_PYTHON_PATH') || !function_exists('shell_exec')) {
+            return;
+        }
+
+        $command = "cd " . FT_PYTHON_PATH . " && nohup /usr/bin/python3.8 train_model_fixed.py --incremental > /dev/null 2>&1 &";
+        shell_exec($command);
+    }
+
     public function import_from_url($url) {
         try {
             $response = wp_remote_get($url, array('timeout' => 60));
@@ -208,6 +208,30 @@ class FT_Pinnacle_API {
         return $synced;
     }
     
+    /**
+     * Sincronizar solo las cuotas que cambiaron desde la última vez
+     * (python/pinnacle_odds_sync.py: cursor 'since' y escrituras por lotes).
+     * Si Python no está disponible, sincronización completa con sync_odds().
+     */
+    public function sync_odds_delta($league_ids = null) {
+        if (defined('FT_PYTHON_PATH') && function_exists('shell_exec')) {
+            $leagues = $league_ids ? implode(',', (array) $league_ids) : '';
+            $command = "cd " . FT_PYTHON_PATH . " && /usr/bin/python3.8 pinnacle_odds_sync.py "
+                . escapeshellarg('--leagues=' . $leagues) . " 2>&1";
+            $output = shell_exec($command);
+            // Solo la última línea es el JSON: antes puede haber avisos en stderr
+            $lines = $output ? explode("\n", trim($output)) : array();
+            $result = $lines ? json_decode(end($lines), true) : null;
+            
+            if (is_array($result) && !empty($result['success'])) {
+                return intval($result['inserted']) + intval($result['updated']);
+            }
+            error_log('Pinnacle API - Error en sincronización incremental de odds');
+        }
+        
+        return $this->sync_odds($league_ids);
+    }
+    
     /**
      * Guardar odds de moneyline (1X2)
      */
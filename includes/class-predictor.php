@@ -12,6 +12,10 @@ class FT_Predictor {
     private static $python_path;
     private static $models_path;
     
+    // Caché de predicciones compartida con python/prediction_cache.py
+    const PREDICTION_CACHE_MAX_ENTRIES = 2000;
+    const PREDICTION_CACHE_WATERMARK_TTL = 300;
+    
     public function __construct() {
         self::$python_path = FT_PYTHON_PATH;
         self::$models_path = FT_MODELS_PATH;
@@ -22,6 +26,17 @@ class FT_Predictor {
      */
     public static function predict_match($home_team, $away_team, $sport = 'football') {
         try {
+            // 0. Caché: mismo partido, mismo modelo y mismo histórico
+            // (el fichero se lee y decodifica una sola vez por petición)
+            $cache = self::read_prediction_cache();
+            $cache_key = self::prediction_cache_key($home_team, $away_team, $sport, $cache);
+            $cached = $cache_key ? self::prediction_cache_get($cache_key, $cache) : null;
+            
+            if ($cached !== null) {
+                $cached['cached'] = true;
+                return $cached;
+            }
+            
             error_log("FT: Prediciendo $home_team vs $away_team");
             
             // 1. Obtener estadísticas de los equipos
@@ -41,6 +56,10 @@ class FT_Predictor {
             // 4. Guardar predicción en BD
             if (!isset($result['error'])) {
                 self::save_prediction($home_team, $away_team, $result);
+                
+                if ($cache_key) {
+                    self::prediction_cache_put($cache_key, $result);
+                }
             }
             
             error_log("FT: Predicción completada para $home_team vs $away_team");
@@ -52,6 +71,243 @@ class FT_Predictor {
         }
     }
     
+    /**
+     * Ruta del fichero de caché de predicciones
+     */
+    private static function prediction_cache_path() {
+        return FT_PLUGIN_PATH . 'cache/predictions.json';
+    }
+    
+    /**
+     * Lee la caché de predicciones (array vacío si no existe)
+     */
+    private static function read_prediction_cache() {
+        $path = self::prediction_cache_path();
+        $data = file_exists($path) ? json_decode(file_get_contents($path), true) : null;
+        
+        if (!is_array($data)) {
+            $data = array();
+        }
+        
+        return array_merge(array(
+            'entries' => array(),
+            'models' => array(),
+            'watermark' => null,
+            'watermark_checked_at' => 0,
+            'generation' => 0,
+            'stats' => array()
+        ), $data);
+    }
+    
+    /**
+     * Lee y vacía el registro de aciertos (llamar con el bloqueo exclusivo)
+     */
+    private static function take_prediction_cache_lookups() {
+        $path = self::prediction_cache_path() . '.hits';
+        if (!file_exists($path)) {
+            return array();
+        }
+        
+        $lookups = array();
+        foreach (file($path, FILE_IGNORE_NEW_LINES | FILE_SKIP_EMPTY_LINES) as $line) {
+            $lookup = json_decode($line, true);
+            if (is_array($lookup)) {
+                $lookups[] = $lookup;
+            }
+        }
+        unlink($path);
+        
+        return $lookups;
+    }
+    
+    /**
+     * Modifica la caché bajo bloqueo exclusivo y la reescribe de forma atómica
+     */
+    private static function update_prediction_cache($callback) {
+        $path = self::prediction_cache_path();
+        
+        if (!file_exists(dirname($path))) {
+            wp_mkdir_p(dirname($path));
+        }
+        
+        $lock = fopen($path . '.lock', 'a');
+        if (!$lock) {
+            return;
+        }
+        
+        flock($lock, LOCK_EX);
+        
+        $data = $callback(self::read_prediction_cache());
+        
+        foreach (array('hits', 'misses', 'evictions', 'invalidations') as $stat) {
+            $data['stats'][$stat] = $data['stats'][$stat] ?? 0;
+        }
+        
+        // Aciertos y fallos anotados desde la última escritura: contadores y orden LRU
+        foreach (self::take_prediction_cache_lookups() as $lookup) {
+            $key = $lookup[1] ?? null;
+            if (($lookup[0] ?? '') === 'hit') {
+                $data['stats']['hits']++;
+                if ($key !== null && isset($data['entries'][$key])) {
+                    $entry = $data['entries'][$key];
+                    unset($data['entries'][$key]);
+                    $data['entries'][$key] = $entry;
+                }
+            } else {
+                $data['stats']['misses']++;
+            }
+        }
+        
+        // Solo el modelo activo de cada espacio (descarta el formato antiguo, por ruta)
+        $data['models'] = array_filter($data['models'], function($model) {
+            return is_array($model) && isset($model['path']);
+        });
+        
+        // Purgar entradas de modelos no activos o de un histórico anterior
+        $current_hashes = array_column($data['models'], 'sha1');
+        foreach ($data['watermark'] === null ? array() : array_keys($data['entries']) as $key) {
+            $parts = explode('|', $key);
+            $model_hash = $parts[count($parts) - 2] ?? '';
+            if (substr($key, -strlen('|' . $data['watermark'])) !== '|' . $data['watermark']
+                || !in_array($model_hash, $current_hashes, true)) {
+                unset($data['entries'][$key]);
+                $data['stats']['invalidations']++;
+            }
+        }
+        
+        // Expulsión LRU: las primeras entradas son las menos usadas
+        while (count($data['entries']) > self::PREDICTION_CACHE_MAX_ENTRIES) {
+            array_shift($data['entries']);
+            $data['stats']['evictions']++;
+        }
+        
+        foreach (array('entries', 'models') as $field) {
+            if (empty($data[$field])) {
+                $data[$field] = new stdClass();
+            }
+        }
+        
+        $tmp = $path . '.tmp' . getmypid();
+        file_put_contents($tmp, json_encode($data));
+        rename($tmp, $path);
+        
+        flock($lock, LOCK_UN);
+        fclose($lock);
+    }
+    
+    /**
+     * Clave de caché: equipos + sha1 del modelo + marca de agua del histórico
+     * $cache es la caché ya leída con read_prediction_cache()
+     * Devuelve null si no hay modelo entrenado
+     */
+    private static function prediction_cache_key($home_team, $away_team, $sport, $cache) {
+        global $wpdb;
+        
+        $model_file = FT_MODELS_PATH . $sport . '_model.pkl';
+        if (!file_exists($model_file)) {
+            return null;
+        }
+        
+        // sha1 del modelo: solo se recalcula si cambia tamaño o fecha del fichero
+        $stamp = filesize($model_file) . ':' . filemtime($model_file);
+        $model = $cache['models']['simple'] ?? null;
+        $refresh_model = !$model || ($model['path'] ?? null) !== $model_file || $model['stamp'] !== $stamp;
+        
+        if ($refresh_model) {
+            $model = array('path' => $model_file, 'stamp' => $stamp, 'sha1' => sha1_file($model_file));
+        }
+        
+        // Marca de agua: se consulta a la BD como mucho cada PREDICTION_CACHE_WATERMARK_TTL segundos
+        $watermark = $cache['watermark'];
+        $refresh_watermark = $watermark === null
+            || time() - $cache['watermark_checked_at'] > self::PREDICTION_CACHE_WATERMARK_TTL;
+        
+        if ($refresh_watermark) {
+            $row = $wpdb->get_row(
+                "SELECT MAX(date) AS max_date, MAX(updated_at) AS max_updated
+                 FROM {$wpdb->prefix}ft_matches_advanced",
+                ARRAY_N
+            );
+            $watermark = ($row[0] ?? 'None') . '/' . ($row[1] ?? 'None');
+        }
+        
+        if ($refresh_model || $refresh_watermark) {
+            $generation = $cache['generation'];
+            self::update_prediction_cache(function($data) use ($model, $watermark, $refresh_watermark, $generation) {
+                $data['models']['simple'] = $model;
+                // Tras una invalidación no se restaura una marca de agua anterior
+                if ($refresh_watermark && $data['generation'] === $generation) {
+                    $data['watermark'] = $watermark;
+                    $data['watermark_checked_at'] = time();
+                }
+                return $data;
+            });
+        }
+        
+        return implode('|', array('simple', $home_team, $away_team, $model['sha1'], $watermark));
+    }
+    
+    /**
+     * Busca una predicción en la caché. No reescribe el fichero: el acierto o
+     * fallo se añade al registro de aciertos con bloqueo compartido, y el
+     * orden LRU y los contadores se aplican en la siguiente escritura.
+     * $cache es la misma lectura usada para calcular la clave
+     */
+    private static function prediction_cache_get($key, $cache) {
+        $path = self::prediction_cache_path();
+        $lock = file_exists(dirname($path)) ? fopen($path . '.lock', 'a') : false;
+        if ($lock) {
+            flock($lock, LOCK_SH);
+        }
+        
+        $hit = isset($cache['entries'][$key]);
+        $result = $hit ? $cache['entries'][$key]['result'] : null;
+        
+        if ($lock) {
+            file_put_contents($path . '.hits', json_encode($hit ? array('hit', $key) : array('miss', null)) . "\n", FILE_APPEND);
+            flock($lock, LOCK_UN);
+            fclose($lock);
+        }
+        
+        return $result;
+    }
+    
+    /**
+     * Guarda una predicción en la caché
+     */
+    private static function prediction_cache_put($key, $result) {
+        self::update_prediction_cache(function($data) use ($key, $result) {
+            // Invalidada mientras se predecía: la clave ya no vale
+            if ($data['watermark'] === null) {
+                return $data;
+            }
+            unset($data['entries'][$key]);
+            $data['entries'][$key] = array(
+                'result' => $result,
+                'created_at' => current_time('mysql')
+            );
+            return $data;
+        });
+    }
+    
+    /**
+     * Vacía la caché de predicciones (tras importar resultados) bajo el mismo
+     * bloqueo que las escrituras. Sube 'generation' para que nadie con una
+     * copia anterior restaure entradas o la marca de agua
+     */
+    public static function invalidate_prediction_cache() {
+        self::update_prediction_cache(function($data) {
+            $data['stats']['invalidations'] = ($data['stats']['invalidations'] ?? 0) + count($data['entries']);
+            $data['entries'] = array();
+            $data['watermark'] = null;
+            $data['watermark_checked_at'] = 0;
+            $data['generation']++;
+            return $data;
+        });
+        
+        self::query_prediction_server(array('action' => 'invalidate'), 2);
+    }
+    
     /**
      * Obtiene estadísticas de un equipo
      */
@@ -216,11 +472,21 @@ private static function get_recent_form($team_name, $as_home = null) {
             return array('error' => 'Modelo no entrenado. Ve a Admin → Football Tipster → Entrenar Modelo');
         }
         
+        // 1. Servidor de predicciones persistente (sin arrancar procesos)
+        $result = self::query_prediction_server(array(
+            'action' => 'predict_simple',
+            'features' => $features
+        ));
+        
+        if ($result !== null) {
+            return $result;
+        }
+        
         // Preparar datos para Python
         $features_json = json_encode($features);
         
-        // Ejecutar script Python
-        $python_script = self::$python_path . 'predict_simple.py';
+        // 2. Cliente ligero: usa el servidor si arrancó entretanto, si no predice en local
+        $python_script = self::$python_path . 'predict_client.py';
         $command = escapeshellcmd("/usr/bin/python3.8 $python_script '$model_file' '$features_json'");
         
         error_log("FT: Ejecutando comando: " . $command);
@@ -242,6 +508,38 @@ private static function get_recent_form($team_name, $as_home = null) {
         return $result;
     }
     
+    /**
+     * Envía una petición al servidor de predicciones (python/prediction_server.py)
+     * Devuelve null si el servidor no está levantado
+     */
+    public static function query_prediction_server($payload, $timeout = 10) {
+        $socket_path = FT_PLUGIN_PATH . 'cache/predictor.sock';
+        
+        if (!file_exists($socket_path)) {
+            return null;
+        }
+        
+        $socket = @stream_socket_client('unix://' . $socket_path, $errno, $errstr, 1);
+        
+        if (!$socket) {
+            error_log("FT: Servidor de predicciones no disponible: $errstr");
+            return null;
+        }
+        
+        stream_set_timeout($socket, $timeout);
+        fwrite($socket, json_encode($payload) . "\n");
+        $response = fgets($socket);
+        fclose($socket);
+        
+        if ($response === false) {
+            return null;
+        }
+        
+        $result = json_decode(trim($response), true);
+        
+        return is_array($result) ? $result : null;
+    }
+    
     /**
      * Guarda predicción en base de datos
      */
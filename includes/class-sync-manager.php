@@ -23,8 +23,8 @@ class FT_Sync_Manager {
             // 1. Sincronizar fixtures
             $fixtures_synced = $this->pinnacle_api->sync_fixtures();
             
-            // 2. Sincronizar odds
-            $odds_synced = $this->pinnacle_api->sync_odds();
+            // 2. Sincronizar odds (solo las que cambiaron)
+            $odds_synced = $this->pinnacle_api->sync_odds_delta();
             
             // 3. Analizar value bets
             $value_analysis = $this->value_analyzer->analyze_all_fixtures();
@@ -27,6 +27,15 @@ class FT_Value_Analyzer {
     public function analyze_all_fixtures($limit = 50) {
         global $wpdb;
         
+        // Predecir de una vez los fixtures sin predicción reciente
+        $this->run_batch_predictions($limit);
+        
+        // Análisis de todos los fixtures y mercados en un solo proceso (python/value_engine.py)
+        $analysis = $this->run_value_engine($limit);
+        if ($analysis !== null) {
+            return $analysis;
+        }
+        
         // Obtener fixtures próximos con odds
         $sql = "
             SELECT DISTINCT f.*, 
@@ -392,6 +401,77 @@ class FT_Value_Analyzer {
         return round(min(1.0, max(0.0, $confidence)), 3);
     }
     
+    /**
+     * Predecir en un solo proceso todos los fixtures próximos (python/predict_batch.py)
+     * y guardarlos en ft_predictions, para que get_or_create_prediction() los encuentre
+     */
+    private function run_batch_predictions($limit) {
+        $payload = array(
+            'action' => 'predict_batch',
+            'limit' => intval($limit),
+            'days' => 7
+        );
+        
+        // 1. Servidor de predicciones persistente
+        $result = class_exists('FT_Predictor') ? FT_Predictor::query_prediction_server($payload, 120) : null;
+        
+        // 2. Un único proceso Python para todo el lote
+        if ($result === null) {
+            $python_script = FT_PYTHON_PATH . 'predict_batch.py';
+            $command = 'cd ' . escapeshellarg(FT_PYTHON_PATH) . ' && /usr/bin/python3.8 '
+                . escapeshellarg($python_script) . ' ' . intval($limit) . ' 7 2>&1';
+            
+            $output = shell_exec($command);
+            $lines = $output ? explode("\n", trim($output)) : array();
+            $result = $lines ? json_decode(end($lines), true) : null;
+        }
+        
+        if (!is_array($result) || isset($result['error'])) {
+            error_log("FT: Error en predicción por lotes: " . ($result['error'] ?? 'sin respuesta'));
+            return null;
+        }
+        
+        error_log("FT: Predicción por lotes: {$result['predictions_saved']} de {$result['fixtures']} fixtures");
+        return $result;
+    }
+    
+    /**
+     * Analizar con python/value_engine.py todos los fixtures próximos: tres
+     * consultas, cálculo por columnas y escritura en bloque de ft_value_bets.
+     * Devuelve null si el script no está disponible o falla.
+     */
+    private function run_value_engine($limit) {
+        if (!defined('FT_PYTHON_PATH') || !function_exists('shell_exec')) {
+            return null;
+        }
+        
+        $args = array(
+            '--limit=' . intval($limit),
+            '--min-value=' . floatval($this->min_value_threshold),
+            '--min-confidence=' . floatval($this->min_confidence_threshold),
+            '--bankroll=' . floatval($this->bankroll),
+            '--max-stake=' . floatval($this->max_stake_percentage)
+        );
+        $command = 'cd ' . escapeshellarg(FT_PYTHON_PATH) . ' && /usr/bin/python3.8 value_engine.py '
+            . implode(' ', array_map('escapeshellarg', $args)) . ' 2>&1';
+        
+        $output = shell_exec($command);
+        $lines = $output ? explode("\n", trim($output)) : array();
+        $result = $lines ? json_decode(end($lines), true) : null;
+        
+        if (!is_array($result) || empty($result['success'])) {
+            error_log("FT: Error en value_engine.py: " . ($result['error'] ?? 'sin respuesta'));
+            return null;
+        }
+        
+        return array(
+            'processed_fixtures' => $result['processed_fixtures'],
+            'value_bets_found' => $result['value_bets_found'],
+            'value_bets' => $result['value_bets'],
+            'analysis_time' => current_time('mysql')
+        );
+    }
+    
     /**
      * Obtener o crear predicción para un fixture
      */
@@ -409,6 +489,21 @@ class FT_Value_Analyzer {
         ));
         
         if ($prediction) {
+            $metadata = json_decode($prediction->metadata ?? '', true);
+            
+            // Predicciones del lote (predict_batch.py): probabilidades reales del modelo
+            if (is_array($metadata) && isset($metadata['probabilities']['H'])) {
+                return array(
+                    'prediction' => $prediction->prediction,
+                    'confidence' => $prediction->probability,
+                    'probabilities' => array(
+                        'home_win' => $metadata['probabilities']['H'],
+                        'draw' => $metadata['probabilities']['D'] ?? 0,
+                        'away_win' => $metadata['probabilities']['A'] ?? 0
+                    )
+                );
+            }
+            
             return array(
                 'prediction' => $prediction->prediction,
                 'confidence' => $prediction->probability,
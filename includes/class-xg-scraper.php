@@ -154,6 +154,27 @@ class FT_XG_Scraper {
         return $updated;
     }
     
+    /**
+     * Tarea diaria: todos los partidos sin xG con python/xg_scraper.py
+     * (peticiones en paralelo y caché en disco); si Python no está
+     * disponible, los 50 siguientes con update_missing_xg()
+     */
+    public static function scheduled_update() {
+        if (defined('FT_PYTHON_PATH') && function_exists('shell_exec')) {
+            $command = "cd " . FT_PYTHON_PATH . " && /usr/bin/python3.8 xg_scraper.py 2>&1";
+            $output = shell_exec($command);
+            // Solo la última línea es el JSON: antes puede haber avisos en stderr
+            $lines = $output ? explode("\n", trim($output)) : array();
+            $result = $lines ? json_decode(end($lines), true) : null;
+            if (is_array($result) && !empty($result['success'])) {
+                return intval($result['updated']);
+            }
+        }
+        
+        $scraper = new self();
+        return $scraper->update_missing_xg();
+    }
+    
     /**
      * Mapea códigos de división a ligas de FBref
      */
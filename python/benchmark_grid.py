@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Benchmark en paralelo de temporadas x modelos x ligas
+
+FT_Benchmarking_Advanced ejecuta benchmark_season.py una celda cada vez
+(temporada, tipo de modelo, liga) y cada ejecución recalcula todas las
+features. Este script evalúa la rejilla completa de una vez:
+
+1. Lee el histórico UNA vez (caché local o MySQL) y calcula la matriz de
+   features de todos los partidos con sus columnas de xG (superconjunto de
+   'with_xg' y 'without_xg'); las features "as-of" no dependen de la celda
+2. Guarda la matriz y las columnas que necesitan las celdas como .npy en
+   cache/benchmark_grid/, que los procesos abren con mmap_mode='r' (las
+   páginas se comparten, no se copian)
+3. Reparte las celdas entre un pool de procesos; cada una entrena y evalúa
+   con las mismas funciones que benchmark_season.py
+4. Imprime un único JSON con el resultado de todas las celdas
+
+Uso:
+    python3 benchmark_grid.py <temporadas|all> [tipos_modelo] [ligas] [procesos]
+
+    procesos: 0 o sin indicar = uno por núcleo
+    temporadas: "2022-2023,2023-2024"
+    tipos_modelo: "with_xg,without_xg" (por defecto ambos)
+    ligas: "all" (todas juntas), "E0,SP1", o "each" (cada división por separado)
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import multiprocessing
+import numpy as np
+import warnings
+warnings.filterwarnings('ignore')
+
+# Agregar path para librerías
+plugin_libs = '/var/www/vhosts/virtualrolldice.com/httpdocs/wp-content/plugins/football-tipster/python-libs'
+if plugin_libs not in sys.path:
+    sys.path.insert(0, plugin_libs)
+
+from benchmark_season import RESULT_MAP, benchmark_probabilities, evaluate_benchmark, load_value_config
+from betting_simulation import OUTCOME_LABELS
+from feature_engine import FEATURE_NAMES, HISTORY_COLUMNS, FeatureEngine
+from instrumentation import instrument_connection, recording, report, stage, start_profiling
+from match_cache import load_matches_cached
+from match_loader import NULL_INT, get_db_connection, load_db_config, matches_table
+from model_cache import ModelCache, cache_enabled
+from threshold_sweep import save_backtest
+
+WORK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'benchmark_grid')
+
+MODEL_TYPES = ['with_xg', 'without_xg']
+ODDS_COLUMNS = ['b365a', 'b365d', 'b365h', 'bwa', 'bwd', 'bwh']
+MIN_TRAIN_MATCHES = 500
+
+# Arrays compartidos que se guardan como .npy para los procesos
+SHARED_ARRAYS = ['features', 'days', 'results', 'season', 'division', 'home_team', 'away_team', 'odds']
+
+# Estado de cada proceso del pool (lo rellena _init_worker)
+_shared = {}
+
+
+def load_grid_data(connection, table_name):
+    """
+    Partidos con resultado de todas las temporadas y ligas, ordenados por
+    fecha, con la matriz de features (20 + xG) de cada uno
+    """
+    columns = list(dict.fromkeys(HISTORY_COLUMNS + ['season', 'division'] + ODDS_COLUMNS))
+    with stage('load'):
+        data = load_matches_cached(connection, table_name, columns)
+        data = data.take(data['ftr'] != NULL_INT)
+
+    with stage('features'):
+        feature_engine = FeatureEngine(data.to_dataframe())
+
+    # Mismas filas que las queries de benchmark_season.py
+    ftr = data.decode('ftr')
+    valid = np.isin(ftr, list(RESULT_MAP)) \
+        & (data['home_team'] != NULL_INT) & (data['away_team'] != NULL_INT)
+    data = data.take(valid)
+    ftr = ftr[valid]
+
+    # COALESCE(b365x, bwx) en orden A, D, H; los float32 de la caché se
+    # redondean para recuperar las cuotas decimales originales
+    b365 = np.column_stack([data.numeric(c) for c in ODDS_COLUMNS[:3]])
+    bw = np.column_stack([data.numeric(c) for c in ODDS_COLUMNS[3:]])
+    odds = np.round(np.where(np.isnan(b365), bw, b365), 4)
+
+    with stage('features'):
+        features = feature_engine.features(
+            data.decode('home_team'), data.decode('away_team'), data['date'], with_xg=True
+        )
+
+    arrays = {
+        'features': features,
+        'days': data['date'].astype('datetime64[D]').astype(np.int64),
+        'results': np.array([RESULT_MAP[r] for r in ftr], dtype=np.int8),
+        'season': data['season'].astype(np.int32),
+        'division': data['division'].astype(np.int32),
+        'home_team': data['home_team'].astype(np.int32),
+        'away_team': data['away_team'].astype(np.int32),
+        'odds': odds,
+    }
+    vocabularies = {
+        'team': data.vocabulary('home_team'),
+        'season': data.vocabulary('season'),
+        'division': data.vocabulary('division'),
+    }
+    return arrays, vocabularies
+
+
+def share_arrays(arrays, work_dir):
+    """Guarda los arrays como .npy para abrirlos con mmap_mode='r'"""
+    os.makedirs(work_dir, exist_ok=True)
+    for name in SHARED_ARRAYS:
+        np.save(os.path.join(work_dir, name + '.npy'), np.ascontiguousarray(arrays[name]))
+
+
+def _init_worker(work_dir, vocabularies, criteria, model_jobs):
+    _shared.clear()
+    _shared.update({
+        name: np.load(os.path.join(work_dir, name + '.npy'), mmap_mode='r')
+        for name in SHARED_ARRAYS
+    })
+    _shared['vocabularies'] = vocabularies
+    _shared['criteria'] = criteria
+    _shared['model_jobs'] = model_jobs
+
+
+def run_cell(cell):
+    """Entrena y evalúa una celda (temporada, tipo de modelo, liga)"""
+    season, model_type, league = cell
+    output = {'season': season, 'model_type': model_type, 'league': league or 'all'}
+    with recording() as timings:
+        output = _run_cell(season, model_type, league, output)
+    output['timings'] = timings.report()
+    return output
+
+
+def _run_cell(season, model_type, league, output):
+    vocabularies = _shared['vocabularies']
+    started = time.time()
+
+    try:
+        if season not in vocabularies['season']:
+            return dict(output, error=f"No se encontraron datos para la temporada {season}")
+
+        days = _shared['days']
+        in_season = _shared['season'] == vocabularies['season'].index(season)
+        if league is None:
+            in_league = np.ones(len(days), dtype=bool)
+        elif league in vocabularies['division']:
+            in_league = _shared['division'] == vocabularies['division'].index(league)
+        else:
+            in_league = np.zeros(len(days), dtype=bool)
+
+        if not in_season.any():
+            return dict(output, error=f"No se encontraron datos para la temporada {season}")
+
+        # Entrenamiento: todo lo anterior al inicio de la temporada, del más
+        # reciente al más antiguo (ORDER BY date DESC)
+        test_start = days[in_season].min()
+        train = np.flatnonzero((days < test_start) & in_league)[::-1]
+        test = np.flatnonzero(in_season & in_league)
+
+        if len(train) < MIN_TRAIN_MATCHES:
+            return dict(output, error=f"Datos de entrenamiento insuficientes: solo {len(train)} partidos")
+        if not len(test):
+            return dict(output, error=f"No hay partidos para evaluar en {season}")
+
+        n_columns = _shared['features'].shape[1] if model_type == 'with_xg' else len(FEATURE_NAMES)
+        X_train = _shared['features'][train, :n_columns]
+        y_train = _shared['results'][train].astype(np.int64)
+
+        teams = np.array(vocabularies['team'], dtype=object)
+        test_dates = [str(d) for d in days[test].astype('datetime64[D]')]
+        test_home = teams[_shared['home_team'][test]].tolist()
+        test_away = teams[_shared['away_team'][test]].tolist()
+        test_results = [OUTCOME_LABELS[r] for r in _shared['results'][test]]
+        odds_matrix = np.array(_shared['odds'][test])
+
+        probabilities, classes = benchmark_probabilities(
+            X_train, y_train, _shared['features'][test, :n_columns],
+            n_jobs=_shared['model_jobs'], cache=ModelCache() if cache_enabled() else None
+        )
+        results, y_test = evaluate_benchmark(
+            probabilities, classes, test_dates, test_home, test_away,
+            test_results, odds_matrix, _shared['criteria']
+        )
+
+        with stage('save'):
+            try:
+                save_backtest(season, model_type, league, test_dates, probabilities, odds_matrix, y_test)
+            except OSError:
+                pass
+
+        output.update(results)
+        output['train_matches'] = int(len(train))
+        output['elapsed_seconds'] = round(time.time() - started, 2)
+        return output
+
+    except Exception as e:
+        return dict(output, error=str(e))
+
+
+def build_cells(seasons, model_types, leagues):
+    return [(season, model_type, league)
+            for season in seasons for model_type in model_types for league in leagues]
+
+
+def _split(argument):
+    return [item.strip() for item in argument.split(',') if item.strip()]
+
+
+def main():
+    start_profiling()
+    if len(sys.argv) < 2:
+        print(json.dumps({"error": "Uso: benchmark_grid.py <temporadas|all> [tipos_modelo] [ligas] [procesos]"}))
+        return
+
+    started = time.time()
+    work_dir = os.path.join(WORK_DIR, str(os.getpid()))
+
+    try:
+        db_config = load_db_config()
+        table_prefix = db_config.get('table_prefix', 'PP0Fhoci_')
+        connection = instrument_connection(get_db_connection(db_config))
+        try:
+            cursor = connection.cursor()
+            value_config = load_value_config(cursor, table_prefix)
+            cursor.close()
+            arrays, vocabularies = load_grid_data(connection, matches_table(db_config))
+        finally:
+            connection.close()
+
+        criteria = {name: value_config[name]
+                    for name in ['min_value', 'min_confidence', 'min_odds', 'max_odds', 'base_unit']}
+
+        seasons = vocabularies['season'] if sys.argv[1] == 'all' else _split(sys.argv[1])
+        model_types = _split(sys.argv[2]) if len(sys.argv) > 2 else MODEL_TYPES
+        league_arg = sys.argv[3] if len(sys.argv) > 3 else 'all'
+        if league_arg == 'each':
+            leagues = list(vocabularies['division'])
+        else:
+            leagues = [None if league == 'all' else league for league in _split(league_arg)]
+        # 0 o sin indicar: un proceso por núcleo
+        processes = (int(sys.argv[4]) if len(sys.argv) > 4 else 0) or os.cpu_count() or 1
+
+        cells = build_cells(seasons, model_types, leagues)
+        processes = max(1, min(processes, len(cells)))
+
+        share_arrays(arrays, work_dir)
+        del arrays
+        # Con varios procesos cada Random Forest usa un solo núcleo
+        initargs = (work_dir, vocabularies, criteria, -1 if processes == 1 else 1)
+
+        if processes == 1:
+            _init_worker(*initargs)
+            results = [run_cell(cell) for cell in cells]
+        else:
+            with multiprocessing.Pool(processes, initializer=_init_worker, initargs=initargs) as pool:
+                results = pool.map(run_cell, cells, chunksize=1)
+
+        print(json.dumps({
+            'success': True,
+            'cells': results,
+            'total_cells': len(cells),
+            'failed_cells': sum(1 for r in results if 'error' in r),
+            'processes': processes,
+            'elapsed_seconds': round(time.time() - started, 2),
+            'timings': report()
+        }))
+
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
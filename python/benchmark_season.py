@@ -19,6 +19,12 @@ if plugin_libs not in sys.path:
 import mysql.connector
 from sklearn.ensemble import RandomForestClassifier
 
+from betting_simulation import betting_details, simulate_value_betting, to_odds_matrix
+from feature_engine import FEATURE_SET_VERSION, FeatureEngine, load_history, to_days
+from instrumentation import instrument_connection, report, stage, start_profiling
+from model_cache import ModelCache, cache_enabled
+from threshold_sweep import save_backtest
+from walk_forward import walk_forward_probabilities
 
 
 def calculate_stake(value, confidence, min_stake=1, max_stake=5):
@@ -280,50 +286,176 @@ def load_value_config(cursor, table_prefix):
         }
 
 
+RESULT_MAP = {'H': 2, 'D': 1, 'A': 0}
+
+# Hiperparámetros del Random Forest del benchmark (forman parte de la clave
+# de model_cache.py)
+BENCHMARK_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 10,
+    'min_samples_split': 20,
+    'min_samples_leaf': 10,
+    'random_state': 42,
+}
+
+
+def train_benchmark_model(X_train, y_train, n_jobs=-1):
+    """Random Forest del benchmark (mismos hiperparámetros en todos los scripts)"""
+    model = RandomForestClassifier(n_jobs=n_jobs, **BENCHMARK_PARAMS)
+    model.fit(X_train, y_train)
+    return model
+
+
+def load_or_train_model(X_train, y_train, n_jobs=-1, cache=None, key=None):
+    """Modelo del benchmark, de la caché (ModelCache) si ya se entrenó con estas filas"""
+    if cache is None:
+        return train_benchmark_model(X_train, y_train, n_jobs)
+
+    key = key or cache.key(X_train, y_train, BENCHMARK_PARAMS, FEATURE_SET_VERSION)
+    model = cache.get_model(key)
+    if model is None:
+        model = train_benchmark_model(X_train, y_train, n_jobs)
+        cache.put_model(key, model, {'train_matches': len(y_train), 'n_features': X_train.shape[1]})
+    return model
+
+
+def benchmark_probabilities(X_train, y_train, X_test, n_jobs=-1, cache=None):
+    """
+    Probabilidades de la temporada de test y clases del modelo
+
+    Con cache (ModelCache) solo se entrena si no hay un modelo para estas
+    mismas filas, features e hiperparámetros, y solo se predice si no están
+    ya guardadas las probabilidades de este X_test
+    """
+    if cache is None:
+        with stage('fit'):
+            model = train_benchmark_model(X_train, y_train, n_jobs)
+        with stage('predict'):
+            return model.predict_proba(X_test), model.classes_
+
+    key = cache.key(X_train, y_train, BENCHMARK_PARAMS, FEATURE_SET_VERSION)
+    cached = cache.get_probabilities(key, X_test)
+    if cached is not None:
+        return cached
+
+    with stage('fit'):
+        model = load_or_train_model(X_train, y_train, n_jobs, cache, key)
+    with stage('predict'):
+        probabilities = model.predict_proba(X_test)
+    with stage('save'):
+        cache.put_probabilities(key, X_test, probabilities, model.classes_)
+    return probabilities, model.classes_
+
+
+def evaluate_benchmark(probabilities, classes, test_dates, test_home, test_away, test_results,
+                       odds_matrix, criteria, initial_bankroll=1000):
+    """
+    Evalúa las probabilidades del modelo sobre la temporada de test
+
+    Devuelve (resultados del JSON del benchmark, y_test)
+    """
+    predictions = classes[np.argmax(probabilities, axis=1)]
+    y_test = np.array([RESULT_MAP[r] for r in test_results])
+    
+    # Simulación de apuestas sobre arrays (mismo criterio que el bucle original)
+    with stage('simulate'):
+        bets_placed, value_betting = simulate_value_betting(
+            probabilities, odds_matrix, y_test, criteria, initial_bankroll
+        )
+    
+    # Calcular métricas
+    correct = np.sum(predictions == y_test)
+    accuracy = correct / len(y_test)
+    
+    # Métricas por tipo
+    home_wins_total = np.sum(y_test == 2)
+    draws_total = np.sum(y_test == 1)
+    away_wins_total = np.sum(y_test == 0)
+    
+    home_wins_correct = np.sum((predictions == 2) & (y_test == 2))
+    draws_correct = np.sum((predictions == 1) & (y_test == 1))
+    away_wins_correct = np.sum((predictions == 0) & (y_test == 0))
+    
+    # Resultados
+    results = {
+        'test_metrics': {
+            'overall_accuracy': float(accuracy),
+            'total_predictions': len(predictions),
+            'correct_predictions': int(correct),
+            'home_wins': {
+                'total': int(home_wins_total),
+                'correct': int(home_wins_correct),
+                'accuracy': float(home_wins_correct / home_wins_total) if home_wins_total > 0 else 0
+            },
+            'draws': {
+                'total': int(draws_total),
+                'correct': int(draws_correct),
+                'accuracy': float(draws_correct / draws_total) if draws_total > 0 else 0
+            },
+            'away_wins': {
+                'total': int(away_wins_total),
+                'correct': int(away_wins_correct),
+                'accuracy': float(away_wins_correct / away_wins_total) if away_wins_total > 0 else 0
+            }
+        },
+        'value_betting': value_betting,
+        'betting_details': betting_details(bets_placed, test_dates, test_home, test_away, test_results)
+    }
+    
+    return results, y_test
+
+
 def main():
     """Función principal del benchmark"""
+    start_profiling()
     try:
-        if len(sys.argv) < 3:
-            print(json.dumps({"error": "Uso: benchmark_season.py <temporada> <tipo_modelo> [liga]"}))
-            return
-        
-        test_season = sys.argv[1]
-        model_type = sys.argv[2]
-        league_filter = sys.argv[3] if len(sys.argv) > 3 and sys.argv[3] != 'all' else None
+        # --walk-forward: reentrenamiento incremental semana a semana
+        walk_forward = '--walk-forward' in sys.argv
+        args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
         
-        # Cargar configuración
-        with open('db_config.json', 'r') as f:
-            db_config = json.load(f)
-        
-        table_prefix = db_config.get('table_prefix', 'PP0Fhoci_')
-        table_name = f"{table_prefix}ft_matches_advanced"
+        if len(args) < 2:
+            print(json.dumps({"error": "Uso: benchmark_season.py <temporada> <tipo_modelo> [liga] [--walk-forward]"}))
+            return
         
-        # Conectar a BD
-        host = db_config['host']
-        port = 3306
-        if ':' in host:
-            host_parts = host.split(':')
-            host = host_parts[0]
-            port = int(host_parts[1])
+        test_season = args[0]
+        model_type = args[1]
+        league_filter = args[2] if len(args) > 2 and args[2] != 'all' else None
+        with_xg = model_type == 'with_xg'
         
-        conn = mysql.connector.connect(
-            host=host,
-            port=port,
-            database=db_config['database'],
-            user=db_config['user'],
-            password=db_config['password']
-        )
-        cursor = conn.cursor()
-        value_config = load_value_config(cursor, table_prefix)
-        # Obtener rango de fechas
-        date_query = f"""
-        SELECT MIN(date) as min_date, MAX(date) as max_date
-        FROM {table_name}
-        WHERE season = %s
-        AND fthg IS NOT NULL
-        """
-        cursor.execute(date_query, (test_season,))
-        date_result = cursor.fetchone()
+        with stage('load'):
+            # Cargar configuración
+            with open('db_config.json', 'r') as f:
+                db_config = json.load(f)
+            
+            table_prefix = db_config.get('table_prefix', 'PP0Fhoci_')
+            table_name = f"{table_prefix}ft_matches_advanced"
+            
+            # Conectar a BD
+            host = db_config['host']
+            port = 3306
+            if ':' in host:
+                host_parts = host.split(':')
+                host = host_parts[0]
+                port = int(host_parts[1])
+            
+            conn = instrument_connection(mysql.connector.connect(
+                host=host,
+                port=port,
+                database=db_config['database'],
+                user=db_config['user'],
+                password=db_config['password']
+            ))
+            cursor = conn.cursor()
+            value_config = load_value_config(cursor, table_prefix)
+            # Obtener rango de fechas
+            date_query = f"""
+            SELECT MIN(date) as min_date, MAX(date) as max_date
+            FROM {table_name}
+            WHERE season = %s
+            AND fthg IS NOT NULL
+            """
+            cursor.execute(date_query, (test_season,))
+            date_result = cursor.fetchone()
         
         if not date_result or not date_result[0]:
             print(json.dumps({"error": f"No se encontraron datos para la temporada {test_season}"}))
@@ -331,6 +463,12 @@ def main():
         
         test_start_date = date_result[0]
         
+        # Cargar histórico UNA vez y precalcular features "as-of"
+        with stage('load'):
+            history = load_history(conn, table_name)
+        with stage('features'):
+            feature_engine = FeatureEngine(history)
+        
         # ENTRENAMIENTO
         league_condition = f"AND division = '{league_filter}'" if league_filter else ""
         
@@ -344,39 +482,22 @@ def main():
         AND away_team IS NOT NULL
         {league_condition}
         ORDER BY date DESC
-        LIMIT 5000
         """
         
-        cursor.execute(train_query, (test_start_date,))
-        train_matches = cursor.fetchall()
+        with stage('load'):
+            cursor.execute(train_query, (test_start_date,))
+            train_matches = cursor.fetchall()
         
         if len(train_matches) < 500:
             print(json.dumps({"error": f"Datos de entrenamiento insuficientes: solo {len(train_matches)} partidos"}))
             return
         
-        # Preparar features de entrenamiento
-        X_train = []
-        y_train = []
-        result_map = {'H': 2, 'D': 1, 'A': 0}
+        # Preparar features de entrenamiento (una sola pasada vectorizada)
+        train_dates, train_home, train_away, train_results = zip(*train_matches)
         
-        for match_date, home_team, away_team, result in train_matches:
-            features = prepare_features_for_match(cursor, table_name, home_team, away_team, match_date)
-            X_train.append(features)
-            y_train.append(result_map[result])
-        
-        X_train = np.array(X_train)
-        y_train = np.array(y_train)
-        
-        # Entrenar modelo
-        model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
-            min_samples_split=20,
-            min_samples_leaf=10,
-            random_state=42,
-            n_jobs=-1
-        )
-        model.fit(X_train, y_train)
+        with stage('features'):
+            X_train = feature_engine.features(train_home, train_away, train_dates, with_xg)
+        y_train = np.array([RESULT_MAP[r] for r in train_results])
         
         # EVALUACIÓN
         test_query = f"""
@@ -394,184 +515,67 @@ def main():
         ORDER BY date
         """
         
-        cursor.execute(test_query, (test_season,))
-        test_matches = cursor.fetchall()
+        with stage('load'):
+            cursor.execute(test_query, (test_season,))
+            test_matches = cursor.fetchall()
         
         if not test_matches:
             print(json.dumps({"error": f"No hay partidos para evaluar en {test_season}"}))
             return
         
-        # Evaluar predicciones y registrar apuestas
-        predictions = []
-        probabilities = []
-        y_test = []
-        betting_details = []
-        
         # Configuración de apuestas con stake variable
         initial_bankroll = 1000
-        current_bankroll = initial_bankroll
-        base_unit = 10  # Unidad base de apuesta
-        total_stakes = 0
-        winning_bets = 0
-        total_bets = 0
         
         # Criterios de apuesta
         # Usar la configuración en lugar de valores hardcodeados
-        min_value = value_config['min_value']
-        min_confidence = value_config['min_confidence']
-        min_odds = value_config['min_odds']
-        max_odds = value_config['max_odds']
-        base_unit = value_config['base_unit']
-        
-        # Estadísticas por stake
-        stakes_distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        stakes_roi = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        stakes_profit = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        
-        for match_date, home_team, away_team, result, odds_h, odds_d, odds_a in test_matches:
-            # Preparar features
-            features = prepare_features_for_match(cursor, table_name, home_team, away_team, match_date)
-            
-            # Predecir
-            pred = model.predict([features])[0]
-            prob = model.predict_proba([features])[0]
-            
-            predictions.append(pred)
-            probabilities.append(prob)
-            y_test.append(result_map[result])
-            
-            # Procesar apuesta
-            if odds_h and odds_d and odds_a:
-                odds = [float(odds_a), float(odds_d), float(odds_h)]
-                
-                # Buscar la mejor apuesta
-                best_value = -1
-                best_bet = None
-                best_odd = None
-                best_confidence = 0
-                
-                for outcome in range(3):
-                    if min_odds <= odds[outcome] <= max_odds:
-                        our_prob = prob[outcome]
-                        if our_prob >= min_confidence:
-                            market_prob = 1 / odds[outcome]
-                            value = our_prob - market_prob
-                            
-                            if value > best_value and value >= min_value:
-                                best_value = value
-                                best_bet = outcome
-                                best_odd = odds[outcome]
-                                best_confidence = our_prob
-                
-                # Realizar apuesta si hay value
-                if best_bet is not None:
-                    # Calcular stake variable (1-5)
-                    stake_level = calculate_stake(best_value, best_confidence)
-                    stake_amount = base_unit * stake_level
-                    
-                    total_bets += 1
-                    total_stakes += stake_amount
-                    stakes_distribution[stake_level] += 1
-                    
-                    bet_won = (best_bet == result_map[result])
-                    
-                    if bet_won:
-                        profit = stake_amount * (best_odd - 1)
-                        current_bankroll += profit
-                        winning_bets += 1
-                        stakes_profit[stake_level] += profit
-                    else:
-                        profit = -stake_amount
-                        current_bankroll -= stake_amount
-                        stakes_profit[stake_level] -= stake_amount
-                    
-                    # Guardar detalles
-                    betting_details.append({
-                        'date': str(match_date),
-                        'home_team': home_team,
-                        'away_team': away_team,
-                        'prediction': ['A', 'D', 'H'][best_bet],
-                        'actual_result': result,
-                        'odds': round(best_odd, 2),
-                        'stake_level': stake_level,
-                        'stake_amount': stake_amount,
-                        'confidence': round(best_confidence, 3),
-                        'value': round(best_value, 3),
-                        'profit': round(profit, 2),
-                        'won': bet_won,
-                        'bankroll': round(current_bankroll, 2)
-                    })
-        
-        # Calcular ROI por stake
-        for stake in range(1, 6):
-            if stakes_distribution[stake] > 0:
-                stakes_roi[stake] = (stakes_profit[stake] / (stakes_distribution[stake] * base_unit * stake)) * 100
-        
-        predictions = np.array(predictions)
-        y_test = np.array(y_test)
-        
-        # Calcular métricas
-        correct = np.sum(predictions == y_test)
-        accuracy = correct / len(y_test)
+        criteria = {
+            'min_value': value_config['min_value'],
+            'min_confidence': value_config['min_confidence'],
+            'min_odds': value_config['min_odds'],
+            'max_odds': value_config['max_odds'],
+            'base_unit': value_config['base_unit']
+        }
         
-        # Métricas por tipo
-        home_wins_total = np.sum(y_test == 2)
-        draws_total = np.sum(y_test == 1)
-        away_wins_total = np.sum(y_test == 0)
+        test_dates, test_home, test_away, test_results, odds_h, odds_d, odds_a = zip(*test_matches)
+        
+        with stage('features'):
+            X_test = feature_engine.features(test_home, test_away, test_dates, with_xg)
+        odds_matrix = to_odds_matrix(odds_h, odds_d, odds_a)
+        
+        # Entrenar (o reutilizar el modelo de la caché) y predecir la temporada
+        model_cache = ModelCache() if cache_enabled() else None
+        walk_forward_stats = None
+        if walk_forward:
+            with stage('fit'):
+                model = load_or_train_model(X_train, y_train, cache=model_cache)
+            # Predicción semanal y reentrenos intercalados
+            with stage('predict'):
+                probabilities, walk_forward_stats = walk_forward_probabilities(
+                    model, X_train, y_train, X_test,
+                    np.array([RESULT_MAP[r] for r in test_results]), to_days(test_dates)
+                )
+            classes = model.classes_
+        else:
+            probabilities, classes = benchmark_probabilities(X_train, y_train, X_test, cache=model_cache)
         
-        home_wins_correct = np.sum((predictions == 2) & (y_test == 2))
-        draws_correct = np.sum((predictions == 1) & (y_test == 1))
-        away_wins_correct = np.sum((predictions == 0) & (y_test == 0))
+        results, y_test = evaluate_benchmark(
+            probabilities, classes, test_dates, test_home, test_away, test_results,
+            odds_matrix, criteria, initial_bankroll
+        )
         
-        profit_loss = current_bankroll - initial_bankroll
-        roi = (profit_loss / total_stakes * 100) if total_stakes > 0 else 0
+        if walk_forward_stats:
+            results['walk_forward'] = walk_forward_stats
         
-        # Resultados
-        results = {
-            'test_metrics': {
-                'overall_accuracy': float(accuracy),
-                'total_predictions': len(predictions),
-                'correct_predictions': int(correct),
-                'home_wins': {
-                    'total': int(home_wins_total),
-                    'correct': int(home_wins_correct),
-                    'accuracy': float(home_wins_correct / home_wins_total) if home_wins_total > 0 else 0
-                },
-                'draws': {
-                    'total': int(draws_total),
-                    'correct': int(draws_correct),
-                    'accuracy': float(draws_correct / draws_total) if draws_total > 0 else 0
-                },
-                'away_wins': {
-                    'total': int(away_wins_total),
-                    'correct': int(away_wins_correct),
-                    'accuracy': float(away_wins_correct / away_wins_total) if away_wins_total > 0 else 0
-                }
-            },
-            'value_betting': {
-                'initial_bankroll': initial_bankroll,
-                'final_bankroll': round(current_bankroll, 2),
-                'total_bets': total_bets,
-                'winning_bets': winning_bets,
-                'roi': round(roi, 1),
-                'profit_loss': round(profit_loss, 2),
-                'win_rate': float(winning_bets / total_bets) if total_bets > 0 else 0,
-                'total_stakes': round(total_stakes, 2),
-                'avg_stake': round(total_stakes / total_bets, 2) if total_bets > 0 else 0,
-                'betting_criteria': {
-                    'min_value': min_value,
-                    'min_confidence': min_confidence,
-                    'min_odds': min_odds,
-                    'max_odds': max_odds,
-                    'base_unit': base_unit
-                },
-                'stakes_distribution': stakes_distribution,
-                'stakes_roi': {k: round(v, 1) for k, v in stakes_roi.items()},
-                'stakes_profit': {k: round(v, 2) for k, v in stakes_profit.items()}
-            },
-            'betting_details': betting_details
-        }
+        # Guardar la matriz del backtest para threshold_sweep.py (opcional:
+        # si no se puede escribir el benchmark sigue igual)
+        with stage('save'):
+            try:
+                save_backtest(test_season, model_type + ('_walk_forward' if walk_forward else ''),
+                              league_filter, test_dates, probabilities, odds_matrix, y_test)
+            except OSError:
+                pass
         
+        results['timings'] = report()
         print(json.dumps(results))
         
         cursor.close()
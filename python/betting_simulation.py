@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Simulación vectorizada de value betting
+
+Misma lógica que el bucle partido a partido de benchmark_season.py, pero
+sobre arrays de toda la temporada:
+
+- elegir el resultado con más value que cumpla cuotas, confianza y value
+- stake 1-5 de calculate_stake()
+- beneficio de cada apuesta y bankroll acumulado
+
+Las probabilidades y cuotas van en el orden de clases del modelo:
+columna 0 = A, 1 = D, 2 = H.
+"""
+
+import numpy as np
+
+OUTCOME_LABELS = ['A', 'D', 'H']
+
+# Tramos de calculate_stake(): límite inferior de cada score 2, 4, ..., 10
+VALUE_STEPS = np.array([0.10, 0.15, 0.20, 0.25, 0.30])
+CONFIDENCE_STEPS = np.array([0.40, 0.45, 0.50, 0.55, 0.60])
+SCORE_STEPS = np.array([2, 4, 6, 8])
+
+STAKE_LEVELS = [1, 2, 3, 4, 5]
+
+
+def to_odds_matrix(odds_home, odds_draw, odds_away):
+    """Cuotas (n, 3) en orden A, D, H; None -> NaN"""
+    def column(values):
+        return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+    return np.column_stack([column(odds_away), column(odds_draw), column(odds_home)])
+
+
+def calculate_stakes(values, confidences):
+    """Versión vectorizada de calculate_stake() de benchmark_season.py"""
+    values = np.asarray(values, dtype=np.float64)
+    confidences = np.asarray(confidences, dtype=np.float64)
+
+    value_score = 2 * np.searchsorted(VALUE_STEPS, values, side='right')
+    confidence_score = 2 * np.searchsorted(CONFIDENCE_STEPS, confidences, side='right')
+    combined_score = (value_score * 0.6) + (confidence_score * 0.4)
+    stakes = 1 + np.searchsorted(SCORE_STEPS, combined_score, side='right')
+
+    # Mismos límites de seguridad
+    stakes = np.where((stakes == 5) & (values < 0.25), 4, stakes)
+    stakes = np.where((stakes >= 4) & (confidences < 0.50), 3, stakes)
+    return stakes
+
+
+def select_bets(probabilities, odds, min_value, min_confidence, min_odds, max_odds):
+    """
+    Mejor apuesta de cada partido
+
+    Devuelve (apuesta, value, cuota, confianza); apuesta = -1 si no hay.
+    Con empates gana el primer resultado, igual que el bucle original.
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    odds = np.asarray(odds, dtype=np.float64)
+
+    # "if odds_h and odds_d and odds_a": las tres cuotas presentes y no nulas
+    has_odds = np.all(np.isfinite(odds) & (odds != 0), axis=1)
+    safe_odds = np.where(np.isfinite(odds) & (odds != 0), odds, 1.0)
+
+    values = probabilities - 1 / safe_odds
+    eligible = (
+        has_odds[:, None]
+        & (min_odds <= odds) & (odds <= max_odds)
+        & (probabilities >= min_confidence)
+        & (values > -1)
+        & (values >= min_value)
+    )
+
+    candidate_values = np.where(eligible, values, -np.inf)
+    bets = np.argmax(candidate_values, axis=1)
+    rows = np.arange(len(bets))
+    has_bet = eligible.any(axis=1)
+
+    return (
+        np.where(has_bet, bets, -1),
+        values[rows, bets],
+        odds[rows, bets],
+        probabilities[rows, bets],
+    )
+
+
+def _running_total(start, amounts):
+    """Suma acumulada en el mismo orden que 'total += x' (start incluido)"""
+    return np.cumsum(np.concatenate([[start], amounts]))[1:]
+
+
+def simulate_value_betting(probabilities, odds, results, criteria, initial_bankroll=1000):
+    """
+    Simulación completa de la temporada
+
+    results: clase real de cada partido (0 = A, 1 = D, 2 = H)
+    criteria: min_value, min_confidence, min_odds, max_odds, base_unit
+
+    Devuelve (diccionario de arrays de las apuestas, resumen value_betting)
+    """
+    results = np.asarray(results)
+    base_unit = criteria['base_unit']
+
+    bets, values, bet_odds, confidences = select_bets(
+        probabilities, odds,
+        criteria['min_value'], criteria['min_confidence'],
+        criteria['min_odds'], criteria['max_odds']
+    )
+
+    placed = np.flatnonzero(bets >= 0)
+    bets = bets[placed]
+    values = values[placed]
+    bet_odds = bet_odds[placed]
+    confidences = confidences[placed]
+
+    stake_levels = calculate_stakes(values, confidences)
+    stake_amounts = base_unit * stake_levels
+    won = bets == results[placed]
+    profits = np.where(won, stake_amounts * (bet_odds - 1), -stake_amounts)
+    bankroll = _running_total(initial_bankroll, profits)
+
+    bets_placed = {
+        'index': placed,
+        'bet': bets,
+        'value': values,
+        'odds': bet_odds,
+        'confidence': confidences,
+        'stake_level': stake_levels,
+        'stake_amount': stake_amounts,
+        'won': won,
+        'profit': profits,
+        'bankroll': bankroll,
+    }
+
+    total_bets = len(placed)
+    winning_bets = int(won.sum())
+    # Importes siempre float, haya o no apuestas ganadas
+    total_stakes = float(_running_total(0, stake_amounts)[-1]) if total_bets else 0.0
+    current_bankroll = float(bankroll[-1]) if total_bets else float(initial_bankroll)
+
+    stakes_distribution = {}
+    stakes_profit = {}
+    stakes_roi = {}
+    for stake in STAKE_LEVELS:
+        level = stake_levels == stake
+        stakes_distribution[stake] = int(level.sum())
+        stakes_profit[stake] = float(_running_total(0, profits[level])[-1]) if level.any() else 0.0
+        stakes_roi[stake] = 0.0
+        if stakes_distribution[stake] > 0:
+            stakes_roi[stake] = (stakes_profit[stake] / (stakes_distribution[stake] * base_unit * stake)) * 100
+
+    profit_loss = current_bankroll - initial_bankroll
+    roi = (profit_loss / total_stakes * 100) if total_stakes > 0 else 0
+
+    value_betting = {
+        'initial_bankroll': initial_bankroll,
+        'final_bankroll': round(current_bankroll, 2),
+        'total_bets': total_bets,
+        'winning_bets': winning_bets,
+        'roi': round(roi, 1),
+        'profit_loss': round(profit_loss, 2),
+        'win_rate': float(winning_bets / total_bets) if total_bets > 0 else 0,
+        'total_stakes': round(total_stakes, 2),
+        'avg_stake': round(total_stakes / total_bets, 2) if total_bets > 0 else 0,
+        'betting_criteria': {
+            'min_value': criteria['min_value'],
+            'min_confidence': criteria['min_confidence'],
+            'min_odds': criteria['min_odds'],
+            'max_odds': criteria['max_odds'],
+            'base_unit': base_unit
+        },
+        'stakes_distribution': stakes_distribution,
+        'stakes_roi': {k: round(v, 1) for k, v in stakes_roi.items()},
+        'stakes_profit': {k: round(v, 2) for k, v in stakes_profit.items()}
+    }
+
+    return bets_placed, value_betting
+
+
+def betting_details(bets_placed, dates, home_teams, away_teams, results):
+    """Lista betting_details del JSON del benchmark (solo partidos con apuesta)"""
+    details = []
+    for (i, bet, odds, level, amount, confidence, value, profit, won, bankroll) in zip(
+            bets_placed['index'].tolist(), bets_placed['bet'].tolist(),
+            bets_placed['odds'].tolist(), bets_placed['stake_level'].tolist(),
+            bets_placed['stake_amount'].tolist(), bets_placed['confidence'].tolist(),
+            bets_placed['value'].tolist(), bets_placed['profit'].tolist(),
+            bets_placed['won'].tolist(), bets_placed['bankroll'].tolist()):
+        details.append({
+            'date': str(dates[i]),
+            'home_team': home_teams[i],
+            'away_team': away_teams[i],
+            'prediction': OUTCOME_LABELS[bet],
+            'actual_result': results[i],
+            'odds': round(odds, 2),
+            'stake_level': level,
+            'stake_amount': amount,
+            'confidence': round(confidence, 3),
+            'value': round(value, 3),
+            'profit': round(profit if won else -amount, 2),
+            'won': won,
+            'bankroll': round(float(bankroll), 2)
+        })
+    return details
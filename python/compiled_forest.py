@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Formato compilado de Random Forest (solo NumPy)
+
+Aplana todos los árboles de un RandomForestClassifier en arrays contiguos
+(un nodo por posición, índices globales) y los guarda en UN fichero:
+
+    FTFOREST | versión | longitud cabecera | cabecera JSON | arrays alineados
+
+    feature    int32    (n_nodos,)            feature del nodo (0 en hojas)
+    threshold  float64  (n_nodos,)            umbral (x <= umbral -> izquierda)
+    left       int32    (n_nodos,)            hijo izquierdo (la propia hoja en hojas)
+    right      int32    (n_nodos,)            hijo derecho (la propia hoja en hojas)
+    value      float64  (n_nodos, n_clases)   probabilidades de la hoja
+    roots      int32    (n_arboles,)          nodo raíz de cada árbol
+    missing_left uint8  (n_nodos,)            NaN -> izquierda (sklearn >= 1.3;
+                                              sin este array se rechazan los NaN)
+
+El fichero se abre con np.memmap, así que cargarlo no copia nada ni importa
+sklearn/SciPy, y no depende de la versión de sklearn de python-libs.
+
+El evaluador recorre todos los árboles a la vez para un lote de filas: en
+cada paso de profundidad avanza el nodo actual de todos los pares (fila,
+árbol) que aún no han llegado a una hoja (las hojas apuntan a sí mismas).
+El resultado coincide exactamente con predict_proba de sklearn, también
+con NaN: van al hijo que sklearn aprendió para los valores que faltan
+(missing_go_to_left). Los sklearn que no lo guardan tampoco aceptan NaN al
+predecir, así que con sus modelos los NaN (e inf siempre) dan ValueError.
+
+Uso:
+    python3 compiled_forest.py export <modelo.pkl> [salida.forest]
+    python3 compiled_forest.py verify <modelo.pkl> [salida.forest]
+"""
+
+import os
+import sys
+import json
+import numpy as np
+
+MAGIC = b'FTFOREST'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+FOREST_EXTENSION = '.forest'
+
+# Filas por bloque al evaluar: acota la matriz (filas, árboles) de nodos
+DEFAULT_BATCH_ROWS = 4096
+
+
+def compiled_path(model_path):
+    """Ruta del forest compilado que acompaña a un .pkl"""
+    return os.path.splitext(model_path)[0] + FOREST_EXTENSION
+
+
+def _unwrap(model):
+    """Acepta el modelo directo o el dict {'model', 'features'} de algunos scripts"""
+    if isinstance(model, dict):
+        return model['model'], model.get('features', [])
+    return model, []
+
+
+def flatten_forest(model):
+    """Arrays del formato compilado a partir de un RandomForestClassifier ajustado"""
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    n_classes = len(model.classes_)
+
+    sizes = np.array([tree.node_count for tree in trees], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    n_nodes = int(sizes.sum())
+
+    feature = np.zeros(n_nodes, dtype=np.int32)
+    threshold = np.zeros(n_nodes, dtype=np.float64)
+    left = np.zeros(n_nodes, dtype=np.int32)
+    right = np.zeros(n_nodes, dtype=np.int32)
+    value = np.zeros((n_nodes, n_classes), dtype=np.float64)
+    has_missing = all(getattr(tree, 'missing_go_to_left', None) is not None for tree in trees)
+    missing_left = np.zeros(n_nodes, dtype=np.uint8)
+
+    for tree, offset, size in zip(trees, offsets, sizes):
+        nodes = slice(offset, offset + size)
+        own = np.arange(offset, offset + size, dtype=np.int64)
+        is_leaf = tree.children_left == -1
+
+        feature[nodes] = np.where(is_leaf, 0, tree.feature)
+        threshold[nodes] = np.where(is_leaf, 0.0, tree.threshold)
+        left[nodes] = np.where(is_leaf, own, tree.children_left + offset)
+        right[nodes] = np.where(is_leaf, own, tree.children_right + offset)
+        if has_missing:
+            missing_left[nodes] = np.where(is_leaf, 0, tree.missing_go_to_left)
+
+        # sklearn < 1.4 guarda conteos y normaliza al predecir; las versiones
+        # nuevas ya guardan fracciones y no vuelven a dividir
+        leaf_values = tree.value[:, 0, :n_classes].astype(np.float64)
+        totals = leaf_values.sum(axis=1, keepdims=True)
+        totals[(totals == 0.0) | (np.abs(totals - 1.0) < 1e-9)] = 1.0
+        value[nodes] = leaf_values / totals
+
+    header = {
+        'n_features': int(model.n_features_in_),
+        'n_classes': n_classes,
+        'n_estimators': len(trees),
+        'max_depth': int(max(tree.max_depth for tree in trees)),
+        'classes': model.classes_.tolist(),
+    }
+    arrays = {
+        'feature': feature,
+        'threshold': threshold,
+        'left': left,
+        'right': right,
+        'value': value,
+        'roots': offsets.astype(np.int32),
+    }
+    if has_missing:
+        arrays['missing_left'] = missing_left
+    return header, arrays
+
+
+def write_forest(path, header, arrays):
+    """Escribe cabecera y arrays alineados; se sustituye el fichero de golpe"""
+    layout = {}
+    position = 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': position}
+        position += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+    header = dict(header, arrays=layout)
+    header_bytes = json.dumps(header).encode('utf-8')
+    prefix_size = len(MAGIC) + 8 + len(header_bytes)
+    data_start = -(-prefix_size // ALIGNMENT) * ALIGNMENT
+
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.array([FORMAT_VERSION, len(header_bytes)], dtype='<u4').tobytes())
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + position)
+    os.replace(tmp, path)
+
+
+def export_forest(model, path, feature_names=None):
+    """Compilar un modelo (o el dict guardado con pickle) a un fichero .forest"""
+    model, stored_names = _unwrap(model)
+    header, arrays = flatten_forest(model)
+    header['feature_names'] = list(feature_names if feature_names is not None else stored_names)
+    write_forest(path, header, arrays)
+    return path
+
+
+class CompiledForest:
+    """
+    Random Forest compilado, con la misma interfaz de inferencia que sklearn
+    (classes_, n_features_in_, predict_proba, predict)
+    """
+
+    def __init__(self, path):
+        raw = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(raw[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f'{path} no es un forest compilado')
+
+        version, header_size = np.frombuffer(raw[len(MAGIC):len(MAGIC) + 8].tobytes(), dtype='<u4').tolist()
+        if version != FORMAT_VERSION:
+            raise ValueError(f'Versión de forest compilado no soportada: {version}')
+
+        start = len(MAGIC) + 8
+        self.header = json.loads(bytes(raw[start:start + header_size]).decode('utf-8'))
+        data_start = -(-(start + header_size) // ALIGNMENT) * ALIGNMENT
+
+        for name, spec in self.header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            offset = data_start + spec['offset']
+            count = int(np.prod(spec['shape']))
+            view = raw[offset:offset + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+            setattr(self, name, view)
+
+        self.path = path
+        self.missing_left = getattr(self, 'missing_left', None)
+        self.classes_ = np.array(self.header['classes'])
+        self.n_features_in_ = self.header['n_features']
+        self.n_estimators = self.header['n_estimators']
+        self.max_depth = self.header['max_depth']
+        self.feature_names = self.header.get('feature_names', [])
+
+    def apply(self, X):
+        """Hoja alcanzada en cada árbol: matriz (filas, árboles) de nodos"""
+        # sklearn evalúa los árboles sobre X en float32
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        missing = np.isnan(X)
+        if np.isinf(X).any() or (self.missing_left is None and missing.any()):
+            raise ValueError('X contiene NaN o infinitos que este modelo no admite')
+        missing = missing.any()
+        n_rows = len(X)
+        flat_X = X.ravel()
+        node = np.tile(self.roots, n_rows)
+        row_base = np.repeat(np.arange(n_rows) * X.shape[1], self.n_estimators)
+
+        # Solo se avanzan los pares (fila, árbol) que aún no están en una hoja
+        active = np.flatnonzero(self.left.take(node) != node)
+        while active.size:
+            current = node.take(active)
+            values = flat_X.take(row_base.take(active) + self.feature.take(current))
+            go_left = values <= self.threshold.take(current)
+            if missing:
+                nan = np.isnan(values)
+                go_left[nan] = self.missing_left.take(current[nan]).astype(bool)
+            current = np.where(go_left, self.left.take(current), self.right.take(current))
+            node[active] = current
+            active = active[self.left.take(current) != current]
+
+        return node.reshape(n_rows, self.n_estimators)
+
+    def predict_proba(self, X, batch_rows=DEFAULT_BATCH_ROWS):
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f'X tiene {X.shape[1]} features, el modelo espera {self.n_features_in_}'
+            )
+
+        proba = np.zeros((len(X), len(self.classes_)))
+        for start in range(0, len(X), batch_rows):
+            leaves = self.apply(X[start:start + batch_rows])
+            block = proba[start:start + batch_rows]
+            # Sumar árbol a árbol, en el mismo orden que sklearn
+            for tree in range(self.n_estimators):
+                block += self.value[leaves[:, tree]]
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def load_compiled(model_path):
+    """
+    Forest compilado asociado a model_path si existe y no es más antiguo
+    que el .pkl; si no, None
+    """
+    path = model_path if model_path.endswith(FOREST_EXTENSION) else compiled_path(model_path)
+    if not os.path.exists(path):
+        return None
+    if path != model_path and os.path.exists(model_path) \
+            and os.path.getmtime(path) < os.path.getmtime(model_path):
+        return None
+    return CompiledForest(path)
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('export', 'verify'):
+        print(json.dumps({'error': 'Uso: compiled_forest.py <export|verify> <modelo.pkl> [salida.forest]'}))
+        return
+
+    import joblib
+
+    model_path = sys.argv[2]
+    output_path = sys.argv[3] if len(sys.argv) > 3 else compiled_path(model_path)
+
+    try:
+        model, feature_names = _unwrap(joblib.load(model_path))
+
+        if sys.argv[1] == 'export':
+            export_forest(model, output_path, feature_names)
+            print(json.dumps({
+                'success': True,
+                'output': output_path,
+                'size_bytes': os.path.getsize(output_path)
+            }))
+            return
+
+        forest = CompiledForest(output_path)
+        rng = np.random.RandomState(0)
+        X = rng.normal(1.0, 2.0, size=(2000, forest.n_features_in_))
+        # Filas con NaN (p.ej. xG medio de equipos sin xG) si el modelo los admite
+        if forest.missing_left is not None:
+            X[rng.random_sample(X.shape) < 0.1] = np.nan
+        difference = np.abs(forest.predict_proba(X) - model.predict_proba(X)).max()
+        print(json.dumps({
+            'success': bool(difference < 1e-9),
+            'max_abs_difference': float(difference),
+            'same_predictions': bool((forest.predict(X) == model.predict(X)).all())
+        }))
+
+    except Exception as e:
+        print(json.dumps({'error': str(e)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Importador masivo de CSV de football-data
+
+Hace lo mismo que FT_CSV_Importer::import_from_file (class-csv-importer.php)
+pero por conjuntos en lugar de fila a fila:
+
+1. Cada fichero se lee entero y sus columnas se convierten de golpe con las
+   mismas reglas que el PHP (get_column_mapping, get_value,
+   get_numeric_value, get_decimal_value, format_date, determine_season)
+2. Las filas repetidas (mismo date / home_team / away_team) dentro de los
+   ficheros se fusionan como lo haría smart_update_match
+3. Todas las filas se cargan en una tabla temporal con INSERTs de varias
+   filas y se aplican a ft_matches_advanced con DOS sentencias: un UPDATE
+   ... JOIN que solo rellena los campos vacíos (NULL, '' o 0) de los
+   partidos existentes y un INSERT ... SELECT de los partidos nuevos
+
+La tabla no tiene clave única sobre (date, home_team, away_team), así que
+INSERT ... ON DUPLICATE KEY UPDATE no detectaría los partidos existentes:
+la tabla temporal da el mismo resultado sin tocar el esquema.
+
+Al terminar, como el PHP, calcula el xG de los partidos que no lo tienen
+(xg_backfill.py), invalida la caché de predicciones y, si hay partidos
+nuevos, lanza en segundo plano train_model_fixed.py --incremental.
+
+Uso:
+    python3 csv_bulk_import.py <fichero.csv|directorio>... [--dry-run] [--no-refresh]
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import subprocess
+import numpy as np
+import pandas as pd
+
+# Agregar path para librerías
+plugin_libs = '/var/www/vhosts/virtualrolldice.com/httpdocs/wp-content/plugins/football-tipster/python-libs'
+if plugin_libs not in sys.path:
+    sys.path.insert(0, plugin_libs)
+
+from instrumentation import instrument_connection, report, stage, start_profiling
+from match_loader import get_db_connection, load_db_config, matches_table
+from xg_backfill import backfill
+
+PYTHON_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Cabecera del CSV (en minúsculas) -> columna de ft_matches_advanced,
+# igual que get_column_mapping()
+FIELD_MAP = {
+    'div': 'division',
+    'division': 'division',
+    'date': 'date',
+    'hometeam': 'home_team',
+    'home': 'home_team',
+    'awayteam': 'away_team',
+    'away': 'away_team',
+
+    'fthg': 'fthg', 'ftag': 'ftag', 'ftr': 'ftr',
+    'hthg': 'hthg', 'htag': 'htag', 'htr': 'htr',
+
+    'hs': 'hs', 'as': 'as_shots', 'hst': 'hst', 'ast': 'ast',
+    'hc': 'hc', 'ac': 'ac', 'hf': 'hf', 'af': 'af',
+    'hy': 'hy', 'ay': 'ay', 'hr': 'hr', 'ar': 'ar',
+
+    'b365h': 'b365h', 'b365d': 'b365d', 'b365a': 'b365a',
+    'b365>2.5': 'b365_over25', 'b365<2.5': 'b365_under25',
+    'b365>1.5': 'b365_over15', 'b365<1.5': 'b365_under15',
+    'b365>3.5': 'b365_over35', 'b365<3.5': 'b365_under35',
+    'b365ah': 'b365_ah_line', 'b365ahh': 'b365_ah_home', 'b365aha': 'b365_ah_away',
+
+    'bwh': 'bwh', 'bwd': 'bwd', 'bwa': 'bwa',
+    'iwh': 'iwh', 'iwd': 'iwd', 'iwa': 'iwa',
+    'psh': 'psh', 'psd': 'psd', 'psa': 'psa',
+    'whh': 'whh', 'whd': 'whd', 'wha': 'wha',
+
+    'maxh': 'max_home', 'maxd': 'max_draw', 'maxa': 'max_away',
+    'max>2.5': 'max_over25', 'max<2.5': 'max_under25',
+    'avgh': 'avg_home', 'avgd': 'avg_draw', 'avga': 'avg_away',
+    'avg>2.5': 'avg_over25', 'avg<2.5': 'avg_under25',
+}
+
+# Columnas que smart_update_match() rellena si están vacías, por tipo
+INTEGER_FIELDS = ['fthg', 'ftag', 'hthg', 'htag', 'hs', 'as_shots', 'hst', 'ast',
+                  'hc', 'ac', 'hf', 'af', 'hy', 'ay', 'hr', 'ar']
+TEXT_FIELDS = ['ftr', 'htr']
+DECIMAL_FIELDS = [
+    'b365h', 'b365d', 'b365a', 'b365_over25', 'b365_under25', 'b365_over15', 'b365_under15',
+    'b365_over35', 'b365_under35', 'b365_ah_line', 'b365_ah_home', 'b365_ah_away',
+    'bwh', 'bwd', 'bwa', 'iwh', 'iwd', 'iwa', 'psh', 'psd', 'psa',
+    'whh', 'whd', 'wha', 'max_home', 'max_draw', 'max_away',
+    'max_over25', 'max_under25', 'avg_home', 'avg_draw', 'avg_away',
+    'avg_over25', 'avg_under25'
+]
+UPDATEABLE_FIELDS = INTEGER_FIELDS + TEXT_FIELDS + DECIMAL_FIELDS
+
+KEY_COLUMNS = ['date', 'home_team', 'away_team']
+INSERT_COLUMNS = ['division'] + KEY_COLUMNS + UPDATEABLE_FIELDS + ['season', 'sport', 'data_source']
+
+# Formatos que prueba format_date(), en el mismo orden
+DATE_FORMATS = ['%d/%m/%Y', '%d/%m/%y', '%Y-%m-%d', '%d-%m-%Y', '%m/%d/%Y']
+
+# get_decimal_value() descarta cuotas fuera de este rango
+MIN_DECIMAL = 1.01
+MAX_DECIMAL = 100
+
+NULL_VALUES = ('', 'NA', 'N/A')
+
+# Número inicial de PHP (floatval lee el prefijo numérico: '2.5x' -> 2.5)
+LEADING_NUMBER = r'^\s*([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)'
+
+BATCH_SIZE = 1000
+
+
+# ---------------------------------------------------------------------- #
+# Lectura y conversión por columnas
+# ---------------------------------------------------------------------- #
+
+def read_csv_rows(path):
+    """(cabeceras, filas) con csv.reader, igual que fgetcsv"""
+    for encoding in ('utf-8-sig', 'latin-1'):
+        try:
+            with open(path, 'r', encoding=encoding, newline='') as f:
+                rows = list(csv.reader(f))
+            break
+        except UnicodeDecodeError:
+            continue
+    if not rows:
+        return [], []
+    return rows[0], rows[1:]
+
+
+def _cell_matrix(rows, width):
+    """Matriz de texto (filas, width) recortada; las celdas que faltan quedan ''"""
+    padded = [row[:width] if len(row) >= width else row + [''] * (width - len(row)) for row in rows]
+    if not padded or width == 0:
+        return np.empty((len(rows), width), dtype=object)
+    return np.char.strip(np.array(padded, dtype=str)).astype(object)
+
+
+def get_column_mapping(headers):
+    """Columna de la tabla -> índice en la fila (la última cabecera repetida gana)"""
+    mapping = {}
+    for index, header in enumerate(headers):
+        field = FIELD_MAP.get(header.strip().lower())
+        if field:
+            mapping[field] = index
+    return mapping
+
+
+def get_values(cells, column_map, field):
+    """Como get_value(): texto recortado o NaN si falta, está vacío o es NA"""
+    index = column_map.get(field)
+    if index is None:
+        return pd.Series(np.nan, index=range(len(cells)), dtype=object)
+    values = pd.Series(cells[:, index], dtype=object)
+    return values.where(~values.isin(NULL_VALUES), np.nan)
+
+
+def get_numeric_values(values):
+    """Como get_numeric_value(): intval de lo que es numérico"""
+    return np.trunc(pd.to_numeric(values, errors='coerce'))
+
+
+def get_decimal_values(values):
+    """
+    Como get_decimal_value(): floatval y solo valores entre 1.01 y 100
+    (las líneas de hándicap negativas también se descartan, como en el PHP)
+    """
+    numbers = pd.to_numeric(values, errors='coerce')
+    # Solo los textos que no son un número completo pasan por la expresión regular
+    partial = numbers.isna() & values.notna()
+    if partial.any():
+        numbers[partial] = pd.to_numeric(values[partial].str.extract(LEADING_NUMBER, expand=False),
+                                         errors='coerce')
+    return numbers.where((numbers >= MIN_DECIMAL) & (numbers <= MAX_DECIMAL), np.nan)
+
+
+def format_dates(values):
+    """
+    Como format_date(): el primer formato que encaja, después el análisis
+    libre de strtotime. Un año de 2 cifras no se acepta con %Y (el PHP lo
+    guardaría como el año 00AA); pasa al formato %d/%m/%y.
+    """
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    for date_format in DATE_FORMATS:
+        pending = parsed.isna() & values.notna()
+        if not pending.any():
+            break
+        attempt = pd.to_datetime(values[pending], format=date_format, errors='coerce')
+        parsed[pending] = attempt
+
+    pending = parsed.isna() & values.notna()
+    if pending.any():
+        parsed[pending] = pd.to_datetime(values[pending], errors='coerce')
+    return parsed
+
+
+def determine_seasons(dates):
+    """Como determine_season(): de julio a junio, 'AAAA-AAAA'"""
+    years = dates.dt.year
+    start = np.where(dates.dt.month >= 7, years, years - 1).astype(np.int64)
+    return pd.Series([f"{year}-{year + 1}" for year in start], index=dates.index, dtype=object)
+
+
+def parse_file(path):
+    """
+    Filas válidas del fichero como DataFrame con INSERT_COLUMNS
+
+    Devuelve (DataFrame, filas leídas, filas omitidas)
+    """
+    # Las líneas en blanco cuentan como omitidas, igual que en el PHP
+    headers, rows = read_csv_rows(path)
+    column_map = get_column_mapping(headers)
+    cells = _cell_matrix(rows, max(column_map.values(), default=-1) + 1)
+
+    df = pd.DataFrame({'division': get_values(cells, column_map, 'division').fillna('')})
+    for field in ['home_team', 'away_team'] + TEXT_FIELDS:
+        df[field] = get_values(cells, column_map, field)
+    for field in INTEGER_FIELDS:
+        df[field] = get_numeric_values(get_values(cells, column_map, field))
+    for field in DECIMAL_FIELDS:
+        df[field] = get_decimal_values(get_values(cells, column_map, field))
+
+    dates = format_dates(get_values(cells, column_map, 'date'))
+    valid = dates.notna() & df['home_team'].notna() & df['away_team'].notna()
+
+    df = df[valid].copy()
+    dates = dates[valid]
+    df['date'] = dates.dt.strftime('%Y-%m-%d')
+    df['season'] = determine_seasons(dates)
+    df['sport'] = 'football'
+    df['data_source'] = 'csv'
+    return df[INSERT_COLUMNS].reset_index(drop=True), len(rows), int((~valid).sum())
+
+
+def _is_empty(df, field):
+    """Campo vacío según smart_update_match(): NULL, '' o 0"""
+    values = df[field]
+    if field in TEXT_FIELDS:
+        return values.isna() | (values == '')
+    return values.isna() | (values == 0)
+
+
+def merge_duplicates(df):
+    """
+    Una fila por partido: la primera aparición, con sus campos vacíos
+    rellenados por las siguientes (lo que hace smart_update_match fila a fila)
+    """
+    if not df.duplicated(KEY_COLUMNS).any():
+        return df
+
+    # Códigos de partido en orden de primera aparición, como drop_duplicates
+    codes = df.groupby(KEY_COLUMNS, sort=False).ngroup().to_numpy()
+    first = df.drop_duplicates(KEY_COLUMNS).reset_index(drop=True)
+
+    # groupby().first() se salta los NaN: primer valor no vacío de cada
+    # partido; si no hay ninguno se queda el de la primera aparición
+    filled = pd.DataFrame({field: df[field].where(~_is_empty(df, field)) for field in UPDATEABLE_FIELDS})
+    first_filled = filled.groupby(codes, sort=True).first().reset_index(drop=True)
+    first[UPDATEABLE_FIELDS] = first_filled.where(first_filled.notna(), first[UPDATEABLE_FIELDS])
+    return first[INSERT_COLUMNS]
+
+
+# ---------------------------------------------------------------------- #
+# Escritura por conjuntos
+# ---------------------------------------------------------------------- #
+
+def _sql_rows(df):
+    """Filas como tuplas de Python con None en lugar de NaN"""
+    values = df[INSERT_COLUMNS].astype(object).where(df[INSERT_COLUMNS].notna(), None)
+    rows = values.values.tolist()
+    integer_positions = [INSERT_COLUMNS.index(field) for field in INTEGER_FIELDS]
+    for row in rows:
+        for position in integer_positions:
+            if row[position] is not None:
+                row[position] = int(row[position])
+    return rows
+
+
+def _fill_empty_sql(field):
+    """Asignación del UPDATE: solo si el valor actual está vacío y llega uno nuevo"""
+    if field in TEXT_FIELDS:
+        empty = f"t.{field} IS NULL OR t.{field} = ''"
+    else:
+        empty = f"t.{field} IS NULL OR t.{field} = 0"
+    return f"t.{field} = IF({empty}, COALESCE(s.{field}, t.{field}), t.{field})"
+
+
+def apply_import(connection, table_name, df, batch_size=BATCH_SIZE):
+    """
+    Aplica las filas a la tabla: rellena los partidos existentes e inserta
+    los nuevos. Devuelve el número de partidos insertados.
+    """
+    staging = f"{table_name}_import_staging"
+    join = ' AND '.join(f"t.{column} = s.{column}" for column in KEY_COLUMNS)
+    columns = ', '.join(INSERT_COLUMNS)
+
+    cursor = connection.cursor()
+    try:
+        with stage('stage'):
+            cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
+            cursor.execute(f"CREATE TEMPORARY TABLE {staging} LIKE {table_name}")
+            query = f"INSERT INTO {staging} ({columns}) VALUES ({', '.join(['%s'] * len(INSERT_COLUMNS))})"
+            rows = _sql_rows(df)
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(query, rows[start:start + batch_size])
+
+        with stage('merge'):
+            cursor.execute(f"""
+                UPDATE {table_name} t
+                JOIN {staging} s ON {join}
+                SET {', '.join(_fill_empty_sql(field) for field in UPDATEABLE_FIELDS)}
+            """)
+            cursor.execute(f"""
+                INSERT INTO {table_name} ({columns})
+                SELECT {', '.join(f's.{column}' for column in INSERT_COLUMNS)}
+                FROM {staging} s
+                LEFT JOIN {table_name} t ON {join}
+                WHERE t.id IS NULL
+                ORDER BY s.id
+            """)
+            inserted = cursor.rowcount
+            connection.commit()
+
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
+        return inserted
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+# ---------------------------------------------------------------------- #
+# Después de importar (lo mismo que import_from_file)
+# ---------------------------------------------------------------------- #
+
+def invalidate_prediction_cache():
+    """Como FT_Predictor::invalidate_prediction_cache()"""
+    from prediction_cache import PredictionCache
+    from predict_client import request
+
+    PredictionCache().invalidate()
+    try:
+        request({'action': 'invalidate'}, timeout=2)
+    except OSError:
+        pass
+
+
+def refresh_model_incremental():
+    """Como refresh_model_incremental(): train_model_fixed.py --incremental en segundo plano"""
+    with open(os.devnull, 'wb') as devnull:
+        subprocess.Popen(
+            [sys.executable, os.path.join(PYTHON_DIR, 'train_model_fixed.py'), '--incremental'],
+            cwd=PYTHON_DIR, stdout=devnull, stderr=devnull, start_new_session=True
+        )
+
+
+def csv_files(paths):
+    """Ficheros .csv indicados o contenidos en los directorios indicados"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in sorted(os.walk(path)):
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith('.csv'))
+        else:
+            files.append(path)
+    return files
+
+
+def import_files(paths, connection=None, table_name=None, dry_run=False, refresh=True):
+    """
+    Importa los ficheros y devuelve el mismo resumen que import_from_file()
+    """
+    frames = []
+    files = []
+    read_rows = 0
+    skipped = 0
+
+    with stage('parse'):
+        for path in csv_files(paths):
+            if not os.path.exists(path):
+                return {'success': False, 'error': f'El archivo no existe: {path}'}
+            df, rows, file_skipped = parse_file(path)
+            frames.append(df)
+            read_rows += rows
+            skipped += file_skipped
+            files.append({'file': path, 'rows': rows, 'skipped': file_skipped})
+
+        valid = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=INSERT_COLUMNS)
+        merged = merge_duplicates(valid)
+
+    processed = 0
+    xg_updated = 0
+    if not dry_run and len(merged):
+        processed = apply_import(connection, table_name, merged)
+        # Como update_missing_xG() al final de import_from_file
+        xg_updated = backfill(connection, table_name)['updated']
+    # Como el PHP: cualquier fila válida que no se insertó cuenta como actualizada
+    updated = len(valid) - processed if not dry_run else 0
+
+    if not dry_run and (processed > 0 or updated > 0):
+        invalidate_prediction_cache()
+    if not dry_run and refresh and processed > 0:
+        refresh_model_incremental()
+
+    message = 'Importación completada: %d nuevos, %d actualizados, %d omitidos, %d errores' % (
+        processed, updated, skipped, 0
+    )
+    if xg_updated > 0:
+        message += ' (%d con xG calculado)' % xg_updated
+    return {
+        'success': True,
+        'message': message,
+        'processed': processed,
+        'updated': updated,
+        'skipped': skipped,
+        'errors': 0,
+        'xg_updated': xg_updated,
+        'rows': read_rows,
+        'valid_rows': len(valid),
+        'unique_matches': len(merged),
+        'dry_run': dry_run,
+        'files': files,
+    }
+
+
+def main():
+    start_profiling()
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not paths:
+        print(json.dumps({'success': False, 'error': 'Uso: csv_bulk_import.py <fichero.csv|directorio>... [--dry-run] [--no-refresh]'}))
+        sys.exit(1)
+
+    dry_run = '--dry-run' in sys.argv
+    connection = None
+    started = time.perf_counter()
+    try:
+        table_name = None
+        if not dry_run:
+            config = load_db_config(os.path.join(PYTHON_DIR, 'db_config.json'))
+            table_name = matches_table(config)
+            connection = instrument_connection(get_db_connection(config))
+
+        result = import_files(paths, connection, table_name, dry_run, '--no-refresh' not in sys.argv)
+        result['seconds'] = round(time.perf_counter() - started, 3)
+        result['timings'] = report()
+        print(json.dumps(result))
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': f'Error procesando archivos: {str(e)}'}))
+        sys.exit(1)
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Sincronización de CSV de football-data
+
+FT_CSV_Importer::import_from_url descarga un fichero cada vez. Este script
+descarga todos los ficheros de liga/temporada a la vez (pool de hilos) y los
+importa juntos con csv_bulk_import.py:
+
+1. Cada URL tiene una copia en cache/http/ y una entrada en el manifiesto
+   (cache/http/manifest.json) con su ETag, Last-Modified y sha1. Las
+   peticiones llevan If-None-Match / If-Modified-Since, así que un fichero sin
+   cambios responde 304 y no se vuelve a descargar
+2. Solo se importan los ficheros cuyo sha1 es distinto del de la última
+   importación correcta (imported_sha1); el resto se salta aunque el servidor
+   los haya devuelto con 200
+3. Los ficheros cambiados se importan en una sola llamada a import_files(),
+   con una sola invalidación de la caché de predicciones y un solo
+   reentrenamiento incremental
+
+Con --serve el script hace de servidor HTTP local (ETag, Last-Modified y 304)
+sobre un directorio con la misma estructura que football-data
+(mmz4281/<temporada>/<división>.csv), para probar la sincronización sin red:
+
+    python3 csv_ingest.py --serve=/tmp/football-data --port=8765
+    python3 csv_ingest.py --base-url=http://127.0.0.1:8765/mmz4281 --dry-run
+
+--self-test levanta ese servidor en un puerto libre sobre un directorio
+temporal y comprueba que la segunda sincronización recibe 304 y que un 200
+con el mismo sha1 que la última importación no se vuelve a importar.
+
+Uso:
+    python3 csv_ingest.py [--divisions=E0,SP1,...] [--seasons=1] [--workers=8]
+                          [--base-url=...] [--force] [--dry-run] [--no-refresh]
+    python3 csv_ingest.py --serve=<directorio> [--port=8765] [--latency-ms=0]
+    python3 csv_ingest.py --self-test
+
+    --seasons: número de temporadas hasta la actual (1 = solo la actual) o
+               lista de años de inicio separados por comas (2023,2024)
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+# Agregar path para librerías
+plugin_libs = '/var/www/vhosts/virtualrolldice.com/httpdocs/wp-content/plugins/football-tipster/python-libs'
+if plugin_libs not in sys.path:
+    sys.path.insert(0, plugin_libs)
+
+PYTHON_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BASE_URL = os.environ.get('FT_CSV_BASE_URL', 'https://www.football-data.co.uk/mmz4281')
+CACHE_DIR = os.path.join(PYTHON_DIR, '..', 'cache', 'http')
+MANIFEST_PATH = os.path.join(CACHE_DIR, 'manifest.json')
+
+# Divisiones que conoce el plugin (class-benchmarking-advanced.php)
+DIVISIONS = ['E0', 'E1', 'E2', 'E3', 'SP1', 'SP2', 'I1', 'I2', 'D1', 'D2',
+             'F1', 'F2', 'N1', 'B1', 'P1', 'T1', 'G1', 'SC0']
+
+DEFAULT_WORKERS = 8
+TIMEOUT = 30
+USER_AGENT = 'FootballTipster/1.0'
+CHUNK_SIZE = 64 * 1024
+
+
+def season_code(start_year):
+    """2024 -> '2425', como en las URL de football-data"""
+    return '%02d%02d' % (start_year % 100, (start_year + 1) % 100)
+
+
+def current_season(today=None):
+    """Año de inicio de la temporada en curso (empiezan en julio)"""
+    today = today or date.today()
+    return today.year if today.month >= 7 else today.year - 1
+
+
+def season_years(spec):
+    """'3' -> las 3 últimas temporadas; '2023,2024' -> esas temporadas"""
+    if ',' in spec or len(spec) == 4:
+        return sorted(int(year) for year in spec.split(','))
+    latest = current_season()
+    return list(range(latest - int(spec) + 1, latest + 1))
+
+
+def build_urls(divisions, seasons, base_url=BASE_URL):
+    return [f"{base_url.rstrip('/')}/{season_code(year)}/{division}.csv"
+            for year in seasons for division in divisions]
+
+
+# ---------------------------------------------------------------------- #
+# Caché local y manifiesto
+# ---------------------------------------------------------------------- #
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def cache_path(url, cache_dir=CACHE_DIR):
+    """Fichero de la caché para una URL: <sha1 de la URL>_<nombre>.csv"""
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{digest}_{os.path.basename(url)}")
+
+
+def fetch(url, entry, cache_dir=CACHE_DIR, timeout=TIMEOUT):
+    """
+    Descarga url revalidando con los validadores de entry. Devuelve la
+    entrada nueva del manifiesto con status: not_modified, downloaded,
+    missing (404) o error
+    """
+    entry = dict(entry or {})
+    path = entry.get('path') or cache_path(url, cache_dir)
+    headers = {'User-Agent': USER_AGENT}
+    if os.path.exists(path):
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    started = time.perf_counter()
+    try:
+        with urlopen(Request(url, headers=headers), timeout=timeout) as response:
+            os.makedirs(cache_dir, exist_ok=True)
+            digest = hashlib.sha1()
+            size = 0
+            tmp = f"{path}.tmp{os.getpid()}"
+            with open(tmp, 'wb') as f:
+                for chunk in iter(lambda: response.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp, path)
+            entry.update({
+                'path': path,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'sha1': digest.hexdigest(),
+                'bytes': size,
+                'fetched_at': datetime.now().isoformat(),
+                'status': 'downloaded',
+            })
+    except HTTPError as e:
+        if e.code == 304:
+            entry['status'] = 'not_modified'
+        elif e.code == 404:
+            entry['status'] = 'missing'
+        else:
+            entry.update({'status': 'error', 'error': f'HTTP {e.code}'})
+    except (URLError, OSError) as e:
+        entry.update({'status': 'error', 'error': str(getattr(e, 'reason', e))})
+
+    entry['seconds'] = round(time.perf_counter() - started, 3)
+    return entry
+
+
+def fetch_all(urls, manifest, workers=DEFAULT_WORKERS, cache_dir=CACHE_DIR):
+    """{url: entrada} descargando las URL en paralelo"""
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls) or 1))) as pool:
+        entries = pool.map(lambda url: fetch(url, manifest.get(url), cache_dir), urls)
+        return dict(zip(urls, entries))
+
+
+# ---------------------------------------------------------------------- #
+# Sincronización
+# ---------------------------------------------------------------------- #
+
+def sync(urls, connection=None, table_name=None, workers=DEFAULT_WORKERS, force=False,
+         dry_run=False, refresh=True, manifest_path=MANIFEST_PATH, cache_dir=CACHE_DIR):
+    """
+    Descarga las URL e importa las que cambiaron desde la última importación
+    """
+    from csv_bulk_import import import_files
+    from instrumentation import stage
+
+    manifest = load_manifest(manifest_path)
+
+    with stage('fetch'):
+        fetched = fetch_all(urls, manifest, workers, cache_dir)
+
+    changed = []
+    files = []
+    for url in urls:
+        entry = fetched[url]
+        status = entry.pop('status')
+        error = entry.pop('error', None)
+        seconds = entry.pop('seconds')
+        if status in ('downloaded', 'not_modified') and entry.get('path'):
+            manifest[url] = entry
+            if force or entry.get('sha1') != entry.get('imported_sha1'):
+                changed.append(url)
+            elif status == 'downloaded':
+                status = 'unchanged'
+        files.append({'url': url, 'status': status, 'seconds': seconds, 'error': error})
+
+    result = {'success': True, 'message': 'Sin cambios desde la última importación',
+              'processed': 0, 'updated': 0, 'skipped': 0}
+    if changed:
+        result = import_files([manifest[url]['path'] for url in changed],
+                              connection, table_name, dry_run, refresh)
+        result.pop('files', None)
+
+    imported = result.get('success') and not dry_run
+    for info in files:
+        if info['url'] in changed:
+            info['imported'] = bool(imported)
+            if imported:
+                manifest[info['url']]['imported_sha1'] = manifest[info['url']]['sha1']
+                manifest[info['url']]['imported_at'] = datetime.now().isoformat()
+
+    save_manifest(manifest, manifest_path)
+
+    counts = {}
+    for info in files:
+        counts[info['status']] = counts.get(info['status'], 0) + 1
+    result.update({
+        'files': files,
+        'statuses': counts,
+        'changed_files': len(changed),
+        'dry_run': dry_run,
+    })
+    return result
+
+
+# ---------------------------------------------------------------------- #
+# Servidor HTTP local (sustituto de football-data para pruebas)
+# ---------------------------------------------------------------------- #
+
+def make_handler(root, latency=0.0):
+    root = os.path.abspath(root)
+
+    class FileHandler(BaseHTTPRequestHandler):
+        """Sirve ficheros de root con ETag (sha1) y Last-Modified"""
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            path = os.path.abspath(os.path.join(root, self.path.split('?', 1)[0].lstrip('/')))
+            if not path.startswith(root + os.sep) or not os.path.isfile(path):
+                self.send_error(404)
+                return
+
+            with open(path, 'rb') as f:
+                body = f.read()
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()
+            mtime = int(os.path.getmtime(path))
+            last_modified = formatdate(mtime, usegmt=True)
+
+            not_modified = False
+            if 'If-None-Match' in self.headers:
+                not_modified = self.headers['If-None-Match'] == etag
+            elif 'If-Modified-Since' in self.headers:
+                try:
+                    since = parsedate_to_datetime(self.headers['If-Modified-Since'])
+                    not_modified = mtime <= since.timestamp()
+                except (TypeError, ValueError):
+                    pass
+
+            self.send_response(304 if not_modified else 200)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            if not_modified:
+                self.end_headers()
+                return
+            self.send_header('Content-Type', mimetypes.guess_type(path)[0] or 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FileHandler
+
+
+def serve(root, port, latency=0.0):
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(root, latency))
+    print(json.dumps({'serving': os.path.abspath(root), 'url': f'http://127.0.0.1:{server.server_port}'}))
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# ---------------------------------------------------------------------- #
+# Prueba contra el servidor local
+# ---------------------------------------------------------------------- #
+
+SELF_TEST_CSV = (
+    "Div,Date,HomeTeam,AwayTeam,FTHG,FTAG,FTR,HS,AS,HST,AST\n"
+    "E0,16/08/2024,Man United,Fulham,1,0,H,14,10,5,2\n"
+    "E0,17/08/2024,Ipswich,Liverpool,0,2,A,7,18,2,5\n"
+)
+
+
+def self_test():
+    """
+    Sincroniza (en seco) un CSV servido por make_handler() y devuelve las
+    comprobaciones: 200 la primera vez, 304 la segunda, 'unchanged' para un
+    200 sin cambios ya importado y de nuevo importable si cambia el contenido
+    """
+    workdir = tempfile.mkdtemp(prefix='csv_ingest_test_')
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(os.path.join(workdir, 'www')))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    checks = []
+
+    def check(name, result, statuses, changed):
+        checks.append({
+            'name': name,
+            'ok': bool(result.get('success')) and result['statuses'] == statuses and result['changed_files'] == changed,
+            'statuses': result['statuses'],
+            'changed_files': result['changed_files'],
+        })
+
+    try:
+        csv_path = os.path.join(workdir, 'www', 'mmz4281', season_code(2024), 'E0.csv')
+        os.makedirs(os.path.dirname(csv_path))
+        with open(csv_path, 'w') as f:
+            f.write(SELF_TEST_CSV)
+
+        urls = build_urls(['E0'], [2024], f'http://127.0.0.1:{server.server_port}/mmz4281')
+        manifest_path = os.path.join(workdir, 'cache', 'manifest.json')
+        options = {'dry_run': True, 'refresh': False, 'workers': 1,
+                   'manifest_path': manifest_path, 'cache_dir': os.path.join(workdir, 'cache')}
+
+        check('first_sync_downloads', sync(urls, **options), {'downloaded': 1}, 1)
+        check('second_sync_not_modified', sync(urls, **options), {'not_modified': 1}, 1)
+
+        # Como tras una importación real; sin ETag el servidor solo puede
+        # comparar Last-Modified y, con el fichero tocado, responde 200
+        manifest = load_manifest(manifest_path)
+        manifest[urls[0]]['imported_sha1'] = manifest[urls[0]]['sha1']
+        manifest[urls[0]].pop('etag')
+        save_manifest(manifest, manifest_path)
+        later = time.time() + 60
+        os.utime(csv_path, (later, later))
+        check('same_sha1_skipped', sync(urls, **options), {'unchanged': 1}, 0)
+
+        with open(csv_path, 'a') as f:
+            f.write("E0,17/08/2024,Arsenal,Wolves,2,0,H,18,9,6,3\n")
+        os.utime(csv_path, (later + 60, later + 60))
+        check('new_content_imported', sync(urls, **options), {'downloaded': 1}, 1)
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {'success': all(item['ok'] for item in checks), 'checks': checks}
+
+
+def _option(name, default=None):
+    prefix = f"--{name}="
+    for arg in sys.argv[1:]:
+        if arg.startswith(prefix):
+            return arg[len(prefix):]
+    return default
+
+
+def main():
+    root = _option('serve')
+    if root:
+        serve(root, int(_option('port', 8765)), float(_option('latency-ms', 0)) / 1000)
+        return
+    if '--self-test' in sys.argv:
+        result = self_test()
+        print(json.dumps(result))
+        sys.exit(0 if result['success'] else 1)
+
+    dry_run = '--dry-run' in sys.argv
+    connection = None
+    started = time.perf_counter()
+    try:
+        from instrumentation import instrument_connection, report, start_profiling
+        start_profiling()
+        from match_loader import get_db_connection, load_db_config, matches_table
+
+        divisions = _option('divisions')
+        divisions = divisions.split(',') if divisions else DIVISIONS
+        seasons = season_years(_option('seasons', '1'))
+        urls = build_urls(divisions, seasons, _option('base-url', BASE_URL))
+
+        table_name = None
+        if not dry_run:
+            config = load_db_config(os.path.join(PYTHON_DIR, 'db_config.json'))
+            table_name = matches_table(config)
+            connection = instrument_connection(get_db_connection(config))
+
+        result = sync(urls, connection, table_name,
+                      workers=int(_option('workers', DEFAULT_WORKERS)),
+                      force='--force' in sys.argv,
+                      dry_run=dry_run,
+                      refresh='--no-refresh' not in sys.argv)
+        result['seasons'] = [season_code(year) for year in seasons]
+        result['seconds'] = round(time.perf_counter() - started, 3)
+        result['timings'] = report()
+        print(json.dumps(result))
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': f'Error sincronizando CSV: {str(e)}'}))
+        sys.exit(1)
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Motor de features "as-of" (punto en el tiempo)
+
+Calcula en una sola pasada vectorizada las mismas 20 features que
+prepare_features_for_match() de benchmark_season.py, usando para cada
+partido SOLO los partidos jugados antes de su fecha.
+
+En lugar de lanzar 6 queries por partido, se carga ft_matches_advanced una
+vez, se ordena por (equipo, fecha) y se guardan sumas acumuladas. Cualquier
+ventana "partidos del equipo entre fecha A y fecha B" se resuelve entonces
+con dos np.searchsorted y una resta.
+"""
+
+import numpy as np
+import pandas as pd
+
+from match_cache import load_matches_cached
+from match_loader import NULL_INT
+
+# Orden exacto de las columnas que devuelve prepare_features_for_match()
+FEATURE_NAMES = [
+    'home_win_rate', 'home_draw_rate', 'home_avg_goals_for', 'home_avg_goals_against',
+    'home_avg_shots', 'home_avg_shots_target', 'home_avg_corners', 'home_form',
+    'away_win_rate', 'away_draw_rate', 'away_avg_goals_for', 'away_avg_goals_against',
+    'away_avg_shots', 'away_avg_shots_target', 'away_avg_corners', 'away_form',
+    'home_attack_vs_away_defense', 'away_attack_vs_home_defense',
+    'shots_diff', 'form_diff'
+]
+
+# Subir al cambiar el cálculo de cualquier feature (invalida model_cache.py)
+FEATURE_SET_VERSION = 2
+
+# Columnas extra de los modelos 'with_xg' (mismos nombres que train_model_benchmark.py)
+XG_FEATURE_NAMES = ['home_avg_xg', 'away_avg_xg', 'xg_diff', 'xg_ratio']
+
+# Columnas de ft_matches_advanced que necesita el motor
+HISTORY_COLUMNS = [
+    'date', 'home_team', 'away_team', 'ftr', 'fthg', 'ftag',
+    'hs', 'hst', 'hc', 'hf', 'as_shots', 'ast', 'ac', 'af',
+    'home_xg', 'away_xg'
+]
+
+# Estadísticas (desde el punto de vista del equipo) y su valor por defecto,
+# igual que get_team_historical_stats()
+STAT_NAMES = ['avg_goals_for', 'avg_goals_against', 'avg_shots',
+              'avg_shots_target', 'avg_corners', 'avg_fouls']
+STAT_DEFAULTS = [1.2, 1.2, 10.0, 4.0, 5.0, 12.0]
+
+HOME_STAT_COLUMNS = ['fthg', 'ftag', 'hs', 'hst', 'hc', 'hf']
+AWAY_STAT_COLUMNS = ['ftag', 'fthg', 'as_shots', 'ast', 'ac', 'af']
+
+WINDOW_DAYS = 365
+FORM_MATCHES = 5
+
+# xG medio si el equipo no tiene partidos con xG (COALESCE(xg, 0))
+XG_DEFAULT = 0.0
+
+# La clave compuesta equipo/fecha es codigo_equipo * 2^32 + (dia + 2^31)
+_DAY_OFFSET = 1 << 31
+_TEAM_SHIFT = 1 << 32
+
+
+def to_days(dates):
+    """Convierte fechas (date, datetime, str o datetime64) a días desde 1970"""
+    return np.asarray(pd.to_datetime(pd.Series(dates)).values.astype('datetime64[D]').astype(np.int64))
+
+
+def load_history(connection, table_name):
+    """Carga en UNA lectura todos los partidos (caché local o MySQL por bloques)"""
+    data = load_matches_cached(connection, table_name, HISTORY_COLUMNS)
+    return data.take(data['ftr'] != NULL_INT).to_dataframe()
+
+
+def _numeric(series):
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64)
+
+
+def _keys(codes, days):
+    return codes.astype(np.int64) * _TEAM_SHIFT + (days.astype(np.int64) + _DAY_OFFSET)
+
+
+class FeatureEngine:
+    """
+    Índice de sumas acumuladas por equipo para consultas "antes de la fecha X"
+    """
+
+    def __init__(self, history):
+        df = history[history['ftr'].notna()]
+
+        teams = pd.unique(pd.concat([df['home_team'], df['away_team']], ignore_index=True))
+        self.team_index = {team: code for code, team in enumerate(teams)}
+
+        days = to_days(df['date'])
+        home_codes = self.encode_teams(df['home_team'])
+        away_codes = self.encode_teams(df['away_team'])
+        ftr = df['ftr'].to_numpy(dtype=object)
+        is_home_win = ftr == 'H'
+        is_draw = ftr == 'D'
+        is_away_win = ftr == 'A'
+
+        # Estadísticas como local y como visitante
+        self.home_side = self._build_side(
+            home_codes, days, is_home_win, is_draw,
+            np.column_stack([_numeric(df[c]) for c in HOME_STAT_COLUMNS])
+        )
+        self.away_side = self._build_side(
+            away_codes, days, is_away_win, is_draw,
+            np.column_stack([_numeric(df[c]) for c in AWAY_STAT_COLUMNS])
+        )
+
+        # Forma reciente: una fila por aparición del equipo (local o visitante)
+        home_points = np.where(is_home_win, 3, np.where(is_draw, 1, 0))
+        away_points = np.where(is_away_win, 3, np.where(is_draw, 1, 0))
+        form_codes = np.concatenate([home_codes, away_codes])
+        form_days = np.concatenate([days, days])
+        form_points = np.concatenate([home_points, away_points]).astype(np.float64)
+
+        order = np.lexsort((form_days, form_codes))
+        self.form_keys = _keys(form_codes[order], form_days[order])
+        self.form_cum = np.concatenate([[0.0], np.cumsum(form_points[order])])
+
+        # xG propio de cada aparición; 0 o NULL = sin dato
+        if 'home_xg' in df and 'away_xg' in df:
+            xg = np.concatenate([_numeric(df['home_xg']), _numeric(df['away_xg'])])
+            xg = np.where(np.isnan(xg), 0.0, xg)
+            self.xg_cum = np.concatenate([[0.0], np.cumsum(xg[order])])
+            self.xg_counts = np.concatenate([[0], np.cumsum(xg[order] > 0)])
+        else:
+            self.xg_cum = None
+
+    def encode_teams(self, teams):
+        """Código entero de cada equipo (-1 si no tiene histórico)"""
+        get = self.team_index.get
+        return np.fromiter((get(t, -1) for t in teams), dtype=np.int64, count=len(teams))
+
+    @staticmethod
+    def _build_side(codes, days, wins, draws, values):
+        order = np.lexsort((days, codes))
+        values = values[order]
+        present = ~np.isnan(values)
+
+        def cum(a):
+            a = np.asarray(a, dtype=np.float64)
+            zero = np.zeros((1,) + a.shape[1:])
+            return np.concatenate([zero, np.cumsum(a, axis=0)])
+
+        return {
+            'keys': _keys(codes[order], days[order]),
+            'matches': cum(np.ones(len(order))),
+            'wins': cum(wins[order]),
+            'draws': cum(draws[order]),
+            'sums': cum(np.where(present, values, 0.0)),
+            'counts': cum(present),
+        }
+
+    @staticmethod
+    def _side_stats(side, codes, days):
+        """Equivalente vectorizado de get_team_historical_stats()"""
+        known = codes >= 0
+        safe_codes = np.where(known, codes, 0)
+        hi = np.searchsorted(side['keys'], _keys(safe_codes, days), side='left')
+        lo = np.searchsorted(side['keys'], _keys(safe_codes, days - WINDOW_DAYS), side='left')
+        hi = np.where(known, hi, 0)
+        lo = np.where(known, lo, 0)
+
+        matches = side['matches'][hi] - side['matches'][lo]
+        has_matches = matches > 0
+        denom = np.where(has_matches, matches, 1.0)
+
+        stats = {
+            'matches': matches.astype(np.int64),
+            'win_rate': np.where(has_matches, (side['wins'][hi] - side['wins'][lo]) / denom, 0.33),
+            'draw_rate': np.where(has_matches, (side['draws'][hi] - side['draws'][lo]) / denom, 0.33),
+        }
+
+        sums = side['sums'][hi] - side['sums'][lo]
+        counts = side['counts'][hi] - side['counts'][lo]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            averages = sums / counts
+        for i, (name, default) in enumerate(zip(STAT_NAMES, STAT_DEFAULTS)):
+            # La query original usa "x if x else default": NULL o 0 -> default
+            avg = averages[:, i]
+            valid = has_matches & (counts[:, i] > 0) & (avg != 0)
+            stats[name] = np.where(valid, avg, default)
+
+        return stats
+
+    def _form(self, codes, days):
+        """Equivalente vectorizado de get_recent_form()"""
+        known = codes >= 0
+        safe_codes = np.where(known, codes, 0)
+        hi = np.searchsorted(self.form_keys, _keys(safe_codes, days), side='left')
+        start = np.searchsorted(self.form_keys, safe_codes.astype(np.int64) * _TEAM_SHIFT, side='left')
+        n = np.where(known, np.minimum(FORM_MATCHES, hi - start), 0)
+        total = self.form_cum[hi] - self.form_cum[hi - n]
+        return np.where(n > 0, total / np.maximum(n, 1), 1.0)
+
+    def _xg(self, codes, days):
+        """xG medio del equipo en sus partidos de los últimos 365 días"""
+        if self.xg_cum is None:
+            return np.full(len(codes), XG_DEFAULT)
+        known = codes >= 0
+        safe_codes = np.where(known, codes, 0)
+        hi = np.searchsorted(self.form_keys, _keys(safe_codes, days), side='left')
+        lo = np.searchsorted(self.form_keys, _keys(safe_codes, days - WINDOW_DAYS), side='left')
+        counts = np.where(known, self.xg_counts[hi] - self.xg_counts[lo], 0)
+        total = self.xg_cum[hi] - self.xg_cum[lo]
+        return np.where(counts > 0, total / np.maximum(counts, 1), XG_DEFAULT)
+
+    def team_stats(self, teams, dates, is_home=True):
+        """Estadísticas de varios equipos antes de sus fechas respectivas"""
+        side = self.home_side if is_home else self.away_side
+        return self._side_stats(side, self.encode_teams(teams), to_days(dates))
+
+    def recent_form(self, teams, dates):
+        """Puntos medios de los últimos 5 partidos antes de cada fecha"""
+        return self._form(self.encode_teams(teams), to_days(dates))
+
+    def features(self, home_teams, away_teams, dates, with_xg=False):
+        """
+        Matriz (n, 20) con el mismo layout que prepare_features_for_match();
+        con with_xg se añaden al final las 4 columnas de XG_FEATURE_NAMES
+        """
+        if len(home_teams) == 0:
+            return np.empty((0, len(FEATURE_NAMES) + (len(XG_FEATURE_NAMES) if with_xg else 0)))
+
+        days = to_days(dates)
+        home_codes = self.encode_teams(home_teams)
+        away_codes = self.encode_teams(away_teams)
+
+        home = self._side_stats(self.home_side, home_codes, days)
+        away = self._side_stats(self.away_side, away_codes, days)
+        home_form = self._form(home_codes, days)
+        away_form = self._form(away_codes, days)
+
+        columns = [
+            home['win_rate'],
+            home['draw_rate'],
+            home['avg_goals_for'],
+            home['avg_goals_against'],
+            home['avg_shots'],
+            home['avg_shots_target'],
+            home['avg_corners'],
+            home_form,
+
+            away['win_rate'],
+            away['draw_rate'],
+            away['avg_goals_for'],
+            away['avg_goals_against'],
+            away['avg_shots'],
+            away['avg_shots_target'],
+            away['avg_corners'],
+            away_form,
+
+            home['avg_goals_for'] - away['avg_goals_against'],
+            away['avg_goals_for'] - home['avg_goals_against'],
+            home['avg_shots'] - away['avg_shots'],
+            home_form - away_form
+        ]
+
+        if with_xg:
+            home_xg = self._xg(home_codes, days)
+            away_xg = self._xg(away_codes, days)
+            columns += [
+                home_xg,
+                away_xg,
+                home_xg - away_xg,
+                home_xg / np.maximum(0.1, away_xg)
+            ]
+
+        return np.column_stack(columns)
+
+    def features_for_match(self, home_team, away_team, match_date, with_xg=False):
+        """Versión de un solo partido, misma firma lógica que la original"""
+        return self.features([home_team], [away_team], [match_date], with_xg)[0].tolist()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Actualización incremental de modelos
+
+Los scripts de entrenamiento guardan en sus metadatos una marca de agua
+(mayor id de ft_matches_advanced usado al entrenar). Con --incremental:
+
+1. Solo se procesan los partidos con id mayor que la marca de agua
+2. Se añaden TREES_PER_UPDATE árboles entrenados con ellos (warm_start)
+   y, si el bosque pasa de max_trees, se descartan los más antiguos: el
+   modelo es una ventana deslizante de árboles sobre los datos recientes
+3. La versión nueva se publica en el registro de modelos (model_registry.py)
+   y se activa de forma atómica, así el servidor de predicción o un
+   predict_match.py concurrente nunca leen un artefacto a medias
+
+Si no hay modelo previo, falta la marca de agua o cambian las features, los
+scripts hacen el entrenamiento completo de siempre.
+"""
+
+import os
+import json
+import numpy as np
+import joblib
+
+from compiled_forest import compiled_path
+from model_registry import FOREST_FILE, METADATA_FILE, MODEL_FILE, ModelRegistry
+
+TREES_PER_UPDATE = 20
+MIN_NEW_MATCHES = 20
+
+
+def read_metadata(metadata_path):
+    try:
+        with open(metadata_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def training_watermark(metadata):
+    """Mayor id de partido con el que se entrenó el modelo (None si no consta)"""
+    watermark = metadata.get('training_watermark') or {}
+    return watermark.get('max_id')
+
+
+def make_watermark(ids, previous=None):
+    ids = np.asarray(ids)
+    max_id = int(ids.max()) if len(ids) else None
+    if previous is not None and (max_id is None or previous > max_id):
+        max_id = int(previous)
+    return {'max_id': max_id, 'matches': int(len(ids))}
+
+
+def model_registry(model_path):
+    """Registro del modelo que antes se guardaba en model_path"""
+    return ModelRegistry(os.path.splitext(os.path.basename(model_path))[0])
+
+
+def load_previous_model(model_path, metadata_path, feature_names=None):
+    """
+    (modelo, metadatos) del último entrenamiento si se puede actualizar de
+    forma incremental; (None, metadatos) si hay que entrenar desde cero
+
+    Se usa la versión activa del registro; los ficheros sueltos solo si el
+    modelo aún no se ha publicado en él.
+    """
+    registry = model_registry(model_path)
+    metadata = registry.load_metadata()
+    if metadata is None:
+        metadata = read_metadata(metadata_path)
+    if training_watermark(metadata) is None:
+        return None, metadata
+    if feature_names is not None and metadata.get('features') not in (None, list(feature_names)):
+        return None, metadata
+
+    version = metadata.get('registry_version')
+    if version:
+        # Sin mmap: el modelo se va a modificar
+        model = registry.load_artifact(MODEL_FILE, version, mmap_mode=None)
+    elif os.path.exists(model_path):
+        model = joblib.load(model_path)
+    else:
+        return None, metadata
+
+    if isinstance(model, dict):
+        model = model['model']
+    return model, metadata
+
+
+def load_previous_artifact(model_path, metadata, legacy_path):
+    """Artefacto extra (p.ej. el escalador) de la misma versión que el modelo"""
+    version = metadata.get('registry_version')
+    if version:
+        return model_registry(model_path).load_artifact(os.path.basename(legacy_path), version, mmap_mode=None)
+    return joblib.load(legacy_path) if os.path.exists(legacy_path) else None
+
+
+def grow_forest(model, X_new, y_new, trees=TREES_PER_UPDATE, max_trees=None):
+    """
+    Añade árboles entrenados solo con los partidos nuevos
+
+    Devuelve el número de árboles añadidos (0 si los datos nuevos no
+    contienen todas las clases del modelo, que warm_start no admite)
+    """
+    y_new = np.asarray(y_new)
+    if set(np.unique(y_new).tolist()) != set(model.classes_.tolist()):
+        return 0
+
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + trees)
+    model.fit(X_new, y_new)
+
+    if max_trees and len(model.estimators_) > max_trees:
+        model.estimators_ = model.estimators_[-max_trees:]
+    model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+    return trees
+
+
+def publish_model(model, model_path, metadata, metadata_path, feature_names, extra_artifacts=None):
+    """
+    Publica el modelo como versión nueva del registro y la activa
+
+    extra_artifacts: {ruta_plana: objeto}, p.ej. el escalador. Los ficheros
+    planos de siempre (model_path, su .forest, metadata_path y los extra)
+    se reescriben como copia de la versión activa. Devuelve la versión.
+    """
+    registry = model_registry(model_path)
+    extra_artifacts = extra_artifacts or {}
+    version = registry.publish(
+        model, metadata, feature_names,
+        {os.path.basename(path): obj for path, obj in extra_artifacts.items()}
+    )
+
+    # El .forest después del .pkl para que nunca parezca más antiguo que él
+    # (load_compiled lo descartaría) y los metadatos al final
+    legacy_paths = {MODEL_FILE: model_path, FOREST_FILE: compiled_path(model_path)}
+    legacy_paths.update({os.path.basename(path): path for path in extra_artifacts})
+    legacy_paths[METADATA_FILE] = metadata_path
+    registry.export_legacy(legacy_paths, version)
+    return version
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Instrumentación por etapas de los scripts
+
+Cada script envuelve sus etapas (load, features, fit, predict, simulate,
+save) en `with stage('load'):` y añade `report()` como bloque 'timings' del
+JSON que ya imprime. Por etapa se registra:
+
+- wall_seconds / cpu_seconds: tiempo real y de CPU del proceso
+- peak_rss_mb: pico de memoria residente del proceso al terminar la etapa
+- sql_queries / sql_seconds: consultas ejecutadas y tiempo en MySQL
+  (execute + fetch), contadas con instrument_connection()
+
+Una etapa que se repite (p.ej. una por partido) acumula sus tiempos y
+cuenta las llamadas; muchas consultas en una etapa delatan un N+1.
+
+Con FT_PROFILE definido, los scripts que llaman a start_profiling() al
+principio de su main() se perfilan con cProfile y el volcado (.prof, se abre
+con pstats o snakeviz) se guarda al llamar a report() en el directorio
+indicado, o en cache/profiles/ con FT_PROFILE=1. Importar el módulo no
+arranca nada: los procesos de larga duración (prediction_server.py) no se
+perfilan y llaman a disable() para no acumular etapas indefinidamente.
+"""
+
+import os
+import sys
+import time
+import resource
+import cProfile
+from contextlib import contextmanager
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'profiles')
+
+
+def profile_dir():
+    """Directorio del volcado de cProfile, o None si no está activado"""
+    value = os.environ.get('FT_PROFILE', '')
+    if value in ('', '0'):
+        return None
+    return PROFILE_DIR if value == '1' else value
+
+
+def _peak_rss_mb(who=resource.RUSAGE_SELF):
+    # En Linux ru_maxrss va en KB
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+class Instrumentation:
+    """
+    Tiempos, memoria y SQL de las etapas de un script
+    """
+
+    def __init__(self, script=None, profile=True):
+        self.script = script or os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0]
+        self.stages = {}
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.started_wall = time.perf_counter()
+        self.started_cpu = time.process_time()
+        self.enabled = True
+        self.profiler = None
+        if profile:
+            self.start_profiling()
+
+    def start_profiling(self):
+        """Arranca cProfile si FT_PROFILE está definido (una sola vez)"""
+        if self.profiler is None and self.enabled and profile_dir():
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def disable(self):
+        """No registrar nada más (ni etapas, ni SQL, ni perfil)"""
+        self.enabled = False
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler = None
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        queries = self.sql_queries
+        sql_seconds = self.sql_seconds
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, {
+                'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'sql_queries': 0, 'sql_seconds': 0.0
+            })
+            entry['calls'] += 1
+            entry['wall_seconds'] += time.perf_counter() - wall
+            entry['cpu_seconds'] += time.process_time() - cpu
+            entry['sql_queries'] += self.sql_queries - queries
+            entry['sql_seconds'] += self.sql_seconds - sql_seconds
+            entry['peak_rss_mb'] = _peak_rss_mb()
+
+    def record_sql(self, seconds, queries=1):
+        self.sql_queries += queries
+        self.sql_seconds += seconds
+
+    def connection(self, connection):
+        """Conexión que cuenta las consultas de todos sus cursores"""
+        if connection is None or not self.enabled or isinstance(connection, InstrumentedConnection):
+            return connection
+        return InstrumentedConnection(connection, self)
+
+    def _dump_profile(self):
+        if self.profiler is None:
+            return None
+        self.profiler.disable()
+        directory = profile_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.script}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+        self.profiler.dump_stats(path)
+        self.profiler = None
+        return os.path.abspath(path)
+
+    def report(self):
+        """Bloque 'timings' del JSON del script"""
+        stages = {}
+        for name, entry in self.stages.items():
+            stages[name] = {
+                'calls': entry['calls'],
+                'wall_seconds': round(entry['wall_seconds'], 4),
+                'cpu_seconds': round(entry['cpu_seconds'], 4),
+                'peak_rss_mb': entry['peak_rss_mb'],
+                'sql_queries': entry['sql_queries'],
+                'sql_seconds': round(entry['sql_seconds'], 4),
+            }
+
+        timings = {
+            'stages': stages,
+            'total': {
+                'wall_seconds': round(time.perf_counter() - self.started_wall, 4),
+                'cpu_seconds': round(time.process_time() - self.started_cpu, 4),
+                'peak_rss_mb': _peak_rss_mb(),
+                'sql_queries': self.sql_queries,
+                'sql_seconds': round(self.sql_seconds, 4),
+            }
+        }
+
+        # Procesos hijos ya terminados (p.ej. el pool de benchmark_grid.py)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        if children.ru_utime + children.ru_stime > 0:
+            timings['total']['children_cpu_seconds'] = round(children.ru_utime + children.ru_stime, 4)
+            timings['total']['children_peak_rss_mb'] = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+
+        profile_path = self._dump_profile()
+        if profile_path:
+            timings['profile'] = profile_path
+        return timings
+
+    def summary_lines(self):
+        """Líneas legibles para los scripts que no imprimen JSON"""
+        timings = self.report()
+        lines = []
+        for name, entry in timings['stages'].items():
+            lines.append(
+                f"{name}: {entry['wall_seconds']:.2f}s (CPU {entry['cpu_seconds']:.2f}s, "
+                f"{entry['sql_queries']} SQL en {entry['sql_seconds']:.2f}s, pico {entry['peak_rss_mb']} MB)"
+            )
+        total = timings['total']
+        lines.append(f"total: {total['wall_seconds']:.2f}s (pico {total['peak_rss_mb']} MB)")
+        if 'profile' in timings:
+            lines.append(f"perfil cProfile: {timings['profile']}")
+        return lines
+
+
+class InstrumentedCursor:
+    """Cursor que mide execute/executemany y las lecturas de resultados"""
+
+    def __init__(self, cursor, instrumentation):
+        self._cursor = cursor
+        self._instrumentation = instrumentation
+
+    def _timed(self, method, queries, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            self._instrumentation.record_sql(time.perf_counter() - started, queries)
+
+    def execute(self, *args, **kwargs):
+        return self._timed(self._cursor.execute, 1, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self._timed(self._cursor.executemany, 1, *args, **kwargs)
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone, 0)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._timed(self._cursor.fetchmany, 0, *args, **kwargs)
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall, 0)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Conexión cuyos cursores (también los de pandas.read_sql) cuentan SQL"""
+
+    def __init__(self, connection, instrumentation):
+        self._connection = connection
+        self._instrumentation = instrumentation
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs), self._instrumentation)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+# Instancia del proceso: las funciones compartidas (benchmark_probabilities,
+# load_grid_data...) registran sus etapas sin recibirla como parámetro
+_current = Instrumentation(profile=False)
+
+
+def current():
+    return _current
+
+
+def stage(name):
+    return _current.stage(name)
+
+
+def start_profiling():
+    """Para el main() de los scripts: perfila el resto de la ejecución con FT_PROFILE"""
+    _current.start_profiling()
+
+
+def disable():
+    """Para procesos de larga duración: las etapas dejan de acumularse"""
+    _current.disable()
+
+
+def instrument_connection(connection):
+    return _current.connection(connection)
+
+
+def report():
+    return _current.report()
+
+
+@contextmanager
+def recording(script=None):
+    """
+    Registra en una Instrumentation nueva lo que pasa dentro del bloque
+    (p.ej. cada celda de benchmark_grid.py) y después restaura la anterior
+    """
+    global _current
+    previous = _current
+    _current = Instrumentation(script or previous.script, profile=False)
+    try:
+        yield _current
+    finally:
+        _current = previous
+
+
+def summary_lines():
+    return _current.summary_lines()
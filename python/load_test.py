@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Prueba de carga de la ruta de predicción
+
+Reproduce una jornada: N peticiones de predicción con una mezcla
+configurable de predicciones por features (contrato de predict_simple.py,
+lo que envía FT_Predictor::predict_match) y por equipos (predict_match.py),
+lanzadas con la concurrencia indicada contra una liga sintética en SQLite
+(synthetic_league.py), sin tocar MySQL ni las cachés del plugin.
+
+Modos (--mode):
+    spawn    un proceso por petición, como FT_Predictor sin servidor:
+             predict_simple.py (features) o predict_match.py (equipos)
+    client   un proceso predict_client.py por petición, con el servidor
+             levantado (respaldo de execute_python_prediction)
+    server   peticiones directas al socket de prediction_server.py
+             (query_prediction_server)
+
+Además de la latencia p50/p95/p99 y el throughput se miden por separado:
+
+- spawn_cost: arranque del intérprete y coste de importar cada script
+  (procesos que solo importan el módulo, sin predecir)
+- model_load: primera carga del modelo en un proceso nuevo, con el forest
+  compilado y con el pickle
+- server_startup: arranque del servidor hasta aceptar peticiones
+
+Los procesos hijos se lanzan a través de load_test_worker.py, que sustituye
+mysql.connector por la conexión SQLite antes de importar nada.
+
+Uso:
+    python3 load_test.py [--mode=spawn|client|server] [--requests=200] [--concurrency=8]
+                         [--mix=simple:0.5,match:0.5] [--fixtures=10] [--matches=20000]
+                         [--samples=5] [--python=/usr/bin/python3.8] [--keep]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+PYTHON_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKER_PATH = os.path.join(PYTHON_DIR, 'load_test_worker.py')
+
+MODES = ['spawn', 'client', 'server']
+REQUEST_KINDS = ['simple', 'match']
+
+DEFAULT_MODE = 'server'
+DEFAULT_REQUESTS = 200
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MIX = {'simple': 0.5, 'match': 0.5}
+# Partidos distintos de la jornada (las repeticiones aciertan en la caché)
+DEFAULT_FIXTURES = 10
+DEFAULT_MATCHES = 20000
+DEFAULT_SAMPLES = 5
+SEED = 0
+
+REQUEST_TIMEOUT = 120
+SERVER_STARTUP_TIMEOUT = 120
+
+PERCENTILES = [50, 95, 99]
+
+
+# ---------------------------------------------------------------------- #
+# Preparación: liga sintética, peticiones y entorno de los hijos
+# ---------------------------------------------------------------------- #
+
+def prepare_environment(workdir, n_matches):
+    """
+    Crea la liga en SQLite y devuelve (entorno de los hijos, DataFrame)
+    """
+    from synthetic_league import create_database
+
+    db_path = os.path.join(workdir, 'league.sqlite')
+    connection, df = create_database(n_matches, db_path, seed=SEED)
+    connection.close()
+
+    db_config_path = os.path.join(workdir, 'db_config.json')
+    with open(db_config_path, 'w') as f:
+        json.dump({'host': 'localhost', 'database': db_path, 'user': 'load_test',
+                   'password': '', 'table_prefix': 'wp_'}, f)
+
+    env = dict(os.environ)
+    env.pop('FT_PROFILE', None)
+    env.update({
+        'FT_LOADTEST_DB': db_path,
+        'FT_LOADTEST_DB_CONFIG': db_config_path,
+        # Ni la caché local de partidos ni la de predicciones del plugin
+        'FT_MATCH_CACHE': '0',
+        'FT_PREDICTION_CACHE': os.path.join(workdir, 'predictions.json'),
+        'FT_PREDICTOR_SOCKET': os.path.join(workdir, 'predictor.sock'),
+    })
+    return env, df
+
+
+def build_requests(df, n_requests, mix, n_fixtures, seed=SEED):
+    """
+    Peticiones de la jornada: n_fixtures partidos de la misma división,
+    repetidos al azar, cada una 'simple' (features) o 'match' (equipos)
+    """
+    import numpy as np
+    from feature_engine import HISTORY_COLUMNS, FeatureEngine
+
+    rng = np.random.RandomState(seed)
+    last_date = df['date'].iloc[-1]
+    fixtures = []
+    for division, group in df.groupby('division'):
+        teams = rng.permutation(sorted(set(group['home_team'])))
+        fixtures.extend((division, teams[i], teams[i + 1]) for i in range(0, len(teams) - 1, 2))
+    order = rng.permutation(len(fixtures))[:n_fixtures]
+    fixtures = [fixtures[i] for i in order]
+
+    # Features "as-of" del día siguiente al último partido, como las que
+    # FT_Predictor calcula con el histórico completo
+    engine = FeatureEngine(df[HISTORY_COLUMNS])
+    match_date = (np.datetime64(last_date) + 1).astype(str)
+    features = {
+        (home, away): [round(value, 4) for value in engine.features_for_match(home, away, match_date)]
+        for _, home, away in fixtures
+    }
+
+    kinds = list(mix)
+    weights = np.array([mix[kind] for kind in kinds], dtype=np.float64)
+    chosen_kinds = rng.choice(kinds, size=n_requests, p=weights / weights.sum())
+    chosen_fixtures = rng.randint(0, len(fixtures), n_requests)
+
+    requests = []
+    for kind, index in zip(chosen_kinds, chosen_fixtures):
+        division, home, away = fixtures[index]
+        requests.append({'kind': str(kind), 'home_team': home, 'away_team': away,
+                         'features': features[(home, away)]})
+    return requests
+
+
+# ---------------------------------------------------------------------- #
+# Ejecución de las peticiones
+# ---------------------------------------------------------------------- #
+
+def _worker_command(python, target, *args):
+    return [python, WORKER_PATH, target] + [str(arg) for arg in args]
+
+
+def _run_process(command, env):
+    completed = subprocess.run(command, env=env, cwd=PYTHON_DIR, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, timeout=REQUEST_TIMEOUT)
+    lines = completed.stdout.decode('utf-8', 'replace').strip().splitlines()
+    if not lines:
+        return {'error': completed.stderr.decode('utf-8', 'replace').strip()[-500:] or 'Sin salida'}
+    try:
+        return json.loads(lines[-1])
+    except ValueError:
+        return {'error': lines[-1][:500]}
+
+
+def make_runner(mode, env, python, model_path):
+    """Función petición -> respuesta para el modo indicado"""
+    if mode == 'server':
+        from predict_client import request as send_request
+
+        def run(req):
+            if req['kind'] == 'simple':
+                payload = {'action': 'predict_simple', 'features': req['features']}
+            else:
+                payload = {'action': 'predict', 'home_team': req['home_team'], 'away_team': req['away_team']}
+            return send_request(payload, env['FT_PREDICTOR_SOCKET'], timeout=REQUEST_TIMEOUT)
+        return run
+
+    if mode == 'client':
+        def run(req):
+            if req['kind'] == 'simple':
+                command = _worker_command(python, 'predict_client', model_path, json.dumps(req['features']))
+            else:
+                command = _worker_command(python, 'predict_client', '--match', req['home_team'], req['away_team'])
+            return _run_process(command, env)
+        return run
+
+    def run(req):
+        if req['kind'] == 'simple':
+            command = _worker_command(python, 'predict_simple', model_path, json.dumps(req['features']))
+        else:
+            command = _worker_command(python, 'predict_match', req['home_team'], req['away_team'])
+        return _run_process(command, env)
+    return run
+
+
+def run_load(requests, run, concurrency):
+    """
+    Lanza las peticiones con concurrency en vuelo a la vez (bucle cerrado)
+
+    Devuelve (mediciones por petición, segundos totales)
+    """
+    def timed(req):
+        started = time.perf_counter()
+        try:
+            response = run(req)
+        except Exception as e:
+            response = {'error': str(e)}
+        latency = time.perf_counter() - started
+        return {
+            'kind': req['kind'],
+            'latency': latency,
+            'ok': isinstance(response, dict) and 'error' not in response,
+            'cached': bool(isinstance(response, dict) and response.get('cached')),
+            'error': response.get('error') if isinstance(response, dict) else None,
+        }
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        measurements = list(pool.map(timed, requests))
+    return measurements, time.perf_counter() - started
+
+
+def start_server(env, python):
+    """
+    Arranca prediction_server.py sobre la liga sintética
+
+    Devuelve (proceso, segundos hasta aceptar peticiones)
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        _worker_command(python, 'prediction_server', '--socket', env['FT_PREDICTOR_SOCKET']),
+        env=env, cwd=PYTHON_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+
+    # El servidor imprime una línea JSON cuando ya escucha
+    ready = {}
+
+    def read_first_line():
+        ready['line'] = process.stdout.readline()
+
+    reader = threading.Thread(target=read_first_line, daemon=True)
+    reader.start()
+    reader.join(SERVER_STARTUP_TIMEOUT)
+
+    line = ready.get('line', b'').decode('utf-8', 'replace').strip()
+    if not line or 'error' in json.loads(line):
+        process.kill()
+        stderr = process.stderr.read().decode('utf-8', 'replace').strip()
+        raise RuntimeError(f"El servidor no arrancó: {line or stderr[-500:]}")
+    return process, time.perf_counter() - started
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# ---------------------------------------------------------------------- #
+# Costes aislados
+# ---------------------------------------------------------------------- #
+
+def _median_process_seconds(command, env, samples):
+    import numpy as np
+
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        subprocess.run(command, env=env, cwd=PYTHON_DIR, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, timeout=REQUEST_TIMEOUT)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings))
+
+
+def measure_spawn_cost(env, python, samples, modules):
+    """Arranque del intérprete y coste añadido de importar cada script"""
+    interpreter = _median_process_seconds([python, '-c', 'pass'], env, samples)
+    worker = _median_process_seconds(_worker_command(python, 'noop'), env, samples)
+    imports = {}
+    for module in modules:
+        seconds = _median_process_seconds(_worker_command(python, f"import:{module}"), env, samples)
+        imports[module] = round((seconds - worker) * 1000, 2)
+    return {
+        'interpreter_ms': round(interpreter * 1000, 2),
+        'worker_overhead_ms': round((worker - interpreter) * 1000, 2),
+        'import_ms': imports,
+    }
+
+
+def measure_model_load(env, python, samples):
+    """Primera carga del modelo en procesos nuevos: forest compilado y pickle"""
+    import numpy as np
+
+    loads = {}
+    for kind in ('compiled', 'pickle'):
+        timings = []
+        error = None
+        for _ in range(samples):
+            result = _run_process(_worker_command(python, f"model_load:{kind}"), env)
+            loads.setdefault('model_path', result.get('model_path'))
+            if 'error' in result:
+                error = result['error']
+                break
+            timings.append(result['seconds'])
+        loads[kind] = {'error': error} if error else {
+            'median_ms': round(float(np.median(timings)) * 1000, 2),
+            'max_ms': round(max(timings) * 1000, 2),
+        }
+    return loads
+
+
+# ---------------------------------------------------------------------- #
+# Informe
+# ---------------------------------------------------------------------- #
+
+def latency_summary(latencies):
+    import numpy as np
+
+    if not latencies:
+        return {'count': 0}
+    values = np.asarray(latencies) * 1000
+    summary = {'count': int(len(values))}
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = round(float(np.percentile(values, p)), 2)
+    summary['mean_ms'] = round(float(values.mean()), 2)
+    summary['max_ms'] = round(float(values.max()), 2)
+    return summary
+
+
+def summarize(measurements, wall_seconds):
+    ok = [m for m in measurements if m['ok']]
+    errors = {}
+    for m in measurements:
+        if not m['ok']:
+            errors[m['error']] = errors.get(m['error'], 0) + 1
+
+    return {
+        'latency': latency_summary([m['latency'] for m in ok]),
+        'by_kind': {
+            kind: latency_summary([m['latency'] for m in ok if m['kind'] == kind])
+            for kind in REQUEST_KINDS if any(m['kind'] == kind for m in measurements)
+        },
+        'uncached_latency': latency_summary([m['latency'] for m in ok if not m['cached']]),
+        'throughput_rps': round(len(ok) / wall_seconds, 2) if wall_seconds > 0 else None,
+        'completed': len(ok),
+        'cached': sum(1 for m in ok if m['cached']),
+        'errors': sum(errors.values()),
+        'error_messages': dict(sorted(errors.items(), key=lambda item: -item[1])[:5]),
+        'wall_seconds': round(wall_seconds, 3),
+    }
+
+
+def _option(name, default=None):
+    prefix = f"--{name}="
+    for arg in sys.argv[1:]:
+        if arg.startswith(prefix):
+            return arg[len(prefix):]
+    return default
+
+
+def _parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        kind, _, weight = part.partition(':')
+        if kind not in REQUEST_KINDS:
+            raise ValueError(f"Tipo de petición desconocido: {kind}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def main():
+    workdir = None
+    server = None
+    try:
+        mode = _option('mode', DEFAULT_MODE)
+        if mode not in MODES:
+            raise ValueError(f"Modo desconocido: {mode} ({', '.join(MODES)})")
+        n_requests = int(_option('requests', DEFAULT_REQUESTS))
+        concurrency = int(_option('concurrency', DEFAULT_CONCURRENCY))
+        mix = _parse_mix(_option('mix')) if _option('mix') else DEFAULT_MIX
+        n_fixtures = int(_option('fixtures', DEFAULT_FIXTURES))
+        n_matches = int(_option('matches', DEFAULT_MATCHES))
+        samples = int(_option('samples', DEFAULT_SAMPLES))
+        python = _option('python', sys.executable)
+
+        workdir = tempfile.mkdtemp(prefix='ft-load-test-')
+        env, df = prepare_environment(workdir, n_matches)
+        requests = build_requests(df, n_requests, mix, n_fixtures)
+
+        model_load = measure_model_load(env, python, samples)
+        model_path = model_load.get('model_path') or ''
+        spawn_modules = {'spawn': ['predict_simple', 'predict_match'],
+                         'client': ['predict_client'],
+                         'server': []}[mode]
+        spawn_cost = measure_spawn_cost(env, python, samples, spawn_modules)
+
+        server_startup = None
+        if mode in ('client', 'server'):
+            server, server_startup = start_server(env, python)
+
+        run = make_runner(mode, env, python, model_path)
+        measurements, wall_seconds = run_load(requests, run, concurrency)
+
+        output = {
+            'success': True,
+            'mode': mode,
+            'requests': n_requests,
+            'concurrency': concurrency,
+            'mix': mix,
+            'fixtures': n_fixtures,
+            'matches': n_matches,
+            'python': python,
+        }
+        output.update(summarize(measurements, wall_seconds))
+        output['spawn_cost'] = spawn_cost
+        output['model_load'] = model_load
+        if server_startup is not None:
+            output['server_startup_ms'] = round(server_startup * 1000, 2)
+        print(json.dumps(output, indent=2))
+
+    except Exception as e:
+        print(json.dumps({'error': str(e)}))
+    finally:
+        if server is not None:
+            stop_server(server)
+        if workdir and '--keep' not in sys.argv:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
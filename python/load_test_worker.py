@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Proceso hijo de load_test.py
+
+Sustituye mysql.connector por la conexión SQLite de la liga sintética
+(FT_LOADTEST_DB) y ejecuta un script de predicción como lo haría PHP. Solo
+importa la biblioteca estándar mínima, así que su coste de arranque es el
+del intérprete.
+
+Uso:
+    python3 load_test_worker.py <script> [argumentos...]
+
+    script: predict_simple, predict_match, predict_client, prediction_server,
+            import:<módulo> (solo importar), model_load:<compiled|pickle>
+            (primera carga del modelo activo) o noop
+"""
+
+import os
+import sys
+import json
+import time
+import types
+
+PYTHON_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def install_standin_database(db_path):
+    """
+    Módulo mysql.connector cuya connect() devuelve la conexión SQLite
+    (synthetic_league.SQLiteConnection) sobre db_path
+    """
+    connector = types.ModuleType('mysql.connector')
+
+    class Error(Exception):
+        pass
+
+    def connect(**kwargs):
+        from synthetic_league import SQLiteConnection
+        return SQLiteConnection(db_path)
+
+    connector.Error = Error
+    connector.connect = connect
+    mysql = types.ModuleType('mysql')
+    mysql.connector = connector
+    sys.modules['mysql'] = mysql
+    sys.modules['mysql.connector'] = connector
+
+
+def model_load(kind):
+    """Primera carga del modelo activo en este proceso (compiled o pickle)"""
+    import predict_match
+    from compiled_forest import load_compiled
+
+    path = predict_match.current_model_path()
+    started = time.perf_counter()
+    if kind == 'compiled':
+        if load_compiled(path) is None:
+            return {'error': f'No hay forest compilado al día para {path}', 'model_path': path}
+    else:
+        import joblib
+        joblib.load(path, mmap_mode='r')
+    return {'success': True, 'seconds': time.perf_counter() - started, 'model_path': path}
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(json.dumps({'error': 'Uso: load_test_worker.py <script> [argumentos...]'}))
+        return
+
+    install_standin_database(os.environ.get('FT_LOADTEST_DB', ':memory:'))
+    target = sys.argv[1]
+
+    if target == 'noop':
+        return
+    if target.startswith('import:'):
+        __import__(target.split(':', 1)[1])
+        return
+    if target.startswith('model_load:'):
+        print(json.dumps(model_load(target.split(':', 1)[1])))
+        return
+
+    sys.argv = [os.path.join(PYTHON_DIR, target + '.py')] + sys.argv[2:]
+    if target in ('predict_match', 'prediction_server'):
+        import predict_match
+        predict_match.DB_CONFIG_PATH = os.environ['FT_LOADTEST_DB_CONFIG']
+    __import__(target).main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Caché local columnar del histórico de partidos
+
+Guarda una copia de ft_matches_advanced en disco, un fichero .npy por
+columna, particionada por temporada y división. Cada tabla (según el
+prefijo de db_config.json) tiene su propio directorio y su propio lock:
+
+    cache/matches/<tabla>/
+        manifest.json        marca de agua (id / updated_at) y particiones
+        vocabularies.json    diccionarios de equipos, divisiones, ...
+        <temporada>/<division>/<columna>.npy
+
+Los .npy se abren con mmap_mode='r', de modo que varios procesos comparten
+las páginas del sistema operativo. Las lecturas consultan la marca de agua
+de la tabla como mucho cada WATERMARK_TTL segundos y solo sincronizan
+(trayendo SOLO las filas con id o updated_at mayores) si ha cambiado.
+
+Los scripts leen de la caché cuando existe (python3 match_cache.py sync la
+crea) y FT_MATCH_CACHE no vale '0'. Si no, leen directamente de MySQL.
+
+Uso:
+    python3 match_cache.py sync       # crear / actualizar incrementalmente
+    python3 match_cache.py rebuild    # rehacer desde cero (p.ej. tras borrados)
+    python3 match_cache.py status
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import shutil
+import numpy as np
+
+from match_loader import (
+    MatchColumns, SHARED_VOCABULARIES, column_type,
+    get_db_connection, load_db_config, load_matches, matches_table
+)
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'matches')
+
+# Columnas que se guardan en la caché
+CACHE_COLUMNS = [
+    'id', 'date', 'division', 'season', 'home_team', 'away_team',
+    'fthg', 'ftag', 'ftr', 'hthg', 'htag', 'htr',
+    'hs', 'as_shots', 'hst', 'ast', 'hhw', 'ahw', 'hc', 'ac',
+    'hf', 'af', 'hy', 'ay', 'hr', 'ar', 'home_xg', 'away_xg',
+    'b365h', 'b365d', 'b365a', 'bwh', 'bwd', 'bwa'
+]
+
+CACHE_FORMAT_VERSION = 1
+
+# Segundos entre consultas de la marca de agua en las lecturas
+WATERMARK_TTL = 60
+
+
+def table_cache_dir(cache_dir, table_name):
+    """Directorio de la caché de una tabla"""
+    return os.path.join(cache_dir, table_name) if table_name else cache_dir
+
+
+def cache_enabled(table_name, cache_dir=CACHE_DIR):
+    """La caché se usa si ya fue creada y no está desactivada por entorno"""
+    if os.environ.get('FT_MATCH_CACHE', '1') == '0':
+        return False
+    return os.path.exists(os.path.join(table_cache_dir(cache_dir, table_name), 'manifest.json'))
+
+
+def _partition_dir_name(value):
+    text = str(value) if value not in (None, '') else '_'
+    return ''.join(c if c.isalnum() or c in '-_' else '_' for c in text)
+
+
+def _write_json_atomic(path, data):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+class MatchCache:
+    """
+    Instantánea columnar de ft_matches_advanced en disco
+    """
+
+    def __init__(self, table_name, cache_dir=CACHE_DIR):
+        self.table_name = table_name
+        self.cache_dir = os.path.abspath(table_cache_dir(cache_dir, table_name))
+        self.manifest_path = os.path.join(self.cache_dir, 'manifest.json')
+        self.vocabularies_path = os.path.join(self.cache_dir, 'vocabularies.json')
+        # Su mtime marca la última consulta de la marca de agua
+        self.checked_path = os.path.join(self.cache_dir, '.checked')
+
+    # ------------------------------------------------------------------ #
+    # Metadatos
+    # ------------------------------------------------------------------ #
+
+    def read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path, 'r') as f:
+            return json.load(f)
+
+    def read_vocabularies(self):
+        if not os.path.exists(self.vocabularies_path):
+            return {}
+        with open(self.vocabularies_path, 'r') as f:
+            return json.load(f)
+
+    def _lock(self, shared=False):
+        """Exclusivo para sincronizar, compartido para leer sin ver ficheros a medias"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        handle = open(os.path.join(self.cache_dir, '.lock'), 'a')
+        fcntl.flock(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        return handle
+
+    # ------------------------------------------------------------------ #
+    # Sincronización
+    # ------------------------------------------------------------------ #
+
+    def _table_watermark(self, connection):
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT MAX(id), MAX(updated_at) FROM {self.table_name}")
+        max_id, max_updated = cursor.fetchone()
+        cursor.close()
+        return max_id, max_updated
+
+    def _mark_checked(self):
+        with open(self.checked_path, 'a'):
+            pass
+        os.utime(self.checked_path)
+
+    def _checked_recently(self, ttl):
+        try:
+            return time.time() - os.path.getmtime(self.checked_path) < ttl
+        except OSError:
+            return False
+
+    @staticmethod
+    def _same_watermark(watermark, max_id, max_updated):
+        return (int(max_id or 0) == int(watermark.get('id') or 0)
+                and (str(max_updated) if max_updated else None) == watermark.get('updated_at'))
+
+    def refresh(self, connection, ttl=WATERMARK_TTL):
+        """
+        Sincroniza solo si la marca de agua de la tabla cambió. La consulta
+        se hace como mucho cada ttl segundos y, si no hay cambios, no se
+        toma el lock exclusivo ni se reescribe el manifest.
+        """
+        if self._checked_recently(ttl):
+            return None
+
+        lock = self._lock(shared=True)
+        try:
+            manifest = self.read_manifest()
+        finally:
+            lock.close()
+
+        if manifest and manifest.get('version') == CACHE_FORMAT_VERSION:
+            max_id, max_updated = self._table_watermark(connection)
+            if self._same_watermark(manifest['watermark'], max_id, max_updated):
+                self._mark_checked()
+                return None
+
+        return self.sync(connection)
+
+    def sync(self, connection, rebuild=False):
+        """
+        Trae las filas nuevas o modificadas desde la última marca de agua
+
+        Devuelve un resumen con el número de filas sincronizadas.
+        """
+        start = time.perf_counter()
+        table_name = self.table_name
+        lock = self._lock()
+        try:
+            manifest = None if rebuild else self.read_manifest()
+            if manifest and (manifest.get('version') != CACHE_FORMAT_VERSION
+                             or manifest.get('table') != table_name):
+                manifest = None
+
+            if manifest is None:
+                self._clear()
+                manifest = {
+                    'version': CACHE_FORMAT_VERSION,
+                    'table': table_name,
+                    'columns': CACHE_COLUMNS,
+                    'watermark': {'id': 0, 'updated_at': None},
+                    'partitions': {}
+                }
+                vocabularies = {}
+            else:
+                vocabularies = self.read_vocabularies()
+
+            watermark = manifest['watermark']
+            where = "id > %s"
+            params = (watermark['id'],)
+            if watermark.get('updated_at'):
+                where = "(id > %s OR updated_at > %s)"
+                params = (watermark['id'], watermark['updated_at'])
+
+            # La nueva marca de agua se lee ANTES de traer filas: lo que se
+            # modifique durante la sincronización entrará en la siguiente
+            max_id, max_updated = self._table_watermark(connection)
+
+            # Otro proceso pudo sincronizar mientras se esperaba el lock
+            unchanged = os.path.exists(self.manifest_path) and \
+                self._same_watermark(watermark, max_id, max_updated)
+            changes = [] if unchanged else load_matches(
+                connection, table_name, manifest['columns'],
+                where=where, params=params, order_by='id', vocabularies=vocabularies
+            )
+
+            if len(changes):
+                self._apply_changes(manifest, changes)
+                _write_json_atomic(self.vocabularies_path, changes.vocabularies)
+
+            if not unchanged:
+                manifest['watermark'] = {
+                    'id': int(max_id or watermark['id'] or 0),
+                    'updated_at': str(max_updated) if max_updated else watermark.get('updated_at')
+                }
+                manifest['synced_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+                _write_json_atomic(self.manifest_path, manifest)
+            self._mark_checked()
+
+            return {
+                'rows_synced': len(changes),
+                'total_rows': sum(p['rows'] for p in manifest['partitions'].values()),
+                'partitions': len(manifest['partitions']),
+                'seconds': round(time.perf_counter() - start, 3)
+            }
+        finally:
+            lock.close()
+
+    def _clear(self):
+        for entry in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, entry)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif entry not in ('.lock', '.checked'):
+                os.remove(path)
+
+    def _apply_changes(self, manifest, changes):
+        """Reescribe solo las particiones afectadas por las filas nuevas"""
+        changed_ids = changes['id']
+        seasons = changes.decode('season')
+        divisions = changes.decode('division')
+        partition_keys = np.array(
+            [f"{_partition_dir_name(s)}/{_partition_dir_name(d)}" for s, d in zip(seasons, divisions)],
+            dtype=object
+        )
+
+        # Una fila modificada puede cambiar de partición: se elimina de todas
+        # las existentes y se añade a la que le corresponde ahora
+        touched = set(partition_keys)
+        for key in manifest['partitions']:
+            existing = np.load(self._column_path(key, 'id'), mmap_mode='r')
+            if np.isin(existing, changed_ids).any():
+                touched.add(key)
+
+        for key in sorted(touched):
+            new_rows = changes.take(partition_keys == key)
+            self._rewrite_partition(manifest, key, new_rows, changed_ids)
+
+    def _column_path(self, key, column):
+        return os.path.join(self.cache_dir, key, f"{column}.npy")
+
+    def _rewrite_partition(self, manifest, key, new_rows, changed_ids):
+        columns = manifest['columns']
+        if key in manifest['partitions']:
+            existing = {c: np.load(self._column_path(key, c)) for c in columns}
+            keep = ~np.isin(existing['id'], changed_ids)
+            merged = {c: np.concatenate([existing[c][keep], new_rows[c]]) for c in columns}
+        else:
+            merged = {c: np.asarray(new_rows[c]) for c in columns}
+
+        order = np.lexsort((merged['id'], merged['date']))
+        rows = len(order)
+
+        partition_dir = os.path.join(self.cache_dir, key)
+        if rows == 0:
+            shutil.rmtree(partition_dir, ignore_errors=True)
+            manifest['partitions'].pop(key, None)
+            return
+
+        os.makedirs(partition_dir, exist_ok=True)
+        for c in columns:
+            tmp = os.path.join(partition_dir, f".{c}.tmp{os.getpid()}.npy")
+            np.save(tmp, merged[c][order])
+            os.replace(tmp, self._column_path(key, c))
+
+        season, division = key.split('/', 1)
+        manifest['partitions'][key] = {
+            'season': season,
+            'division': division,
+            'rows': rows,
+            'min_date': str(merged['date'].min()),
+            'max_date': str(merged['date'].max())
+        }
+
+    # ------------------------------------------------------------------ #
+    # Lectura
+    # ------------------------------------------------------------------ #
+
+    def load(self, columns=None, seasons=None, divisions=None):
+        """
+        Lee columnas de la caché (memory-mapped) ordenadas por fecha
+
+        Args:
+            columns: columnas a leer (por defecto todas)
+            seasons / divisions: filtrar particiones sin abrir las demás
+        """
+        lock = self._lock(shared=True)
+        try:
+            manifest = self.read_manifest()
+            if manifest is None:
+                raise RuntimeError('La caché de partidos no existe: ejecuta match_cache.py sync')
+
+            columns = list(columns or manifest['columns'])
+            missing = [c for c in columns if c not in manifest['columns']]
+            if missing:
+                raise KeyError(f"Columnas no disponibles en la caché: {missing}")
+
+            season_dirs = {_partition_dir_name(s) for s in seasons} if seasons else None
+            division_dirs = {_partition_dir_name(d) for d in divisions} if divisions else None
+            keys = [
+                key for key, info in sorted(manifest['partitions'].items())
+                if (season_dirs is None or info['season'] in season_dirs)
+                and (division_dirs is None or info['division'] in division_dirs)
+            ]
+
+            # date e id hacen falta para el orden global aunque no se pidan
+            read_columns = list(dict.fromkeys(columns + ['date', 'id']))
+            parts = {c: [np.load(self._column_path(k, c), mmap_mode='r') for k in keys] for c in read_columns}
+
+            if len(keys) == 1:
+                data = {c: parts[c][0] for c in columns}
+            elif keys:
+                merged = {c: np.concatenate(parts[c]) for c in read_columns}
+                order = np.lexsort((merged['id'], merged['date']))
+                data = {c: merged[c][order] for c in columns}
+            else:
+                data = {c: np.empty(0, dtype=_empty_dtype(c)) for c in columns}
+
+            vocabulary_of = {c: SHARED_VOCABULARIES.get(c, c) for c in columns if column_type(c) == 'category'}
+            return MatchColumns(data, self.read_vocabularies(), vocabulary_of)
+        finally:
+            lock.close()
+
+
+def _empty_dtype(column):
+    kind = column_type(column)
+    if kind == 'category':
+        return np.int32
+    if kind == 'date':
+        return 'datetime64[D]'
+    return kind
+
+
+def load_matches_cached(connection, table_name, columns, cache_dir=CACHE_DIR,
+                        seasons=None, divisions=None):
+    """
+    Cargar columnas desde la caché local (al día según refresh()) o, si la
+    caché no está activada, directamente desde MySQL con load_matches()
+    """
+    if cache_enabled(table_name, cache_dir):
+        cache = MatchCache(table_name, cache_dir)
+        cache.refresh(connection)
+        return cache.load(columns, seasons=seasons, divisions=divisions)
+
+    conditions = []
+    params = []
+    for column, values in (('season', seasons), ('division', divisions)):
+        if values:
+            conditions.append(f"{column} IN ({', '.join(['%s'] * len(values))})")
+            params.extend(values)
+    return load_matches(
+        connection, table_name, columns,
+        where=' AND '.join(conditions), params=tuple(params), order_by='date, id'
+    )
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+
+    try:
+        config = load_db_config()
+        cache = MatchCache(matches_table(config))
+
+        if command == 'status':
+            manifest = cache.read_manifest()
+            if manifest is None:
+                print(json.dumps({'error': 'La caché no existe todavía'}))
+                return
+            print(json.dumps({
+                'watermark': manifest['watermark'],
+                'synced_at': manifest.get('synced_at'),
+                'partitions': len(manifest['partitions']),
+                'total_rows': sum(p['rows'] for p in manifest['partitions'].values())
+            }))
+            return
+
+        if command not in ('sync', 'rebuild'):
+            print(json.dumps({'error': 'Uso: match_cache.py <sync|rebuild|status>'}))
+            return
+
+        connection = get_db_connection(config)
+        try:
+            result = cache.sync(connection, rebuild=(command == 'rebuild'))
+        finally:
+            connection.close()
+        print(json.dumps(result))
+
+    except Exception as e:
+        print(json.dumps({'error': str(e)}))
+
+
+if __name__ == "__main__":
+    main()
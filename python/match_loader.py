@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Cargador columnar tipado de ft_matches_advanced
+
+Lee la tabla por bloques desde un cursor NO bufferizado y va rellenando
+columnas NumPy preasignadas:
+- goles, tiros, córners, faltas y tarjetas como enteros pequeños (int8; la
+  columna pasa a int16/int32 si algún valor no cabe, nunca se trunca)
+- nombres de equipo (y demás textos) codificados con diccionario (int32)
+- fechas como datetime64[D], xG y cuotas como float32
+
+Así nunca existen a la vez la lista completa de tuplas de fetchall() y el
+DataFrame: como mucho hay un bloque de filas Python en memoria.
+
+Uso para medir contra fetchall() + DataFrame:
+    python3 match_loader.py --measure
+"""
+
+import sys
+import json
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+# Agregar path para librerías
+plugin_libs = '/var/www/vhosts/virtualrolldice.com/httpdocs/wp-content/plugins/football-tipster/python-libs'
+if plugin_libs not in sys.path:
+    sys.path.insert(0, plugin_libs)
+
+# Valor centinela para NULL en columnas enteras
+NULL_INT = -1
+
+# Tipos a los que se amplía una columna entera cuando un valor no cabe
+WIDER_INTS = (np.int16, np.int32, np.int64)
+
+# Tipo de almacenamiento de cada columna conocida de ft_matches_advanced.
+# Las columnas no listadas (cuotas b365h, bwh, ...) se guardan como float32.
+COLUMN_TYPES = {
+    'id': 'int32',
+    'division': 'category',
+    'date': 'date',
+    'time': 'category',
+    'home_team': 'category',
+    'away_team': 'category',
+    'fthg': 'int8', 'ftag': 'int8', 'ftr': 'category',
+    'hthg': 'int8', 'htag': 'int8', 'htr': 'category',
+    'attendance': 'int32',
+    'referee': 'category',
+    'hs': 'int8', 'as_shots': 'int8',
+    'hst': 'int8', 'ast': 'int8',
+    'hhw': 'int8', 'ahw': 'int8',
+    'hc': 'int8', 'ac': 'int8',
+    'hf': 'int8', 'af': 'int8',
+    'hfkc': 'int8', 'afkc': 'int8',
+    'ho': 'int8', 'ao': 'int8',
+    'hy': 'int8', 'ay': 'int8',
+    'hr': 'int8', 'ar': 'int8',
+    'hbp': 'int8', 'abp': 'int8',
+    'home_xg': 'float32', 'away_xg': 'float32',
+    'data_source': 'category',
+    'sport': 'category',
+    'season': 'category',
+}
+
+# Columnas que comparten diccionario (local y visitante usan los mismos códigos)
+SHARED_VOCABULARIES = {
+    'home_team': 'team',
+    'away_team': 'team',
+}
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def load_db_config(path='db_config.json'):
+    """Leer db_config.json que escribe el plugin"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def get_db_connection(config):
+    """Crear conexión a MySQL (acepta host con puerto 'host:puerto')"""
+    import mysql.connector
+
+    host = str(config['host'])
+    port = int(config.get('port', 3306))
+    if ':' in host:
+        host, port = host.split(':', 1)
+        port = int(port)
+
+    return mysql.connector.connect(
+        host=host,
+        port=port,
+        database=config['database'],
+        user=config['user'],
+        password=config['password'],
+        charset='utf8mb4',
+        use_unicode=True
+    )
+
+
+def matches_table(config):
+    """Nombre completo de la tabla de partidos según el prefijo configurado"""
+    return f"{config.get('table_prefix', 'wp_')}ft_matches_advanced"
+
+
+def column_type(name):
+    return COLUMN_TYPES.get(name, 'float32')
+
+
+class MatchColumns:
+    """
+    Resultado del cargador: un array NumPy por columna + diccionarios
+    """
+
+    def __init__(self, columns, vocabularies, vocabulary_of):
+        self.columns = columns
+        self.vocabularies = vocabularies
+        self.vocabulary_of = vocabulary_of
+
+    def __len__(self):
+        if not self.columns:
+            return 0
+        return len(next(iter(self.columns.values())))
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.columns.values())
+
+    def vocabulary(self, name):
+        """Lista de valores de una columna codificada"""
+        return self.vocabularies[self.vocabulary_of[name]]
+
+    def code_of(self, name, value):
+        """Código de un valor en una columna codificada (-1 si no existe)"""
+        try:
+            return self.vocabulary(name).index(value)
+        except ValueError:
+            return NULL_INT
+
+    def decode(self, name):
+        """Array object con los textos; comparte los str del diccionario"""
+        codes = self.columns[name]
+        values = np.empty(len(self.vocabulary(name)) + 1, dtype=object)
+        values[:-1] = self.vocabulary(name)
+        values[-1] = None
+        return values[codes]
+
+    def take(self, index):
+        """Subconjunto de filas (máscara booleana o índices)"""
+        return MatchColumns(
+            {name: values[index] for name, values in self.columns.items()},
+            self.vocabularies,
+            self.vocabulary_of
+        )
+
+    def numeric(self, name, dtype=np.float64):
+        """Columna numérica con NaN en lugar del centinela de NULL"""
+        values = self.columns[name]
+        if values.dtype.kind == 'i':
+            out = values.astype(dtype)
+            out[values == NULL_INT] = np.nan
+            return out
+        return values.astype(dtype, copy=False)
+
+    def to_dataframe(self, categorical=False):
+        """
+        DataFrame compatible con el código existente: textos decodificados
+        (o Categorical) y NULL de enteros convertidos a NaN
+        """
+        data = {}
+        for name, values in self.columns.items():
+            kind = column_type(name)
+            if kind == 'category':
+                if categorical:
+                    data[name] = pd.Categorical.from_codes(values, self.vocabulary(name))
+                else:
+                    data[name] = self.decode(name)
+            elif values.dtype.kind == 'i' and (values == NULL_INT).any():
+                data[name] = self.numeric(name, np.float32)
+            else:
+                data[name] = values
+        return pd.DataFrame(data)
+
+
+class _ColumnBuilder:
+    """Arrays preasignados que se rellenan bloque a bloque"""
+
+    def __init__(self, names, capacity, vocabularies=None):
+        self.names = list(names)
+        self.size = 0
+        self.vocabularies = {k: list(v) for k, v in (vocabularies or {}).items()}
+        self.lookups = {k: {value: code for code, value in enumerate(v)}
+                        for k, v in self.vocabularies.items()}
+        self.vocabulary_of = {}
+        self.arrays = {}
+
+        for name in self.names:
+            kind = column_type(name)
+            if kind == 'category':
+                vocab_name = SHARED_VOCABULARIES.get(name, name)
+                self.vocabulary_of[name] = vocab_name
+                self.vocabularies.setdefault(vocab_name, [])
+                self.lookups.setdefault(vocab_name, {})
+                self.arrays[name] = np.empty(capacity, dtype=np.int32)
+            elif kind == 'date':
+                self.arrays[name] = np.empty(capacity, dtype='datetime64[D]')
+            else:
+                self.arrays[name] = np.empty(capacity, dtype=kind)
+
+    def _ensure_capacity(self, needed):
+        capacity = len(next(iter(self.arrays.values()))) if self.arrays else 0
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        for name, values in self.arrays.items():
+            grown = np.empty(new_capacity, dtype=values.dtype)
+            grown[:self.size] = values[:self.size]
+            self.arrays[name] = grown
+
+    def _fit_int(self, name, values):
+        """
+        Array de name ampliado (int8 -> int16 -> ...) si values no cabe en su
+        tipo: un 200 en int8 se convertiría en -56 y un 255 en el centinela
+        """
+        target = self.arrays[name]
+        info = np.iinfo(target.dtype)
+        low, high = int(values.min()), int(values.max())
+        if info.min <= low and high <= info.max:
+            return target
+        for dtype in WIDER_INTS:
+            wider = np.iinfo(dtype)
+            if wider.min <= low and high <= wider.max:
+                target = target.astype(dtype)
+                self.arrays[name] = target
+                return target
+        raise ValueError(f"Valor fuera de rango en la columna {name}: {low}..{high}")
+
+    def _encode(self, name, values):
+        vocab_name = self.vocabulary_of[name]
+        lookup = self.lookups[vocab_name]
+        vocab = self.vocabularies[vocab_name]
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            if value is None:
+                codes[i] = NULL_INT
+                continue
+            code = lookup.get(value)
+            if code is None:
+                code = len(vocab)
+                lookup[value] = code
+                vocab.append(value)
+            codes[i] = code
+        return codes
+
+    def append(self, rows):
+        n = len(rows)
+        if n == 0:
+            return
+        self._ensure_capacity(self.size + n)
+        start, end = self.size, self.size + n
+
+        for name, values in zip(self.names, zip(*rows)):
+            kind = column_type(name)
+            target = self.arrays[name]
+            if kind == 'category':
+                target[start:end] = self._encode(name, values)
+            elif kind == 'date':
+                target[start:end] = np.array(values, dtype='datetime64[D]')
+            elif kind.startswith('int'):
+                block = np.fromiter(
+                    (NULL_INT if v is None else int(v) for v in values), dtype=np.int64, count=n
+                )
+                self._fit_int(name, block)[start:end] = block
+            else:
+                target[start:end] = np.fromiter(
+                    (np.nan if v is None else float(v) for v in values), dtype=np.float64, count=n
+                )
+
+        self.size = end
+
+    def finish(self):
+        columns = {name: values[:self.size].copy() if len(values) != self.size else values
+                   for name, values in self.arrays.items()}
+        return MatchColumns(columns, self.vocabularies, self.vocabulary_of)
+
+
+def load_matches(connection, table_name, columns, where='', params=(), order_by='date',
+                 limit=None, chunk_size=DEFAULT_CHUNK_SIZE, vocabularies=None):
+    """
+    Carga SOLO las columnas pedidas de ft_matches_advanced en arrays tipados
+
+    Args:
+        connection: conexión mysql.connector (o compatible DB-API)
+        table_name: tabla con prefijo, p.ej. PP0Fhoci_ft_matches_advanced
+        columns: lista de columnas a cargar
+        where: condición SQL sin la palabra WHERE (opcional)
+        params: parámetros de la condición
+        order_by: orden SQL (por defecto date)
+        limit: máximo de filas (opcional)
+        vocabularies: diccionarios previos a extender, para mantener códigos
+    """
+    columns = list(columns)
+    where_sql = f"WHERE {where}" if where else ""
+    order_sql = f"ORDER BY {order_by}" if order_by else ""
+    limit_sql = f"LIMIT {int(limit)}" if limit else ""
+
+    # Contar primero para preasignar los arrays de una vez
+    count_cursor = connection.cursor()
+    count_cursor.execute(f"SELECT COUNT(*) FROM {table_name} {where_sql}", params)
+    expected = int(count_cursor.fetchone()[0])
+    count_cursor.close()
+    if limit:
+        expected = min(expected, int(limit))
+
+    builder = _ColumnBuilder(columns, expected, vocabularies)
+
+    try:
+        cursor = connection.cursor(buffered=False)
+    except TypeError:
+        cursor = connection.cursor()
+
+    cursor.execute(
+        f"SELECT {', '.join(columns)} FROM {table_name} {where_sql} {order_sql} {limit_sql}",
+        params
+    )
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        builder.append(rows)
+    cursor.close()
+
+    return builder.finish()
+
+
+def measure(config, columns=None, where='ftr IS NOT NULL'):
+    """
+    Compara fetchall() + DataFrame sobre SELECT * contra el cargador tipado
+    (tiempo y pico de memoria Python medido con tracemalloc)
+    """
+    table_name = matches_table(config)
+    columns = columns or ['date', 'division', 'season', 'home_team', 'away_team', 'ftr',
+                          'fthg', 'ftag', 'hs', 'as_shots', 'hst', 'ast', 'hc', 'ac',
+                          'hf', 'af', 'hy', 'ay', 'hr', 'ar', 'home_xg', 'away_xg']
+    results = {}
+
+    connection = get_db_connection(config)
+    try:
+        tracemalloc.start()
+        start = time.perf_counter()
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(f"SELECT * FROM {table_name} WHERE {where}")
+        df = pd.DataFrame(cursor.fetchall())
+        cursor.close()
+        results['fetchall_dataframe'] = {
+            'seconds': round(time.perf_counter() - start, 3),
+            'peak_mb': round(tracemalloc.get_traced_memory()[1] / 1e6, 1),
+            'rows': len(df)
+        }
+        tracemalloc.stop()
+        del df
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        data = load_matches(connection, table_name, columns, where=where)
+        results['typed_loader'] = {
+            'seconds': round(time.perf_counter() - start, 3),
+            'peak_mb': round(tracemalloc.get_traced_memory()[1] / 1e6, 1),
+            'rows': len(data),
+            'columns_mb': round(data.nbytes / 1e6, 2)
+        }
+        tracemalloc.stop()
+    finally:
+        connection.close()
+
+    baseline = results['fetchall_dataframe']
+    loader = results['typed_loader']
+    results['speedup'] = round(baseline['seconds'] / max(loader['seconds'], 1e-6), 1)
+    results['memory_factor'] = round(baseline['peak_mb'] / max(loader['peak_mb'], 0.1), 1)
+    return results
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--measure':
+        try:
+            print(json.dumps(measure(load_db_config())))
+        except Exception as e:
+            print(json.dumps({'error': str(e)}))
+        return
+
+    print(json.dumps({'error': 'Uso: match_loader.py --measure'}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Caché de modelos de benchmark por contenido
+
+Cada modelo entrenado se guarda en cache/models/<clave>/ donde la clave es
+el sha1 de:
+
+- las filas de entrenamiento (bytes de X e y)
+- la versión del conjunto de features
+- los hiperparámetros del modelo
+
+Si nada de eso cambia, volver a lanzar el benchmark reutiliza el modelo (y
+las probabilidades de la temporada de test, guardadas por sha1 de X_test)
+sin entrenar. Al importar partidos nuevos cambian las filas y la clave.
+
+Cuando el total supera MAX_BYTES se borran las entradas usadas hace más
+tiempo. FT_MODEL_CACHE=0 desactiva la caché.
+
+Uso:
+    python3 model_cache.py status
+    python3 model_cache.py clear
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import numpy as np
+import joblib
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'models')
+
+MAX_BYTES = int(os.environ.get('FT_MODEL_CACHE_MB', '512')) * 1024 * 1024
+
+MODEL_FILE = 'model.joblib'
+METADATA_FILE = 'metadata.json'
+
+
+def cache_enabled():
+    return os.environ.get('FT_MODEL_CACHE', '1') != '0'
+
+
+def array_digest(*arrays):
+    """sha1 del contenido de varios arrays (tipo, forma y bytes)"""
+    digest = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode('utf-8'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def _write_atomic(path, write):
+    tmp = f"{path}.tmp{os.getpid()}"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _entry_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+class ModelCache:
+    """
+    Modelos entrenados y probabilidades de test direccionados por contenido
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+
+    def _lock(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        handle = open(os.path.join(self.cache_dir, '.lock'), 'a')
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _touch(self, key):
+        """Marca la entrada como usada (la mtime del directorio ordena el LRU)"""
+        try:
+            os.utime(self._entry_dir(key))
+        except OSError:
+            pass
+
+    @staticmethod
+    def key(X_train, y_train, params, feature_version):
+        definition = json.dumps({'params': params, 'feature_version': feature_version}, sort_keys=True)
+        digest = hashlib.sha1(definition.encode('utf-8'))
+        digest.update(array_digest(X_train, y_train).encode('utf-8'))
+        return digest.hexdigest()
+
+    # ------------------------------------------------------------------ #
+    # Modelos
+    # ------------------------------------------------------------------ #
+
+    def get_model(self, key):
+        path = os.path.join(self._entry_dir(key), MODEL_FILE)
+        try:
+            model = joblib.load(path)
+        except (OSError, EOFError, ValueError):
+            return None
+        self._touch(key)
+        return model
+
+    def get_metadata(self, key):
+        try:
+            with open(os.path.join(self._entry_dir(key), METADATA_FILE), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put_model(self, key, model, metadata=None):
+        entry = self._entry_dir(key)
+        os.makedirs(entry, exist_ok=True)
+        _write_atomic(os.path.join(entry, MODEL_FILE), lambda tmp: joblib.dump(model, tmp))
+
+        metadata = dict(metadata or {}, created_at=time.strftime('%Y-%m-%d %H:%M:%S'))
+        def write_metadata(tmp):
+            with open(tmp, 'w') as f:
+                json.dump(metadata, f)
+        _write_atomic(os.path.join(entry, METADATA_FILE), write_metadata)
+
+        self.evict(keep=key)
+
+    # ------------------------------------------------------------------ #
+    # Probabilidades de test
+    # ------------------------------------------------------------------ #
+
+    def _probabilities_path(self, key, X_test):
+        return os.path.join(self._entry_dir(key), f"probabilities_{array_digest(X_test)}.npz")
+
+    def get_probabilities(self, key, X_test):
+        """(probabilidades, clases) guardadas para este modelo y este X_test, o None"""
+        try:
+            with np.load(self._probabilities_path(key, X_test)) as data:
+                cached = data['probabilities'], data['classes']
+        except (OSError, KeyError, ValueError):
+            return None
+        self._touch(key)
+        return cached
+
+    def put_probabilities(self, key, X_test, probabilities, classes):
+        path = self._probabilities_path(key, X_test)
+        if not os.path.isdir(os.path.dirname(path)):
+            return
+        def write_probabilities(tmp):
+            # Con un fichero abierto np.savez no añade la extensión .npz
+            with open(tmp, 'wb') as f:
+                np.savez(f, probabilities=probabilities, classes=classes)
+        _write_atomic(path, write_probabilities)
+        self.evict(keep=key)
+
+    # ------------------------------------------------------------------ #
+    # Tamaño
+    # ------------------------------------------------------------------ #
+
+    def entries(self):
+        """[(clave, bytes, último uso)] de las entradas, la más antigua primero"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        found = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_dir():
+                try:
+                    found.append((entry.name, _entry_size(entry.path), entry.stat().st_mtime))
+                except OSError:
+                    continue
+        found.sort(key=lambda item: item[2])
+        return found
+
+    def evict(self, keep=None):
+        """Borra las entradas usadas hace más tiempo hasta bajar de max_bytes"""
+        handle = self._lock()
+        try:
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            evicted = 0
+            for key, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+                total -= size
+                evicted += 1
+            return evicted
+        finally:
+            handle.close()
+
+    def clear(self):
+        handle = self._lock()
+        try:
+            for key, _, _ in self.entries():
+                shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+        finally:
+            handle.close()
+
+    def summary(self):
+        entries = self.entries()
+        return {
+            'entries': len(entries),
+            'size_bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+        }
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    cache = ModelCache()
+
+    if command == 'status':
+        print(json.dumps(cache.summary()))
+    elif command == 'clear':
+        cache.clear()
+        print(json.dumps({'success': True}))
+    else:
+        print(json.dumps({'error': 'Uso: model_cache.py <status|clear>'}))
+
+
+if __name__ == "__main__":
+    main()
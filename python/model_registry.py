@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Registro de versiones de modelos
+
+Cada entrenamiento publica una versión INMUTABLE en su propio directorio:
+
+    models/registry/<nombre>/versions/<AAAAMMDD-HHMMSS-μs>-<sha1 del modelo>/
+        model.pkl        modelo (joblib sin comprimir, abrible con mmap_mode)
+        model.forest     forest compilado (solo NumPy, se abre con np.memmap)
+        scaler.pkl ...   artefactos extra del entrenamiento
+        metadata.json
+    models/registry/<nombre>/CURRENT     versión activa
+
+La versión se escribe primero en un directorio temporal que se renombra de
+golpe, y después se sustituye CURRENT con os.replace. Quien lee CURRENT y
+abre los ficheros de esa versión nunca ve un modelo a medias ni mezcla el
+modelo de una versión con el escalador o los metadatos de otra.
+
+Los procesos de predicción abren el forest compilado con np.memmap y el
+.pkl con joblib mmap_mode='r', así que comparten las páginas del fichero
+en lugar de tener cada uno su copia.
+
+Los ficheros planos de siempre (../models/football_rf_advanced.pkl,
+model_metadata.json...) se siguen publicando como copia de la versión
+activa para el panel de WordPress y los scripts antiguos.
+
+Uso:
+    python3 model_registry.py list [nombre]
+    python3 model_registry.py activate <nombre> <versión>     # rollback
+    python3 model_registry.py prune <nombre> [versiones_a_conservar]
+    python3 model_registry.py import <nombre> <modelo.pkl> [metadatos.json] [artefactos...]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+from datetime import datetime
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models')
+REGISTRY_DIR = os.path.join(MODELS_DIR, 'registry')
+
+MODEL_FILE = 'model.pkl'
+FOREST_FILE = 'model.forest'
+METADATA_FILE = 'metadata.json'
+CURRENT_FILE = 'CURRENT'
+STAGING_PREFIX = '.staging-'
+
+# Versiones que se conservan al publicar (además de la activa)
+KEEP_VERSIONS = 5
+
+
+def _file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, content):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, 'w') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def _copy_atomic(source, target):
+    """Sustituye target por una copia de source de golpe"""
+    tmp = f"{target}.tmp{os.getpid()}"
+    shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+
+
+class ModelRegistry:
+    """
+    Versiones inmutables de un modelo con un puntero CURRENT atómico
+    """
+
+    def __init__(self, name, registry_dir=REGISTRY_DIR):
+        self.name = name
+        self.root = os.path.abspath(os.path.join(registry_dir, name))
+        self.versions_dir = os.path.join(self.root, 'versions')
+
+    # ------------------------------------------------------------------ #
+    # Rutas y versiones
+    # ------------------------------------------------------------------ #
+
+    def path(self, filename, version=None):
+        """Ruta de un fichero de una versión (la activa por defecto) o None"""
+        version = version or self.current_version()
+        if version is None:
+            return None
+        return os.path.join(self.versions_dir, version, filename)
+
+    def current_version(self):
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), 'r') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def versions(self):
+        """Versiones publicadas, de la más antigua a la más reciente"""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        return sorted(
+            entry.name for entry in os.scandir(self.versions_dir)
+            if entry.is_dir() and not entry.name.startswith(STAGING_PREFIX)
+        )
+
+    def activate(self, version):
+        """Cambia la versión activa de forma atómica (sirve para el rollback)"""
+        if not os.path.isfile(os.path.join(self.versions_dir, version, MODEL_FILE)):
+            raise ValueError(f"No existe la versión {version} de {self.name}")
+        _write_atomic(os.path.join(self.root, CURRENT_FILE), version + '\n')
+
+    # ------------------------------------------------------------------ #
+    # Publicación
+    # ------------------------------------------------------------------ #
+
+    def publish(self, model, metadata, feature_names=None, extra_artifacts=None,
+                keep=KEEP_VERSIONS):
+        """
+        Publica una versión nueva y la activa
+
+        extra_artifacts: {nombre_fichero: objeto} guardados con joblib junto
+        al modelo (p.ej. {'scaler.pkl': scaler})
+        """
+        import joblib
+        from compiled_forest import export_forest
+
+        os.makedirs(self.versions_dir, exist_ok=True)
+        staging = os.path.join(self.versions_dir, f"{STAGING_PREFIX}{os.getpid()}-{time.time():.6f}")
+        os.makedirs(staging)
+
+        try:
+            # Sin compresión: es lo que permite abrirlo con mmap_mode
+            joblib.dump(model, os.path.join(staging, MODEL_FILE))
+            export_forest(model, os.path.join(staging, FOREST_FILE), feature_names)
+            for filename, obj in (extra_artifacts or {}).items():
+                joblib.dump(obj, os.path.join(staging, filename))
+
+            # El prefijo de fecha ordena las versiones por antigüedad
+            version = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{_file_sha1(os.path.join(staging, MODEL_FILE))[:10]}"
+            metadata = dict(metadata, registry_version=version, registry_name=self.name)
+            with open(os.path.join(staging, METADATA_FILE), 'w') as f:
+                json.dump(metadata, f, indent=2, default=str)
+
+            final = os.path.join(self.versions_dir, version)
+            if os.path.isdir(final):
+                # Mismo modelo publicado en el mismo instante
+                shutil.rmtree(staging)
+            else:
+                os.rename(staging, final)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        self.activate(version)
+        self.prune(keep)
+        return version
+
+    def import_files(self, model_path, metadata_path=None, extra_paths=()):
+        """Registra un modelo ya guardado en ficheros sueltos"""
+        import joblib
+
+        model = joblib.load(model_path)
+        metadata = {}
+        if metadata_path:
+            with open(metadata_path, 'r') as f:
+                metadata = json.load(f)
+
+        if isinstance(model, dict):
+            feature_names = model.get('features')
+        else:
+            feature_names = metadata.get('features') or metadata.get('feature_names')
+        extra_artifacts = {os.path.basename(path): joblib.load(path) for path in extra_paths}
+        return self.publish(model, metadata, feature_names, extra_artifacts)
+
+    def export_legacy(self, legacy_paths, version=None):
+        """
+        Publica la versión como los ficheros planos de siempre
+
+        legacy_paths: {nombre_fichero_de_la_versión: ruta_plana}. Son copias
+        y no enlaces: algunos scripts de emergencia reescriben el .pkl plano
+        en el sitio y no deben poder modificar una versión publicada.
+        """
+        for filename, target in legacy_paths.items():
+            source = self.path(filename, version)
+            if source and os.path.exists(source):
+                os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+                _copy_atomic(source, target)
+
+    def prune(self, keep=KEEP_VERSIONS):
+        """Borra las versiones más antiguas; la activa nunca se borra"""
+        current = self.current_version()
+        removed = []
+        for version in self.versions()[:-keep] if keep > 0 else self.versions():
+            if version != current:
+                shutil.rmtree(os.path.join(self.versions_dir, version), ignore_errors=True)
+                removed.append(version)
+
+        # Publicaciones interrumpidas hace más de una hora
+        if os.path.isdir(self.versions_dir):
+            for entry in os.scandir(self.versions_dir):
+                if entry.name.startswith(STAGING_PREFIX) and time.time() - entry.stat().st_mtime > 3600:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+        return removed
+
+    # ------------------------------------------------------------------ #
+    # Carga
+    # ------------------------------------------------------------------ #
+
+    def load_metadata(self, version=None):
+        path = self.path(METADATA_FILE, version)
+        if path is None:
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load_artifact(self, filename, version=None, mmap_mode='r'):
+        """Objeto joblib de una versión; los arrays quedan mapeados en memoria"""
+        import joblib
+
+        path = self.path(filename, version)
+        if path is None:
+            return None
+        return joblib.load(path, mmap_mode=mmap_mode)
+
+    def load_model(self, version=None, compiled=True):
+        """
+        (modelo, versión) de la versión indicada o de la activa, o (None, None)
+
+        Con compiled=True se usa el forest compilado (np.memmap, sin sklearn)
+        si la versión lo tiene.
+        """
+        version = version or self.current_version()
+        if version is None:
+            return None, None
+
+        if compiled:
+            from compiled_forest import CompiledForest
+            forest_path = self.path(FOREST_FILE, version)
+            if os.path.exists(forest_path):
+                return CompiledForest(forest_path), version
+
+        return self.load_artifact(MODEL_FILE, version), version
+
+    def summary(self):
+        versions = self.versions()
+        return {
+            'name': self.name,
+            'current': self.current_version(),
+            'versions': versions,
+        }
+
+
+def registered_names(registry_dir=REGISTRY_DIR):
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(entry.name for entry in os.scandir(registry_dir) if entry.is_dir())
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+
+    try:
+        if command == 'list':
+            names = sys.argv[2:3] or registered_names()
+            print(json.dumps({'models': [ModelRegistry(name).summary() for name in names]}))
+        elif command == 'activate' and len(sys.argv) > 3:
+            registry = ModelRegistry(sys.argv[2])
+            registry.activate(sys.argv[3])
+            print(json.dumps({'success': True, 'current': registry.current_version()}))
+        elif command == 'prune' and len(sys.argv) > 2:
+            keep = int(sys.argv[3]) if len(sys.argv) > 3 else KEEP_VERSIONS
+            removed = ModelRegistry(sys.argv[2]).prune(keep)
+            print(json.dumps({'success': True, 'removed': removed}))
+        elif command == 'import' and len(sys.argv) > 3:
+            metadata_path = sys.argv[4] if len(sys.argv) > 4 else None
+            version = ModelRegistry(sys.argv[2]).import_files(sys.argv[3], metadata_path, sys.argv[5:])
+            print(json.dumps({'success': True, 'version': version}))
+        else:
+            print(json.dumps({'error': 'Uso: model_registry.py <list|activate|prune|import> ...'}))
+    except Exception as e:
+        print(json.dumps({'error': str(e)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,582 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Histórico compacto de cuotas
+
+ft_odds solo guarda el precio actual de cada (fixture, mercado, apuesta).
+Este almacén guarda en disco cada cambio de precio, sin tocar la tabla:
+
+    cache/odds_history/
+        latest.npy                  último precio de cada serie (vista rápida)
+        <fixture // 1000>/<fixture>.log   cambios recientes, solo se añaden
+        <fixture // 1000>/<fixture>.npz   bloque compactado del fixture
+
+Una serie es (fixture, mercado, apuesta, línea). Los precios se guardan en
+milésimas (como decimal(10,3)) y las marcas de tiempo en segundos Unix. Las
+fechas sin zona horaria (start_time de ft_fixtures, --time) se interpretan
+en la hora local del servidor, como las escribe convert_pinnacle_time, y
+'timestamp' se devuelve en esa misma hora local.
+
+En ft_odds solo hay una fila de spread (y de moneyline) por apuesta: la del
+handicap principal. Por eso en esos mercados la línea vigente es la del
+último cambio y las series de líneas anteriores se dan por cerradas (salen
+de latest.npy y no cuentan en price_at). En totales conviven varias líneas.
+
+- append() añade los cambios al .log del fixture (registros binarios de
+  tamaño fijo) y actualiza latest.npy; un precio igual al último de su
+  serie no se guarda
+- compact() convierte .log + .npz en un .npz nuevo: ticks ordenados por
+  serie y tiempo, tiempos y precios codificados como diferencias con el tick
+  anterior de la serie (enteros del tamaño mínimo) y comprimido. Los ticks
+  más antiguos que DOWNSAMPLE_AFTER_DAYS se reducen a uno por
+  DOWNSAMPLE_SECONDS (el último de cada intervalo; el primero y el último de
+  cada serie y los cambios de línea se conservan siempre)
+- apply_retention() borra los fixtures sin cambios en RETENTION_DAYS
+
+Las lecturas (price_at, closing_odds, movement) solo abren el bloque y el
+log del fixture pedido, nunca el histórico completo; latest() solo lee
+latest.npy.
+
+Uso:
+    python3 odds_history.py status
+    python3 odds_history.py compact [--all]
+    python3 odds_history.py retention
+    python3 odds_history.py latest --fixture=<id>
+    python3 odds_history.py at --fixture=<id> --time='2024-05-01 18:00:00'
+    python3 odds_history.py movement --fixture=<id>
+    python3 odds_history.py --self-test
+
+--self-test guarda en un directorio temporal un spread que alterna de
+handicap repitiendo precios y comprueba que price_at devuelve lo mismo antes
+y después de compactar.
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import shutil
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'odds_history')
+
+MARKETS = ['moneyline', 'spread', 'total']
+BETS = ['home', 'draw', 'away', 'over', 'under']
+
+# Registro del .log: 16 bytes por cambio de precio
+LOG_DTYPE = np.dtype([('ts', '<i8'), ('market', 'i1'), ('bet', 'i1'), ('line', '<i2'), ('price', '<i4')])
+LATEST_DTYPE = np.dtype([('fixture', '<i4'), ('market', 'i1'), ('bet', 'i1'), ('line', '<i2'),
+                         ('ts', '<i8'), ('price', '<i4')])
+
+# Registros en el .log a partir de los cuales append() compacta el fixture
+LOG_COMPACT_RECORDS = 512
+DOWNSAMPLE_AFTER_DAYS = 30
+DOWNSAMPLE_SECONDS = 3600
+RETENTION_DAYS = 730
+
+PRICE_SCALE = 1000
+LINE_SCALE = 100
+
+# Único mercado con varias líneas vigentes por apuesta
+TOTAL = MARKETS.index('total')
+
+
+def _timestamp(value):
+    """
+    Segundos Unix de un datetime, Timestamp, texto o número. Sin zona
+    horaria se toma la hora local del servidor.
+    """
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return int(value)
+    value = pd.Timestamp(value)
+    if value.tzinfo is None:
+        return int(time.mktime(value.to_pydatetime().timetuple()))
+    return int(value.value // 10 ** 9)
+
+
+def _local_datetimes(seconds):
+    """Segundos Unix -> fechas sin zona en hora local (inverso de _timestamp)"""
+    return pd.to_datetime([datetime.fromtimestamp(int(value)) for value in seconds])
+
+
+def _smallest_int(values):
+    """Array con el entero más pequeño que admite sus valores"""
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if not len(values) or (values.min() >= info.min and values.max() <= info.max):
+            return values.astype(dtype)
+    return values
+
+
+def _series_starts(ticks):
+    """Posición del primer tick de cada serie (ticks ordenados por serie y tiempo)"""
+    if not len(ticks):
+        return np.zeros(0, dtype=np.int64)
+    key = _series_key(ticks)
+    return np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+
+
+def _series_key(ticks):
+    return (ticks['market'].astype(np.int64) << 24) | (ticks['bet'].astype(np.int64) << 16) | \
+           (ticks['line'].astype(np.int64) & 0xFFFF)
+
+
+def _bet_key(records):
+    fixture = records['fixture'].astype(np.int64) if 'fixture' in records.dtype.names \
+        else np.zeros(len(records), dtype=np.int64)
+    return (fixture << 16) | (records['market'].astype(np.int64) << 8) | records['bet'].astype(np.int64)
+
+
+def _line_switches(ticks):
+    """
+    Ticks en los que una apuesta (fuera de totales) pasa a otra línea o
+    vuelve a una anterior: deciden qué handicap está vigente y no se pueden
+    quitar al compactar aunque repitan el precio del último tick de su serie
+    """
+    if not len(ticks):
+        return np.zeros(0, dtype=bool)
+    group = _bet_key(ticks)
+    order = np.lexsort((ticks['ts'], group))
+    line = ticks['line'][order]
+    switched = np.zeros(len(ticks), dtype=bool)
+    switched[order] = np.r_[False, (group[order][1:] == group[order][:-1]) & (line[1:] != line[:-1])]
+    return switched & (ticks['market'] != TOTAL)
+
+
+def _current_lines(records):
+    """
+    Fuera de totales solo vale una línea por apuesta: la del último cambio
+    (las demás son handicaps anteriores)
+    """
+    if not len(records):
+        return records
+    group = _bet_key(records)
+    order = np.lexsort((records['ts'], group))
+    newest = order[np.r_[group[order][1:] != group[order][:-1], True]]
+    keep = records['market'] == TOTAL
+    keep[newest] = True
+    return records[keep]
+
+
+def _delta_encode(values, starts):
+    """Diferencia con el valor anterior de la misma serie; el primero va entero"""
+    deltas = np.diff(values, prepend=0)
+    deltas[starts] = values[starts]
+    return _smallest_int(deltas)
+
+
+def _delta_decode(deltas, starts):
+    values = np.cumsum(deltas.astype(np.int64))
+    if not len(starts):
+        return values
+    # Restar lo acumulado por las series anteriores
+    segment = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(values)]))
+    before = np.r_[0, values[starts[1:] - 1]]
+    return values - before[segment]
+
+
+class OddsHistory:
+    """
+    Histórico de cambios de precio por fixture
+    """
+
+    def __init__(self, history_dir=HISTORY_DIR):
+        self.history_dir = os.path.abspath(history_dir)
+        self.latest_path = os.path.join(self.history_dir, 'latest.npy')
+
+    def _lock(self, shared=False):
+        os.makedirs(self.history_dir, exist_ok=True)
+        handle = open(os.path.join(self.history_dir, '.lock'), 'a')
+        fcntl.flock(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        return handle
+
+    def _path(self, fixture_id, extension):
+        return os.path.join(self.history_dir, str(int(fixture_id) // 1000), f"{int(fixture_id)}.{extension}")
+
+    def _read_latest(self):
+        if not os.path.exists(self.latest_path):
+            return np.zeros(0, dtype=LATEST_DTYPE)
+        return np.load(self.latest_path)
+
+    def _write_latest(self, latest):
+        tmp = os.path.join(self.history_dir, f".latest.tmp{os.getpid()}.npy")
+        np.save(tmp, latest)
+        os.replace(tmp, self.latest_path)
+
+    # ------------------------------------------------------------------ #
+    # Escritura
+    # ------------------------------------------------------------------ #
+
+    def append(self, lines, when=None):
+        """
+        Guarda los precios de lines (DataFrame con fixture_id, market_type,
+        bet_type, line_value y odds) con la marca de tiempo when (ahora por
+        defecto). Devuelve el número de cambios guardados.
+        """
+        if not len(lines):
+            return 0
+        records = np.zeros(len(lines), dtype=LATEST_DTYPE)
+        records['fixture'] = lines['fixture_id'].to_numpy(dtype=np.int64)
+        records['market'] = pd.Categorical(lines['market_type'], categories=MARKETS).codes
+        records['bet'] = pd.Categorical(lines['bet_type'], categories=BETS).codes
+        records['line'] = np.round(pd.to_numeric(lines['line_value']).fillna(0).to_numpy() * LINE_SCALE)
+        records['ts'] = _timestamp(when if when is not None else time.time())
+        records['price'] = np.round(lines['odds'].to_numpy(dtype=np.float64) * PRICE_SCALE)
+        records = records[(records['market'] >= 0) & (records['bet'] >= 0)]
+
+        # Si una serie llega repetida en el lote vale el último precio
+        keys = self._latest_key(records)
+        _, last = np.unique(keys[::-1], return_index=True)
+        keep = np.sort(len(keys) - 1 - last)
+        records, keys = records[keep], keys[keep]
+
+        lock = self._lock()
+        try:
+            latest = self._read_latest()
+            index = pd.Index(self._latest_key(latest)).get_indexer(keys)
+            found = index >= 0
+            unchanged = np.zeros(len(records), dtype=bool)
+            unchanged[found] = latest['price'][index[found]] == records['price'][found]
+            records, index = records[~unchanged], index[~unchanged]
+            if not len(records):
+                return 0
+
+            # Actualizar la vista de últimos precios
+            found = index >= 0
+            latest[index[found]] = records[found]
+            latest = np.concatenate([latest, records[~found]])
+            # Un spread con otra línea cierra la serie del handicap anterior
+            moved = records[records['market'] != TOTAL]
+            superseded = (latest['market'] != TOTAL) \
+                & np.isin(_bet_key(latest), _bet_key(moved)) \
+                & ~np.isin(self._latest_key(latest), self._latest_key(moved))
+            self._write_latest(latest[~superseded])
+
+            to_compact = []
+            for fixture_id in np.unique(records['fixture']):
+                path = self._path(fixture_id, 'log')
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fixture_records = records[records['fixture'] == fixture_id]
+                log = np.zeros(len(fixture_records), dtype=LOG_DTYPE)
+                for name in LOG_DTYPE.names:
+                    log[name] = fixture_records[name]
+                with open(path, 'ab') as f:
+                    f.write(log.tobytes())
+                if os.path.getsize(path) >= LOG_COMPACT_RECORDS * LOG_DTYPE.itemsize:
+                    to_compact.append(int(fixture_id))
+
+            for fixture_id in to_compact:
+                self._compact_fixture(fixture_id)
+            return len(records)
+        finally:
+            lock.close()
+
+    @staticmethod
+    def _latest_key(records):
+        return (records['fixture'].astype(np.int64) << 32) | _series_key(records)
+
+    def _read_ticks(self, fixture_id):
+        """Ticks del bloque y del log de un fixture, ordenados por serie y tiempo"""
+        parts = []
+        block_path = self._path(fixture_id, 'npz')
+        if os.path.exists(block_path):
+            with np.load(block_path) as block:
+                starts = block['starts']
+                ticks = np.zeros(len(block['ts']), dtype=LOG_DTYPE)
+                counts = np.diff(np.r_[starts, len(ticks)])
+                for name in ('market', 'bet', 'line'):
+                    ticks[name] = np.repeat(block[name], counts)
+                ticks['ts'] = _delta_decode(block['ts'], starts)
+                ticks['price'] = _delta_decode(block['price'], starts)
+                parts.append(ticks)
+        log_path = self._path(fixture_id, 'log')
+        if os.path.exists(log_path):
+            parts.append(np.fromfile(log_path, dtype=LOG_DTYPE))
+        if not parts:
+            return np.zeros(0, dtype=LOG_DTYPE)
+        ticks = np.concatenate(parts)
+        return ticks[np.lexsort((ticks['ts'], _series_key(ticks)))]
+
+    def _compact_fixture(self, fixture_id, now=None):
+        ticks = self._read_ticks(fixture_id)
+        ticks = self._downsample(ticks, now)
+
+        block_path = self._path(fixture_id, 'npz')
+        if len(ticks):
+            starts = _series_starts(ticks)
+            tmp = f"{block_path[:-4]}.tmp{os.getpid()}.npz"
+            np.savez_compressed(
+                tmp,
+                market=ticks['market'][starts], bet=ticks['bet'][starts], line=ticks['line'][starts],
+                starts=starts.astype(np.int32),
+                ts=_delta_encode(ticks['ts'], starts),
+                price=_delta_encode(ticks['price'].astype(np.int64), starts),
+            )
+            os.replace(tmp, block_path)
+        log_path = self._path(fixture_id, 'log')
+        if os.path.exists(log_path):
+            os.remove(log_path)
+        return len(ticks)
+
+    @staticmethod
+    def _downsample(ticks, now=None):
+        """
+        Quita precios repetidos y deja un tick por DOWNSAMPLE_SECONDS en los
+        anteriores a DOWNSAMPLE_AFTER_DAYS (siempre el primero y el último de
+        cada serie, y los cambios de línea de moneyline y spread)
+        """
+        if not len(ticks):
+            return ticks
+        key = _series_key(ticks)
+        first = np.r_[True, key[1:] != key[:-1]]
+        last = np.r_[key[1:] != key[:-1], True]
+
+        cutoff = _timestamp(now if now is not None else time.time()) - DOWNSAMPLE_AFTER_DAYS * 86400
+        bucket = ticks['ts'] // DOWNSAMPLE_SECONDS
+        # Último tick de cada intervalo de la serie
+        bucket_end = np.r_[(key[1:] != key[:-1]) | (bucket[1:] != bucket[:-1]), True]
+        keep = first | last | (ticks['ts'] >= cutoff) | bucket_end | _line_switches(ticks)
+        ticks = ticks[keep]
+
+        # Precios iguales al anterior de la serie no aportan nada, salvo si
+        # entre los dos la apuesta estuvo en otra línea (-0.25 -> -0.5 ->
+        # -0.25): sin ese tick price_at daría por vigente la -0.5
+        key = _series_key(ticks)
+        first = np.r_[True, key[1:] != key[:-1]]
+        last = np.r_[key[1:] != key[:-1], True]
+        changed = np.diff(ticks['price'], prepend=0) != 0
+        return ticks[first | last | changed | _line_switches(ticks)]
+
+    def compact(self, all_fixtures=False, now=None):
+        """Compacta los fixtures con log (o todos con all_fixtures)"""
+        lock = self._lock()
+        try:
+            extension = ('.log', '.npz') if all_fixtures else ('.log',)
+            fixture_ids = set()
+            for root, _, names in os.walk(self.history_dir):
+                fixture_ids.update(int(name.split('.')[0]) for name in names
+                                   if name.endswith(extension) and name.split('.')[0].isdigit())
+            ticks = sum(self._compact_fixture(fixture_id, now) for fixture_id in sorted(fixture_ids))
+            return {'fixtures': len(fixture_ids), 'ticks': ticks}
+        finally:
+            lock.close()
+
+    def apply_retention(self, now=None):
+        """Borra los fixtures cuyo último cambio es anterior a RETENTION_DAYS"""
+        cutoff = _timestamp(now if now is not None else time.time()) - RETENTION_DAYS * 86400
+        lock = self._lock()
+        try:
+            latest = self._read_latest()
+            if not len(latest):
+                return {'fixtures_removed': 0}
+            fixtures = pd.Series(latest['ts']).groupby(latest['fixture']).max()
+            expired = fixtures.index[fixtures.values < cutoff].to_numpy()
+            for fixture_id in expired:
+                for extension in ('log', 'npz'):
+                    path = self._path(fixture_id, extension)
+                    if os.path.exists(path):
+                        os.remove(path)
+            if len(expired):
+                self._write_latest(latest[~np.isin(latest['fixture'], expired)])
+            return {'fixtures_removed': int(len(expired))}
+        finally:
+            lock.close()
+
+    # ------------------------------------------------------------------ #
+    # Lectura
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _frame(records, fixture_id=None):
+        df = pd.DataFrame({
+            'market_type': np.array(MARKETS, dtype=object)[records['market']],
+            'bet_type': np.array(BETS, dtype=object)[records['bet']],
+            'line_value': records['line'] / LINE_SCALE,
+            'odds': records['price'] / PRICE_SCALE,
+            'timestamp': _local_datetimes(records['ts']),
+        })
+        if 'fixture' in (records.dtype.names or ()):
+            df.insert(0, 'fixture_id', records['fixture'])
+        elif fixture_id is not None:
+            df.insert(0, 'fixture_id', int(fixture_id))
+        # Moneyline no tiene línea (NULL en ft_odds)
+        df.loc[df['market_type'] == 'moneyline', 'line_value'] = np.nan
+        return df
+
+    def latest(self, fixture_ids=None):
+        """Último precio de cada serie (de todos los fixtures o de los indicados)"""
+        lock = self._lock(shared=True)
+        try:
+            latest = self._read_latest()
+        finally:
+            lock.close()
+        if fixture_ids is not None:
+            latest = latest[np.isin(latest['fixture'], np.asarray(list(fixture_ids), dtype=np.int64))]
+        return self._frame(_current_lines(latest))
+
+    def ticks(self, fixture_id):
+        """Todos los cambios de precio guardados de un fixture"""
+        lock = self._lock(shared=True)
+        try:
+            ticks = self._read_ticks(fixture_id)
+        finally:
+            lock.close()
+        return self._frame(ticks, fixture_id)
+
+    def price_at(self, fixture_id, when):
+        """
+        Precio vigente de cada serie del fixture en el instante when (hora
+        local si no lleva zona)
+        """
+        lock = self._lock(shared=True)
+        try:
+            ticks = self._read_ticks(fixture_id)
+        finally:
+            lock.close()
+        ticks = ticks[ticks['ts'] <= _timestamp(when)]
+        if len(ticks):
+            key = _series_key(ticks)
+            ticks = _current_lines(ticks[np.r_[key[1:] != key[:-1], True]])
+        return self._frame(ticks, fixture_id)
+
+    def closing_odds(self, fixture_id, kickoff):
+        """Cuotas de cierre: el último precio antes del inicio del partido"""
+        return self.price_at(fixture_id, kickoff)
+
+    def movement(self, fixture_id):
+        """Apertura, cierre, mínimo, máximo y número de cambios por serie"""
+        ticks = self.ticks(fixture_id)
+        if not len(ticks):
+            return ticks
+        keys = ['fixture_id', 'market_type', 'bet_type', 'line_value']
+        grouped = ticks.groupby(keys, dropna=False, sort=False)
+        summary = grouped['odds'].agg(['first', 'last', 'min', 'max', 'count'])
+        summary.columns = ['opening_odds', 'current_odds', 'min_odds', 'max_odds', 'changes']
+        summary['first_seen'] = grouped['timestamp'].first()
+        summary['last_change'] = grouped['timestamp'].last()
+        summary['movement'] = summary['current_odds'] / summary['opening_odds'] - 1
+        return summary.reset_index()
+
+    def status(self):
+        latest = self._read_latest()
+        sizes = {'log': 0, 'npz': 0}
+        files = {'log': 0, 'npz': 0}
+        for root, _, names in os.walk(self.history_dir):
+            for name in names:
+                extension = name.rsplit('.', 1)[-1]
+                if extension in sizes and not name.startswith('.') and '.tmp' not in name:
+                    sizes[extension] += os.path.getsize(os.path.join(root, name))
+                    files[extension] += 1
+        return {
+            'series': int(len(latest)),
+            'fixtures': int(len(np.unique(latest['fixture']))),
+            'blocks': files['npz'],
+            'logs': files['log'],
+            'block_bytes': sizes['npz'],
+            'log_bytes': sizes['log'],
+        }
+
+
+def _option(name, default=None):
+    prefix = f"--{name}="
+    for arg in sys.argv[1:]:
+        if arg.startswith(prefix):
+            return arg[len(prefix):]
+    return default
+
+
+def self_test(lookups=300):
+    """
+    price_at antes y después de compact(): con solo precios repetidos debe
+    coincidir entero; con el submuestreo de ticks antiguos, al menos la
+    línea vigente de cada apuesta
+    """
+    rng = np.random.RandomState(0)
+    workdir = tempfile.mkdtemp(prefix='odds_history_test_')
+    start = 1700000000
+    checks = []
+    try:
+        history = OddsHistory(workdir)
+        when = start
+        for _ in range(120):
+            when += int(rng.randint(60, 1800))
+            hdp = rng.choice([-0.25, -0.5])
+            # Pocos precios distintos: la vuelta a una línea repite precio
+            home, away = rng.choice([1.9, 2.0]), rng.choice([1.85, 1.95])
+            history.append(pd.DataFrame({
+                'fixture_id': [1] * 5,
+                'market_type': ['spread', 'spread', 'moneyline', 'total', 'total'],
+                'bet_type': ['home', 'away', 'home', 'over', 'under'],
+                'line_value': [hdp, -hdp, None, 2.5, 2.5],
+                'odds': [home, away, rng.choice([2.1, 2.2]), 1.9, 1.9],
+            }), when)
+
+        times = np.sort(rng.randint(start, when + 3600, lookups))
+        columns = ['market_type', 'bet_type', 'line_value', 'odds']
+
+        def snapshot():
+            return [history.price_at(1, pd.Timestamp(t, unit='s', tz='UTC'))[columns]
+                    .sort_values(columns[:3]).reset_index(drop=True) for t in times]
+
+        before = snapshot()
+        for name, now, compare in (('compact_keeps_prices', when, columns),
+                                   ('downsample_keeps_lines', when + 365 * 86400, columns[:3])):
+            history.compact(all_fixtures=True, now=now)
+            after = snapshot()
+            mismatches = sum(not a[compare].equals(b[compare]) for a, b in zip(before, after))
+            checks.append({'name': name, 'ok': mismatches == 0, 'lookups': len(times), 'mismatches': mismatches})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {'success': all(item['ok'] for item in checks), 'checks': checks}
+
+
+def _records(df):
+    df = df.astype(object).where(df.notna(), None)
+    for column in ('timestamp', 'first_seen', 'last_change'):
+        if column in df:
+            df[column] = df[column].map(lambda value: str(value) if value is not None else None)
+    return df.to_dict('records')
+
+
+def main():
+    if '--self-test' in sys.argv:
+        result = self_test()
+        print(json.dumps(result))
+        sys.exit(0 if result['success'] else 1)
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    history = OddsHistory()
+
+    try:
+        if command == 'status':
+            result = history.status()
+        elif command == 'compact':
+            result = history.compact(all_fixtures='--all' in sys.argv)
+        elif command == 'retention':
+            result = history.apply_retention()
+        elif command in ('latest', 'at', 'movement'):
+            fixture_id = _option('fixture')
+            if fixture_id is None and command != 'latest':
+                raise ValueError('Falta --fixture=<id>')
+            if command == 'latest':
+                df = history.latest([int(fixture_id)] if fixture_id else None)
+            elif command == 'at':
+                df = history.price_at(int(fixture_id), _option('time', datetime.now()))
+            else:
+                df = history.movement(int(fixture_id))
+            result = {'prices': _records(df)}
+        else:
+            result = {'error': 'Uso: odds_history.py <status|compact|retention|latest|at|movement>'}
+        print(json.dumps(result))
+    except Exception as e:
+        print(json.dumps({'error': str(e)}))
+
+
+if __name__ == "__main__":
+    main()
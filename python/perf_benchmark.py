@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Benchmark de rendimiento sin MySQL
+
+Mide los caminos calientes de los scripts sobre una liga sintética
+(synthetic_league.py) cargada en SQLite en memoria, a varias escalas:
+
+- prepare_features_for_match: features de benchmark_season.py, 6 queries
+  por partido (SAMPLE_MATCHES partidos del último cuarto del histórico)
+- calculate_team_stats: estadísticas de predict_match.py sobre el
+  DataFrame completo (SAMPLE_TEAMS equipos, como local y como visitante)
+- prepare_features: features de train_model_benchmark.py (modelo with_xg)
+- feature_engine: FeatureEngine construido y evaluado para todos los partidos
+- simulate_value_betting: simulación de betting_simulation.py
+- threshold_sweep: barrido de una rejilla pequeña de threshold_sweep.py
+
+Cada camino se ejecuta una vez de calentamiento (descartada: importaciones,
+cachés de pandas...) y después repeats veces (al menos MIN_REPEATS); se
+compara la mediana. Con una línea base guardada (--save-baseline) el script
+termina con código 1 si la mediana de algún camino supera threshold veces la
+de referencia y además la diferencia pasa de MIN_REGRESSION_SECONDS, así
+puede ir en un hook o en CI sin fallar por ruido en los caminos rápidos.
+
+Uso:
+    python3 perf_benchmark.py [tamaños] [--only=camino,...] [--repeats=3]
+                              [--threshold=1.5] [--baseline=ruta] [--save-baseline]
+
+    tamaños: lista separada por comas (por defecto 1000,10000,100000)
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import platform
+from contextlib import redirect_stdout
+from datetime import datetime
+
+# Agregar path para librerías
+plugin_libs = '/var/www/vhosts/virtualrolldice.com/httpdocs/wp-content/plugins/football-tipster/python-libs'
+if plugin_libs not in sys.path:
+    sys.path.insert(0, plugin_libs)
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import recording
+from synthetic_league import create_database
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_REPEATS = 3
+# Con menos repeticiones la mediana no filtra una ejecución lenta suelta
+MIN_REPEATS = 3
+DEFAULT_THRESHOLD = 1.5
+# Diferencias menores se consideran ruido aunque superen el umbral
+MIN_REGRESSION_SECONDS = 0.05
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'perf_baseline.json')
+
+TABLE_NAME = 'wp_ft_matches_advanced'
+SAMPLE_MATCHES = 50
+SAMPLE_TEAMS = 25
+SEED = 0
+
+# Rejilla del barrido: 12 configuraciones (unidades de ft_value_config:
+# min_value en porcentaje, a diferencia de BETTING_CRITERIA)
+SWEEP_GRID = {
+    'min_value': [5.0, 10.0],
+    'min_confidence': [0.40, 0.50],
+    'stake_system': ['fixed', 'variable', 'kelly'],
+}
+
+BETTING_CRITERIA = {
+    'min_value': 0.05,
+    'min_confidence': 0.40,
+    'min_odds': 1.6,
+    'max_odds': 6.0,
+    'base_unit': 10,
+}
+
+# Alias de las columnas de load_training_data() en train_model_benchmark.py
+TRAINING_COLUMNS = {
+    'ftr': 'result',
+    'hs': 'home_shots', 'as_shots': 'away_shots',
+    'hst': 'home_shots_target', 'ast': 'away_shots_target',
+    'hc': 'home_corners', 'ac': 'away_corners',
+    'hf': 'home_fouls', 'af': 'away_fouls',
+    'hy': 'home_yellows', 'ay': 'away_yellows',
+    'hhw': 'home_woodwork', 'ahw': 'away_woodwork',
+}
+
+
+# ---------------------------------------------------------------------- #
+# Caminos medidos: cada uno prepara sus datos y devuelve la función a medir
+# ---------------------------------------------------------------------- #
+
+def _sample_matches(df, size=SAMPLE_MATCHES):
+    """Partidos repartidos por el último cuarto del histórico (ya hay datos previos)"""
+    recent = df.iloc[len(df) * 3 // 4:]
+    positions = np.linspace(0, len(recent) - 1, min(size, len(recent))).astype(int)
+    return recent.iloc[positions]
+
+
+def path_prepare_features_for_match(connection, df):
+    from benchmark_season import prepare_features_for_match
+
+    sample = _sample_matches(df)
+    matches = list(zip(sample['home_team'], sample['away_team'], pd.to_datetime(sample['date']).dt.date))
+
+    def run():
+        cursor = connection.cursor()
+        for home_team, away_team, match_date in matches:
+            prepare_features_for_match(cursor, TABLE_NAME, home_team, away_team, match_date)
+        cursor.close()
+
+    return run, len(matches)
+
+
+def path_calculate_team_stats(connection, df):
+    from predict_match import calculate_team_stats
+
+    teams = pd.unique(df['home_team'])[:SAMPLE_TEAMS]
+
+    def run():
+        for team in teams:
+            calculate_team_stats(team, True, df)
+            calculate_team_stats(team, False, df)
+
+    return run, 2 * len(teams)
+
+
+def path_prepare_features(connection, df):
+    from train_model_benchmark import prepare_features
+
+    training = df.rename(columns=TRAINING_COLUMNS)
+    defaults = {'home_shots': 10, 'away_shots': 10, 'home_shots_target': 4, 'away_shots_target': 4,
+                'home_corners': 5, 'away_corners': 5, 'home_fouls': 12, 'away_fouls': 12,
+                'home_yellows': 2, 'away_yellows': 2, 'home_woodwork': 0, 'away_woodwork': 0,
+                'home_xg': 0, 'away_xg': 0}
+    training = training.fillna(defaults)
+
+    def run():
+        # El script imprime su progreso; aquí solo interesa el tiempo
+        with redirect_stdout(io.StringIO()):
+            prepare_features(training, 'with_xg')
+
+    return run, len(training)
+
+
+def path_feature_engine(connection, df):
+    from feature_engine import HISTORY_COLUMNS, FeatureEngine
+
+    history = df[HISTORY_COLUMNS]
+
+    def run():
+        engine = FeatureEngine(history)
+        engine.features(df['home_team'], df['away_team'], df['date'], with_xg=True)
+
+    return run, len(df)
+
+
+def _backtest(df):
+    """Probabilidades de un modelo con ruido, cuotas (A, D, H) y resultados"""
+    rng = np.random.RandomState(SEED)
+    odds = df[['b365a', 'b365d', 'b365h']].to_numpy(dtype=np.float64)
+    implied = 1.0 / odds
+    probabilities = implied * np.exp(rng.normal(0.0, 0.15, odds.shape))
+    probabilities = np.where(np.isnan(probabilities), 1 / 3, probabilities)
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+    results = df['ftr'].map({'A': 0, 'D': 1, 'H': 2}).to_numpy(dtype=np.int8)
+    days = pd.to_datetime(df['date']).values.astype('datetime64[D]').astype(np.int64)
+    return {'days': days, 'probabilities': probabilities, 'odds': odds, 'results': results}
+
+
+def path_simulate_value_betting(connection, df):
+    from betting_simulation import simulate_value_betting
+
+    backtest = _backtest(df)
+
+    def run():
+        simulate_value_betting(backtest['probabilities'], backtest['odds'], backtest['results'], BETTING_CRITERIA)
+
+    return run, len(df)
+
+
+def path_threshold_sweep(connection, df):
+    from threshold_sweep import sweep
+
+    backtest = _backtest(df)
+
+    def run():
+        sweep(backtest, SWEEP_GRID)
+
+    return run, len(df)
+
+
+PATHS = {
+    'prepare_features_for_match': path_prepare_features_for_match,
+    'calculate_team_stats': path_calculate_team_stats,
+    'prepare_features': path_prepare_features,
+    'feature_engine': path_feature_engine,
+    'simulate_value_betting': path_simulate_value_betting,
+    'threshold_sweep': path_threshold_sweep,
+}
+
+
+# ---------------------------------------------------------------------- #
+# Medición y comparación con la línea base
+# ---------------------------------------------------------------------- #
+
+def time_path(build, connection, df, repeats=DEFAULT_REPEATS):
+    """
+    Mediana (y mejor tiempo) de repeats ejecuciones tras una de
+    calentamiento, con las consultas SQL de cada una
+    """
+    repeats = max(repeats, MIN_REPEATS)
+    with recording('perf_benchmark') as instrumentation:
+        run, units = build(instrumentation.connection(connection), df)
+        run()
+        setup_queries = instrumentation.sql_queries
+
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+
+        queries = (instrumentation.sql_queries - setup_queries) // repeats
+
+    median = float(np.median(timings))
+    return {
+        'seconds': round(median, 6),
+        'best_seconds': round(min(timings), 6),
+        'units': units,
+        'per_unit_ms': round(median / units * 1000, 4) if units else None,
+        'sql_queries': queries,
+    }
+
+
+def run_suite(sizes, paths=None, repeats=DEFAULT_REPEATS):
+    """{tamaño: {camino: medición}} para cada tamaño de liga"""
+    paths = paths or list(PATHS)
+    results = {}
+    for n_matches in sizes:
+        connection, df = create_database(n_matches, seed=SEED)
+        try:
+            results[str(n_matches)] = {
+                name: time_path(PATHS[name], connection, df, repeats) for name in paths
+            }
+        finally:
+            connection.close()
+    return results
+
+
+def load_baseline(path=BASELINE_PATH):
+    """Línea base guardada o None (también si es de mejores tiempos, no de medianas)"""
+    try:
+        with open(path, 'r') as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return baseline if baseline.get('statistic') == 'median' else None
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    """Guarda (fusionando con la existente) la línea base de medianas"""
+    baseline = load_baseline(path) or {}
+    sizes = baseline.get('sizes', {})
+    for size, paths in results.items():
+        sizes.setdefault(size, {}).update({name: entry['seconds'] for name, entry in paths.items()})
+
+    baseline = {
+        'created_at': datetime.now().isoformat(),
+        'statistic': 'median',
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'sizes': sizes,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump(baseline, f, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def find_regressions(results, baseline, threshold=DEFAULT_THRESHOLD, min_seconds=MIN_REGRESSION_SECONDS):
+    """Caminos cuya mediana supera threshold veces la de referencia y min_seconds más"""
+    regressions = []
+    reference_sizes = (baseline or {}).get('sizes', {})
+    for size, paths in results.items():
+        for name, entry in paths.items():
+            reference = reference_sizes.get(size, {}).get(name)
+            if not reference:
+                continue
+            ratio = entry['seconds'] / reference
+            entry['baseline_seconds'] = reference
+            entry['ratio'] = round(ratio, 3)
+            if ratio > threshold and entry['seconds'] - reference > min_seconds:
+                regressions.append({
+                    'size': int(size),
+                    'path': name,
+                    'seconds': entry['seconds'],
+                    'baseline_seconds': reference,
+                    'ratio': round(ratio, 3),
+                })
+    return regressions
+
+
+def _option(name, default=None):
+    prefix = f"--{name}="
+    for arg in sys.argv[1:]:
+        if arg.startswith(prefix):
+            return arg[len(prefix):]
+    return default
+
+
+def main():
+    try:
+        args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+        sizes = [int(size) for size in args[0].split(',')] if args else DEFAULT_SIZES
+        only = _option('only')
+        paths = only.split(',') if only else list(PATHS)
+        unknown = set(paths) - set(PATHS)
+        if unknown:
+            raise ValueError(f"Caminos desconocidos: {', '.join(sorted(unknown))}")
+        repeats = max(int(_option('repeats', DEFAULT_REPEATS)), MIN_REPEATS)
+        threshold = float(_option('threshold', DEFAULT_THRESHOLD))
+        baseline_path = _option('baseline', BASELINE_PATH)
+
+        started = time.perf_counter()
+        results = run_suite(sizes, paths, repeats)
+
+        baseline = load_baseline(baseline_path)
+        regressions = find_regressions(results, baseline, threshold)
+
+        output = {
+            'success': not regressions,
+            'sizes': sizes,
+            'repeats': repeats,
+            'threshold': threshold,
+            'baseline': os.path.abspath(baseline_path) if baseline else None,
+            'results': results,
+            'regressions': regressions,
+            'total_seconds': round(time.perf_counter() - started, 2),
+        }
+        if '--save-baseline' in sys.argv:
+            output['baseline_saved'] = os.path.abspath(save_baseline(results, baseline_path))
+
+        print(json.dumps(output, indent=2))
+        sys.exit(1 if regressions else 0)
+    except Exception as e:
+        print(json.dumps({'error': str(e)}))
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,595 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Sincronización incremental de cuotas de Pinnacle
+
+FT_Pinnacle_API::sync_odds pide todas las cuotas en cada ejecución y hace
+dos consultas (SELECT + UPDATE/INSERT) por precio. Este script:
+
+1. Guarda el cursor 'last' de /v1/odds entre ejecuciones
+   (cache/pinnacle_odds_state.json, uno por selección de ligas) y lo manda
+   como 'since', así la API solo devuelve los eventos que cambiaron. Si
+   alguna línea no tiene fixture todavía, el cursor no avanza: la siguiente
+   ejecución vuelve a pedir esos eventos en lugar de perderlos
+2. Convierte los eventos en líneas con las mismas reglas que
+   save_moneyline_odds, save_spread_odds y save_totals_odds (mismas claves,
+   line_value e implied_probability)
+3. Carga con UNA consulta los fixtures y con otra los precios guardados de
+   esos fixtures, compara y descarta las líneas que no cambiaron
+4. Inserta las líneas nuevas con INSERTs de varias filas y actualiza las
+   cambiadas con una tabla temporal y un UPDATE ... JOIN por id
+5. Añade los precios nuevos y cambiados al histórico (odds_history.py)
+
+Usuario, contraseña y ligas se leen de las opciones del plugin
+(ft_pinnacle_username, ft_pinnacle_password, ft_pinnacle_leagues).
+
+Con --serve hace de API de Pinnacle local sobre un fichero JSON con la
+respuesta completa de /v1/odds; cada vez que el fichero cambia, los eventos
+modificados reciben una versión nueva y solo esos se devuelven a quien
+pregunte con since:
+
+    python3 pinnacle_odds_sync.py --serve=/tmp/odds.json --port=8767
+    python3 pinnacle_odds_sync.py --base-url=http://127.0.0.1:8767/v1/
+
+--self-test levanta esa API en un puerto libre sobre un fichero temporal y
+comprueba que una petición con since sin cambios vuelve vacía (sin tocar la
+base de datos) y que tras editar el fichero solo vuelve el evento cambiado.
+
+Uso:
+    python3 pinnacle_odds_sync.py [--leagues=1980,2196] [--full] [--dry-run]
+                                  [--base-url=https://api.pinnacle.com/v1/]
+    python3 pinnacle_odds_sync.py --serve=<fichero.json> [--port=8767]
+    python3 pinnacle_odds_sync.py --self-test
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+from urllib.request import Request, urlopen
+
+# Agregar path para librerías
+plugin_libs = '/var/www/vhosts/virtualrolldice.com/httpdocs/wp-content/plugins/football-tipster/python-libs'
+if plugin_libs not in sys.path:
+    sys.path.insert(0, plugin_libs)
+
+import pandas as pd
+
+from odds_history import HISTORY_DIR, OddsHistory
+
+PYTHON_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BASE_URL = os.environ.get('FT_PINNACLE_BASE_URL', 'https://api.pinnacle.com/v1/')
+STATE_PATH = os.path.join(PYTHON_DIR, '..', 'cache', 'pinnacle_odds_state.json')
+
+SPORT_ID = 29  # Soccer/Football
+TIMEOUT = 30
+BATCH_SIZE = 1000
+DEFAULT_TOTAL_LINE = 2.5
+
+OPTION_NAMES = ('ft_pinnacle_username', 'ft_pinnacle_password', 'ft_pinnacle_leagues')
+
+# Columnas de ft_odds que escriben los save_*_odds()
+ODDS_COLUMNS = ['fixture_id', 'pinnacle_fixture_id', 'market_type', 'bet_type',
+                'odds', 'decimal_odds', 'implied_probability', 'line_value']
+# Clave de cada precio: el PHP busca por (fixture_id, market_type, bet_type)
+# y en totals también por line_value
+KEY_COLUMNS = ['fixture_id', 'market_type', 'bet_type', 'line_key']
+
+
+# ---------------------------------------------------------------------- #
+# Configuración y cursor
+# ---------------------------------------------------------------------- #
+
+def load_options(connection, table_prefix):
+    cursor = connection.cursor()
+    cursor.execute(
+        f"SELECT option_name, option_value FROM {table_prefix}options "
+        f"WHERE option_name IN ({', '.join(['%s'] * len(OPTION_NAMES))})",
+        OPTION_NAMES
+    )
+    options = dict(cursor.fetchall())
+    cursor.close()
+    return options
+
+
+def parse_league_ids(value):
+    """ft_pinnacle_leagues: JSON con los IDs o lista separada por comas"""
+    if not value:
+        return []
+    try:
+        ids = json.loads(value)
+    except ValueError:
+        ids = value.replace('\n', ',').split(',')
+    if not isinstance(ids, list):
+        ids = [ids]
+    return sorted({int(league_id) for league_id in ids if str(league_id).strip()})
+
+
+def state_key(league_ids):
+    return ','.join(str(league_id) for league_id in league_ids) or 'all'
+
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# ---------------------------------------------------------------------- #
+# API
+# ---------------------------------------------------------------------- #
+
+def get_odds(username, password, league_ids=None, since=None, base_url=BASE_URL):
+    """Respuesta de /v1/odds (como get_odds() del PHP, pero con 'last')"""
+    params = {'sportId': SPORT_ID, 'oddsFormat': 'decimal'}
+    if league_ids:
+        params['leagueIds'] = ','.join(str(league_id) for league_id in league_ids)
+    if since:
+        params['since'] = since
+
+    token = base64.b64encode(f"{username}:{password}".encode('utf-8')).decode('ascii')
+    request = Request(f"{base_url}odds?{urlencode(params)}", headers={
+        'Authorization': f'Basic {token}',
+        'Accept': 'application/json',
+    })
+    with urlopen(request, timeout=TIMEOUT) as response:
+        body = response.read()
+    # Sin cambios desde 'since' la API responde sin cuerpo
+    return json.loads(body) if body.strip() else {}
+
+
+def odds_events(data):
+    """Eventos de la respuesta: data['odds'] (lo que lee el PHP) o leagues[].events[]"""
+    if 'odds' in data:
+        return data['odds'] or []
+    return [event for league in data.get('leagues', []) for event in league.get('events', [])]
+
+
+def _full_match_period(event):
+    periods = event.get('periods') or []
+    for period in periods:
+        if period.get('number') == 0:
+            return period
+    return periods[0] if periods else None
+
+
+def _implied(odds):
+    return round(1 / odds, 4)
+
+
+def event_lines(event):
+    """
+    Precios de un evento como los guardan save_moneyline_odds,
+    save_spread_odds y save_totals_odds: (market_type, bet_type, odds, line)
+    """
+    period = _full_match_period(event)
+    if not period:
+        return []
+    lines = []
+
+    moneyline = period.get('moneyline')
+    if moneyline:
+        for bet_type in ('home', 'draw', 'away'):
+            if moneyline.get(bet_type) is not None:
+                lines.append(('moneyline', bet_type, moneyline[bet_type], None))
+
+    # La API manda listas (spreads/totals); el PHP espera un objeto. Del
+    # spread solo se guarda una línea por lado, la principal.
+    spread = period.get('spread') or (period.get('spreads') or [None])[0]
+    if spread and spread.get('home') is not None and spread.get('away') is not None:
+        hdp = spread.get('hdp') or 0
+        lines.append(('spread', 'home', spread['home'], hdp))
+        lines.append(('spread', 'away', spread['away'], -hdp))
+
+    totals = period.get('totals') or []
+    for total in totals if isinstance(totals, list) else [totals]:
+        if total.get('over') is not None and total.get('under') is not None:
+            points = total.get('points', DEFAULT_TOTAL_LINE)
+            lines.append(('total', 'over', total['over'], points))
+            lines.append(('total', 'under', total['under'], points))
+    return lines
+
+
+def events_frame(events):
+    """DataFrame de líneas (pinnacle_fixture_id, market_type, bet_type, odds, line_value)"""
+    rows = [(str(event['id']),) + line for event in events for line in event_lines(event)]
+    df = pd.DataFrame(rows, columns=['pinnacle_fixture_id', 'market_type', 'bet_type', 'odds', 'line_value'])
+    df['odds'] = df['odds'].astype(float).round(3)
+    df['line_value'] = df['line_value'].astype(float).round(2)
+    return df[df['odds'] > 0]
+
+
+# ---------------------------------------------------------------------- #
+# Comparación y escritura por conjuntos
+# ---------------------------------------------------------------------- #
+
+def _line_key(df):
+    """Solo los totals distinguen por línea; el resto usa un valor fijo"""
+    return df['line_value'].where(df['market_type'] == 'total').fillna(-999.0).round(2)
+
+
+def _in_chunks(cursor, query, values, chunk_size=BATCH_SIZE):
+    rows = []
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        cursor.execute(query.format(placeholders=', '.join(['%s'] * len(chunk))), chunk)
+        rows.extend(cursor.fetchall())
+    return rows
+
+
+def diff_lines(connection, fixtures_table, odds_table, lines):
+    """
+    (nuevas, cambiadas, sin_cambios, sin_fixture): líneas a insertar, líneas
+    con el id de ft_odds a actualizar, número de líneas iguales a las
+    guardadas y número de líneas cuyo fixture no está en la BD
+    """
+    cursor = connection.cursor()
+    try:
+        pinnacle_ids = sorted(lines['pinnacle_fixture_id'].unique())
+        fixtures = _in_chunks(cursor, f"SELECT pinnacle_id, id FROM {fixtures_table} "
+                                      f"WHERE pinnacle_id IN ({{placeholders}})", pinnacle_ids)
+        fixture_ids = {str(pinnacle_id): int(fixture_id) for pinnacle_id, fixture_id in fixtures}
+
+        lines = lines.assign(fixture_id=lines['pinnacle_fixture_id'].map(fixture_ids))
+        missing_fixture = int(lines['fixture_id'].isna().sum())
+        lines = lines.dropna(subset=['fixture_id'])
+        lines = lines.assign(fixture_id=lines['fixture_id'].astype(int))
+        lines = lines.assign(line_key=_line_key(lines)).drop_duplicates(KEY_COLUMNS, keep='last')
+
+        stored = _in_chunks(cursor, f"SELECT id, fixture_id, market_type, bet_type, decimal_odds, line_value "
+                                    f"FROM {odds_table} WHERE fixture_id IN ({{placeholders}})",
+                            sorted(set(fixture_ids.values())))
+    finally:
+        cursor.close()
+
+    stored = pd.DataFrame(stored, columns=['id', 'fixture_id', 'market_type', 'bet_type',
+                                           'stored_odds', 'stored_line'])
+    stored['stored_odds'] = stored['stored_odds'].astype(float).round(3)
+    stored['stored_line'] = stored['stored_line'].astype(float).round(2)
+    stored['line_value'] = stored['stored_line']
+    stored['line_key'] = _line_key(stored)
+    # Con filas repetidas el PHP actualiza la primera que devuelve get_var()
+    stored = stored.sort_values('id').drop_duplicates(KEY_COLUMNS, keep='first').drop(columns='line_value')
+
+    merged = lines.merge(stored, on=KEY_COLUMNS, how='left')
+    new = merged[merged['id'].isna()]
+    existing = merged[merged['id'].notna()]
+    same_line = (existing['stored_line'] == existing['line_value']) | \
+                (existing['stored_line'].isna() & existing['line_value'].isna())
+    changed = existing[(existing['stored_odds'] != existing['odds']) | ~same_line]
+    unchanged = len(existing) - len(changed)
+    return new, changed.assign(id=changed['id'].astype(int)), unchanged, missing_fixture
+
+
+def _none(value):
+    return None if pd.isna(value) else value
+
+
+def apply_lines(connection, odds_table, new, changed, batch_size=BATCH_SIZE):
+    """INSERT de las líneas nuevas y UPDATE ... JOIN de las cambiadas en una transacción"""
+    staging = f"{odds_table}_sync_staging"
+    cursor = connection.cursor()
+    try:
+        if len(new):
+            rows = [
+                (int(row.fixture_id), row.pinnacle_fixture_id, row.market_type, row.bet_type,
+                 float(row.odds), float(row.odds), _implied(row.odds), _none(row.line_value))
+                for row in new.itertuples(index=False)
+            ]
+            query = f"INSERT INTO {odds_table} ({', '.join(ODDS_COLUMNS)}) " \
+                    f"VALUES ({', '.join(['%s'] * len(ODDS_COLUMNS))})"
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(query, rows[start:start + batch_size])
+
+        if len(changed):
+            cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
+            cursor.execute(f"""
+                CREATE TEMPORARY TABLE {staging} (
+                    id int(11) NOT NULL PRIMARY KEY,
+                    odds decimal(10,3) NOT NULL,
+                    implied_probability decimal(5,4) NOT NULL,
+                    line_value decimal(5,2) DEFAULT NULL
+                )
+            """)
+            rows = [(int(row.id), float(row.odds), _implied(row.odds), _none(row.line_value))
+                    for row in changed.itertuples(index=False)]
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(
+                    f"INSERT INTO {staging} (id, odds, implied_probability, line_value) VALUES (%s, %s, %s, %s)",
+                    rows[start:start + batch_size]
+                )
+            cursor.execute(f"""
+                UPDATE {odds_table} o
+                JOIN {staging} s ON o.id = s.id
+                SET o.odds = s.odds, o.decimal_odds = s.odds,
+                    o.implied_probability = s.implied_probability, o.line_value = s.line_value
+            """)
+            cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
+
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def sync_odds(connection, table_prefix, username, password, league_ids, full=False, dry_run=False,
+              base_url=BASE_URL, state_path=STATE_PATH, history_dir=HISTORY_DIR):
+    """
+    Pide los cambios desde el último cursor, los aplica y guarda el cursor
+    nuevo. Si hay líneas sin fixture se mantiene el cursor anterior para
+    volver a pedirlas (las ya aplicadas vuelven como sin cambios). Devuelve
+    el resumen.
+    """
+    from instrumentation import stage
+
+    state = load_state(state_path)
+    key = state_key(league_ids)
+    since = None if full else state.get(key, {}).get('last')
+
+    with stage('fetch'):
+        data = get_odds(username, password, league_ids, since, base_url)
+        events = odds_events(data)
+
+    with stage('diff'):
+        lines = events_frame(events)
+        new = changed = lines.iloc[:0]
+        unchanged = missing_fixture = 0
+        if len(lines):
+            new, changed, unchanged, missing_fixture = diff_lines(
+                connection, f"{table_prefix}ft_fixtures", f"{table_prefix}ft_odds", lines
+            )
+
+    history_saved = 0
+    if not dry_run:
+        if len(new) or len(changed):
+            with stage('write'):
+                apply_lines(connection, f"{table_prefix}ft_odds", new, changed)
+            # ft_odds solo guarda el precio actual; los cambios van al histórico
+            with stage('history'):
+                history_saved = OddsHistory(history_dir).append(pd.concat([new, changed], sort=False))
+        if data.get('last') and not missing_fixture:
+            state[key] = {'last': data['last'], 'updated_at': datetime.now().isoformat()}
+            save_state(state, state_path)
+
+    return {
+        'success': True,
+        'since': since,
+        'last': data.get('last', since),
+        'cursor_held': bool(missing_fixture),
+        'events': len(events),
+        'lines': len(lines),
+        'inserted': len(new),
+        'updated': len(changed),
+        'unchanged': unchanged,
+        'missing_fixture': missing_fixture,
+        'history_saved': history_saved,
+        'dry_run': dry_run,
+    }
+
+
+# ---------------------------------------------------------------------- #
+# API local (sustituto de Pinnacle para pruebas)
+# ---------------------------------------------------------------------- #
+
+class StandInOddsAPI:
+    """
+    Versiona los eventos de un fichero JSON con la forma de /v1/odds
+    (leagues[].events[]): cada evento que cambia entre dos lecturas recibe
+    la versión siguiente
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.version = 0
+        self.events = {}
+        self.lock = threading.Lock()
+
+    def _reload(self):
+        mtime = os.path.getmtime(self.path)
+        if mtime == self.mtime:
+            return
+        self.mtime = mtime
+        with open(self.path, 'r') as f:
+            data = json.load(f)
+        self.version += 1
+        for league in data.get('leagues', []):
+            for event in league.get('events', []):
+                known = self.events.get(event['id'])
+                if known is None or known[2] != event:
+                    self.events[event['id']] = (self.version, league['id'], event)
+
+    def odds(self, since=None, league_ids=None):
+        with self.lock:
+            self._reload()
+            leagues = {}
+            for version, league_id, event in self.events.values():
+                if since is not None and version <= since:
+                    continue
+                if league_ids and league_id not in league_ids:
+                    continue
+                leagues.setdefault(league_id, []).append(event)
+            if since is not None and not leagues:
+                return None
+            return {
+                'sportId': SPORT_ID,
+                'last': self.version,
+                'leagues': [{'id': league_id, 'events': events} for league_id, events in leagues.items()],
+            }
+
+
+def make_server(path, port):
+    api = StandInOddsAPI(path)
+
+    class OddsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if not url.path.rstrip('/').endswith('/odds'):
+                self.send_error(404)
+                return
+            query = {name: values[0] for name, values in parse_qs(url.query).items()}
+            since = int(query['since']) if query.get('since') else None
+            league_ids = parse_league_ids(query.get('leagueIds'))
+            data = api.odds(since, set(league_ids))
+            body = json.dumps(data).encode('utf-8') if data else b''
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer(('127.0.0.1', port), OddsHandler)
+
+
+def serve(path, port):
+    server = make_server(path, port)
+    print(json.dumps({'serving': os.path.abspath(path), 'url': f'http://127.0.0.1:{server.server_port}/v1/'}))
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# ---------------------------------------------------------------------- #
+# Prueba contra la API local
+# ---------------------------------------------------------------------- #
+
+def _self_test_event(event_id, home, draw, away):
+    return {'id': event_id, 'periods': [{'number': 0, 'moneyline': {'home': home, 'draw': draw, 'away': away}}]}
+
+
+def self_test():
+    """
+    Pide /v1/odds a make_server() como lo haría sync_odds(): completo, con
+    since sin cambios (respuesta vacía, sync_odds sin conexión no falla) y
+    con since después de cambiar un precio (solo ese evento)
+    """
+    workdir = tempfile.mkdtemp(prefix='pinnacle_test_')
+    odds_path = os.path.join(workdir, 'odds.json')
+    state_path = os.path.join(workdir, 'state.json')
+
+    def write_odds(events, mtime):
+        with open(odds_path, 'w') as f:
+            json.dump({'sportId': SPORT_ID, 'leagues': [{'id': 1980, 'events': events}]}, f)
+        os.utime(odds_path, (mtime, mtime))
+
+    events = [_self_test_event(1001, 1.8, 3.6, 4.5), _self_test_event(1002, 2.5, 3.2, 2.9)]
+    write_odds(events, time.time())
+    server = make_server(odds_path, 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f'http://127.0.0.1:{server.server_port}/v1/'
+    checks = []
+
+    def check(name, ok, **details):
+        checks.append(dict({'name': name, 'ok': bool(ok)}, **details))
+
+    try:
+        data = get_odds('user', 'password', [1980], None, base_url)
+        ids = sorted(event['id'] for event in odds_events(data))
+        check('full_request', ids == [1001, 1002] and data.get('last') == 1, events=ids, last=data.get('last'))
+
+        data = get_odds('user', 'password', [1980], 1, base_url)
+        check('since_without_changes_is_empty', data == {}, response=data)
+
+        save_state({state_key([1980]): {'last': 1}}, state_path)
+        result = sync_odds(None, 'wp_', 'user', 'password', [1980], base_url=base_url,
+                           state_path=state_path, history_dir=os.path.join(workdir, 'history'))
+        check('sync_without_changes', result['events'] == 0 and result['last'] == 1
+              and load_state(state_path)[state_key([1980])]['last'] == 1,
+              events=result['events'], last=result['last'])
+
+        events[1] = _self_test_event(1002, 2.4, 3.2, 3.0)
+        write_odds(events, time.time() + 60)
+        data = get_odds('user', 'password', [1980], 1, base_url)
+        lines = events_frame(odds_events(data))
+        ids = [event['id'] for event in odds_events(data)]
+        check('since_returns_changed_event', ids == [1002] and data.get('last') == 2
+              and lines['odds'].tolist() == [2.4, 3.2, 3.0],
+              events=ids, last=data.get('last'), odds=lines['odds'].tolist())
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {'success': all(item['ok'] for item in checks), 'checks': checks}
+
+
+def _option(name, default=None):
+    prefix = f"--{name}="
+    for arg in sys.argv[1:]:
+        if arg.startswith(prefix):
+            return arg[len(prefix):]
+    return default
+
+
+def main():
+    path = _option('serve')
+    if path:
+        serve(path, int(_option('port', 8767)))
+        return
+    if '--self-test' in sys.argv:
+        result = self_test()
+        print(json.dumps(result))
+        sys.exit(0 if result['success'] else 1)
+
+    connection = None
+    started = time.perf_counter()
+    try:
+        from instrumentation import instrument_connection, report, start_profiling
+        start_profiling()
+        from match_loader import get_db_connection, load_db_config
+
+        config = load_db_config(os.path.join(PYTHON_DIR, 'db_config.json'))
+        table_prefix = config.get('table_prefix', 'wp_')
+        connection = instrument_connection(get_db_connection(config))
+
+        options = load_options(connection, table_prefix)
+        leagues = _option('leagues')
+        league_ids = parse_league_ids(leagues if leagues is not None else options.get('ft_pinnacle_leagues'))
+
+        result = sync_odds(connection, table_prefix,
+                           options.get('ft_pinnacle_username', ''), options.get('ft_pinnacle_password', ''),
+                           league_ids,
+                           full='--full' in sys.argv,
+                           dry_run='--dry-run' in sys.argv,
+                           base_url=_option('base-url', BASE_URL))
+        result['seconds'] = round(time.perf_counter() - started, 3)
+        result['timings'] = report()
+        print(json.dumps(result))
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': f'Error sincronizando cuotas: {str(e)}'}))
+        sys.exit(1)
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,11 +9,14 @@ import numpy as np
 import mysql.connector
 from datetime import datetime, timedelta
 
+from instrumentation import instrument_connection, report, stage, start_profiling
+from model_registry import MODEL_FILE, ModelRegistry
+
 def get_team_recent_stats(team_name, db_config):
     """
     Obtiene estadísticas recientes de un equipo
     """
-    connection = mysql.connector.connect(**db_config)
+    connection = instrument_connection(mysql.connector.connect(**db_config))
     cursor = connection.cursor(dictionary=True)
     
     # Query para obtener estadísticas de los últimos 5 partidos
@@ -42,7 +45,7 @@ def get_h2h_stats(home_team, away_team, db_config):
     """
     Obtiene estadísticas de enfrentamientos directos
     """
-    connection = mysql.connector.connect(**db_config)
+    connection = instrument_connection(mysql.connector.connect(**db_config))
     cursor = connection.cursor(dictionary=True)
     
     query = """
@@ -66,20 +69,30 @@ def predict_match(home_team, away_team, db_config):
     """
     Predice el resultado de un partido
     """
-    # Cargar modelo y escalador
-    model = joblib.load('../models/football_rf_advanced.pkl')
-    scaler = joblib.load('../models/scaler.pkl')
-    
-    # Cargar metadatos para saber qué características usar
-    with open('../models/model_metadata.json', 'r') as f:
-        metadata = json.load(f)
+    # Modelo, escalador y metadatos de la MISMA versión del registro
+    # (los ficheros sueltos solo si todavía no hay ninguna publicada)
+    with stage('load'):
+        registry = ModelRegistry('football_rf_advanced')
+        version = registry.current_version()
+        if version:
+            model = registry.load_artifact(MODEL_FILE, version)
+            scaler = registry.load_artifact('scaler.pkl', version)
+            metadata = registry.load_metadata(version)
+        else:
+            model = joblib.load('../models/football_rf_advanced.pkl')
+            scaler = joblib.load('../models/scaler.pkl')
+        
+            # Cargar metadatos para saber qué características usar
+            with open('../models/model_metadata.json', 'r') as f:
+                metadata = json.load(f)
     
     feature_names = metadata['features']
     
     # Obtener estadísticas de los equipos
-    home_stats = get_team_recent_stats(home_team, db_config)
-    away_stats = get_team_recent_stats(away_team, db_config)
-    h2h_stats = get_h2h_stats(home_team, away_team, db_config)
+    with stage('features'):
+        home_stats = get_team_recent_stats(home_team, db_config)
+        away_stats = get_team_recent_stats(away_team, db_config)
+        h2h_stats = get_h2h_stats(home_team, away_team, db_config)
     
     # Crear vector de características
     features = {}
@@ -122,12 +135,13 @@ def predict_match(home_team, away_team, db_config):
             feature_vector.append(0)  # Valor por defecto
     
     # Convertir a numpy array y escalar
-    X = np.array(feature_vector).reshape(1, -1)
-    X_scaled = scaler.transform(X)
+    with stage('predict'):
+        X = np.array(feature_vector).reshape(1, -1)
+        X_scaled = scaler.transform(X)
     
-    # Hacer predicción
-    prediction = model.predict(X_scaled)[0]
-    probabilities = model.predict_proba(X_scaled)[0]
+        # Hacer predicción
+        prediction = model.predict(X_scaled)[0]
+        probabilities = model.predict_proba(X_scaled)[0]
     
     # Obtener clases
     classes = model.classes_
@@ -180,6 +194,7 @@ def analyze_prediction(model, X, feature_names, feature_values):
 
 # Punto de entrada
 if __name__ == "__main__":
+    start_profiling()
     if len(sys.argv) < 3:
         print(json.dumps({'error': 'Faltan parámetros'}))
         sys.exit(1)
@@ -197,6 +212,7 @@ if __name__ == "__main__":
     
     try:
         result = predict_match(home_team, away_team, db_config)
+        result['timings'] = report()
         print(json.dumps(result))
     except Exception as e:
         print(json.dumps({'error': str(e)}))
\ No newline at end of file
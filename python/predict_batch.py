@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Predicción por lotes de los fixtures próximos
+
+Sustituye las N llamadas a predict_match() que hacía
+FT_Value_Analyzer::analyze_all_fixtures (un proceso, una conexión y una
+carga del modelo por fixture) por una sola ejecución:
+
+1. Una query para los fixtures próximos sin predicción reciente
+2. Una query (o la caché local) con el histórico de todos sus equipos
+3. Features de todos los partidos y UNA llamada a predict_proba
+4. Un INSERT multi-fila en ft_predictions
+
+Uso:
+    python3 predict_batch.py [limite] [dias]
+"""
+
+import sys
+import json
+import numpy as np
+import pandas as pd
+import warnings
+warnings.filterwarnings('ignore')
+
+# Agregar path para librerías personalizadas
+plugin_libs = '/var/www/vhosts/virtualrolldice.com/httpdocs/wp-content/plugins/football-tipster/python-libs'
+if plugin_libs not in sys.path:
+    sys.path.insert(0, plugin_libs)
+
+import predict_match
+from instrumentation import instrument_connection, report, stage, start_profiling
+from match_cache import cache_enabled
+
+# Misma ventana que get_or_create_prediction(): no se repite una predicción
+# hecha en las últimas 24 horas
+RECENT_PREDICTION_HOURS = 24
+HISTORY_LIMIT = 100
+
+
+def load_upcoming_fixtures(connection, table_prefix='wp_', limit=50, days=7):
+    """
+    Fixtures próximos con cuotas (mismo criterio que analyze_all_fixtures)
+    que aún no tienen una predicción reciente
+    """
+    query = f"""
+        SELECT DISTINCT f.id AS fixture_id, f.home_team, f.away_team, f.start_time, f.league
+        FROM {table_prefix}ft_fixtures f
+        INNER JOIN {table_prefix}ft_odds o ON f.id = o.fixture_id
+        WHERE f.start_time > NOW()
+        AND f.start_time < DATE_ADD(NOW(), INTERVAL %s DAY)
+        AND f.status = 'upcoming'
+        AND NOT EXISTS (
+            SELECT 1 FROM {table_prefix}ft_predictions p
+            WHERE p.home_team = f.home_team AND p.away_team = f.away_team
+            AND p.predicted_at >= DATE_SUB(NOW(), INTERVAL {RECENT_PREDICTION_HOURS} HOUR)
+        )
+        ORDER BY f.start_time ASC
+        LIMIT %s
+    """
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(query, (int(days), int(limit)))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def load_teams_history(connection, teams, table_prefix='wp_'):
+    """
+    Histórico con goles de todos los equipos implicados, más reciente
+    primero, en una sola lectura
+    """
+    teams = sorted(set(teams))
+    if not teams:
+        return pd.DataFrame()
+
+    table_name = f"{table_prefix}ft_matches_advanced"
+    if cache_enabled(table_name):
+        return predict_match.load_recent_matches_cached(connection, teams, limit=None, table_name=table_name)
+
+    placeholders = ', '.join(['%s'] * len(teams))
+    query = f"""
+        SELECT * FROM {table_name}
+        WHERE (home_team IN ({placeholders}) OR away_team IN ({placeholders}))
+        AND fthg IS NOT NULL AND ftag IS NOT NULL
+        ORDER BY date DESC
+    """
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(query, tuple(teams) * 2)
+        return pd.DataFrame(cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def build_batch_features(fixtures, history_df):
+    """
+    Features de cada fixture con la misma ventana que build_match_features():
+    los últimos 100 partidos de cualquiera de los dos equipos
+
+    Devuelve (lista de features o None, lista de errores o None)
+    """
+    features = []
+    errors = []
+    empty = pd.DataFrame()
+
+    for fixture in fixtures:
+        home_team = fixture['home_team']
+        away_team = fixture['away_team']
+
+        if history_df.empty:
+            matches_df = empty
+        else:
+            pair = [home_team, away_team]
+            mask = history_df['home_team'].isin(pair) | history_df['away_team'].isin(pair)
+            matches_df = history_df[mask].head(HISTORY_LIMIT)
+
+        row, error = predict_match.features_from_history(home_team, away_team, matches_df)
+        features.append(row)
+        errors.append(error)
+
+    return features, errors
+
+
+def predict_fixtures(fixtures, connection, model=None, table_prefix='wp_'):
+    """
+    Predice todos los fixtures con una sola llamada a predict_proba
+
+    Devuelve una lista con el diccionario de predict_match() (o de error)
+    para cada fixture, en el mismo orden
+    """
+    results = [None] * len(fixtures)
+    valid = []
+    for i, fixture in enumerate(fixtures):
+        if not fixture.get('home_team') or not fixture.get('away_team'):
+            results[i] = {'error': 'Faltan home_team / away_team'}
+        else:
+            valid.append(i)
+
+    if not valid:
+        return results
+
+    with stage('load'):
+        if model is None:
+            model, _ = predict_match.load_model()
+        teams = [fixtures[i][key] for i in valid for key in ('home_team', 'away_team')]
+        history_df = load_teams_history(connection, teams, table_prefix)
+    n_features_expected = model.n_features_in_
+
+    with stage('features'):
+        features, errors = build_batch_features([fixtures[i] for i in valid], history_df)
+
+    rows = []
+    positions = []
+    for i, row, error in zip(valid, features, errors):
+        if error:
+            results[i] = error
+            continue
+        rows.append(predict_match.fit_feature_count(row, n_features_expected))
+        positions.append(i)
+
+    if rows:
+        X = np.array(rows, dtype=np.float64)
+        with stage('predict'):
+            probabilities = model.predict_proba(X)
+        predictions = model.classes_[np.argmax(probabilities, axis=1)]
+        for row, i in enumerate(positions):
+            results[i] = predict_match.format_prediction(
+                predictions[row], probabilities[row],
+                fixtures[i]['home_team'], fixtures[i]['away_team'],
+                X.shape[1], n_features_expected
+            )
+
+    return results
+
+
+def save_predictions(connection, fixtures, results, table_prefix='wp_'):
+    """Inserta todas las predicciones válidas en ft_predictions de una vez"""
+    rows = []
+    for fixture, result in zip(fixtures, results):
+        if not result or 'error' in result:
+            continue
+        metadata = dict(result, fixture_id=fixture.get('fixture_id'), source='predict_batch')
+        rows.append((
+            fixture['start_time'],
+            fixture['home_team'],
+            fixture['away_team'],
+            result['prediction'],
+            result['probability'],
+            'football',
+            json.dumps(metadata, default=str)
+        ))
+
+    if not rows:
+        return 0
+
+    cursor = connection.cursor()
+    try:
+        cursor.executemany(f"""
+            INSERT INTO {table_prefix}ft_predictions
+            (match_date, home_team, away_team, prediction, probability, sport, metadata)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, rows)
+        connection.commit()
+    finally:
+        cursor.close()
+
+    return len(rows)
+
+
+def run_batch(connection, table_prefix='wp_', limit=50, days=7, model=None):
+    """Fixtures próximos -> predicciones -> ft_predictions"""
+    with stage('load'):
+        fixtures = load_upcoming_fixtures(connection, table_prefix, limit, days)
+    results = predict_fixtures(fixtures, connection, model, table_prefix)
+    with stage('save'):
+        saved = save_predictions(connection, fixtures, results, table_prefix)
+
+    errors = [
+        {'fixture_id': fixture['fixture_id'], 'error': result['error']}
+        for fixture, result in zip(fixtures, results)
+        if result and 'error' in result
+    ]
+
+    return {
+        'success': True,
+        'fixtures': len(fixtures),
+        'predictions_saved': saved,
+        'errors': errors
+    }
+
+
+def main():
+    start_profiling()
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+
+    try:
+        with open(predict_match.DB_CONFIG_PATH, 'r') as f:
+            db_config = json.load(f)
+    except Exception:
+        print(json.dumps({'error': 'No se pudo cargar la configuración de la base de datos'}))
+        sys.exit(1)
+
+    connection = instrument_connection(predict_match.get_db_connection(db_config))
+    if not connection:
+        print(json.dumps({'error': 'No se pudo conectar a la base de datos'}))
+        sys.exit(1)
+
+    try:
+        result = run_batch(connection, db_config.get('table_prefix', 'wp_'), limit, days)
+    except Exception as e:
+        result = {'error': f'Error en la predicción por lotes: {str(e)}'}
+    finally:
+        connection.close()
+
+    result['timings'] = report()
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
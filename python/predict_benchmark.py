@@ -23,14 +23,26 @@ import mysql.connector
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 
+from instrumentation import instrument_connection, report, stage, start_profiling
+from match_loader import load_matches
+
+# Columnas que usan prepare_features y simulate_value_betting_simple
+BENCHMARK_COLUMNS = [
+    'date', 'season', 'division', 'home_team', 'away_team', 'ftr', 'fthg', 'ftag',
+    'hs', 'as_shots', 'hst', 'ast', 'hc', 'ac', 'hf', 'af', 'hy', 'ay', 'hr', 'ar',
+    'home_xg', 'away_xg', 'b365h', 'b365d', 'b365a', 'bwh', 'bwd', 'bwa'
+]
+
 def main():
     """Función principal del benchmark"""
+    start_profiling()
     if len(sys.argv) < 3:
         print("ERROR: Uso: benchmark_season.py <temporada> <tipo_modelo>")
         sys.exit(1)
     
     exclude_season = sys.argv[1]
     model_type = sys.argv[2]  # 'with_xg' o 'without_xg'
+    league_filter = sys.argv[3] if len(sys.argv) > 3 and sys.argv[3] != 'all' else None
     
     print("🏆 INICIANDO BENCHMARK")
     print("=" * 50)
@@ -55,45 +67,50 @@ def main():
             host = host_parts[0]
             port = int(host_parts[1])
         
-        conn = mysql.connector.connect(
+        conn = instrument_connection(mysql.connector.connect(
             host=host,
             port=port,
             database=db_config['database'],
             user=db_config['user'],
             password=db_config['password']
-        )
+        ))
         print("✅ Conexión establecida")
         
         # PASO 1: ENTRENAR MODELO
         print(f"\n📊 ENTRENANDO MODELO (sin {exclude_season})...")
         
-        # Cargar datos de entrenamiento
-        train_query = f"""
-        SELECT * FROM {table_prefix}ft_matches_advanced
-        WHERE season != %s
+        # Cargar datos de entrenamiento (solo las columnas necesarias, por bloques)
+        table_name = f"{table_prefix}ft_matches_advanced"
+        league_condition = "AND division = %s" if league_filter else ""
+        league_params = (league_filter,) if league_filter else ()
+        
+        train_where = f"""
+        season != %s
         AND season IS NOT NULL
         AND fthg IS NOT NULL
         AND ftag IS NOT NULL
         AND hs IS NOT NULL
         AND as_shots IS NOT NULL
-        {f"AND division = '{league_filter}'" if league_filter else ""}
-        ORDER BY date DESC
-        LIMIT 5000
+        {league_condition}
         """
         
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(train_query, (exclude_season,))
-        training_data = cursor.fetchall()
+        with stage('load'):
+            training_data = load_matches(
+                conn, table_name, BENCHMARK_COLUMNS,
+                where=train_where, params=(exclude_season,) + league_params,
+                order_by='date DESC', limit=5000
+            )
         
-        if not training_data:
+        if len(training_data) == 0:
             print("❌ No hay datos de entrenamiento")
             sys.exit(1)
         
         print(f"✅ {len(training_data)} partidos para entrenamiento")
         
         # Preparar datos de entrenamiento
-        df_train = pd.DataFrame(training_data)
-        X_train, y_train = prepare_features(df_train, model_type)
+        with stage('features'):
+            df_train = training_data.to_dataframe()
+            X_train, y_train = prepare_features(df_train, model_type)
         
         print(f"📐 Shape entrenamiento: X={X_train.shape}, y={y_train.shape}")
         
@@ -109,46 +126,51 @@ def main():
         
         # Split para validación
         X_tr, X_val, y_tr, y_val = train_test_split(X_train, y_train, test_size=0.2, random_state=42)
-        model.fit(X_tr, y_tr)
+        with stage('fit'):
+            model.fit(X_tr, y_tr)
         
-        train_acc = model.score(X_val, y_val)
+        with stage('predict'):
+            train_acc = model.score(X_val, y_val)
         print(f"📈 Precisión validación: {train_acc:.4f}")
         
         # PASO 2: PREDECIR TEMPORADA DE TEST
         print(f"\n🎯 PREDICIENDO TEMPORADA {exclude_season}...")
         
         # Cargar datos de test
-        test_query = f"""
-        SELECT * FROM {table_prefix}ft_matches_advanced
-        WHERE season = %s
+        test_where = f"""
+        season = %s
         AND fthg IS NOT NULL
         AND ftag IS NOT NULL
         AND hs IS NOT NULL
         AND as_shots IS NOT NULL
-        {f"AND division = '{league_filter}'" if league_filter else ""}
-        ORDER BY date
+        {league_condition}
         """
         
-        cursor.execute(test_query, (exclude_season,))
-        test_data = cursor.fetchall()
+        with stage('load'):
+            test_data = load_matches(
+                conn, table_name, BENCHMARK_COLUMNS,
+                where=test_where, params=(exclude_season,) + league_params,
+                order_by='date'
+            )
         
-        if not test_data:
+        if len(test_data) == 0:
             print(f"❌ No hay datos para la temporada {exclude_season}")
-            cursor.close()
             conn.close()
             sys.exit(1)
         
         print(f"✅ {len(test_data)} partidos para evaluar")
         
         # Preparar datos de test
-        df_test = pd.DataFrame(test_data)
-        X_test, y_test = prepare_features(df_test, model_type)
+        with stage('features'):
+            df_test = test_data.to_dataframe()
+            X_test, y_test = prepare_features(df_test, model_type)
         
         print(f"📐 Shape test: X={X_test.shape}, y={y_test.shape}")
         
         # Hacer predicciones
-        predictions = model.predict(X_test)
-        probabilities = model.predict_proba(X_test)
+        with stage('predict'):
+            predictions = model.predict(X_test)
+            probabilities = model.predict_proba(X_test)
         
         # Calcular métricas
         correct = np.sum(predictions == y_test)
@@ -158,6 +180,9 @@ def main():
         print(f"📊 Precisión: {accuracy:.4f}")
         print(f"✅ Correctas: {correct} / {len(y_test)}")
         
+        with stage('simulate'):
+            value_betting = simulate_value_betting_simple(probabilities, y_test, df_test)
+        
         # Preparar resultados detallados
         results = {
             'test_metrics': {
@@ -169,14 +194,14 @@ def main():
                 'away_wins': calculate_result_metrics(y_test, predictions, 0),
                 'high_confidence': calculate_confidence_metrics(probabilities, predictions, y_test)
             },
-            'value_betting': simulate_value_betting_simple(probabilities, y_test, df_test)
+            'value_betting': value_betting,
+            'timings': report()
         }
         
         # Imprimir resultados
         print("\n📊 RESULTADOS DEL BENCHMARK:")
         print(json.dumps(results, indent=2))
         
-        cursor.close()
         conn.close()
         
         print("\n✅ BENCHMARK COMPLETADO")
@@ -291,25 +316,25 @@ def simulate_value_betting_simple(probabilities, y_true, df_test):
         
         # Home odds
         home_odd = match.get('b365h')
-        if home_odd is None or home_odd == '':
+        if home_odd is None or home_odd == '' or pd.isna(home_odd):
             home_odd = match.get('bwh')
-        if home_odd is None or home_odd == '':
+        if home_odd is None or home_odd == '' or pd.isna(home_odd):
             home_odd = 0
         odds[2] = float(home_odd) if home_odd else 0
         
         # Draw odds
         draw_odd = match.get('b365d')
-        if draw_odd is None or draw_odd == '':
+        if draw_odd is None or draw_odd == '' or pd.isna(draw_odd):
             draw_odd = match.get('bwd')
-        if draw_odd is None or draw_odd == '':
+        if draw_odd is None or draw_odd == '' or pd.isna(draw_odd):
             draw_odd = 0
         odds[1] = float(draw_odd) if draw_odd else 0
         
         # Away odds
         away_odd = match.get('b365a')
-        if away_odd is None or away_odd == '':
+        if away_odd is None or away_odd == '' or pd.isna(away_odd):
             away_odd = match.get('bwa')
-        if away_odd is None or away_odd == '':
+        if away_odd is None or away_odd == '' or pd.isna(away_odd):
             away_odd = 0
         odds[0] = float(away_odd) if away_odd else 0
         
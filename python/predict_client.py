@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Cliente ligero del servidor de predicciones
+
+Mantiene el mismo contrato de línea de comandos que predict_simple.py y
+predict_match.py, pero envía la petición a prediction_server.py. Solo
+importa json y socket, así que arranca en milisegundos. Si el servidor no
+está levantado, ejecuta la predicción en el propio proceso como antes.
+
+Uso:
+    python3 predict_client.py <model_path> '<features_json>'
+    python3 predict_client.py --match <equipo_local> <equipo_visitante>
+"""
+
+import os
+import sys
+import json
+import socket
+
+DEFAULT_SOCKET_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'predictor.sock'
+)
+
+
+def request(payload, socket_path=None, tcp_address=None, timeout=30):
+    """
+    Enviar una petición al servidor y devolver la respuesta decodificada
+
+    Lanza OSError si el servidor no está disponible.
+    """
+    if tcp_address:
+        sock = socket.create_connection(tcp_address, timeout=timeout)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(socket_path or os.environ.get('FT_PREDICTOR_SOCKET', DEFAULT_SOCKET_PATH))
+
+    try:
+        sock.sendall((json.dumps(payload) + '\n').encode('utf-8'))
+        with sock.makefile('rb') as stream:
+            line = stream.readline()
+    finally:
+        sock.close()
+
+    if not line:
+        raise OSError('El servidor de predicciones cerró la conexión')
+    return json.loads(line.decode('utf-8'))
+
+
+def predict_features_local(features):
+    """Respaldo: misma lógica que predict_simple.py en este proceso"""
+    from predict_simple import simple_prediction
+
+    if len(features) < 18:
+        return {'error': f'Se requieren 18 características, recibidas: {len(features)}'}
+    return simple_prediction(features)
+
+
+def predict_match_local(home_team, away_team):
+    """Respaldo: misma lógica que predict_match.py en este proceso"""
+    import predict_match
+
+    with open(predict_match.DB_CONFIG_PATH, 'r') as f:
+        db_config = json.load(f)
+    connection = predict_match.get_db_connection(db_config)
+    if not connection:
+        return {'error': 'No se pudo conectar a la base de datos'}
+    try:
+        return predict_match.predict_match(home_team, away_team, connection)
+    finally:
+        connection.close()
+
+
+def main():
+    args = sys.argv[1:]
+
+    try:
+        if len(args) == 3 and args[0] == '--match':
+            home_team, away_team = args[1], args[2]
+            try:
+                result = request({'action': 'predict', 'home_team': home_team, 'away_team': away_team})
+            except OSError:
+                result = predict_match_local(home_team, away_team)
+
+        elif len(args) == 2:
+            # args[0] es la ruta del modelo; se mantiene por compatibilidad
+            features = json.loads(args[1])
+            try:
+                result = request({'action': 'predict_simple', 'features': features})
+            except OSError:
+                result = predict_features_local(features)
+
+        else:
+            result = {'error': 'Uso: python3 predict_client.py model_path features_json | --match local visitante'}
+
+    except json.JSONDecodeError as e:
+        result = {'error': f'Error decodificando JSON: {str(e)}'}
+    except Exception as e:
+        result = {'error': f'Error en predicción: {str(e)}'}
+
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
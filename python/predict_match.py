@@ -5,9 +5,9 @@ Football Tipster - Script de predicción de partidos
 Usa el modelo Random Forest entrenado para predecir resultados
 """
 
+import os
 import sys
 import json
-import pickle
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
@@ -22,6 +22,16 @@ if plugin_libs not in sys.path:
 import mysql.connector
 from mysql.connector import Error
 
+from match_cache import CACHE_COLUMNS, MatchCache, cache_enabled
+from compiled_forest import load_compiled
+from instrumentation import instrument_connection, report, stage, start_profiling
+from model_registry import MODEL_FILE, MODELS_DIR, ModelRegistry
+from match_loader import NULL_INT, matches_table
+from prediction_cache import PredictionCache
+
+# Tabla por defecto; main() usa la del prefijo de db_config.json
+MATCHES_TABLE = matches_table({})
+
 def get_db_connection(config):
     """Crear conexión a la base de datos"""
     try:
@@ -106,145 +116,258 @@ def calculate_team_stats(team, is_home, matches_df, n_matches=10):
     
     return stats
 
-def predict_match(home_team, away_team, connection):
-    """Predecir el resultado de un partido"""
+def load_recent_matches_cached(connection, teams, limit=100, table_name=MATCHES_TABLE):
+    """
+    Mismo resultado que la query de predict_match() (últimos partidos con
+    goles de cualquiera de los equipos, más recientes primero) pero leyendo
+    de la caché local de partidos
+    """
+    cache = MatchCache(table_name)
+    cache.refresh(connection)
+    data = cache.load(CACHE_COLUMNS)
+    
+    codes = [data.code_of('home_team', team) for team in teams]
+    codes = [code for code in codes if code != NULL_INT]
+    mask = (
+        (np.isin(data['home_team'], codes) | np.isin(data['away_team'], codes))
+        & (data['fthg'] != NULL_INT) & (data['ftag'] != NULL_INT)
+    )
+    
+    index = np.flatnonzero(mask)[::-1][:limit]
+    return data.take(index).to_dataframe()
+
+DB_CONFIG_PATH = '/var/www/vhosts/virtualrolldice.com/httpdocs/wp-content/plugins/football-tipster/python/db_config.json'
+MODEL_NAME = 'football_rf_advanced'
+# Fichero plano de antes del registro de modelos
+MODEL_PATH = os.path.join(MODELS_DIR, MODEL_NAME + '.pkl')
+
+def current_model_path():
+    """.pkl de la versión activa del registro (o el fichero plano si no hay)"""
+    return ModelRegistry(MODEL_NAME).path(MODEL_FILE) or MODEL_PATH
+
+def load_model(model_path=None):
+    """
+    Cargar el modelo: el forest compilado si está al día (solo NumPy, con
+    np.memmap); si no, el pickle (dict {'model', 'features'} o modelo
+    directo) con mmap_mode para compartir páginas entre procesos
+    """
+    model_path = model_path or current_model_path()
+    forest = load_compiled(model_path)
+    if forest is not None:
+        return forest, forest.feature_names
+    
+    import joblib
+    model_data = joblib.load(model_path, mmap_mode='r')
+    
+    if isinstance(model_data, dict):
+        return model_data['model'], model_data.get('features', [])
+    return model_data, []
+
+def build_match_features(home_team, away_team, connection, table_name=MATCHES_TABLE):
+    """
+    Calcular las features de un partido a partir del histórico
+    
+    Devuelve (features, None) o (None, diccionario de error)
+    """
+    cursor = connection.cursor(dictionary=True)
     try:
-        cursor = connection.cursor(dictionary=True)
-        
         # Obtener partidos históricos
-        query = """
-            SELECT * FROM wp_ft_matches_advanced 
-            WHERE (home_team = %s OR away_team = %s OR home_team = %s OR away_team = %s)
-            AND fthg IS NOT NULL AND ftag IS NOT NULL
-            ORDER BY date DESC
-            LIMIT 100
-        """
-        
-        cursor.execute(query, (home_team, home_team, away_team, away_team))
-        matches = cursor.fetchall()
-        
-        if not matches:
-            return {'error': f'No hay datos históricos para {home_team} o {away_team}'}
-        
-        # Convertir a DataFrame
-        matches_df = pd.DataFrame(matches)
-        
-        # Calcular estadísticas
-        home_stats = calculate_team_stats(home_team, True, matches_df)
-        away_stats = calculate_team_stats(away_team, False, matches_df)
-        
-        if not home_stats or not away_stats:
-            return {'error': 'No hay suficientes datos para hacer la predicción'}
-        
-        # Crear features para el modelo
-        features = []
-        
-        # Features básicas
+        with stage('load'):
+            matches_df = _load_match_history(connection, cursor, home_team, away_team, table_name)
+    finally:
+        cursor.close()
+    
+    with stage('features'):
+        return features_from_history(home_team, away_team, matches_df)
+
+def _load_match_history(connection, cursor, home_team, away_team, table_name=MATCHES_TABLE):
+    """Últimos partidos de los dos equipos (caché local o MySQL)"""
+    if cache_enabled(table_name):
+        return load_recent_matches_cached(connection, [home_team, away_team], table_name=table_name)
+    
+    query = f"""
+        SELECT * FROM {table_name} 
+        WHERE (home_team = %s OR away_team = %s OR home_team = %s OR away_team = %s)
+        AND fthg IS NOT NULL AND ftag IS NOT NULL
+        ORDER BY date DESC
+        LIMIT 100
+    """
+    
+    cursor.execute(query, (home_team, home_team, away_team, away_team))
+    matches = cursor.fetchall()
+    
+    # Convertir a DataFrame
+    return pd.DataFrame(matches)
+
+def features_from_history(home_team, away_team, matches_df):
+    """
+    Features de un partido a partir de sus últimos partidos ya cargados
+    (los de cualquiera de los dos equipos, más recientes primero)
+    """
+    if matches_df.empty:
+        return None, {'error': f'No hay datos históricos para {home_team} o {away_team}'}
+    
+    # Calcular estadísticas
+    home_stats = calculate_team_stats(home_team, True, matches_df)
+    away_stats = calculate_team_stats(away_team, False, matches_df)
+    
+    if not home_stats or not away_stats:
+        return None, {'error': 'No hay suficientes datos para hacer la predicción'}
+    
+    # Crear features para el modelo
+    features = []
+    
+    # Features básicas
+    features.extend([
+        home_stats['avg_goals_for'],
+        home_stats['avg_goals_against'],
+        away_stats['avg_goals_for'],
+        away_stats['avg_goals_against'],
+        home_stats['avg_shots_for'],
+        home_stats['avg_shots_against'],
+        away_stats['avg_shots_for'],
+        away_stats['avg_shots_against'],
+        home_stats['avg_corners_for'],
+        home_stats['avg_corners_against'],
+        away_stats['avg_corners_for'],
+        away_stats['avg_corners_against'],
+        home_stats['form_points'],
+        away_stats['form_points'],
+        home_stats['win_rate'],
+        away_stats['win_rate']
+    ])
+    
+    # xG features si están disponibles
+    if 'avg_xg_for' in home_stats:
         features.extend([
-            home_stats['avg_goals_for'],
-            home_stats['avg_goals_against'],
-            away_stats['avg_goals_for'],
-            away_stats['avg_goals_against'],
-            home_stats['avg_shots_for'],
-            home_stats['avg_shots_against'],
-            away_stats['avg_shots_for'],
-            away_stats['avg_shots_against'],
-            home_stats['avg_corners_for'],
-            home_stats['avg_corners_against'],
-            away_stats['avg_corners_for'],
-            away_stats['avg_corners_against'],
-            home_stats['form_points'],
-            away_stats['form_points'],
-            home_stats['win_rate'],
-            away_stats['win_rate']
+            home_stats['avg_xg_for'],
+            home_stats['avg_xg_against'],
+            away_stats['avg_xg_for'],
+            away_stats['avg_xg_against']
         ])
-        
-        # xG features si están disponibles
-        if 'avg_xg_for' in home_stats:
-            features.extend([
-                home_stats['avg_xg_for'],
-                home_stats['avg_xg_against'],
-                away_stats['avg_xg_for'],
-                away_stats['avg_xg_against']
-            ])
+    
+    return features, None
+
+def fit_feature_count(features, n_features_expected):
+    """Rellenar con ceros o recortar hasta el número de features del modelo"""
+    features = list(features)
+    if len(features) < n_features_expected:
+        # Agregar features dummy si faltan
+        features.extend([0] * (n_features_expected - len(features)))
+    elif len(features) > n_features_expected:
+        # Recortar si sobran
+        features = features[:n_features_expected]
+    return features
+
+def format_prediction(prediction, probabilities, home_team, away_team, features_used, n_features_expected):
+    """Construir el diccionario de respuesta de una predicción"""
+    # Mapear clases
+    class_mapping = {0: 'A', 1: 'D', 2: 'H'}  # Ajustar según tu modelo
+    
+    # Encontrar el índice de la predicción (los modelos entrenados con las
+    # etiquetas de ftr predicen directamente 'A' / 'D' / 'H', en ese orden)
+    if prediction in ('A', 'D', 'H'):
+        predicted_result = prediction
+    else:
+        predicted_result = class_mapping.get(int(prediction), 'H')
+    
+    # Crear diccionario de probabilidades
+    prob_dict = {}
+    for idx, prob in enumerate(probabilities):
+        result = class_mapping.get(idx, 'H')
+        prob_dict[result] = float(prob)
+    
+    # Asegurar que todas las clases estén presentes
+    for result in ['H', 'D', 'A']:
+        if result not in prob_dict:
+            prob_dict[result] = 0.0
+    
+    # Obtener la probabilidad de la predicción
+    prediction_probability = prob_dict.get(predicted_result, max(probabilities))
+    
+    return {
+        'success': True,
+        'prediction': predicted_result,
+        'probability': float(prediction_probability),
+        'probabilities': prob_dict,
+        'home_team': home_team,
+        'away_team': away_team,
+        'features_used': features_used,
+        'model_features': n_features_expected
+    }
+
+def predict_match(home_team, away_team, connection, model=None, table_name=MATCHES_TABLE):
+    """
+    Predecir el resultado de un partido
+    
+    Si se pasa model (servidor de predicciones) no se vuelve a cargar del disco
+    """
+    try:
+        features, error = build_match_features(home_team, away_team, connection, table_name)
+        if error:
+            return error
         
         # Cargar modelo
-        model_path = '/var/www/vhosts/virtualrolldice.com/httpdocs/wp-content/plugins/football-tipster/models/football_rf_advanced.pkl'
-        
-        try:
-            with open(model_path, 'rb') as f:
-                model_data = pickle.load(f)
-                
-            if isinstance(model_data, dict):
-                model = model_data['model']
-                feature_names = model_data.get('features', [])
-            else:
-                model = model_data
-                feature_names = []
-            
-        except Exception as e:
-            return {'error': f'Error cargando el modelo: {str(e)}'}
+        if model is None:
+            try:
+                with stage('load'):
+                    model, feature_names = load_model()
+            except Exception as e:
+                return {'error': f'Error cargando el modelo: {str(e)}'}
         
         # Ajustar número de features
         n_features_expected = model.n_features_in_
-        n_features_actual = len(features)
-        
-        if n_features_actual < n_features_expected:
-            # Agregar features dummy si faltan
-            features.extend([0] * (n_features_expected - n_features_actual))
-        elif n_features_actual > n_features_expected:
-            # Recortar si sobran
-            features = features[:n_features_expected]
+        features = fit_feature_count(features, n_features_expected)
         
         # Hacer predicción
         X = np.array(features).reshape(1, -1)
         
         # Predicción
-        prediction = model.predict(X)[0]
-        probabilities = model.predict_proba(X)[0]
+        with stage('predict'):
+            prediction = model.predict(X)[0]
+            probabilities = model.predict_proba(X)[0]
         
-        # Mapear clases
-        class_mapping = {0: 'A', 1: 'D', 2: 'H'}  # Ajustar según tu modelo
-        
-        # Encontrar el índice de la predicción
-        pred_index = int(prediction)
-        predicted_result = class_mapping.get(pred_index, 'H')
-        
-        # Crear diccionario de probabilidades
-        prob_dict = {}
-        for idx, prob in enumerate(probabilities):
-            result = class_mapping.get(idx, 'H')
-            prob_dict[result] = float(prob)
-        
-        # Asegurar que todas las clases estén presentes
-        for result in ['H', 'D', 'A']:
-            if result not in prob_dict:
-                prob_dict[result] = 0.0
-        
-        # Obtener la probabilidad de la predicción
-        prediction_probability = prob_dict.get(predicted_result, max(probabilities))
-        
-        result = {
-            'success': True,
-            'prediction': predicted_result,
-            'probability': float(prediction_probability),
-            'probabilities': prob_dict,
-            'home_team': home_team,
-            'away_team': away_team,
-            'features_used': len(features),
-            'model_features': n_features_expected
-        }
-        
-        return result
+        return format_prediction(prediction, probabilities, home_team, away_team,
+                                 len(features), n_features_expected)
         
     except Exception as e:
         return {'error': f'Error en la predicción: {str(e)}', 'details': str(e)}
-    finally:
-        if cursor:
-            cursor.close()
+
+def predict_match_cached(home_team, away_team, cache, open_connection, get_model=None,
+                         model_path=None, table_name=MATCHES_TABLE):
+    """
+    predict_match() a través de la caché de predicciones
+    
+    Con un acierto no se carga el modelo ni se abre la conexión: open_connection
+    y get_model son funciones que solo se llaman si hacen falta. Tampoco se
+    reescribe la caché: el acierto solo se anota en el registro de aciertos.
+    """
+    # La versión se resuelve una vez: la clave y el modelo usado coinciden
+    # aunque se active otra versión a mitad de la predicción
+    model_path = model_path or current_model_path()
+    if get_model is None:
+        get_model = lambda: load_model(model_path)[0]
+    
+    cache.reload()
+    key = cache.key('match', home_team, away_team,
+                    cache.model_hash(model_path),
+                    cache.data_watermark(open_connection, table_name))
+    
+    result = cache.get(key)
+    if result is not None:
+        cache.flush_lookups()
+        return dict(result, cached=True)
+    
+    model = get_model()
+    result = predict_match(home_team, away_team, open_connection(), model, table_name)
+    if result.get('success'):
+        cache.put(key, result)
+    cache.save()
+    return result
 
 def main():
     """Función principal"""
+    start_profiling()
     if len(sys.argv) < 3:
         print(json.dumps({'error': 'Uso: predict_match.py <equipo_local> <equipo_visitante>'}))
         sys.exit(1)
@@ -254,25 +377,36 @@ def main():
     
     # Cargar configuración de BD
     try:
-        with open('/var/www/vhosts/virtualrolldice.com/httpdocs/wp-content/plugins/football-tipster/python/db_config.json', 'r') as f:
+        with open(DB_CONFIG_PATH, 'r') as f:
             db_config = json.load(f)
     except:
         print(json.dumps({'error': 'No se pudo cargar la configuración de la base de datos'}))
         sys.exit(1)
     
-    # Conectar a BD
-    connection = get_db_connection(db_config)
-    if not connection:
-        print(json.dumps({'error': 'No se pudo conectar a la base de datos'}))
-        sys.exit(1)
+    # Conectar a BD solo si la caché no tiene la predicción
+    connections = []
+    
+    def open_connection():
+        if not connections:
+            connection = instrument_connection(get_db_connection(db_config))
+            if not connection:
+                raise RuntimeError('No se pudo conectar a la base de datos')
+            connections.append(connection)
+        return connections[0]
     
     try:
         # Hacer predicción
-        result = predict_match(home_team, away_team, connection)
+        result = predict_match_cached(home_team, away_team, PredictionCache(), open_connection,
+                                      table_name=matches_table(db_config))
+        result['timings'] = report()
         print(json.dumps(result))
+    except RuntimeError as e:
+        print(json.dumps({'error': str(e)}))
+        sys.exit(1)
     finally:
-        if connection and connection.is_connected():
-            connection.close()
+        for connection in connections:
+            if connection.is_connected():
+                connection.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -8,6 +8,8 @@ import sys
 import json
 import numpy as np
 
+from instrumentation import report, stage, start_profiling
+
 def simple_prediction(features):
     """
     Modelo simple basado en estadísticas sin ML
@@ -96,14 +98,16 @@ def simple_prediction(features):
     }
 
 def main():
-    if len(sys.argv) != 3:
-        print(json.dumps({'error': 'Uso: python3 predict_simple.py model_path features_json'}))
+    start_profiling()
+    args = [arg for arg in sys.argv[1:] if arg != '--timings']
+    if len(args) != 2:
+        print(json.dumps({'error': 'Uso: python3 predict_simple.py model_path features_json [--timings]'}))
         return
     
     try:
         # model_path no se usa en este modelo simple
-        model_path = sys.argv[1]
-        features_json = sys.argv[2]
+        model_path = args[0]
+        features_json = args[1]
         
         # Decodificar características
         features = json.loads(features_json)
@@ -114,7 +118,12 @@ def main():
             return
         
         # Hacer predicción
-        result = simple_prediction(features)
+        with stage('predict'):
+            result = simple_prediction(features)
+        # El resultado es la predicción que el PHP guarda y cachea: los
+        # tiempos solo si se piden
+        if '--timings' in sys.argv:
+            result['timings'] = report()
         
         # Devolver resultado como JSON
         print(json.dumps(result))
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Caché de predicciones
+
+Guarda el resultado de cada predicción en cache/predictions.json con la clave
+
+    espacio | equipo_local | equipo_visitante | sha1 del modelo | marca de agua
+
+donde la marca de agua es la fecha del último partido del histórico (y el
+último updated_at). Al reentrenar cambia el sha1 del modelo y al importar
+resultados cambia la marca de agua, así que las entradas viejas dejan de
+coincidir solas y se purgan en la siguiente escritura.
+
+- El sha1 del modelo se memoriza por (tamaño, mtime): solo cuesta un stat.
+  Se guarda uno por espacio (el modelo activo), así las entradas de
+  versiones superadas se purgan
+- La marca de agua se consulta a la BD como mucho cada WATERMARK_TTL segundos
+- invalidate() (lo llama el importador de CSV) vacía la caché bajo bloqueo y
+  sube 'generation': quien tuviera una copia anterior no puede restaurarla
+- Expulsión LRU a partir de MAX_ENTRIES y contadores de aciertos / fallos
+- Una consulta no reescribe el fichero: añade una línea a predictions.json.hits
+  con bloqueo compartido. El orden LRU y los contadores de ese registro se
+  aplican en la siguiente escritura (put) o cuando pasa de HITS_LOG_MAX_BYTES
+
+El mismo fichero lo lee y escribe FT_Predictor (PHP) con el espacio 'simple'.
+
+Uso:
+    python3 prediction_cache.py status
+    python3 prediction_cache.py clear      # invalidate()
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import hashlib
+from collections import OrderedDict
+
+# FT_PREDICTION_CACHE permite usar otro fichero (p.ej. load_test.py)
+CACHE_PATH = os.environ.get('FT_PREDICTION_CACHE') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'predictions.json'
+)
+
+MAX_ENTRIES = 2000
+WATERMARK_TTL = 300
+HITS_LOG_MAX_BYTES = 64 * 1024
+
+STAT_NAMES = ['hits', 'misses', 'evictions', 'invalidations']
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def query_data_watermark(connection, table_name):
+    """Fecha del último partido y último updated_at del histórico"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT MAX(date), MAX(updated_at) FROM {table_name}")
+        max_date, max_updated = cursor.fetchone()
+    finally:
+        cursor.close()
+    return f"{max_date}/{max_updated}"
+
+
+class PredictionCache:
+    """
+    Caché LRU persistente de predicciones compartida entre procesos
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, watermark_ttl=WATERMARK_TTL):
+        self.path = os.path.abspath(path)
+        self.hits_path = self.path + '.hits'
+        self.max_entries = max_entries
+        self.watermark_ttl = watermark_ttl
+        self.loaded_mtime = None
+        self._reset()
+        self.reload()
+
+    def _reset(self):
+        self.entries = OrderedDict()
+        self.models = {}
+        self.watermark = None
+        self.watermark_checked_at = 0
+        self.generation = 0
+        self.stats = dict.fromkeys(STAT_NAMES, 0)
+        self.lookups = []
+        self.dirty = set()
+        self.changed = False
+
+    # ------------------------------------------------------------------ #
+    # Persistencia
+    # ------------------------------------------------------------------ #
+
+    def _lock(self, shared=False):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        handle = open(self.path + '.lock', 'a')
+        fcntl.flock(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        return handle
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def reload(self):
+        """
+        Relee el fichero si otro proceso lo ha cambiado. Si ha desaparecido
+        (invalidación externa) se vacía también la copia en memoria.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            if self.loaded_mtime is not None:
+                self._reset()
+                self.loaded_mtime = None
+            return
+
+        if mtime == self.loaded_mtime:
+            return
+
+        handle = self._lock(shared=True)
+        try:
+            data = self._read() or {}
+        finally:
+            handle.close()
+        self.entries = OrderedDict(data.get('entries', {}))
+        self.models = _active_models(data)
+        self.watermark = data.get('watermark')
+        self.watermark_checked_at = data.get('watermark_checked_at', 0)
+        self.generation = data.get('generation', 0)
+        self.stats = dict(dict.fromkeys(STAT_NAMES, 0), **data.get('stats', {}))
+        self.loaded_mtime = mtime
+
+    def flush_lookups(self):
+        """
+        Anota las consultas pendientes en el registro de aciertos sin
+        reescribir la caché (bloqueo compartido: no espera a otros lectores)
+        """
+        if self.changed:
+            self.save()
+            return
+        if not self.lookups:
+            return
+
+        handle = self._lock(shared=True)
+        try:
+            with open(self.hits_path, 'a') as f:
+                f.write(''.join(json.dumps(lookup) + '\n' for lookup in self.lookups))
+            size = os.path.getsize(self.hits_path)
+        finally:
+            handle.close()
+        self.lookups = []
+
+        if size > HITS_LOG_MAX_BYTES:
+            self.save()
+
+    def _read_lookups(self):
+        """Registro de aciertos de todos los procesos (bajo bloqueo exclusivo)"""
+        lookups = []
+        try:
+            with open(self.hits_path, 'r') as f:
+                for line in f:
+                    try:
+                        lookups.append(json.loads(line))
+                    except ValueError:
+                        continue
+            os.remove(self.hits_path)
+        except OSError:
+            pass
+        return lookups
+
+    def save(self):
+        """
+        Escribe bajo bloqueo, mezclando con lo que hayan guardado otros
+        procesos desde la última lectura
+        """
+        handle = self._lock()
+        try:
+            data = self._read() or {}
+            generation = data.get('generation', 0)
+            # Tras una invalidación lo calculado con la copia anterior no vale
+            current = generation == self.generation
+
+            entries = OrderedDict(data.get('entries', {}))
+            for key in self.entries:
+                if key in self.dirty and current:
+                    entries.pop(key, None)
+                    entries[key] = self.entries[key]
+
+            stats = dict(dict.fromkeys(STAT_NAMES, 0), **data.get('stats', {}))
+            for event, key in self._read_lookups() + self.lookups:
+                stats['hits' if event == 'hit' else 'misses'] += 1
+                if event == 'hit' and key in entries:
+                    entries.move_to_end(key)
+
+            models = dict(_active_models(data), **self.models)
+            if current and self.watermark_checked_at >= data.get('watermark_checked_at', 0):
+                watermark, checked_at = self.watermark, self.watermark_checked_at
+            else:
+                watermark, checked_at = data.get('watermark'), data.get('watermark_checked_at', 0)
+
+            self.entries = entries
+            self.models = models
+            self.watermark = watermark
+            self.watermark_checked_at = checked_at
+            self.generation = generation
+            self.stats = stats
+            self.lookups = []
+            self.dirty = set()
+            self.changed = False
+            self.stats['invalidations'] += self._prune()
+            self.stats['evictions'] += self._evict()
+
+            tmp = f"{self.path}.tmp{os.getpid()}"
+            with open(tmp, 'w') as f:
+                json.dump({
+                    'entries': self.entries,
+                    'models': self.models,
+                    'watermark': self.watermark,
+                    'watermark_checked_at': self.watermark_checked_at,
+                    'generation': self.generation,
+                    'stats': self.stats
+                }, f)
+            os.replace(tmp, self.path)
+            self.loaded_mtime = os.stat(self.path).st_mtime_ns
+        finally:
+            handle.close()
+
+    def invalidate(self):
+        """
+        Vacía la caché (tras importar resultados) conservando contadores y
+        modelos. Sube 'generation' para que ningún proceso con una copia
+        anterior vuelva a escribir sus entradas ni su marca de agua.
+        """
+        handle = self._lock()
+        try:
+            data = self._read() or {}
+            self._reset()
+            self.generation = data.get('generation', 0) + 1
+            self.models = _active_models(data)
+            self.stats = dict(dict.fromkeys(STAT_NAMES, 0), **data.get('stats', {}))
+            self.stats['invalidations'] += len(data.get('entries', {}))
+            for event, _ in self._read_lookups():
+                self.stats['hits' if event == 'hit' else 'misses'] += 1
+
+            tmp = f"{self.path}.tmp{os.getpid()}"
+            with open(tmp, 'w') as f:
+                json.dump({
+                    'entries': {},
+                    'models': self.models,
+                    'watermark': None,
+                    'watermark_checked_at': 0,
+                    'generation': self.generation,
+                    'stats': self.stats
+                }, f)
+            os.replace(tmp, self.path)
+            self.loaded_mtime = os.stat(self.path).st_mtime_ns
+        finally:
+            handle.close()
+
+
+    # ------------------------------------------------------------------ #
+    # Componentes de la clave
+    # ------------------------------------------------------------------ #
+
+    def model_hash(self, model_path, namespace='match'):
+        """
+        sha1 del modelo activo del espacio, recalculado solo si cambia el
+        fichero o se activa otra versión
+        """
+        st = os.stat(model_path)
+        stamp = f"{st.st_size}:{int(st.st_mtime)}"
+        known = self.models.get(namespace)
+        if not known or known.get('path') != model_path or known.get('stamp') != stamp:
+            known = {'path': model_path, 'stamp': stamp, 'sha1': file_sha1(model_path)}
+            self.models[namespace] = known
+            self.changed = True
+        return known['sha1']
+
+    def data_watermark(self, open_connection, table_name, force=False):
+        """
+        Marca de agua del histórico. open_connection es una función que
+        devuelve la conexión, y solo se llama cuando caduca el TTL.
+        """
+        now = time.time()
+        if force or self.watermark is None or now - self.watermark_checked_at > self.watermark_ttl:
+            self.watermark = query_data_watermark(open_connection(), table_name)
+            self.watermark_checked_at = now
+            self.changed = True
+        return self.watermark
+
+    @staticmethod
+    def key(namespace, home_team, away_team, model_hash, watermark):
+        return '|'.join([namespace, home_team, away_team, model_hash, watermark])
+
+    # ------------------------------------------------------------------ #
+    # Consulta
+    # ------------------------------------------------------------------ #
+
+    def get(self, key):
+        """
+        Solo en memoria: la consulta se anota con flush_lookups() o save()
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self._count('miss', key)
+            return None
+        self.entries.move_to_end(key)
+        self._count('hit', key)
+        return entry['result']
+
+    def put(self, key, result):
+        self.entries[key] = {'result': result, 'created_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+        self.entries.move_to_end(key)
+        self.dirty.add(key)
+
+    def _count(self, event, key):
+        self.stats['hits' if event == 'hit' else 'misses'] += 1
+        self.lookups.append([event, key if event == 'hit' else None])
+
+    def _prune(self):
+        """Elimina las entradas de modelos no activos o marcas de agua ya superadas"""
+        if self.watermark is None:
+            return 0
+        current_hashes = {m['sha1'] for m in self.models.values()}
+        stale = [
+            key for key in self.entries
+            if not key.endswith('|' + self.watermark)
+            or key.rsplit('|', 2)[-2] not in current_hashes
+        ]
+        for key in stale:
+            del self.entries[key]
+        return len(stale)
+
+    def _evict(self):
+        """Expulsión LRU: las primeras entradas son las menos usadas"""
+        evicted = 0
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def summary(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return dict(
+            self.stats,
+            entries=len(self.entries),
+            max_entries=self.max_entries,
+            hit_rate=round(self.stats['hits'] / lookups, 4) if lookups else 0.0,
+            watermark=self.watermark
+        )
+
+
+def _active_models(data):
+    """Modelo activo por espacio (descarta el formato antiguo, por ruta)"""
+    return {
+        namespace: model for namespace, model in data.get('models', {}).items()
+        if isinstance(model, dict) and 'path' in model
+    }
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    cache = PredictionCache()
+
+    if command == 'status':
+        print(json.dumps(cache.summary()))
+    elif command == 'clear':
+        cache.invalidate()
+        print(json.dumps({'success': True}))
+    else:
+        print(json.dumps({'error': 'Uso: prediction_cache.py <status|clear>'}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Servidor de predicciones persistente
+
+Mantiene en memoria el modelo (football_rf_advanced.forest compilado, o el
+.pkl si no existe), las librerías ya importadas y una conexión a la base de
+datos, y responde peticiones JSON por un socket Unix local (o TCP en
+loopback). Así cada predicción deja de pagar
+el arranque de python3.8, los imports de pandas/sklearn, la conexión a MySQL
+y el unpickle del modelo.
+
+Protocolo: una petición JSON por línea, una respuesta JSON por línea. La
+conexión puede reutilizarse para varias peticiones.
+
+    {"action": "ping"}
+    {"action": "reload"}
+    {"action": "predict_simple", "features": [...]}        # contrato de predict_simple.py
+    {"action": "predict", "home_team": "...", "away_team": "..."}
+    {"action": "predict", "fixtures": [{"home_team": "...", "away_team": "..."}, ...]}
+    {"action": "predict_batch", "limit": 50, "days": 7}     # contrato de predict_batch.py
+    {"action": "invalidate"}                                # vaciar la caché de predicciones
+
+Las predicciones por equipos pasan por la caché de prediction_cache.py: un
+partido ya predicho con el mismo modelo y el mismo histórico se responde sin
+tocar el modelo ni la base de datos.
+
+El modelo se recarga solo cuando se activa otra versión en el registro de
+modelos (o, con un fichero fijo, cuando cambia su fecha de modificación).
+
+Uso:
+    python3 prediction_server.py                    # socket Unix en cache/predictor.sock
+    python3 prediction_server.py --tcp 127.0.0.1:8765
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import socketserver
+import warnings
+warnings.filterwarnings('ignore')
+
+# Agregar path para librerías personalizadas
+plugin_libs = '/var/www/vhosts/virtualrolldice.com/httpdocs/wp-content/plugins/football-tipster/python-libs'
+if plugin_libs not in sys.path:
+    sys.path.insert(0, plugin_libs)
+
+import instrumentation
+import predict_batch
+from compiled_forest import compiled_path
+import predict_match
+from prediction_cache import PredictionCache
+from predict_client import DEFAULT_SOCKET_PATH
+from predict_simple import simple_prediction
+
+
+class PredictionService:
+    """
+    Estado caliente del servidor: modelo, conexión y contadores
+    """
+
+    def __init__(self, model_path=None, db_config_path=None):
+        # None: seguir la versión activa del registro de modelos
+        self.model_path = model_path
+        self.loaded_path = None
+        self.db_config_path = db_config_path or predict_match.DB_CONFIG_PATH
+        self.model_lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        self.model = None
+        self.model_mtime = None
+        self.connection = None
+        self.table_prefix = self._read_table_prefix()
+        self.cache = PredictionCache()
+        self.cache_lock = threading.Lock()
+        self.stats = {
+            'started_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'requests': 0,
+            'predictions': 0,
+            'model_reloads': 0,
+            'errors': 0
+        }
+
+    # ------------------------------------------------------------------ #
+    # Modelo y base de datos
+    # ------------------------------------------------------------------ #
+
+    def current_model_path(self):
+        return self.model_path or predict_match.current_model_path()
+
+    def get_model(self, force=False):
+        """Devuelve el modelo, recargándolo si ha cambiado la versión o el fichero"""
+        path = self.current_model_path()
+        mtime = os.stat(path).st_mtime_ns
+        forest_path = compiled_path(path)
+        if os.path.exists(forest_path):
+            # El forest compilado se escribe justo después del .pkl
+            mtime = max(mtime, os.stat(forest_path).st_mtime_ns)
+        stamp = (path, mtime)
+        if force or self.model is None or stamp != self.model_mtime:
+            with self.model_lock:
+                if force or self.model is None or stamp != self.model_mtime:
+                    model, _ = predict_match.load_model(path)
+                    # Se sustituye la referencia de golpe: las peticiones en
+                    # curso terminan con el modelo anterior
+                    self.model = model
+                    self.model_mtime = stamp
+                    self.loaded_path = path
+                    self.stats['model_reloads'] += 1
+        return self.model
+
+    def _read_table_prefix(self):
+        try:
+            with open(self.db_config_path, 'r') as f:
+                return json.load(f).get('table_prefix', 'wp_')
+        except (OSError, ValueError):
+            return 'wp_'
+
+    def get_connection(self):
+        """Conexión a MySQL reutilizable (reconecta si se ha caído)"""
+        if self.connection is not None:
+            try:
+                self.connection.ping(reconnect=True, attempts=2, delay=0)
+                return self.connection
+            except Exception:
+                self.connection = None
+
+        with open(self.db_config_path, 'r') as f:
+            db_config = json.load(f)
+        self.table_prefix = db_config.get('table_prefix', 'wp_')
+        self.connection = predict_match.get_db_connection(db_config)
+        if not self.connection:
+            raise RuntimeError('No se pudo conectar a la base de datos')
+        return self.connection
+
+    # ------------------------------------------------------------------ #
+    # Peticiones
+    # ------------------------------------------------------------------ #
+
+    def handle(self, request):
+        self.stats['requests'] += 1
+        action = request.get('action', 'predict')
+
+        try:
+            if action == 'ping':
+                with self.cache_lock:
+                    cache_stats = self.cache.summary()
+                return dict(self.stats, success=True, model_path=self.loaded_path, cache=cache_stats)
+
+            if action == 'invalidate':
+                with self.cache_lock:
+                    self.cache.invalidate()
+                return {'success': True}
+
+            if action == 'reload':
+                self.get_model(force=True)
+                return {'success': True, 'model_reloads': self.stats['model_reloads']}
+
+            if action == 'predict_simple':
+                features = request.get('features') or []
+                if len(features) < 18:
+                    return {'error': f'Se requieren 18 características, recibidas: {len(features)}'}
+                self.stats['predictions'] += 1
+                return simple_prediction(features)
+
+            if action == 'predict':
+                fixtures = request.get('fixtures')
+                if fixtures is None:
+                    return self.predict_fixtures([request])[0]
+                return {'success': True, 'predictions': self.predict_fixtures(fixtures)}
+
+            if action == 'predict_batch':
+                model = self.get_model()
+                with self.db_lock:
+                    result = predict_batch.run_batch(
+                        self.get_connection(), self.table_prefix,
+                        request.get('limit', 50), request.get('days', 7), model
+                    )
+                self.stats['predictions'] += result['predictions_saved']
+                return result
+
+            return {'error': f'Acción desconocida: {action}'}
+
+        except Exception as e:
+            self.stats['errors'] += 1
+            return {'error': f'Error en la predicción: {str(e)}'}
+
+    def predict_fixtures(self, fixtures):
+        """
+        Predice varios partidos: primero la caché; los que faltan, con el
+        histórico en una sola lectura y una sola llamada a predict_proba
+        """
+        results = [None] * len(fixtures)
+        keys = {}
+
+        with self.cache_lock:
+            self.cache.reload()
+            model_hash = self.cache.model_hash(self.current_model_path())
+            with self.db_lock:
+                watermark = self.cache.data_watermark(self.get_connection,
+                                                       f"{self.table_prefix}ft_matches_advanced")
+            for i, fixture in enumerate(fixtures):
+                if fixture.get('home_team') and fixture.get('away_team'):
+                    keys[i] = self.cache.key('match', fixture['home_team'], fixture['away_team'],
+                                             model_hash, watermark)
+                    cached = self.cache.get(keys[i])
+                    if cached is not None:
+                        results[i] = dict(cached, cached=True)
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            with self.cache_lock:
+                self.cache.flush_lookups()
+            return results
+
+        model = self.get_model()
+        with self.db_lock:
+            computed = predict_batch.predict_fixtures(
+                [fixtures[i] for i in missing], self.get_connection(), model, self.table_prefix
+            )
+
+        with self.cache_lock:
+            for i, result in zip(missing, computed):
+                results[i] = result
+                if i in keys and result and result.get('success'):
+                    self.cache.put(keys[i], result)
+            self.cache.save()
+
+        self.stats['predictions'] += sum(1 for r in computed if r and 'error' not in r)
+        return results
+
+
+class PredictionRequestHandler(socketserver.StreamRequestHandler):
+    """Lee peticiones JSON línea a línea y responde en la misma conexión"""
+
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line.decode('utf-8'))
+                response = self.server.service.handle(request)
+            except json.JSONDecodeError as e:
+                response = {'error': f'Error decodificando JSON: {str(e)}'}
+            self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+
+class UnixPredictionServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class TCPPredictionServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def create_server(service, socket_path=DEFAULT_SOCKET_PATH, tcp_address=None):
+    """Crear el servidor en socket Unix (por defecto) o TCP"""
+    if tcp_address:
+        server = TCPPredictionServer(tcp_address, PredictionRequestHandler)
+    else:
+        os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+        if os.path.exists(socket_path):
+            # Eliminar un socket huérfano de una ejecución anterior
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(socket_path)
+                probe.close()
+                raise RuntimeError(f'Ya hay un servidor escuchando en {socket_path}')
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.remove(socket_path)
+        server = UnixPredictionServer(socket_path, PredictionRequestHandler)
+        # Accesible para el usuario y el grupo del servidor web
+        os.chmod(socket_path, 0o660)
+
+    server.service = service
+    return server
+
+
+def main():
+    tcp_address = None
+    socket_path = DEFAULT_SOCKET_PATH
+    args = sys.argv[1:]
+
+    if '--tcp' in args:
+        host, port = args[args.index('--tcp') + 1].rsplit(':', 1)
+        tcp_address = (host, int(port))
+    if '--socket' in args:
+        socket_path = args[args.index('--socket') + 1]
+
+    # Proceso de larga duración: las etapas de predict_match/predict_batch
+    # no se acumulan (nadie llama a report())
+    instrumentation.disable()
+    
+    service = PredictionService()
+    # Calentar: cargar modelo y conexión antes de aceptar peticiones
+    service.get_model()
+    service.get_connection()
+
+    server = create_server(service, socket_path, tcp_address)
+    print(json.dumps({
+        'success': True,
+        'listening': f"{tcp_address[0]}:{tcp_address[1]}" if tcp_address else socket_path
+    }), flush=True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.cache.save()
+        if not tcp_address and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    main()
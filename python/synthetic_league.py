@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Generador de ligas sintéticas y sustituto SQLite de MySQL
+
+Genera filas realistas de ft_matches_advanced (equipos, temporadas,
+divisiones, goles, tiros, córners, tarjetas, xG y cuotas) a la escala que se
+pida, para medir el rendimiento de los scripts sin una base de datos real:
+
+- Cada división juega ligas a doble vuelta, temporada tras temporada, hasta
+  llegar al número de partidos pedido (la última temporada queda a medias,
+  como la temporada en curso)
+- Los goles siguen un modelo de Poisson con ataque / defensa por equipo y
+  ventaja de campo; tiros, xG y córners se derivan de la misma intensidad
+- Las cuotas salen de las probabilidades reales del modelo con el margen
+  de cada casa y algo de ruido; faltan algunas cuotas y el xG de las
+  primeras temporadas, como en los datos importados
+
+SQLiteConnection imita la conexión de mysql.connector (cursor(dictionary=True),
+%s como marcador, DATE_SUB, NOW, SHOW TABLES LIKE...) para que las funciones
+que reciben una conexión funcionen sin cambios.
+
+Uso:
+    python3 synthetic_league.py <partidos> <ruta.sqlite> [semilla] [prefijo_tablas]
+"""
+
+import re
+import sys
+import json
+import sqlite3
+import numpy as np
+import pandas as pd
+
+# División -> número de equipos
+DIVISIONS = {'E0': 20, 'E1': 24, 'SP1': 20, 'I1': 20, 'D1': 18}
+
+FIRST_SEASON = 2010
+# Temporadas iniciales sin xG (los proveedores no lo publicaban)
+SEASONS_WITHOUT_XG = 3
+SEASON_DAYS = 290
+
+MATCH_COLUMNS = [
+    ('id', 'INTEGER PRIMARY KEY'),
+    ('division', 'TEXT'),
+    ('date', 'DATE'),
+    ('home_team', 'TEXT'),
+    ('away_team', 'TEXT'),
+    ('fthg', 'INTEGER'), ('ftag', 'INTEGER'), ('ftr', 'TEXT'),
+    ('hthg', 'INTEGER'), ('htag', 'INTEGER'), ('htr', 'TEXT'),
+    ('hs', 'INTEGER'), ('as_shots', 'INTEGER'),
+    ('hst', 'INTEGER'), ('ast', 'INTEGER'),
+    ('hhw', 'INTEGER'), ('ahw', 'INTEGER'),
+    ('hc', 'INTEGER'), ('ac', 'INTEGER'),
+    ('hf', 'INTEGER'), ('af', 'INTEGER'),
+    ('hy', 'INTEGER'), ('ay', 'INTEGER'),
+    ('hr', 'INTEGER'), ('ar', 'INTEGER'),
+    ('home_xg', 'REAL'), ('away_xg', 'REAL'),
+    ('b365h', 'REAL'), ('b365d', 'REAL'), ('b365a', 'REAL'),
+    ('bwh', 'REAL'), ('bwd', 'REAL'), ('bwa', 'REAL'),
+    ('data_source', 'TEXT'), ('sport', 'TEXT'), ('season', 'TEXT'),
+    ('created_at', 'TEXT'), ('updated_at', 'TEXT'),
+]
+
+# Los mismos índices que la tabla de MySQL (football-tipster.php)
+MATCH_INDEXES = {
+    'idx_date': '(date)',
+    'idx_teams': '(home_team, away_team)',
+    'idx_season': '(season)',
+}
+
+MAX_GOALS = 12
+
+
+def _poisson_pmf(lam, max_goals=MAX_GOALS):
+    """P(goles = k) para k = 0..max_goals, una fila por partido"""
+    pmf = np.empty((len(lam), max_goals + 1))
+    pmf[:, 0] = np.exp(-lam)
+    for k in range(1, max_goals + 1):
+        pmf[:, k] = pmf[:, k - 1] * lam / k
+    return pmf
+
+
+def outcome_probabilities(lam_home, lam_away):
+    """Probabilidades (local, empate, visitante) del modelo de Poisson"""
+    pmf_home = _poisson_pmf(lam_home)
+    pmf_away = _poisson_pmf(lam_away)
+    cdf_away = np.cumsum(pmf_away, axis=1)
+
+    draw = np.sum(pmf_home * pmf_away, axis=1)
+    # Local gana con i goles si el visitante marca i - 1 o menos
+    home = np.sum(pmf_home[:, 1:] * cdf_away[:, :-1], axis=1)
+    away = np.clip(1.0 - home - draw, 0.0, 1.0)
+    return home, draw, away
+
+
+def _bookmaker_odds(rng, probabilities, margin, noise, missing):
+    odds = []
+    for p in probabilities:
+        price = 1.0 / (p * margin * np.exp(rng.normal(0.0, noise, len(p))))
+        odds.append(np.round(np.maximum(price, 1.01), 2))
+    absent = rng.random_sample(len(probabilities[0])) < missing
+    return [np.where(absent, np.nan, o) for o in odds]
+
+
+def _result(home_goals, away_goals):
+    return np.where(home_goals > away_goals, 'H', np.where(home_goals < away_goals, 'A', 'D'))
+
+
+def _round_robin(size, rng):
+    """
+    Calendario a doble vuelta por el método del círculo: arrays (local,
+    visitante, jornada) en los que cada equipo juega como mucho una vez por
+    jornada. Con un número impar de equipos, el que cae contra el hueco
+    descansa esa jornada
+    """
+    slots = list(rng.permutation(size)) + ([None] if size % 2 else [])
+    n_slots = len(slots)
+    home, away, rounds = [], [], []
+    for rnd in range(n_slots - 1):
+        for k in range(n_slots // 2):
+            first, second = slots[k], slots[n_slots - 1 - k]
+            if first is None or second is None:
+                continue
+            # Alternar campo para que nadie juegue siempre en casa
+            if (rnd + k) % 2:
+                first, second = second, first
+            home.append(first)
+            away.append(second)
+            rounds.append(rnd)
+        # El primero queda fijo y el resto gira una posición
+        slots = [slots[0], slots[-1]] + slots[1:-1]
+
+    # Segunda vuelta: los mismos cruces con el campo cambiado
+    first_half = n_slots - 1
+    home, away = np.array(home + away), np.array(away + home)
+    rounds = np.array(rounds + [rnd + first_half for rnd in rounds])
+    return home, away, rounds, 2 * first_half
+
+
+def generate_matches(n_matches, divisions=None, first_season=FIRST_SEASON, seed=0):
+    """
+    DataFrame de n_matches partidos con las columnas de ft_matches_advanced,
+    en orden de fecha e ids consecutivos
+    """
+    rng = np.random.RandomState(seed)
+    divisions = divisions or DIVISIONS
+
+    teams = {division: np.array([f"{division} Team {k + 1:02d}" for k in range(size)])
+             for division, size in divisions.items()}
+    attack = {division: rng.normal(0.0, 0.25, size) for division, size in divisions.items()}
+    defence = {division: rng.normal(0.0, 0.2, size) for division, size in divisions.items()}
+
+    blocks = []
+    total = 0
+    season = first_season
+    while total < n_matches:
+        season_start = np.datetime64(f"{season}-08-01").astype(np.int64)
+        for division, size in divisions.items():
+            # Doble vuelta por jornadas: cada equipo juega como mucho un
+            # partido por día, como en un calendario real
+            home, away, rounds, n_rounds = _round_robin(size, rng)
+            days = season_start + rounds * (SEASON_DAYS // n_rounds)
+            lam_home = np.exp(0.30 + attack[division][home] - defence[division][away])
+            lam_away = np.exp(0.05 + attack[division][away] - defence[division][home])
+            blocks.append({
+                'division': np.full(len(home), division),
+                'season': np.full(len(home), f"{season}-{season + 1}"),
+                'season_number': np.full(len(home), season - first_season),
+                'home_team': teams[division][home],
+                'away_team': teams[division][away],
+                'day': days,
+                'lam_home': lam_home,
+                'lam_away': lam_away,
+            })
+            total += len(home)
+
+        # La forma de los equipos cambia algo de una temporada a otra
+        for division, size in divisions.items():
+            attack[division] = 0.8 * attack[division] + rng.normal(0.0, 0.12, size)
+            defence[division] = 0.8 * defence[division] + rng.normal(0.0, 0.1, size)
+        season += 1
+
+    columns = {name: np.concatenate([block[name] for block in blocks]) for name in blocks[0]}
+    order = np.argsort(columns['day'], kind='stable')[:n_matches]
+    columns = {name: values[order] for name, values in columns.items()}
+    n = len(order)
+    lam_home = columns['lam_home']
+    lam_away = columns['lam_away']
+
+    fthg = rng.poisson(lam_home)
+    ftag = rng.poisson(lam_away)
+    hthg = rng.binomial(fthg, 0.45)
+    htag = rng.binomial(ftag, 0.45)
+
+    # Tiros a puerta >= goles y tiros >= tiros a puerta
+    hst = np.maximum(rng.binomial(rng.poisson(7 + 4 * lam_home), 0.35) + fthg // 2, fthg)
+    ast = np.maximum(rng.binomial(rng.poisson(7 + 4 * lam_away), 0.35) + ftag // 2, ftag)
+    hs = hst + rng.poisson(6 + 2 * lam_home)
+    as_shots = ast + rng.poisson(6 + 2 * lam_away)
+
+    without_xg = (columns['season_number'] < SEASONS_WITHOUT_XG) | (rng.random_sample(n) < 0.1)
+    home_xg = np.where(without_xg, np.nan, np.round(lam_home * rng.gamma(8.0, 1 / 8.0, n), 2))
+    away_xg = np.where(without_xg, np.nan, np.round(lam_away * rng.gamma(8.0, 1 / 8.0, n), 2))
+
+    probabilities = outcome_probabilities(lam_home, lam_away)
+    b365h, b365d, b365a = _bookmaker_odds(rng, probabilities, 1.05, 0.03, 0.03)
+    bwh, bwd, bwa = _bookmaker_odds(rng, probabilities, 1.07, 0.04, 0.10)
+
+    dates = columns['day'].astype('datetime64[D]')
+    timestamps = pd.Series(dates.astype(str)) + ' 12:00:00'
+
+    return pd.DataFrame({
+        'id': np.arange(1, n + 1),
+        'division': columns['division'],
+        'date': dates.astype(str),
+        'home_team': columns['home_team'],
+        'away_team': columns['away_team'],
+        'fthg': fthg, 'ftag': ftag, 'ftr': _result(fthg, ftag),
+        'hthg': hthg, 'htag': htag, 'htr': _result(hthg, htag),
+        'hs': hs, 'as_shots': as_shots,
+        'hst': hst, 'ast': ast,
+        'hhw': rng.poisson(0.15, n), 'ahw': rng.poisson(0.12, n),
+        'hc': rng.poisson(3.5 + 1.5 * lam_home), 'ac': rng.poisson(3.0 + 1.5 * lam_away),
+        'hf': rng.poisson(11.0, n), 'af': rng.poisson(11.8, n),
+        'hy': rng.poisson(1.6, n), 'ay': rng.poisson(1.9, n),
+        'hr': rng.binomial(1, 0.05, n), 'ar': rng.binomial(1, 0.07, n),
+        'home_xg': home_xg, 'away_xg': away_xg,
+        'b365h': b365h, 'b365d': b365d, 'b365a': b365a,
+        'bwh': bwh, 'bwd': bwd, 'bwa': bwa,
+        'data_source': 'synthetic',
+        'sport': 'football',
+        'season': columns['season'],
+        'created_at': timestamps.values,
+        'updated_at': timestamps.values,
+    }, columns=[name for name, _ in MATCH_COLUMNS])
+
+
+# ---------------------------------------------------------------------- #
+# Sustituto SQLite de la conexión de mysql.connector
+# ---------------------------------------------------------------------- #
+
+_DATE_SUB = re.compile(r"DATE_SUB\(\s*([^,()]+?)\s*,\s*INTERVAL\s+(\d+)\s+(DAY|MONTH|YEAR)\s*\)", re.IGNORECASE)
+_SHOW_TABLES = re.compile(r"SHOW\s+TABLES\s+LIKE\s+('[^']*')", re.IGNORECASE)
+
+
+def translate_sql(query):
+    """Dialecto MySQL de los scripts -> SQLite"""
+    query = _SHOW_TABLES.sub(r"SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE \1", query)
+    query = _DATE_SUB.sub(lambda m: f"date({m.group(1)}, '-{m.group(2)} {m.group(3).lower()}s')", query)
+    query = re.sub(r"\bNOW\(\)", "datetime('now')", query, flags=re.IGNORECASE)
+    query = re.sub(r"\bCURDATE\(\)", "date('now')", query, flags=re.IGNORECASE)
+    return query.replace('%s', '?')
+
+
+def _parameters(params):
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return params
+    # sqlite3 no adapta los tipos de NumPy
+    return tuple(p.item() if isinstance(p, np.generic) else p for p in params)
+
+
+class SQLiteCursor:
+    """Cursor con la interfaz de mysql.connector sobre sqlite3"""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self.dictionary = dictionary
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def execute(self, query, params=None):
+        self._cursor.execute(translate_sql(query), _parameters(params))
+
+    def executemany(self, query, seq_params):
+        self._cursor.executemany(translate_sql(query), [_parameters(p) for p in seq_params])
+
+    def _row(self, row):
+        if row is None or not self.dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return (self._row(row) for row in self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """
+    Sustituto en memoria (o en fichero) de la conexión MySQL
+    """
+
+    def __init__(self, path=':memory:'):
+        self.connection = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES,
+                                          check_same_thread=False)
+        self.connected = True
+
+    def cursor(self, dictionary=False, buffered=None):
+        return SQLiteCursor(self.connection.cursor(), dictionary)
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        if not self.connected:
+            raise sqlite3.ProgrammingError('Conexión cerrada')
+
+    def is_connected(self):
+        return self.connected
+
+    def close(self):
+        if self.connected:
+            self.connection.close()
+            self.connected = False
+
+
+def create_matches_table(connection, table_name):
+    cursor = connection.cursor()
+    columns = ', '.join(f"{name} {kind}" for name, kind in MATCH_COLUMNS)
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({columns})")
+    for index, definition in MATCH_INDEXES.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {table_name}_{index} ON {table_name} {definition}")
+    cursor.close()
+
+
+def insert_matches(connection, table_name, df, batch_size=10000):
+    """Inserta el DataFrame de generate_matches() (NaN -> NULL)"""
+    columns = [name for name, _ in MATCH_COLUMNS]
+    rows = df[columns].astype(object).where(df[columns].notna(), None).values.tolist()
+    cursor = connection.cursor()
+    query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    for start in range(0, len(rows), batch_size):
+        cursor.executemany(query, rows[start:start + batch_size])
+    connection.commit()
+    cursor.close()
+
+
+def create_database(n_matches, path=':memory:', table_prefix='wp_', seed=0, divisions=None):
+    """
+    Conexión SQLite con la tabla <prefijo>ft_matches_advanced ya rellena
+
+    Devuelve (conexión, DataFrame de los partidos generados)
+    """
+    df = generate_matches(n_matches, divisions, seed=seed)
+    connection = SQLiteConnection(path)
+    table_name = f"{table_prefix}ft_matches_advanced"
+    create_matches_table(connection, table_name)
+    insert_matches(connection, table_name, df)
+    return connection, df
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(json.dumps({'error': 'Uso: synthetic_league.py <partidos> <ruta.sqlite> [semilla] [prefijo_tablas]'}))
+        return
+
+    try:
+        n_matches = int(sys.argv[1])
+        seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+        table_prefix = sys.argv[4] if len(sys.argv) > 4 else 'wp_'
+
+        connection, df = create_database(n_matches, sys.argv[2], table_prefix, seed)
+        connection.close()
+
+        print(json.dumps({
+            'success': True,
+            'path': sys.argv[2],
+            'table': f"{table_prefix}ft_matches_advanced",
+            'matches': len(df),
+            'seasons': sorted(df['season'].unique().tolist()),
+            'divisions': sorted(df['division'].unique().tolist()),
+            'result_distribution': df['ftr'].value_counts(normalize=True).round(3).to_dict(),
+        }))
+    except Exception as e:
+        print(json.dumps({'error': str(e)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Barrido de umbrales sobre backtests guardados
+
+benchmark_season.py guarda, para cada temporada / modelo / liga, la matriz de
+probabilidades del modelo, las cuotas y el resultado real de cada partido
+(cache/backtests/*.npz). Con eso se puede evaluar cualquier configuración de
+ft_value_config SIN reentrenar.
+
+El barrido evalúa a la vez toda una rejilla de configuraciones: cada
+parámetro es un array (G, 1) que se combina por broadcasting con los
+partidos (1, n). Además de los criterios del benchmark incluye las reglas
+que el bucle original no aplicaba:
+
+- stake_system: fixed (base_unit), variable (stake 1-5 de calculate_stake)
+  o kelly (Kelly fraccionario como FT_Value_Analyzer::calculate_kelly_stake,
+  sobre el bankroll inicial para que cada configuración sea independiente
+  del orden de evaluación)
+- max_daily_bets: como mucho N apuestas por día, en orden de partido
+- stop_loss_daily: se deja de apostar ese día al alcanzar la pérdida
+
+Devuelve por configuración ROI, beneficio, nº de apuestas y máximo drawdown.
+
+Uso:
+    python3 threshold_sweep.py <temporada> <tipo_modelo> [liga] ['<rejilla_json>']
+
+    rejilla_json: {"min_value": [5, 10], "stake_system": ["fixed", "kelly"], ...}
+
+    Las unidades son las de ft_value_config: min_value y max_stake_percentage
+    en porcentaje (5 = 5%), min_confidence y kelly_fraction como fracción.
+"""
+
+import os
+import sys
+import json
+import time
+import itertools
+import numpy as np
+
+from betting_simulation import calculate_stakes
+from instrumentation import report, stage, start_profiling
+
+BACKTEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'backtests')
+
+INITIAL_BANKROLL = 1000
+
+# Rejilla por defecto: rangos habituales de ft_value_config, en sus mismas
+# unidades (min_value y max_stake_percentage en porcentaje)
+DEFAULT_GRID = {
+    'min_value': [5.0, 10.0, 15.0, 20.0],
+    'min_confidence': [0.35, 0.40, 0.45, 0.50],
+    'min_odds': [1.6],
+    'max_odds': [3.0, 4.0, 6.0],
+    'stake_system': ['fixed', 'variable', 'kelly'],
+    'kelly_fraction': [0.25],
+    'max_stake_percentage': [5.0],
+    'base_unit': [10],
+    'max_daily_bets': [0],
+    'stop_loss_daily': [0],
+}
+
+STAKE_SYSTEMS = ['fixed', 'variable', 'kelly']
+
+# Configuraciones evaluadas a la vez (acota la memoria de los arrays (G, n, 3))
+DEFAULT_BLOCK_SIZE = 256
+
+
+def backtest_path(season, model_type, league=None, backtest_dir=BACKTEST_DIR):
+    name = f"{season}_{model_type}_{league or 'all'}"
+    name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+    return os.path.join(backtest_dir, name + '.npz')
+
+
+def save_backtest(season, model_type, league, dates, probabilities, odds, results,
+                  backtest_dir=BACKTEST_DIR):
+    """Guardar probabilidades, cuotas (A, D, H) y resultados de un backtest"""
+    os.makedirs(backtest_dir, exist_ok=True)
+    path = backtest_path(season, model_type, league, backtest_dir)
+    tmp = path + f".tmp{os.getpid()}.npz"
+    np.savez(
+        tmp,
+        days=np.array(dates, dtype='datetime64[D]').astype(np.int64),
+        probabilities=np.asarray(probabilities, dtype=np.float64),
+        odds=np.asarray(odds, dtype=np.float64),
+        results=np.asarray(results, dtype=np.int8),
+    )
+    os.replace(tmp, path)
+    return path
+
+
+def load_backtest(season, model_type, league=None, backtest_dir=BACKTEST_DIR):
+    with np.load(backtest_path(season, model_type, league, backtest_dir)) as data:
+        return {name: data[name] for name in data.files}
+
+
+def expand_grid(grid):
+    """Producto cartesiano de la rejilla -> dict de arrays (G,)"""
+    grid = dict(DEFAULT_GRID, **(grid or {}))
+    names = list(grid)
+    combos = list(itertools.product(*(grid[name] for name in names)))
+    configs = {name: [combo[i] for combo in combos] for i, name in enumerate(names)}
+
+    unknown = set(configs['stake_system']) - set(STAKE_SYSTEMS)
+    if unknown:
+        raise ValueError(f"stake_system desconocido: {', '.join(sorted(unknown))}")
+    return configs
+
+
+def _within_day_cumsum(values, day_start):
+    """Suma acumulada (G, n) que se reinicia en cada cambio de día"""
+    total = np.cumsum(values, axis=1)
+    before_day = np.concatenate([np.zeros((values.shape[0], 1)), total[:, :-1]], axis=1)
+    return total - np.take(before_day, day_start, axis=1)
+
+
+def _evaluate_block(backtest, configs):
+    probabilities = backtest['probabilities'][None, :, :]
+    odds = backtest['odds'][None, :, :]
+    results = backtest['results']
+    days = backtest['days']
+    n = len(results)
+
+    def param(name, dtype=np.float64):
+        return np.asarray(configs[name], dtype=dtype)[:, None, None]
+
+    # 1. Selección de la mejor apuesta de cada partido (igual que select_bets)
+    valid_odds = np.isfinite(odds) & (odds != 0)
+    has_odds = np.all(valid_odds, axis=2, keepdims=True)
+    values = probabilities - 1 / np.where(valid_odds, odds, 1.0)
+    eligible = (
+        has_odds
+        & (param('min_odds') <= odds) & (odds <= param('max_odds'))
+        & (probabilities >= param('min_confidence'))
+        & (values > -1)
+        & (values >= param('min_value') / 100)
+    )
+    candidate = np.where(eligible, values, -np.inf)
+    bet = np.argmax(candidate, axis=2)
+    placed = eligible.any(axis=2)
+
+    pick = bet[:, :, None]
+    bet_value = np.take_along_axis(np.broadcast_to(values, eligible.shape), pick, axis=2)[:, :, 0]
+    bet_odds = np.take_along_axis(np.broadcast_to(odds, eligible.shape), pick, axis=2)[:, :, 0]
+    bet_prob = np.take_along_axis(np.broadcast_to(probabilities, eligible.shape), pick, axis=2)[:, :, 0]
+
+    # 2. Stake según el sistema
+    base_unit = param('base_unit')[:, :, 0]
+    system = np.asarray(configs['stake_system'])[:, None]
+    b = np.where(bet_odds > 1, bet_odds - 1, 1.0)
+    kelly = np.where(bet_odds > 1, (b * bet_prob - (1 - bet_prob)) / b, 0.0)
+    kelly = np.clip(kelly, 0, param('max_stake_percentage')[:, :, 0] / 100)
+    stakes = np.select(
+        [system == 'fixed', system == 'variable'],
+        [np.broadcast_to(base_unit, placed.shape),
+         base_unit * calculate_stakes(bet_value, bet_prob)],
+        default=INITIAL_BANKROLL * kelly * param('kelly_fraction')[:, :, 0]
+    )
+    placed &= stakes > 0
+
+    won = bet == results[None, :]
+    profit = np.where(won, stakes * (bet_odds - 1), -stakes)
+
+    # 3. Límites diarios (0 = sin límite)
+    day_change = np.concatenate([[True], days[1:] != days[:-1]])
+    day_start = np.maximum.accumulate(np.where(day_change, np.arange(n), 0))
+
+    max_daily = param('max_daily_bets', np.int64)[:, :, 0]
+    daily_rank = _within_day_cumsum(placed.astype(np.float64), day_start)
+    placed &= (max_daily <= 0) | (daily_rank <= max_daily)
+
+    stop_loss = param('stop_loss_daily')[:, :, 0]
+    daily_pl = _within_day_cumsum(np.where(placed, profit, 0.0), day_start)
+    hit_stop = (stop_loss > 0) & (daily_pl <= -stop_loss)
+    # Apuestas posteriores a la que alcanza el stop loss dentro del mismo día
+    stops_before = _within_day_cumsum(hit_stop.astype(np.float64), day_start) - hit_stop
+    placed &= stops_before == 0
+
+    # 4. Bankroll, ROI y drawdown
+    profit = np.where(placed, profit, 0.0)
+    staked = np.where(placed, stakes, 0.0)
+    bankroll = INITIAL_BANKROLL + np.cumsum(profit, axis=1)
+    peak = np.maximum(np.maximum.accumulate(bankroll, axis=1), INITIAL_BANKROLL)
+    drawdown = (peak - bankroll) / peak
+
+    total_bets = placed.sum(axis=1)
+    total_stakes = staked.sum(axis=1)
+    total_profit = profit.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roi = np.where(total_stakes > 0, total_profit / total_stakes * 100, 0.0)
+        win_rate = np.where(total_bets > 0, (won & placed).sum(axis=1) / total_bets, 0.0)
+
+    return {
+        'total_bets': total_bets,
+        'total_stakes': total_stakes,
+        'profit_loss': total_profit,
+        'final_bankroll': bankroll[:, -1] if n else np.full(len(total_bets), INITIAL_BANKROLL),
+        'roi': roi,
+        'win_rate': win_rate,
+        'max_drawdown': drawdown.max(axis=1) if n else np.zeros(len(total_bets)),
+    }
+
+
+def sweep(backtest, grid=None, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Evaluar toda la rejilla sobre un backtest
+
+    Devuelve (configs, métricas) con un array (G,) por nombre
+    """
+    configs = expand_grid(grid)
+    size = len(configs['stake_system'])
+
+    metrics = {}
+    for start in range(0, size, block_size):
+        block = {name: values[start:start + block_size] for name, values in configs.items()}
+        for name, values in _evaluate_block(backtest, block).items():
+            metrics.setdefault(name, []).append(values)
+
+    return configs, {name: np.concatenate(parts) for name, parts in metrics.items()}
+
+
+def surface(configs, metrics):
+    """Lista de configuraciones con sus métricas, ordenada por ROI"""
+    rows = []
+    for i in range(len(configs['stake_system'])):
+        row = {name: values[i] for name, values in configs.items()}
+        row.update({
+            'total_bets': int(metrics['total_bets'][i]),
+            'total_stakes': round(float(metrics['total_stakes'][i]), 2),
+            'profit_loss': round(float(metrics['profit_loss'][i]), 2),
+            'final_bankroll': round(float(metrics['final_bankroll'][i]), 2),
+            'roi': round(float(metrics['roi'][i]), 1),
+            'win_rate': round(float(metrics['win_rate'][i]), 4),
+            'max_drawdown': round(float(metrics['max_drawdown'][i]), 4),
+        })
+        rows.append(row)
+
+    rows.sort(key=lambda r: (r['roi'], -r['max_drawdown']), reverse=True)
+    return rows
+
+
+def main():
+    start_profiling()
+    try:
+        if len(sys.argv) < 3:
+            print(json.dumps({"error": "Uso: threshold_sweep.py <temporada> <tipo_modelo> [liga] [rejilla_json]"}))
+            return
+
+        season = sys.argv[1]
+        model_type = sys.argv[2]
+        league = sys.argv[3] if len(sys.argv) > 3 and sys.argv[3] != 'all' else None
+        grid = json.loads(sys.argv[4]) if len(sys.argv) > 4 else None
+
+        try:
+            with stage('load'):
+                backtest = load_backtest(season, model_type, league)
+        except FileNotFoundError:
+            print(json.dumps({"error": f"No hay backtest guardado para {season} / {model_type}. Ejecuta antes benchmark_season.py"}))
+            return
+
+        start = time.time()
+        with stage('simulate'):
+            configs, metrics = sweep(backtest, grid)
+            rows = surface(configs, metrics)
+
+        print(json.dumps({
+            'season': season,
+            'model_type': model_type,
+            'league': league or 'all',
+            'matches': int(len(backtest['results'])),
+            'configurations': len(rows),
+            'elapsed_seconds': round(time.time() - start, 3),
+            'best': rows[0] if rows else None,
+            'surface': rows,
+            'timings': report()
+        }))
+
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+
+
+if __name__ == "__main__":
+    main()
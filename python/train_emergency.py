@@ -20,6 +20,8 @@ if plugin_libs not in sys.path:
 
 import mysql.connector
 
+from match_loader import load_matches
+
 print("🚀 Script de entrenamiento de emergencia iniciado")
 
 try:
@@ -45,16 +47,17 @@ try:
         database=config["database"]
     )
     
-    # Cargar datos
+    # Cargar datos (solo columnas usadas, por bloques y con tipos compactos)
     print("📥 Cargando datos...")
-    query = """
-    SELECT * FROM wp_ft_matches_advanced 
-    WHERE fthg IS NOT NULL 
-    AND ftag IS NOT NULL
-    AND hs IS NOT NULL
-    """
-    
-    df = pd.read_sql(query, conn)
+    data = load_matches(
+        conn,
+        "wp_ft_matches_advanced",
+        ["home_team", "away_team", "ftr", "fthg", "ftag",
+         "hs", "as_shots", "hst", "ast", "hc", "ac"],
+        where="fthg IS NOT NULL AND ftag IS NOT NULL AND hs IS NOT NULL",
+        order_by=None
+    )
+    df = data.to_dataframe()
     conn.close()
     
     print(f"✅ {len(df)} partidos cargados")
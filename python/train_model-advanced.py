@@ -9,13 +9,25 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
-import joblib
 import mysql.connector
 from datetime import datetime, timedelta
-import json
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+from instrumentation import instrument_connection, stage, start_profiling, summary_lines
+from incremental_training import (
+    MIN_NEW_MATCHES, grow_forest, load_previous_artifact, load_previous_model,
+    make_watermark, publish_model, training_watermark
+)
+
+MODEL_PATH = '../models/football_rf_advanced.pkl'
+SCALER_PATH = '../models/scaler.pkl'
+METADATA_PATH = '../models/model_metadata.json'
+
+# Tope de árboles en modo incremental (se descartan los más antiguos)
+MAX_TREES = 400
+
 class AdvancedFootballPredictor:
     """
     Clase principal para el predictor avanzado
@@ -39,22 +51,26 @@ class AdvancedFootballPredictor:
         Conecta a la base de datos MySQL
         Similar a $wpdb en WordPress
         """
-        return mysql.connector.connect(
+        return instrument_connection(mysql.connector.connect(
             host=self.db_config['host'],
             user=self.db_config['user'],
             password=self.db_config['password'],
             database=self.db_config['database']
-        )
+        ))
     
-    def load_match_data(self):
+    def load_match_data(self, after_id=None):
         """
         Carga todos los datos de partidos con estadísticas avanzadas
+        
+        Args:
+            after_id: solo partidos con id mayor (modo incremental); las
+                      subconsultas se calculan entonces solo para ellos
         """
         connection = self.connect_db()
         
         # Query SQL compleja para obtener todos los datos necesarios
         # Incluye estadísticas históricas de los últimos 5 partidos
-        query = """
+        query = f"""
         SELECT 
             m.*,
             -- Estadísticas del equipo local en últimos 5 partidos
@@ -104,19 +120,24 @@ class AdvancedFootballPredictor:
         WHERE m.fthg IS NOT NULL 
         AND m.ftag IS NOT NULL
         AND m.date > DATE_SUB(NOW(), INTERVAL 5 YEAR)
+        {"AND m.id > %s" if after_id is not None else ""}
         ORDER BY m.date
         """
         
         # Cargar datos en DataFrame (como array asociativo en PHP)
-        df = pd.read_sql(query, connection)
+        df = pd.read_sql(query, connection, params=(after_id,) if after_id is not None else None)
         connection.close()
         
         return df
     
-    def create_features(self, df):
+    def create_features(self, df, feature_names=None):
         """
         Crea características (features) para el modelo
         Transforma datos brutos en información útil para predicción
+        
+        Args:
+            feature_names: lista fija de características (la del modelo ya
+                           publicado en modo incremental)
         """
         
         # Crear nuevas características calculadas
@@ -165,15 +186,18 @@ class AdvancedFootballPredictor:
             'home_xg_diff', 'away_xg_diff'
         ]
         
-     # Eliminar características que no existen o tienen muchos NaN
-        available_features = []
-        for feature in self.feature_names:
-            if feature in df.columns:
-                # Verificar que no más del 50% sean valores nulos
-                if df[feature].notna().sum() / len(df) > 0.5:
-                    available_features.append(feature)
-        
-        self.feature_names = available_features
+        if feature_names is not None:
+            self.feature_names = list(feature_names)
+        else:
+            # Eliminar características que no existen o tienen muchos NaN
+            available_features = []
+            for feature in self.feature_names:
+                if feature in df.columns:
+                    # Verificar que no más del 50% sean valores nulos
+                    if df[feature].notna().sum() / len(df) > 0.5:
+                        available_features.append(feature)
+            
+            self.feature_names = available_features
         
         # Rellenar valores faltantes con la media
         # En PHP: $df[$feature] = $df[$feature] ?? $promedio;
@@ -187,10 +211,12 @@ class AdvancedFootballPredictor:
         Entrena el modelo Random Forest
         """
         print("🔄 Cargando datos...")
-        df = self.load_match_data()
+        with stage('load'):
+            df = self.load_match_data()
         
         print("🔧 Creando características...")
-        df = self.create_features(df)
+        with stage('features'):
+            df = self.create_features(df)
         
         # Preparar datos para entrenamiento
         # X = características, y = resultado
@@ -199,6 +225,8 @@ class AdvancedFootballPredictor:
         
         # Normalizar datos (importante para mejor rendimiento)
         X_scaled = self.scaler.fit_transform(X)
+        self.training_ids = df['id'].to_numpy()
+        self.training_data = (X_scaled, y)
         
         # Dividir en entrenamiento y prueba (80/20)
         X_train, X_test, y_train, y_test = train_test_split(
@@ -219,7 +247,8 @@ class AdvancedFootballPredictor:
         )
         
         # Entrenar
-        self.model.fit(X_train, y_train)
+        with stage('fit'):
+            self.model.fit(X_train, y_train)
         
         # Evaluar
         print("\n📊 Evaluación del modelo:")
@@ -241,7 +270,8 @@ class AdvancedFootballPredictor:
         self.analyze_feature_importance()
         
         # Guardar modelo
-        self.save_model()
+        with stage('save'):
+            self.save_model()
         
         return accuracy
     
@@ -258,31 +288,78 @@ class AdvancedFootballPredictor:
     
     def save_model(self):
         """
-        Guarda el modelo y metadatos
+        Guarda el modelo, el escalador y los metadatos
         """
-        # Guardar modelo
-        joblib.dump(self.model, '../models/football_rf_advanced.pkl')
-        
-        # Guardar escalador
-        joblib.dump(self.scaler, '../models/scaler.pkl')
+        # Precisión sobre todos los partidos ya cargados en train()
+        X_scaled, y = self.training_data
         
-        # Guardar metadatos
         metadata = {
+            'trainer': 'train_model-advanced',
             'features': self.feature_names,
             'training_date': datetime.now().isoformat(),
             'model_params': self.model.get_params(),
             'performance': {
-                'accuracy': float(self.model.score(
-                    self.scaler.transform(self.load_match_data()[self.feature_names]),
-                    self.load_match_data()['ftr']
-                ))
-            }
+                'accuracy': float(self.model.score(X_scaled, y))
+            },
+            'training_watermark': make_watermark(self.training_ids)
         }
         
-        with open('../models/model_metadata.json', 'w') as f:
-            json.dump(metadata, f, indent=4)
+        # Modelo + versión compilada (solo NumPy) + escalador + metadatos,
+        # publicados de forma atómica
+        publish_model(self.model, MODEL_PATH, metadata, METADATA_PATH,
+                      self.feature_names, {SCALER_PATH: self.scaler})
         
         print("\n✅ Modelo guardado exitosamente!")
+    
+    def update_incremental(self):
+        """
+        Añade al modelo publicado árboles entrenados solo con los partidos
+        posteriores a su marca de agua. Devuelve False si hay que hacer un
+        entrenamiento completo.
+        """
+        model, metadata = load_previous_model(MODEL_PATH, METADATA_PATH)
+        scaler = None
+        if model is not None and metadata.get('trainer') == 'train_model-advanced':
+            scaler = load_previous_artifact(MODEL_PATH, metadata, SCALER_PATH)
+        if scaler is None:
+            print("⚠️  No hay modelo previo de este script con marca de agua: entrenamiento completo")
+            return False
+        
+        watermark = training_watermark(metadata)
+        print(f"🔄 Cargando partidos posteriores al id {watermark}...")
+        with stage('load'):
+            df = self.load_match_data(after_id=watermark)
+        print(f"🆕 Partidos nuevos: {len(df)}")
+        
+        if len(df) < MIN_NEW_MATCHES:
+            print("✅ Modelo al día, no hace falta actualizarlo")
+            return True
+        
+        with stage('features'):
+            df = self.create_features(df, metadata['features'])
+        self.model = model
+        self.scaler = scaler
+        
+        with stage('fit'):
+            added = grow_forest(self.model, self.scaler.transform(df[self.feature_names]), df['ftr'],
+                                max_trees=MAX_TREES)
+        if not added:
+            print("⚠️  Los partidos nuevos no incluyen todos los resultados: entrenamiento completo")
+            return False
+        
+        metadata.update({
+            'training_date': datetime.now().isoformat(),
+            'model_params': self.model.get_params(),
+            'training_watermark': make_watermark(df['id'].to_numpy(), watermark),
+            'incremental_updates': metadata.get('incremental_updates', 0) + 1,
+            'last_update_matches': len(df)
+        })
+        with stage('save'):
+            publish_model(self.model, MODEL_PATH, metadata, METADATA_PATH, self.feature_names)
+        
+        print(f"🌲 Añadidos {added} árboles ({len(self.model.estimators_)} en total)")
+        print("\n✅ Modelo actualizado exitosamente!")
+        return True
 
 # Configuración de base de datos - obtener de wp-config.php
 db_config = {
@@ -294,5 +371,11 @@ db_config = {
 
 # Ejecutar si se llama directamente
 if __name__ == "__main__":
+    start_profiling()
     predictor = AdvancedFootballPredictor(db_config)
-    predictor.train()
\ No newline at end of file
+    
+    # --incremental: solo los partidos importados desde el último entrenamiento
+    if '--incremental' not in sys.argv or not predictor.update_incremental():
+        predictor.train()
+    for line in summary_lines():
+        print(f"⏱️  {line}")
\ No newline at end of file
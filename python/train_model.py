@@ -26,7 +26,6 @@ import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
-import joblib
 import mysql.connector
 from datetime import datetime
 import json
@@ -35,12 +34,26 @@ import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
-import joblib
 import mysql.connector
 from datetime import datetime
 
-def connect_database():
-    """Conectar a la base de datos WordPress"""
+from match_cache import load_matches_cached
+from match_loader import matches_table
+from incremental_training import (
+    MIN_NEW_MATCHES, grow_forest, load_previous_model, make_watermark,
+    publish_model, training_watermark
+)
+from instrumentation import instrument_connection, stage, start_profiling, summary_lines
+
+MODELS_DIR = '../models'
+MODEL_PATH = os.path.join(MODELS_DIR, 'football_model.pkl')
+METADATA_PATH = os.path.join(MODELS_DIR, 'football_metadata.json')
+
+# Tope de árboles en modo incremental (se descartan los más antiguos)
+MAX_TREES = 300
+
+def load_database_config():
+    """Configuración de la base de datos WordPress"""
     
     # Intentar leer configuración temporal
     config_file = 'db_config_temp.json'
@@ -56,71 +69,101 @@ def connect_database():
             'database': 'wordpress'
         }
     
-    return mysql.connector.connect(**config)
+    return config
+
+def connect_database(config=None):
+    """Conectar a la base de datos WordPress"""
+    config = dict(config or load_database_config())
+    config.pop('table_prefix', None)
+    return instrument_connection(mysql.connector.connect(**config))
+def cumulative_team_stats(matches, team_col, win_result, goals_for_col, goals_against_col):
+    """
+    Estadísticas acumuladas de cada equipo ANTES de la fecha de cada partido
+    
+    Equivale a las subconsultas correlacionadas "m2.date < m.date": se agrega
+    por (equipo, fecha), se acumula por equipo y se resta el propio día para
+    no contar partidos de la misma fecha.
+    """
+    goals_for = pd.to_numeric(matches[goals_for_col], errors='coerce')
+    goals_against = pd.to_numeric(matches[goals_against_col], errors='coerce')
+    
+    daily = pd.DataFrame({
+        'team': matches[team_col].values,
+        'date': matches['date'].values,
+        'matches': 1,
+        'wins': (matches['ftr'] == win_result).astype(int).values,
+        'draws': (matches['ftr'] == 'D').astype(int).values,
+        'goals_for_sum': goals_for.fillna(0).values,
+        'goals_for_count': goals_for.notna().astype(int).values,
+        'goals_against_sum': goals_against.fillna(0).values,
+        'goals_against_count': goals_against.notna().astype(int).values
+    }).groupby(['team', 'date'], sort=True).sum()
+    
+    before = daily.groupby(level='team').cumsum() - daily
+    
+    stats = pd.DataFrame({
+        'matches': before['matches'],
+        'wins': before['wins'],
+        'draws': before['draws'],
+        # AVG() de SQL devuelve NULL si no hay valores
+        'goals_for': before['goals_for_sum'] / before['goals_for_count'].where(before['goals_for_count'] > 0),
+        'goals_against': before['goals_against_sum'] / before['goals_against_count'].where(before['goals_against_count'] > 0)
+    })
+    
+    keys = pd.MultiIndex.from_arrays([matches[team_col].values, matches['date'].values], names=['team', 'date'])
+    return stats.reindex(keys).reset_index(drop=True)
+
 def load_training_data():
     """Cargar datos de entrenamiento desde WordPress"""
     print("🔄 Cargando datos de entrenamiento...")
     
-    connection = connect_database()
-    cursor = connection.cursor()
+    config = load_database_config()
+    connection = connect_database(config)
     
-    # Query para obtener datos con estadísticas calculadas
-    query = """
-    SELECT 
-        m.home_team,
-        m.away_team,
-        m.ftr as result,
-        
-        -- Estadísticas del equipo local
-        (SELECT COUNT(*) FROM wp_ft_matches_advanced m2 
-         WHERE m2.home_team = m.home_team AND m2.date < m.date) as home_matches_played,
-        (SELECT COUNT(*) FROM wp_ft_matches_advanced m2 
-         WHERE m2.home_team = m.home_team AND m2.ftr = 'H' AND m2.date < m.date) as home_wins,
-        (SELECT COUNT(*) FROM wp_ft_matches_advanced m2 
-         WHERE m2.home_team = m.home_team AND m2.ftr = 'D' AND m2.date < m.date) as home_draws,
-        (SELECT AVG(m2.fthg) FROM wp_ft_matches_advanced m2 
-         WHERE m2.home_team = m.home_team AND m2.date < m.date) as home_avg_goals_for,
-        (SELECT AVG(m2.ftag) FROM wp_ft_matches_advanced m2 
-         WHERE m2.home_team = m.home_team AND m2.date < m.date) as home_avg_goals_against,
-         
-        -- Estadísticas del equipo visitante
-        (SELECT COUNT(*) FROM wp_ft_matches_advanced m2 
-         WHERE m2.away_team = m.away_team AND m2.date < m.date) as away_matches_played,
-        (SELECT COUNT(*) FROM wp_ft_matches_advanced m2 
-         WHERE m2.away_team = m.away_team AND m2.ftr = 'A' AND m2.date < m.date) as away_wins,
-        (SELECT COUNT(*) FROM wp_ft_matches_advanced m2 
-         WHERE m2.away_team = m.away_team AND m2.ftr = 'D' AND m2.date < m.date) as away_draws,
-        (SELECT AVG(m2.ftag) FROM wp_ft_matches_advanced m2 
-         WHERE m2.away_team = m.away_team AND m2.date < m.date) as away_avg_goals_for,
-        (SELECT AVG(m2.fthg) FROM wp_ft_matches_advanced m2 
-         WHERE m2.away_team = m.away_team AND m2.date < m.date) as away_avg_goals_against,
-         
-        -- Estadísticas del partido actual
-        m.hs as home_shots,
-        m.as_shots as away_shots,
-        m.hc as home_corners,
-        m.ac as away_corners
-        
-    FROM wp_ft_matches_advanced m
-    WHERE m.ftr IS NOT NULL 
-    AND m.ftr IN ('H', 'D', 'A')
-    ORDER BY m.date
-    """
+    # Una sola lectura de los partidos (caché local si existe); el histórico
+    # se acumula en Python
+    data = load_matches_cached(connection, matches_table(config), [
+        'id', 'date', 'home_team', 'away_team', 'ftr', 'fthg', 'ftag', 'hs', 'as_shots', 'hc', 'ac'
+    ])
+    matches = data.to_dataframe().rename(columns={
+        'hs': 'home_shots',
+        'as_shots': 'away_shots',
+        'hc': 'home_corners',
+        'ac': 'away_corners'
+    })
+    
+    connection.close()
     
-    cursor.execute(query)
-    results = cursor.fetchall()
+    home = cumulative_team_stats(matches, 'home_team', 'H', 'fthg', 'ftag')
+    away = cumulative_team_stats(matches, 'away_team', 'A', 'ftag', 'fthg')
     
     # Convertir a DataFrame
-    columns = ['home_team', 'away_team', 'result', 'home_matches', 'home_wins', 'home_draws',
-              'home_goals_for', 'home_goals_against', 'away_matches', 'away_wins', 'away_draws',
-              'away_goals_for', 'away_goals_against', 'home_shots', 'away_shots', 
-              'home_corners', 'away_corners']
+    df = pd.DataFrame({
+        'id': matches['id'],
+        'home_team': matches['home_team'],
+        'away_team': matches['away_team'],
+        'result': matches['ftr'],
+        'home_matches': home['matches'],
+        'home_wins': home['wins'],
+        'home_draws': home['draws'],
+        'home_goals_for': home['goals_for'],
+        'home_goals_against': home['goals_against'],
+        'away_matches': away['matches'],
+        'away_wins': away['wins'],
+        'away_draws': away['draws'],
+        'away_goals_for': away['goals_for'],
+        'away_goals_against': away['goals_against'],
+        'home_shots': matches['home_shots'],
+        'away_shots': matches['away_shots'],
+        'home_corners': matches['home_corners'],
+        'away_corners': matches['away_corners']
+    })
     
-    df = pd.DataFrame(results, columns=columns)
+    # Solo partidos con resultado se usan para entrenar
+    df = df[df['result'].isin(['H', 'D', 'A'])].reset_index(drop=True)
     
     print(f"✅ Cargados {len(df)} partidos")
     
-    connection.close()
     return df
 
 def prepare_features(df):
@@ -155,7 +198,7 @@ def prepare_features(df):
     y = df['result']
     
     print(f"✅ Preparadas {len(features)} características para {len(X)} partidos")
-    return X, y, features
+    return X, y, features, df['id'].to_numpy()
 
 def train_random_forest(X, y):
     """Entrenar modelo Random Forest"""
@@ -186,52 +229,93 @@ def train_random_forest(X, y):
     
     return model, accuracy
 
-def save_model(model, features, accuracy):
-    """Guardar modelo y metadatos"""
-    models_dir = '../models'
-    if not os.path.exists(models_dir):
-        os.makedirs(models_dir)
-    
-    # Guardar modelo
-    model_path = os.path.join(models_dir, 'football_model.pkl')
-    joblib.dump(model, model_path)
-    
-    # Guardar metadatos
+def save_model(model, features, accuracy, ids):
+    """Guardar modelo y metadatos (publicación atómica, con marca de agua)"""
     metadata = {
         'model_type': 'RandomForestClassifier',
         'features': features,
         'accuracy': float(accuracy),
         'training_date': datetime.now().isoformat(),
         'n_estimators': model.n_estimators,
-        'max_depth': model.max_depth
+        'max_depth': model.max_depth,
+        'training_watermark': make_watermark(ids)
     }
     
-    metadata_path = os.path.join(models_dir, 'football_metadata.json')
-    with open(metadata_path, 'w') as f:
-        json.dump(metadata, f, indent=2)
+    # Modelo + versión compilada (solo NumPy) para la inferencia + metadatos
+    publish_model(model, MODEL_PATH, metadata, METADATA_PATH, features)
+    
+    print(f"✅ Modelo guardado en: {MODEL_PATH}")
+    print(f"✅ Metadatos guardados en: {METADATA_PATH}")
+
+def update_model_incremental(X, y, features, ids):
+    """
+    Actualizar el modelo publicado solo con los partidos posteriores a su
+    marca de agua. Devuelve la precisión del modelo o None si hay que hacer
+    un entrenamiento completo.
+    """
+    model, metadata = load_previous_model(MODEL_PATH, METADATA_PATH, features)
+    if model is None:
+        print("⚠️  No hay modelo previo con marca de agua: entrenamiento completo")
+        return None
+    
+    new = ids > training_watermark(metadata)
+    print(f"🆕 Partidos nuevos desde el último entrenamiento: {int(new.sum())}")
+    
+    if new.sum() < MIN_NEW_MATCHES:
+        print("✅ Modelo al día, no hace falta actualizarlo")
+        return metadata.get('accuracy', 0.0)
     
-    print(f"✅ Modelo guardado en: {model_path}")
-    print(f"✅ Metadatos guardados en: {metadata_path}")
+    added = grow_forest(model, X[new], y[new], max_trees=MAX_TREES)
+    if not added:
+        print("⚠️  Los partidos nuevos no incluyen todos los resultados: entrenamiento completo")
+        return None
+    
+    metadata.update({
+        'training_date': datetime.now().isoformat(),
+        'n_estimators': len(model.estimators_),
+        'training_watermark': make_watermark(ids[new], training_watermark(metadata)),
+        'incremental_updates': metadata.get('incremental_updates', 0) + 1,
+        'last_update_matches': int(new.sum())
+    })
+    publish_model(model, MODEL_PATH, metadata, METADATA_PATH, features)
+    
+    print(f"🌲 Añadidos {added} árboles ({len(model.estimators_)} en total)")
+    print(f"✅ Modelo actualizado en: {MODEL_PATH}")
+    return metadata.get('accuracy', 0.0)
 
 def main():
+    start_profiling()
+    # --incremental: solo los partidos importados desde el último entrenamiento
+    incremental = '--incremental' in sys.argv
+    
     print("🚀 Iniciando entrenamiento de Random Forest")
     print("=" * 50)
     
     try:
         # 1. Cargar datos
-        df = load_training_data()
+        with stage('load'):
+            df = load_training_data()
         
         # 2. Preparar características
-        X, y, features = prepare_features(df)
+        with stage('features'):
+            X, y, features, ids = prepare_features(df)
         
-        # 3. Entrenar modelo
-        model, accuracy = train_random_forest(X, y)
+        with stage('fit'):
+            accuracy = update_model_incremental(X, y, features, ids) if incremental else None
         
-        # 4. Guardar modelo
-        save_model(model, features, accuracy)
+        if accuracy is None:
+            # 3. Entrenar modelo
+            with stage('fit'):
+                model, accuracy = train_random_forest(X, y)
+            
+            # 4. Guardar modelo
+            with stage('save'):
+                save_model(model, features, accuracy, ids)
         
         print("\n🎉 Entrenamiento completado exitosamente!")
         print(f"📈 Precisión final: {accuracy:.2%}")
+        for line in summary_lines():
+            print(f"⏱️  {line}")
         
     except Exception as e:
         print(f"❌ Error durante el entrenamiento: {str(e)}")
@@ -16,10 +16,24 @@ import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
-import joblib
 import mysql.connector
 from datetime import datetime
 
+from incremental_training import publish_model
+from instrumentation import instrument_connection, stage, start_profiling, summary_lines
+from model_cache import ModelCache, cache_enabled
+
+# Versión de prepare_features() para la clave de model_cache.py
+FEATURE_SET_VERSION = 'train_model_benchmark-1'
+
+MODEL_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 8,
+    'min_samples_split': 10,
+    'min_samples_leaf': 5,
+    'random_state': 42,
+}
+
 def connect_database():
     print("🔌 Conectando a la base de datos...")
     config_file = 'db_config.json'
@@ -43,7 +57,7 @@ def connect_database():
     print(f"🟢 Conectando a {config['host']}:{config.get('port', 3306)}")
     
     try:
-        connection = mysql.connector.connect(**config)
+        connection = instrument_connection(mysql.connector.connect(**config))
         print("✅ Conexión establecida")
         return connection
     except Exception as e:
@@ -258,36 +272,43 @@ def train_benchmark_model(X, y, model_type):
     print(f"📊 Datos de entrenamiento: {len(X_train)} partidos")
     print(f"📊 Datos de validación: {len(X_val)} partidos")
     
-    # Configurar modelo
-    rf = RandomForestClassifier(
-        n_estimators=100,
-        max_depth=8,
-        min_samples_split=10,
-        min_samples_leaf=5,
-        random_state=42,
-        n_jobs=-1
-    )
-    
-    # Entrenar
-    print("🎯 Entrenando Random Forest...")
-    rf.fit(X_train, y_train)
+    # Mismas filas, features e hiperparámetros -> modelo ya entrenado
+    cache = ModelCache() if cache_enabled() else None
+    cache_key = cache.key(X, y, MODEL_PARAMS, f"{FEATURE_SET_VERSION}:{model_type}") if cache else None
+    rf = cache.get_model(cache_key) if cache else None
+    cached_metadata = cache.get_metadata(cache_key) if rf is not None else None
     
-    # Evaluar
-    train_pred = rf.predict(X_train)
-    val_pred = rf.predict(X_val)
-    
-    train_accuracy = accuracy_score(y_train, train_pred)
-    val_accuracy = accuracy_score(y_val, val_pred)
+    if rf is not None and cached_metadata:
+        print("♻️ Modelo recuperado de la caché (mismos datos e hiperparámetros)")
+        train_accuracy = cached_metadata['training_accuracy']
+        val_accuracy = cached_metadata['validation_accuracy']
+    else:
+        # Configurar modelo
+        rf = RandomForestClassifier(n_jobs=-1, **MODEL_PARAMS)
+        
+        # Entrenar
+        print("🎯 Entrenando Random Forest...")
+        rf.fit(X_train, y_train)
+        
+        # Evaluar
+        train_pred = rf.predict(X_train)
+        val_pred = rf.predict(X_val)
+        
+        train_accuracy = accuracy_score(y_train, train_pred)
+        val_accuracy = accuracy_score(y_val, val_pred)
+        
+        if cache:
+            cache.put_model(cache_key, rf, {
+                'training_accuracy': train_accuracy,
+                'validation_accuracy': val_accuracy
+            })
     
     print(f"📈 Precisión entrenamiento: {train_accuracy:.4f}")
     print(f"📈 Precisión validación: {val_accuracy:.4f}")
     
-    # Guardar modelo
+    # Guardar modelo, versión compilada (solo NumPy) y metadatos
     model_path = '../models/benchmark_model.pkl'
-    joblib.dump(rf, model_path)
-    print(f"💾 Modelo guardado en {model_path}")
-    
-    # Guardar metadatos
+    metadata_path = '../models/benchmark_metadata.json'
     metadata = {
         'model_type': model_type,
         'training_date': datetime.now().isoformat(),
@@ -298,10 +319,8 @@ def train_benchmark_model(X, y, model_type):
         'feature_names': get_feature_names(model_type)
     }
     
-    metadata_path = '../models/benchmark_metadata.json'
-    with open(metadata_path, 'w') as f:
-        json.dump(metadata, f, indent=2)
-    
+    version = publish_model(rf, model_path, metadata, metadata_path, get_feature_names(model_type))
+    print(f"💾 Modelo guardado en {model_path} (versión {version})")
     print(f"📄 Metadatos guardados en {metadata_path}")
     
     return val_accuracy
@@ -322,6 +341,7 @@ def get_feature_names(model_type):
     return base_features
 
 def main():
+    start_profiling()
     try:
         print("🏆 INICIANDO ENTRENAMIENTO DE BENCHMARKING")
         print("=" * 50)
@@ -342,21 +362,24 @@ def main():
         print(f"🤖 Tipo de modelo: {model_type}")
         
         # 1. Cargar datos
-        df = load_training_data(exclude_season, model_type)
+        with stage('load'):
+            df = load_training_data(exclude_season, model_type)
         
         if len(df) < 100:
             print(f"❌ Datos insuficientes: {len(df)} partidos")
             sys.exit(1)
         
         # 2. Preparar features
-        X, y = prepare_features(df, model_type)
+        with stage('features'):
+            X, y = prepare_features(df, model_type)
         
         if len(X) < 50:
             print(f"❌ Features insuficientes: {len(X)} partidos válidos")
             sys.exit(1)
         
         # 3. Entrenar modelo
-        val_accuracy = train_benchmark_model(X, y, model_type)
+        with stage('fit'):
+            val_accuracy = train_benchmark_model(X, y, model_type)
         
         # 4. Verificar distribución de clases
         unique, counts = np.unique(y, return_counts=True)
@@ -368,6 +391,8 @@ def main():
         print("=" * 50)
         print("🎉 ENTRENAMIENTO COMPLETADO")
         print(f"Training accuracy: {val_accuracy:.4f}")
+        for line in summary_lines():
+            print(f"⏱️  {line}")
         print("BENCHMARK_SUCCESS")
         
     except Exception as e:
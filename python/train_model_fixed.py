@@ -16,10 +16,27 @@ import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
-import joblib
 import mysql.connector
 from datetime import datetime
 
+from match_loader import load_matches
+from incremental_training import (
+    MIN_NEW_MATCHES, grow_forest, load_previous_model, make_watermark,
+    publish_model, training_watermark
+)
+from instrumentation import instrument_connection, stage, start_profiling, summary_lines
+
+MODELS_DIR = '../models'
+MODEL_PATH = os.path.join(MODELS_DIR, 'football_rf_advanced.pkl')
+METADATA_PATH = os.path.join(MODELS_DIR, 'model_metadata.json')
+
+# Tope de árboles en modo incremental (se descartan los más antiguos)
+MAX_TREES = 300
+
+# Partidos del entrenamiento completo: los más recientes, para que la marca
+# de agua (id máximo) no deje partidos sin entrenar por encima
+FULL_TRAINING_LIMIT = 2000
+
 def connect_database():
     print("🔌 Conectando a la base de datos...")
     config_file = 'db_config.json'
@@ -54,63 +71,81 @@ def connect_database():
 
     print(f"🟢 Conectando a host={config['host']} port={config.get('port',3306)} db={config['database']}")
     try:
-        connection = mysql.connector.connect(**config)
+        connection = instrument_connection(mysql.connector.connect(**config))
         print("✅ Conexión establecida")
         return connection
     except Exception as e:
         print(f"❌ Error de conexión: {e}")
         raise
 
-def load_training_data():
+# Columnas de la tabla -> nombre en el DataFrame y valor si es NULL
+TRAINING_COLUMNS = [
+    ('id', 'id', None),
+    ('home_team', 'home_team', None),
+    ('away_team', 'away_team', None),
+    ('ftr', 'result', None),
+    ('fthg', 'home_goals', None),
+    ('ftag', 'away_goals', None),
+    ('hs', 'home_shots', 10),
+    ('as_shots', 'away_shots', 10),
+    ('hst', 'home_shots_target', 4),
+    ('ast', 'away_shots_target', 4),
+    ('hc', 'home_corners', 5),
+    ('ac', 'away_corners', 5),
+    ('home_xg', 'home_xg', 0),
+    ('away_xg', 'away_xg', 0),
+    ('hf', 'home_fouls', 12),
+    ('af', 'away_fouls', 12),
+    ('hy', 'home_yellows', 2),
+    ('ay', 'away_yellows', 2),
+    ('hhw', 'home_woodwork', 0),
+    ('ahw', 'away_woodwork', 0),
+]
+
+def load_training_data(after_id=None):
+    """
+    after_id: solo partidos con id mayor (modo incremental), todos, para que
+    la marca de agua nueva no salte partidos que no se han cargado
+    """
     print("📊 Cargando datos de entrenamiento...")    
     connection = connect_database()
-    cursor = connection.cursor()
 
-    # QUERY MEJORADA: Incluye xG y más estadísticas
-    query = """
-        SELECT 
-            home_team,
-            away_team,
-            ftr as result,
-            fthg as home_goals,
-            ftag as away_goals,
-            COALESCE(hs, 10) as home_shots,
-            COALESCE(as_shots, 10) as away_shots,
-            COALESCE(hst, 4) as home_shots_target,
-            COALESCE(ast, 4) as away_shots_target,
-            COALESCE(hc, 5) as home_corners,
-            COALESCE(ac, 5) as away_corners,
-            COALESCE(home_xg, 0) as home_xg,
-            COALESCE(away_xg, 0) as away_xg,
-            COALESCE(hf, 12) as home_fouls,
-            COALESCE(af, 12) as away_fouls,
-            COALESCE(hy, 2) as home_yellows,
-            COALESCE(ay, 2) as away_yellows,
-            COALESCE(hhw, 0) as home_woodwork,
-            COALESCE(ahw, 0) as away_woodwork
-        FROM PP0Fhoci_ft_matches_advanced 
-        WHERE ftr IS NOT NULL 
+    where = """
+        ftr IS NOT NULL 
         AND ftr IN ('H', 'D', 'A')
         AND fthg IS NOT NULL 
         AND ftag IS NOT NULL
-        LIMIT 2000
-    """
+        """
+    params = ()
+    if after_id is not None:
+        where += " AND id > %s"
+        params = (after_id,)
+
+    # Carga columnar por bloques: solo las columnas usadas, enteros pequeños
+    data = load_matches(
+        connection,
+        'PP0Fhoci_ft_matches_advanced',
+        [column for column, _, _ in TRAINING_COLUMNS],
+        where=where,
+        params=params,
+        order_by='id' if after_id is not None else 'id DESC',
+        limit=None if after_id is not None else FULL_TRAINING_LIMIT
+    )
     
-    cursor.execute(query)
-    results = cursor.fetchall()
+    df = data.to_dataframe()
     
-    columns = ['home_team', 'away_team', 'result', 'home_goals', 'away_goals',
-              'home_shots', 'away_shots', 'home_shots_target', 'away_shots_target',
-              'home_corners', 'away_corners', 'home_xg', 'away_xg', 
-              'home_fouls', 'away_fouls', 'home_yellows', 'away_yellows',
-              'home_woodwork', 'away_woodwork']
+    # Equivalente a los COALESCE de la query original
+    for column, name, default in TRAINING_COLUMNS:
+        if default is not None:
+            df[column] = df[column].fillna(default)
     
-    df = pd.DataFrame(results, columns=columns)
+    df = df.rename(columns={column: name for column, name, _ in TRAINING_COLUMNS})
+    df = df[[name for _, name, _ in TRAINING_COLUMNS]]
     print(f"✅ Cargados {len(df)} partidos")
     
     # Estadísticas de xG
     xg_available = df[(df['home_xg'] > 0) | (df['away_xg'] > 0)]
-    print(f"📊 Partidos con xG disponible: {len(xg_available)} ({len(xg_available)/len(df)*100:.1f}%)")
+    print(f"📊 Partidos con xG disponible: {len(xg_available)} ({len(xg_available)/max(1, len(df))*100:.1f}%)")
     
     connection.close()
     return df
@@ -220,15 +255,8 @@ def train_random_forest(X, y, features):
     
     return model, accuracy
 
-def save_model(model, features, accuracy):
+def save_model(model, features, accuracy, ids):
     print("💾 Guardando modelo...")
-    models_dir = '../models'
-    if not os.path.exists(models_dir):
-        os.makedirs(models_dir)
-    
-    # Cambiar nombre para distinguir del modelo anterior
-    model_path = os.path.join(models_dir, 'football_rf_advanced.pkl')
-    joblib.dump(model, model_path)
     
     # Metadatos mejorados
     metadata = {
@@ -242,32 +270,93 @@ def save_model(model, features, accuracy):
         'performance': {
             'accuracy': float(accuracy),
             'improvement': 'Uses xG for better predictions'
-        }
+        },
+        'training_watermark': make_watermark(ids)
     }
     
-    metadata_path = os.path.join(models_dir, 'model_metadata.json')
-    with open(metadata_path, 'w') as f:
-        json.dump(metadata, f, indent=2)
+    # Modelo + versión compilada (solo NumPy) + metadatos, de forma atómica
+    publish_model(model, MODEL_PATH, metadata, METADATA_PATH, features)
+    
+    print(f"✅ Modelo guardado: {MODEL_PATH}")
+    print(f"✅ Metadatos guardados: {METADATA_PATH}")
+
+def update_model_incremental():
+    """
+    Añadir al modelo publicado árboles entrenados solo con los partidos
+    importados desde su marca de agua. Devuelve (precisión, features) o
+    None si hay que hacer un entrenamiento completo.
+    """
+    model, metadata = load_previous_model(MODEL_PATH, METADATA_PATH)
+    # train_model-advanced.py publica en las mismas rutas otro tipo de modelo
+    if model is None or metadata.get('version') != '2.0_with_xG':
+        print("⚠️  No hay modelo previo con marca de agua: entrenamiento completo")
+        return None
+    
+    watermark = training_watermark(metadata)
+    with stage('load'):
+        df = load_training_data(after_id=watermark)
+    print(f"🆕 Partidos nuevos desde el último entrenamiento: {len(df)}")
+    
+    if len(df) < MIN_NEW_MATCHES:
+        print("✅ Modelo al día, no hace falta actualizarlo")
+        return metadata.get('accuracy', 0.0), metadata['features']
+    
+    ids = df['id'].to_numpy()
+    with stage('features'):
+        X, y, features = prepare_features(df)
+    if features != metadata.get('features'):
+        print("⚠️  Las características han cambiado: entrenamiento completo")
+        return None
     
-    print(f"✅ Modelo guardado: {model_path}")
-    print(f"✅ Metadatos guardados: {metadata_path}")
+    with stage('fit'):
+        added = grow_forest(model, X, y, max_trees=MAX_TREES)
+    if not added:
+        print("⚠️  Los partidos nuevos no incluyen todos los resultados: entrenamiento completo")
+        return None
+    
+    metadata.update({
+        'training_date': datetime.now().isoformat(),
+        'training_watermark': make_watermark(ids, watermark),
+        'incremental_updates': metadata.get('incremental_updates', 0) + 1,
+        'last_update_matches': len(df),
+        'n_estimators': len(model.estimators_)
+    })
+    with stage('save'):
+        publish_model(model, MODEL_PATH, metadata, METADATA_PATH, features)
+    
+    print(f"🌲 Añadidos {added} árboles ({len(model.estimators_)} en total)")
+    return metadata.get('accuracy', 0.0), features
 
 def main():
+    start_profiling()
     print("🚀 Iniciando entrenamiento Random Forest con xG")
     print("=" * 60)
     try:
         print(f"NumPy version: {np.__version__}")
         print(f"Pandas version: {pd.__version__}")
         
-        df = load_training_data()
-        X, y, features = prepare_features(df)
-        model, accuracy = train_random_forest(X, y, features)
-        save_model(model, features, accuracy)
+        # --incremental: solo los partidos importados desde el último entrenamiento
+        updated = update_model_incremental() if '--incremental' in sys.argv else None
+        
+        if updated is not None:
+            accuracy, features = updated
+        else:
+            with stage('load'):
+                df = load_training_data()
+            ids = df['id'].to_numpy()
+            with stage('features'):
+                X, y, features = prepare_features(df)
+            with stage('fit'):
+                model, accuracy = train_random_forest(X, y, features)
+            with stage('save'):
+                save_model(model, features, accuracy, ids)
         
         print(f"\n🎉 Entrenamiento completado exitosamente!")
         print(f"📈 Precisión final: {accuracy:.2%}")
         print(f"🎯 Features con xG incluidas: {len([f for f in features if 'xg' in f.lower()])}")
         print(f"🚀 Modelo mejorado guardado como 'football_rf_advanced.pkl'")
+        for line in summary_lines():
+            print(f"⏱️  {line}")
         
         return True
     except Exception as e:
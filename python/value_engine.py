@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Análisis de value bets por conjuntos
+
+Versión por columnas de FT_Value_Analyzer::analyze_all_fixtures
+(class-value-analyzer.php). El PHP recorre los fixtures uno a uno: una
+consulta para la predicción, otra para las cuotas y dos por value bet al
+guardar (SELECT + UPDATE/INSERT). Aquí:
+
+1. Tres consultas: fixtures próximos con cuotas (mismo criterio y LIMIT),
+   todas sus cuotas (fixture_id IN ...) y las predicciones de las últimas
+   24 horas de esos equipos (la más reciente por partido, como
+   get_or_create_prediction)
+2. Probabilidad propia, valor, expected value, confianza y stake de Kelly
+   (calculate_kelly_stake) de todas las filas de cuotas a la vez, con las
+   mismas reglas y redondeos que analyze_moneyline_market,
+   analyze_total_market y analyze_spread_market
+3. Los value bets se cargan en una tabla temporal y se aplican a
+   ft_value_bets con un UPDATE ... JOIN de los que ya existen hoy para
+   (fixture_id, market_type, bet_type) y un INSERT ... SELECT del resto,
+   igual que save_value_bets
+
+Los fixtures sin predicción reciente se saltan (el PHP ejecuta antes
+predict_batch.py con run_batch_predictions). Los umbrales y el bankroll se
+leen de las opciones del plugin salvo que se pasen por línea de comandos.
+
+Uso:
+    python3 value_engine.py [--limit=50] [--days=7] [--dry-run]
+                            [--min-value=5] [--min-confidence=0.6]
+                            [--bankroll=1000] [--max-stake=5]
+"""
+
+import os
+import sys
+import json
+import time
+from datetime import datetime
+
+# Agregar path para librerías
+plugin_libs = '/var/www/vhosts/virtualrolldice.com/httpdocs/wp-content/plugins/football-tipster/python-libs'
+if plugin_libs not in sys.path:
+    sys.path.insert(0, plugin_libs)
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import instrument_connection, report, stage, start_profiling
+from match_loader import get_db_connection, load_db_config
+from xg_backfill import php_round
+
+PYTHON_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Opciones del plugin -> (argumento, valor por defecto del constructor PHP)
+OPTIONS = {
+    'ft_min_value_threshold': ('min-value', 5.0),
+    'ft_min_confidence_threshold': ('min-confidence', 0.6),
+    'ft_bankroll': ('bankroll', 1000.0),
+    'ft_max_stake_percentage': ('max-stake', 5.0),
+}
+
+RECENT_PREDICTION_HOURS = 24
+TOP_VALUE_BETS = 20
+BATCH_SIZE = 1000
+
+# predict_total_goals() / predict_goal_difference()
+HOME_AVG = 1.5
+AWAY_AVG = 1.3
+
+# calculate_confidence(): multiplicador por mercado (0.8 para el resto)
+MARKET_MULTIPLIERS = {'moneyline': 1.0, 'total': 0.85, 'spread': 0.9}
+DRAW_MULTIPLIER = 0.8
+
+KELLY_FRACTION = 0.25
+
+# Límites de value_percentage decimal(5,2) en ft_value_bets
+MAX_VALUE_PERCENTAGE = 999.99
+
+BET_COLUMNS = ['fixture_id', 'market_type', 'bet_type', 'our_probability', 'market_odds',
+               'implied_probability', 'value_percentage', 'expected_value', 'confidence_score',
+               'recommended_stake']
+
+
+# ---------------------------------------------------------------------- #
+# Carga
+# ---------------------------------------------------------------------- #
+
+def load_options(connection, table_prefix):
+    cursor = connection.cursor()
+    cursor.execute(
+        f"SELECT option_name, option_value FROM {table_prefix}options "
+        f"WHERE option_name IN ({', '.join(['%s'] * len(OPTIONS))})",
+        tuple(OPTIONS)
+    )
+    options = dict(cursor.fetchall())
+    cursor.close()
+    return options
+
+
+def resolve_settings(connection, table_prefix, overrides):
+    """
+    Umbrales y bankroll: argumento si se pasó, si no la opción del plugin y
+    si no el valor por defecto del constructor de FT_Value_Analyzer
+    """
+    settings = {}
+    options = None
+    for option_name, (argument, default) in OPTIONS.items():
+        value = overrides.get(argument)
+        if value is None:
+            if options is None:
+                options = load_options(connection, table_prefix)
+            value = options.get(option_name)
+        settings[argument] = float(value) if value not in (None, '') else default
+    return settings
+
+
+def _frame(connection, query, params=()):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        columns = [column[0] for column in cursor.description]
+    finally:
+        cursor.close()
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+
+def load_fixtures(connection, table_prefix='wp_', limit=50, days=7):
+    """Fixtures próximos con cuotas (consulta de analyze_all_fixtures)"""
+    return _frame(connection, f"""
+        SELECT DISTINCT f.id AS fixture_id, f.home_team, f.away_team, f.start_time, f.league
+        FROM {table_prefix}ft_fixtures f
+        INNER JOIN {table_prefix}ft_odds o ON f.id = o.fixture_id
+        WHERE f.start_time > NOW()
+        AND f.start_time < DATE_ADD(NOW(), INTERVAL %s DAY)
+        AND f.status = 'upcoming'
+        ORDER BY f.start_time ASC
+        LIMIT %s
+    """, (int(days), int(limit)))
+
+
+def load_odds(connection, fixture_ids, table_prefix='wp_'):
+    """Todas las cuotas de los fixtures, en el orden de analyze_fixture"""
+    return _frame(connection, f"""
+        SELECT id, fixture_id, market_type, bet_type, decimal_odds, implied_probability, line_value
+        FROM {table_prefix}ft_odds
+        WHERE fixture_id IN ({', '.join(['%s'] * len(fixture_ids))})
+        ORDER BY fixture_id, market_type, bet_type, id
+    """, tuple(int(fixture_id) for fixture_id in fixture_ids))
+
+
+def load_predictions(connection, home_teams, table_prefix='wp_'):
+    """
+    Predicción más reciente de las últimas 24 horas por (home_team, away_team)
+    """
+    predictions = _frame(connection, f"""
+        SELECT id, home_team, away_team, prediction, probability, metadata
+        FROM {table_prefix}ft_predictions
+        WHERE predicted_at >= DATE_SUB(NOW(), INTERVAL {RECENT_PREDICTION_HOURS} HOUR)
+        AND home_team IN ({', '.join(['%s'] * len(home_teams))})
+        ORDER BY predicted_at DESC, id DESC
+    """, tuple(home_teams))
+    if not len(predictions):
+        return predictions
+    return predictions.drop_duplicates(['home_team', 'away_team']).reset_index(drop=True)
+
+
+def prediction_probabilities(predictions):
+    """
+    home_win/draw/away_win de cada predicción (get_or_create_prediction):
+    las del modelo si el lote las guardó en metadata, si no derivadas de
+    prediction y probability
+    """
+    probability = predictions['probability'].astype(np.float64).to_numpy()
+    outcome = predictions['prediction'].astype(str).to_numpy()
+    rest = (1 - probability) / 2
+    home = np.where(outcome == 'H', probability, rest)
+    draw = np.where(outcome == 'D', probability, 0.25)
+    away = np.where(outcome == 'A', probability, rest)
+
+    for i, metadata in enumerate(predictions['metadata'].tolist()):
+        try:
+            probabilities = json.loads(metadata or '').get('probabilities') or {}
+        except (ValueError, TypeError, AttributeError):
+            continue
+        if isinstance(probabilities, dict) and probabilities.get('H') is not None:
+            home[i] = float(probabilities['H'])
+            draw[i] = float(probabilities.get('D') or 0)
+            away[i] = float(probabilities.get('A') or 0)
+
+    return pd.DataFrame({
+        'home_team': predictions['home_team'].to_numpy(),
+        'away_team': predictions['away_team'].to_numpy(),
+        'prediction': outcome,
+        'confidence': probability,
+        'home_win': home,
+        'draw': draw,
+        'away_win': away,
+    })
+
+
+# ---------------------------------------------------------------------- #
+# Cálculo
+# ---------------------------------------------------------------------- #
+
+def our_probabilities(rows):
+    """
+    Probabilidad propia de cada fila de cuotas; 0 para mercados y apuestas
+    que el PHP no analiza
+    """
+    market = rows['market_type'].to_numpy()
+    bet = rows['bet_type'].to_numpy()
+    confidence = rows['confidence'].to_numpy()
+    line = rows['line_value'].to_numpy()
+    # Sin línea PHP compara con NULL como booleanos: Over y spread local ganan
+    no_line = np.isnan(line)
+
+    # Totales: predict_total_goals() + calculate_over_probability()
+    predicted_total = HOME_AVG + AWAY_AVG + confidence * 0.5
+    over = np.where(predicted_total > line, 0.65, np.where(predicted_total < line - 0.5, 0.35, 0.5))
+    over = np.where(no_line, 0.65, over)
+
+    # Spread: predict_goal_difference() + calculate_spread_probability()
+    outcome = rows['prediction'].to_numpy()
+    home_expected = HOME_AVG + np.where(outcome == 'H', 0.5, 0.0)
+    away_expected = AWAY_AVG + np.where(outcome == 'A', 0.5, 0.0)
+    difference = home_expected - away_expected
+
+    conditions = [
+        (market == 'moneyline') & (bet == 'home'),
+        (market == 'moneyline') & (bet == 'draw'),
+        (market == 'moneyline') & (bet == 'away'),
+        (market == 'total') & (bet == 'over'),
+        (market == 'total') & (bet == 'under'),
+        (market == 'spread') & (bet == 'home'),
+        (market == 'spread') & (bet == 'away'),
+    ]
+    choices = [
+        rows['home_win'].to_numpy(),
+        rows['draw'].to_numpy(),
+        rows['away_win'].to_numpy(),
+        over,
+        1 - over,
+        np.where((difference > line) | no_line, 0.6, 0.4),
+        np.where(difference < line, 0.6, 0.4),
+    ]
+    return np.select(conditions, choices, 0.0), predicted_total, difference
+
+
+def kelly_stake(probability, odds, bankroll, max_stake_percentage):
+    """calculate_kelly_stake() sobre arrays"""
+    b = odds - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kelly_fraction = (b * probability - (1 - probability)) / b
+    kelly_fraction = np.clip(np.nan_to_num(kelly_fraction), 0, max_stake_percentage / 100)
+    fractional_kelly = kelly_fraction * KELLY_FRACTION
+    return pd.DataFrame({
+        'kelly_fraction': php_round(kelly_fraction, 4),
+        'fractional_kelly': php_round(fractional_kelly, 4),
+        'recommended_amount': php_round(bankroll * fractional_kelly, 2),
+        'percentage_of_bankroll': php_round(fractional_kelly * 100, 2),
+    }, index=probability.index if hasattr(probability, 'index') else None)
+
+
+def analyze(fixtures, odds, predictions, settings):
+    """
+    Value bets de todas las filas de cuotas, en el orden en que el PHP los
+    encuentra. Devuelve (value_bets, fixtures con predicción)
+    """
+    if not len(fixtures) or not len(odds) or not len(predictions):
+        return pd.DataFrame(), 0
+
+    predicted = fixtures.merge(prediction_probabilities(predictions),
+                               on=['home_team', 'away_team'], how='inner')
+    rows = odds.merge(predicted, on='fixture_id', how='inner')
+    if not len(rows):
+        return rows, len(predicted)
+
+    rows['decimal_odds'] = rows['decimal_odds'].astype(np.float64)
+    rows['implied_probability'] = rows['implied_probability'].astype(np.float64)
+    rows['line_value'] = rows['line_value'].astype(np.float64)
+
+    our_probability, predicted_total, difference = our_probabilities(rows)
+    rows['our_probability'] = our_probability
+    rows['predicted_total'] = predicted_total
+    rows['predicted_difference'] = difference
+    rows = rows[rows['our_probability'] > 0]
+
+    # calculate_value()
+    p = rows['our_probability']
+    market_odds = rows['decimal_odds']
+    value_percentage = (p * market_odds - 1) * 100
+    rows = rows.assign(
+        expected_value=php_round(p * (market_odds - 1) - (1 - p), 4),
+        value_percentage=php_round(value_percentage, 2),
+        edge=php_round(p - rows['implied_probability'], 4),
+    )[value_percentage >= settings['min-value']]
+
+    # calculate_confidence()
+    multiplier = rows['market_type'].map(MARKET_MULTIPLIERS).fillna(0.8)
+    multiplier = multiplier * np.where(rows['bet_type'] == 'draw', DRAW_MULTIPLIER, 1.0)
+    confidence = rows['confidence'].fillna(0.5) * multiplier
+    rows = rows.assign(confidence_score=php_round(confidence.clip(0.0, 1.0), 3))
+    rows = rows[rows['confidence_score'] >= settings['min-confidence']]
+
+    stakes = kelly_stake(rows['our_probability'], rows['decimal_odds'],
+                         settings['bankroll'], settings['max-stake'])
+    rows = pd.concat([rows, stakes], axis=1).rename(columns={
+        'decimal_odds': 'market_odds', 'id': 'odds_id'
+    })
+    return rows.reset_index(drop=True), len(predicted)
+
+
+# ---------------------------------------------------------------------- #
+# Escritura
+# ---------------------------------------------------------------------- #
+
+def save_value_bets(connection, table_prefix, bets, batch_size=BATCH_SIZE):
+    """
+    save_value_bets() en bloque: una fila por (fixture_id, market_type,
+    bet_type) y día; si se repite gana la última, como en el PHP
+    """
+    table = f"{table_prefix}ft_value_bets"
+    staging = f"{table}_staging"
+    bets = bets.drop_duplicates(['fixture_id', 'market_type', 'bet_type'], keep='last')
+    rows = [
+        (int(row.fixture_id), row.market_type, row.bet_type, float(row.our_probability),
+         float(row.market_odds), float(row.implied_probability),
+         float(np.clip(row.value_percentage, -MAX_VALUE_PERCENTAGE, MAX_VALUE_PERCENTAGE)),
+         float(row.expected_value), float(row.confidence_score), float(row.recommended_amount))
+        for row in bets.itertuples(index=False)
+    ]
+    if not rows:
+        return {'updated': 0, 'inserted': 0}
+
+    key = "v.fixture_id = s.fixture_id AND v.market_type = s.market_type " \
+          "AND v.bet_type = s.bet_type AND DATE(v.created_at) = DATE(NOW())"
+    values = ', '.join(f"v.{column} = s.{column}" for column in BET_COLUMNS[3:])
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
+        cursor.execute(f"""
+            CREATE TEMPORARY TABLE {staging} (
+                fixture_id int(11) NOT NULL,
+                market_type varchar(50) NOT NULL,
+                bet_type varchar(20) NOT NULL,
+                our_probability decimal(5,4) NOT NULL,
+                market_odds decimal(10,3) NOT NULL,
+                implied_probability decimal(5,4) NOT NULL,
+                value_percentage decimal(5,2) NOT NULL,
+                expected_value decimal(10,4) NOT NULL,
+                confidence_score decimal(3,2) NOT NULL,
+                recommended_stake decimal(10,2) DEFAULT NULL,
+                PRIMARY KEY (fixture_id, market_type, bet_type)
+            )
+        """)
+        query = f"INSERT INTO {staging} ({', '.join(BET_COLUMNS)}) " \
+                f"VALUES ({', '.join(['%s'] * len(BET_COLUMNS))})"
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(query, rows[start:start + batch_size])
+
+        cursor.execute(f"UPDATE {table} v JOIN {staging} s ON {key} SET {values}")
+        updated = cursor.rowcount
+        cursor.execute(f"""
+            INSERT INTO {table} ({', '.join(BET_COLUMNS)})
+            SELECT {', '.join('s.' + column for column in BET_COLUMNS)}
+            FROM {staging} s
+            LEFT JOIN {table} v ON {key}
+            WHERE v.id IS NULL
+        """)
+        inserted = cursor.rowcount
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
+        connection.commit()
+        return {'updated': updated, 'inserted': inserted}
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+# ---------------------------------------------------------------------- #
+# Salida
+# ---------------------------------------------------------------------- #
+
+def _line_text(line):
+    """line_value tal como llega de MySQL (decimal(5,2): "2.50")"""
+    return '' if line is None else '%.2f' % line
+
+
+def bet_description(bet):
+    """get_bet_description()"""
+    home, away = bet['fixture']['home_team'], bet['fixture']['away_team']
+    market, bet_type, line = bet['market_type'], bet['bet_type'], bet.get('line_value')
+    if market == 'moneyline':
+        return {'home': f"{home} ganador", 'draw': "Empate", 'away': f"{away} ganador"}.get(bet_type, '')
+    if market == 'total':
+        return f"Más de {_line_text(line)} goles" if bet_type == 'over' else f"Menos de {_line_text(line)} goles"
+    if market == 'spread':
+        line = line or 0.0
+        line_text = f"+{_line_text(line)}" if line > 0 else _line_text(line)
+        # -(string) en PHP da un número: "-0.50" -> 0.5
+        return f"{home} {line_text}" if bet_type == 'home' else f"{away} {'%.14G' % (0.0 - line)}"
+    return f"{market} {bet_type}"
+
+
+def top_value_bets(bets, limit=TOP_VALUE_BETS):
+    """Los value bets con más valor con la forma de analyze_*_market()"""
+    # mergesort es estable: a igual valor se mantiene el orden de aparición (usort)
+    top = bets.sort_values('value_percentage', ascending=False, kind='mergesort').head(limit)
+    result = []
+    for row in top.to_dict('records'):
+        bet = {
+            'fixture_id': int(row['fixture_id']),
+            'fixture': {
+                'fixture_id': int(row['fixture_id']),
+                'home_team': row['home_team'],
+                'away_team': row['away_team'],
+                'start_time': str(row['start_time']),
+                'league': row['league'],
+            },
+            'market_type': row['market_type'],
+            'bet_type': row['bet_type'],
+            'our_probability': float(row['our_probability']),
+            'market_odds': float(row['market_odds']),
+            'implied_probability': float(row['implied_probability']),
+            'value_percentage': float(row['value_percentage']),
+            'expected_value': float(row['expected_value']),
+            'confidence_score': float(row['confidence_score']),
+            'recommended_stake': {
+                'kelly_fraction': float(row['kelly_fraction']),
+                'fractional_kelly': float(row['fractional_kelly']),
+                'recommended_amount': float(row['recommended_amount']),
+                'percentage_of_bankroll': float(row['percentage_of_bankroll']),
+            },
+            'odds_id': int(row['odds_id']),
+        }
+        if row['market_type'] in ('total', 'spread'):
+            bet['line_value'] = None if pd.isna(row['line_value']) else float(row['line_value'])
+        if row['market_type'] == 'total':
+            bet['predicted_total'] = float(row['predicted_total'])
+        if row['market_type'] == 'spread':
+            bet['predicted_difference'] = float(row['predicted_difference'])
+        bet['bet_description'] = bet_description(bet)
+        result.append(bet)
+    return result
+
+
+def analyze_all_fixtures(connection, table_prefix='wp_', limit=50, days=7, overrides=None, dry_run=False):
+    """Fixtures -> cuotas -> predicciones -> value bets -> ft_value_bets"""
+    with stage('load'):
+        settings = resolve_settings(connection, table_prefix, overrides or {})
+        fixtures = load_fixtures(connection, table_prefix, limit, days)
+        odds = predictions = pd.DataFrame()
+        if len(fixtures):
+            odds = load_odds(connection, fixtures['fixture_id'].tolist(), table_prefix)
+            predictions = load_predictions(connection, sorted(set(fixtures['home_team'])), table_prefix)
+
+    with stage('analyze'):
+        bets, with_prediction = analyze(fixtures, odds, predictions, settings)
+
+    saved = {'updated': 0, 'inserted': 0}
+    if not dry_run and len(bets):
+        with stage('save'):
+            saved = save_value_bets(connection, table_prefix, bets)
+
+    return {
+        'success': True,
+        'processed_fixtures': len(fixtures),
+        'value_bets_found': len(bets),
+        'value_bets': top_value_bets(bets) if len(bets) else [],
+        'analysis_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'without_prediction': len(fixtures) - with_prediction,
+        'odds_rows': len(odds),
+        'saved': saved,
+        'settings': settings,
+        'dry_run': dry_run,
+    }
+
+
+def _option(name, default=None):
+    prefix = f"--{name}="
+    for arg in sys.argv[1:]:
+        if arg.startswith(prefix):
+            return arg[len(prefix):]
+    return default
+
+
+def main():
+    start_profiling()
+    connection = None
+    started = time.perf_counter()
+    try:
+        config = load_db_config(os.path.join(PYTHON_DIR, 'db_config.json'))
+        connection = instrument_connection(get_db_connection(config))
+
+        overrides = {argument: _option(argument) for argument, _ in OPTIONS.values()}
+        result = analyze_all_fixtures(connection, config.get('table_prefix', 'wp_'),
+                                      limit=int(_option('limit', 50)),
+                                      days=int(_option('days', 7)),
+                                      overrides=overrides,
+                                      dry_run='--dry-run' in sys.argv)
+        result['seconds'] = round(time.perf_counter() - started, 3)
+        result['timings'] = report()
+        print(json.dumps(result))
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': f'Error analizando value bets: {str(e)}'}))
+        sys.exit(1)
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+if __name__ == "__main__":
+    main()
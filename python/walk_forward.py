@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Backtest walk-forward (origen móvil semana a semana)
+
+En lugar de entrenar una vez antes de la temporada y puntuarla entera con
+el modelo congelado, se avanza por semanas:
+
+1. Se predicen los partidos de la semana con el modelo actual
+2. Sus resultados pasan a ser conocidos
+3. Se añaden árboles nuevos (warm_start) entrenados sobre una ventana
+   acotada de los partidos más recientes, incluidos los de esa semana
+
+Las features "as-of" ya están precalculadas por FeatureEngine para todos
+los partidos (solo usan datos anteriores a cada fecha), así que cada semana
+solo cuesta entrenar TREES_PER_WEEK árboles. El bosque se limita a
+MAX_TREES descartando los árboles más antiguos.
+
+Se usa desde benchmark_season.py con la opción --walk-forward.
+"""
+
+import numpy as np
+
+TREES_PER_WEEK = 10
+MAX_TREES = 300
+WINDOW_MATCHES = 5000
+WEEK_DAYS = 7
+
+
+def week_numbers(test_days):
+    """Semana de cada partido contada desde el primer día de la temporada"""
+    test_days = np.asarray(test_days, dtype=np.int64)
+    return (test_days - test_days.min()) // WEEK_DAYS
+
+
+def walk_forward_probabilities(model, X_train, y_train, X_test, y_test, test_days,
+                               trees_per_week=TREES_PER_WEEK, max_trees=MAX_TREES,
+                               window=WINDOW_MATCHES):
+    """
+    Probabilidades de la temporada con reentrenamiento incremental semanal
+
+    model: RandomForestClassifier ya entrenado con (X_train, y_train)
+    X_train / y_train: del más reciente al más antiguo (ORDER BY date DESC)
+    X_test / y_test / test_days: en orden de fecha
+
+    Devuelve (probabilidades, estadísticas)
+    """
+    # Histórico completo en orden cronológico: el final de la ventana
+    # avanza a medida que se conocen los resultados de cada semana
+    all_X = np.concatenate([X_train[::-1], X_test])
+    all_y = np.concatenate([y_train[::-1], y_test])
+    known = len(y_train)
+
+    model.set_params(warm_start=True)
+    n_classes = len(model.classes_)
+    probabilities = np.empty((len(y_test), n_classes))
+    weeks = week_numbers(test_days)
+    week_values = np.unique(weeks)
+
+    trees_added = 0
+    updates = 0
+    for position, week in enumerate(week_values):
+        rows = np.flatnonzero(weeks == week)
+        probabilities[rows] = model.predict_proba(X_test[rows])
+
+        if position == len(week_values) - 1:
+            break
+
+        # Resultados de la semana ya conocidos
+        known = len(y_train) + rows.max() + 1
+        start = max(0, known - window)
+        window_y = all_y[start:known]
+
+        # Con warm_start los árboles nuevos deben ver las mismas clases
+        if len(np.unique(window_y)) < n_classes:
+            continue
+
+        model.set_params(n_estimators=len(model.estimators_) + trees_per_week)
+        model.fit(all_X[start:known], window_y)
+        trees_added += trees_per_week
+        updates += 1
+
+        if len(model.estimators_) > max_trees:
+            model.estimators_ = model.estimators_[-max_trees:]
+            model.set_params(n_estimators=max_trees)
+
+    stats = {
+        'weeks': int(len(week_values)),
+        'updates': updates,
+        'trees_added': trees_added,
+        'final_trees': len(model.estimators_),
+        'trees_per_week': trees_per_week,
+        'max_trees': max_trees,
+        'window_matches': window,
+    }
+    return probabilities, stats
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Cálculo masivo de xG
+
+Versión por columnas de FootballTipster_xG_Calculator (class-xg-calculator.php):
+calculate_xG() se aplica a los arrays completos de tiros, tiros a puerta,
+palos, córners y faltas del rival, con los mismos coeficientes, umbrales,
+límite 0-5 y redondeo a 2 decimales que el PHP.
+
+update_missing_xG() calcula 100 partidos por llamada y hace un UPDATE por
+partido. Aquí se cargan de una vez todos los partidos sin home_xg/away_xg
+(con hs y as_shots, como el PHP) y los valores se escriben por lotes: cada
+lote se carga en una tabla temporal y se aplica con un UPDATE ... JOIN por id
+y un COMMIT, así una ejecución interrumpida continúa donde se quedó.
+
+Con --recompute se recalculan todos los partidos con tiros, no solo los que
+no tienen xG (para cuando cambia la fórmula).
+
+Uso:
+    python3 xg_backfill.py [--recompute] [--dry-run] [--batch-size=5000]
+"""
+
+import os
+import sys
+import json
+import time
+import numpy as np
+
+# Agregar path para librerías
+plugin_libs = '/var/www/vhosts/virtualrolldice.com/httpdocs/wp-content/plugins/football-tipster/python-libs'
+if plugin_libs not in sys.path:
+    sys.path.insert(0, plugin_libs)
+
+from instrumentation import instrument_connection, report, stage, start_profiling
+from match_loader import get_db_connection, load_db_config, load_matches, matches_table
+
+PYTHON_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Columnas de cada equipo en calculate_match_xG(): tiros, a puerta, palos,
+# córners y faltas cometidas por el rival
+HOME_COLUMNS = ['hs', 'hst', 'hhw', 'hc', 'af']
+AWAY_COLUMNS = ['as_shots', 'ast', 'ahw', 'ac', 'hf']
+
+MISSING_XG = '(home_xg IS NULL OR away_xg IS NULL) AND hs IS NOT NULL AND as_shots IS NOT NULL'
+WITH_SHOTS = 'hs IS NOT NULL AND as_shots IS NOT NULL'
+
+BATCH_SIZE = 5000
+MAX_XG = 5
+
+
+def php_round(values, decimals=2):
+    """
+    round() de PHP: mitades hacia arriba (np.round redondea al par) y
+    pre-redondeo para que 1.005 * 100 = 100.49999... cuente como mitad
+    """
+    scale = 10.0 ** decimals
+    scaled = np.round(values * scale, 9)
+    return np.sign(scaled) * np.floor(np.abs(scaled) + 0.5) / scale
+
+
+def calculate_xg(shots, shots_on_target, woodwork, corners, rival_fouls):
+    """
+    calculate_xG() sobre arrays. Los NULL (NaN) cuentan como 0, igual que el
+    (int) de un campo sin valor en el PHP.
+    """
+    shots, shots_on_target, woodwork, corners, rival_fouls = (
+        np.nan_to_num(np.asarray(values, dtype=np.float64))
+        for values in (shots, shots_on_target, woodwork, corners, rival_fouls)
+    )
+
+    xg = shots * 0.08 + shots_on_target * 0.12 + woodwork * 0.4 + corners * 0.03
+    xg += np.where(rival_fouls > 15, (rival_fouls - 15) * 0.02, 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        efficiency = np.where(shots > 0, shots_on_target / shots, np.nan)
+    xg *= np.where(efficiency > 0.4, 1.1, np.where(efficiency < 0.2, 0.9, 1.0))
+    xg *= np.where(corners > 8, 1.05, 1.0)
+
+    return php_round(np.clip(xg, 0, MAX_XG))
+
+
+def calculate_match_xg(columns):
+    """
+    calculate_match_xG(): (home_xg, away_xg) a partir de un mapeo
+    columna -> array (DataFrame, MatchColumns o dict)
+    """
+    home = calculate_xg(*(_numeric(columns, name) for name in HOME_COLUMNS))
+    away = calculate_xg(*(_numeric(columns, name) for name in AWAY_COLUMNS))
+    return home, away
+
+
+def _numeric(columns, name):
+    if hasattr(columns, 'numeric'):
+        return columns.numeric(name)
+    return np.asarray(columns[name], dtype=np.float64)
+
+
+def write_xg(connection, table_name, ids, home_xg, away_xg, batch_size=BATCH_SIZE):
+    """Escribe home_xg/away_xg por id en lotes (tabla temporal + UPDATE ... JOIN)"""
+    staging = f"{table_name}_xg_staging"
+    rows = list(zip(ids.tolist(), home_xg.tolist(), away_xg.tolist()))
+    updated = 0
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
+        cursor.execute(f"""
+            CREATE TEMPORARY TABLE {staging} (
+                id int(11) NOT NULL PRIMARY KEY,
+                home_xg float NOT NULL,
+                away_xg float NOT NULL
+            )
+        """)
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(
+                f"INSERT INTO {staging} (id, home_xg, away_xg) VALUES (%s, %s, %s)",
+                rows[start:start + batch_size]
+            )
+            cursor.execute(f"""
+                UPDATE {table_name} t
+                JOIN {staging} s ON t.id = s.id
+                SET t.home_xg = s.home_xg, t.away_xg = s.away_xg
+            """)
+            updated += cursor.rowcount
+            cursor.execute(f"DELETE FROM {staging}")
+            connection.commit()
+
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
+        return updated
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def backfill(connection, table_name, recompute=False, dry_run=False, batch_size=BATCH_SIZE):
+    """
+    Calcula y guarda el xG de los partidos sin xG (o de todos con --recompute).
+    Devuelve el resumen de la ejecución.
+    """
+    with stage('load'):
+        matches = load_matches(connection, table_name, ['id'] + HOME_COLUMNS + AWAY_COLUMNS,
+                               where=WITH_SHOTS if recompute else MISSING_XG, order_by='id')
+
+    with stage('calculate'):
+        home_xg, away_xg = calculate_match_xg(matches)
+
+    changed = 0
+    if not dry_run and len(matches):
+        with stage('write'):
+            changed = write_xg(connection, table_name, matches['id'], home_xg, away_xg, batch_size)
+
+    return {
+        'success': True,
+        'matches': len(matches),
+        'updated': changed,
+        'recompute': recompute,
+        'dry_run': dry_run,
+        'avg_home_xg': round(float(home_xg.mean()), 2) if len(matches) else None,
+        'avg_away_xg': round(float(away_xg.mean()), 2) if len(matches) else None,
+    }
+
+
+def _option(name, default=None):
+    prefix = f"--{name}="
+    for arg in sys.argv[1:]:
+        if arg.startswith(prefix):
+            return arg[len(prefix):]
+    return default
+
+
+def main():
+    start_profiling()
+    connection = None
+    started = time.perf_counter()
+    try:
+        config = load_db_config(os.path.join(PYTHON_DIR, 'db_config.json'))
+        connection = instrument_connection(get_db_connection(config))
+
+        result = backfill(connection, matches_table(config),
+                          recompute='--recompute' in sys.argv,
+                          dry_run='--dry-run' in sys.argv,
+                          batch_size=int(_option('batch-size', BATCH_SIZE)))
+        result['seconds'] = round(time.perf_counter() - started, 3)
+        result['timings'] = report()
+        print(json.dumps(result))
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': f'Error calculando xG: {str(e)}'}))
+        sys.exit(1)
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Football Tipster - Scraper de xG de FBref en paralelo
+
+Hace lo mismo que FT_XG_Scraper::update_missing_xg (class-xg-scraper.php),
+con las mismas ligas, map_division_to_league y criterios de búsqueda
+(fecha del partido y nombre del local en la tabla de resultados, xG en
+#team_stats de la página del partido), pero:
+
+1. Las peticiones son asíncronas (asyncio) con un máximo de peticiones en
+   curso y un intervalo mínimo entre peticiones al mismo host, en lugar de
+   dos peticiones bloqueantes y sleep(2) por partido
+2. La página de resultados de cada liga se descarga una vez por ejecución,
+   no una vez por partido
+3. Las respuestas se guardan en cache/xg_scraper/ por URL: las páginas de
+   partido no cambian y no se vuelven a pedir nunca; la de resultados se
+   reutiliza durante FIXTURES_MAX_AGE segundos. Los reintentos y las
+   ejecuciones siguientes no vuelven a pedir lo que ya está en disco
+4. Los xG encontrados se escriben por lotes con write_xg() de xg_backfill.py
+
+Con --serve hace de servidor HTTP local sobre un directorio con la misma
+estructura de rutas que FBref (en/comps/..., en/matches/...), para probar
+sin red:
+
+    python3 xg_scraper.py --serve=/tmp/fbref --port=8766
+    python3 xg_scraper.py --base-url=http://127.0.0.1:8766 --interval=0
+
+--self-test levanta ese servidor en un puerto libre con una página de
+resultados y una de partido, y comprueba que la segunda pasada sale entera
+de la caché en disco sin ninguna petición.
+
+Uso:
+    python3 xg_scraper.py [--limit=N] [--years=2] [--concurrency=4] [--interval=2]
+                          [--base-url=https://fbref.com] [--refresh] [--dry-run]
+    python3 xg_scraper.py --serve=<directorio> [--port=8766] [--latency-ms=0]
+    python3 xg_scraper.py --self-test
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+import tempfile
+import threading
+from html.parser import HTMLParser
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+# Agregar path para librerías
+plugin_libs = '/var/www/vhosts/virtualrolldice.com/httpdocs/wp-content/plugins/football-tipster/python-libs'
+if plugin_libs not in sys.path:
+    sys.path.insert(0, plugin_libs)
+
+import numpy as np
+
+PYTHON_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BASE_URL = os.environ.get('FT_XG_BASE_URL', 'https://fbref.com')
+CACHE_DIR = os.path.join(PYTHON_DIR, '..', 'cache', 'xg_scraper')
+
+# Igual que $leagues y map_division_to_league() en class-xg-scraper.php
+LEAGUES = {
+    'premier-league': '/en/comps/9/Premier-League-Stats',
+    'la-liga': '/en/comps/12/La-Liga-Stats',
+    'serie-a': '/en/comps/11/Serie-A-Stats',
+    'bundesliga': '/en/comps/20/Bundesliga-Stats',
+    'ligue-1': '/en/comps/13/Ligue-1-Stats',
+}
+DIVISION_LEAGUES = {
+    'E0': 'premier-league',
+    'E1': 'championship',
+    'SP1': 'la-liga',
+    'I1': 'serie-a',
+    'D1': 'bundesliga',
+    'F1': 'ligue-1',
+}
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+TIMEOUT = 30
+DEFAULT_CONCURRENCY = 4
+# Segundos entre peticiones al mismo host (el PHP espera 2 s por partido)
+DEFAULT_INTERVAL = 2.0
+RETRIES = 3
+FIXTURES_MAX_AGE = 12 * 3600
+BATCH_SIZE = 500
+DEFAULT_YEARS = 2
+
+LEADING_NUMBER = re.compile(r'^\s*([+-]?(?:\d+\.?\d*|\.\d+))')
+
+
+def map_division_to_league(division):
+    return DIVISION_LEAGUES.get(division)
+
+
+# ---------------------------------------------------------------------- #
+# Descargas: caché por URL, concurrencia limitada y ritmo por host
+# ---------------------------------------------------------------------- #
+
+class HostRateLimiter:
+    """Intervalo mínimo entre el inicio de dos peticiones al mismo host"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.locks = {}
+        self.next_slot = {}
+
+    async def wait(self, host):
+        lock = self.locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            delay = self.next_slot.get(host, 0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.next_slot[host] = time.monotonic() + self.interval
+
+
+class CachedFetcher:
+    """
+    GET asíncronos con caché en disco por URL. Las descargas (urllib,
+    bloqueantes) van al executor por defecto del bucle.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, concurrency=DEFAULT_CONCURRENCY,
+                 interval=DEFAULT_INTERVAL, refresh=False):
+        self.cache_dir = cache_dir
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.limiter = HostRateLimiter(interval)
+        self.refresh = refresh
+        self.stats = {'cache_hits': 0, 'requests': 0, 'errors': 0}
+
+    def cache_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.html')
+
+    def cached(self, url, max_age=None):
+        path = self.cache_path(url)
+        try:
+            if max_age is not None and time.time() - os.path.getmtime(path) > max_age:
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def store(self, url, html):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.cache_path(url)
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(tmp, path)
+
+    async def get(self, url, max_age=None):
+        """HTML de url (de la caché si es posible) o None si no se pudo descargar"""
+        html = None if self.refresh else self.cached(url, max_age)
+        if html is not None:
+            self.stats['cache_hits'] += 1
+            return html
+
+        loop = asyncio.get_event_loop()
+        host = urlsplit(url).netloc
+        async with self.semaphore:
+            for attempt in range(RETRIES):
+                await self.limiter.wait(host)
+                self.stats['requests'] += 1
+                try:
+                    html = await loop.run_in_executor(None, _download, url)
+                    self.store(url, html)
+                    return html
+                except HTTPError as e:
+                    if e.code not in (429, 500, 502, 503, 504):
+                        break
+                    retry_after = e.headers.get('Retry-After') if e.headers else None
+                    await asyncio.sleep(float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt)
+                except (URLError, OSError):
+                    await asyncio.sleep(2 ** attempt)
+        self.stats['errors'] += 1
+        return None
+
+
+def _download(url):
+    request = Request(url, headers={'User-Agent': USER_AGENT})
+    with urlopen(request, timeout=TIMEOUT) as response:
+        charset = response.headers.get_content_charset() or 'utf-8'
+        return response.read().decode(charset, errors='replace')
+
+
+# ---------------------------------------------------------------------- #
+# Análisis del HTML (las mismas consultas XPath que el PHP)
+# ---------------------------------------------------------------------- #
+
+class FixturesParser(HTMLParser):
+    """
+    Filas de la tabla de resultados: texto de cada td[@data-stat] y enlace
+    de td[@data-stat='match_report']/a
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self.row = None
+        self.cell = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'tr':
+            self.row = {'cells': {}, 'report': None}
+        elif self.row is not None and tag in ('td', 'th') and attrs.get('data-stat'):
+            self.cell = attrs['data-stat']
+            self.row['cells'][self.cell] = ''
+        elif tag == 'a' and self.cell == 'match_report' and attrs.get('href'):
+            self.row['report'] = attrs['href']
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.row['cells'][self.cell] += data
+
+    def handle_endtag(self, tag):
+        if tag in ('td', 'th'):
+            self.cell = None
+        elif tag == 'tr' and self.row is not None:
+            self.rows.append(self.row)
+            self.row = None
+
+
+class TeamStatsParser(HTMLParser):
+    """Celdas de la primera fila de div#team_stats cuyo texto contiene 'xG'"""
+
+    def __init__(self):
+        super().__init__()
+        self.depth = 0
+        self.row = None
+        self.cell = None
+        self.xg_row = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.depth:
+            if tag == 'div':
+                self.depth += 1
+            elif tag == 'tr':
+                self.row = []
+            elif tag == 'td' and self.row is not None:
+                self.cell = ''
+        elif tag == 'div' and dict(attrs).get('id') == 'team_stats':
+            self.depth = 1
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell += data
+
+    def handle_endtag(self, tag):
+        if not self.depth:
+            return
+        if tag == 'td' and self.cell is not None:
+            self.row.append(self.cell)
+            self.cell = None
+        elif tag == 'tr' and self.row is not None:
+            if self.xg_row is None and any('xG' in cell for cell in self.row):
+                self.xg_row = self.row
+            self.row = None
+        elif tag == 'div':
+            self.depth -= 1
+
+
+def _floatval(text):
+    """floatval() de PHP: número al principio del texto, 0 si no hay"""
+    match = LEADING_NUMBER.match(text)
+    return float(match.group(1)) if match else 0.0
+
+
+def parse_fixtures(html):
+    parser = FixturesParser()
+    parser.feed(html)
+    return [row for row in parser.rows if row['report']]
+
+
+def find_match_url(rows, home_team, match_date, base_url=BASE_URL):
+    """Primera fila con la fecha del partido y el local (como la XPath de find_match_url)"""
+    for row in rows:
+        cells = row['cells']
+        if match_date in cells.get('date', '') and home_team in cells.get('home_team', ''):
+            return base_url.rstrip('/') + row['report']
+    return None
+
+
+def parse_match_xg(html):
+    """{'home_xg', 'away_xg'} de #team_stats o {} si la página no tiene xG"""
+    parser = TeamStatsParser()
+    parser.feed(html)
+    if not parser.xg_row or len(parser.xg_row) < 2:
+        return {}
+    return {'home_xg': _floatval(parser.xg_row[0]), 'away_xg': _floatval(parser.xg_row[1])}
+
+
+# ---------------------------------------------------------------------- #
+# Pipeline
+# ---------------------------------------------------------------------- #
+
+def load_missing(connection, table_name, years=DEFAULT_YEARS, limit=None):
+    """Partidos sin home_xg de los últimos años, como update_missing_xg()"""
+    from match_loader import load_matches
+
+    matches = load_matches(
+        connection, table_name, ['id', 'date', 'division', 'home_team', 'away_team'],
+        where='home_xg IS NULL AND date >= DATE_SUB(NOW(), INTERVAL %s YEAR)',
+        params=(int(years),), order_by='date DESC', limit=limit
+    )
+    return matches.to_dataframe()
+
+
+async def scrape(matches, fetcher, base_url=BASE_URL, on_batch=None, batch_size=BATCH_SIZE):
+    """
+    Busca el xG de cada partido. Llama a on_batch(ids, home, away) cada
+    batch_size partidos encontrados y devuelve el resumen.
+    """
+    matches = matches.assign(league=matches['division'].map(DIVISION_LEAGUES))
+    matches = matches[matches['league'].isin(list(LEAGUES))]
+
+    leagues = sorted(matches['league'].unique())
+    pages = await asyncio.gather(*(
+        fetcher.get(base_url.rstrip('/') + LEAGUES[league], FIXTURES_MAX_AGE) for league in leagues
+    ))
+    fixtures = {league: parse_fixtures(html) if html else [] for league, html in zip(leagues, pages)}
+
+    async def match_xg(match):
+        url = find_match_url(fixtures[match.league], match.home_team, str(match.date)[:10], base_url)
+        if url is None:
+            return match.id, None
+        html = await fetcher.get(url)
+        return match.id, parse_match_xg(html) if html else None
+
+    found = {'ids': [], 'home_xg': [], 'away_xg': []}
+    summary = {'matches': len(matches), 'found': 0, 'not_found': 0}
+
+    def flush():
+        if found['ids'] and on_batch is not None:
+            on_batch(np.array(found['ids']), np.array(found['home_xg']), np.array(found['away_xg']))
+        for values in found.values():
+            values.clear()
+
+    for task in asyncio.as_completed([match_xg(match) for match in matches.itertuples(index=False)]):
+        match_id, xg = await task
+        if not xg:
+            summary['not_found'] += 1
+            continue
+        summary['found'] += 1
+        found['ids'].append(int(match_id))
+        found['home_xg'].append(xg['home_xg'])
+        found['away_xg'].append(xg['away_xg'])
+        if len(found['ids']) >= batch_size:
+            flush()
+    flush()
+
+    summary.update(fetcher.stats)
+    return summary
+
+
+async def run(matches, connection=None, table_name=None, base_url=BASE_URL, concurrency=DEFAULT_CONCURRENCY,
+              interval=DEFAULT_INTERVAL, refresh=False, dry_run=False, cache_dir=CACHE_DIR):
+    from xg_backfill import write_xg
+
+    fetcher = CachedFetcher(cache_dir, concurrency, interval, refresh)
+    written = [0]
+
+    def on_batch(ids, home_xg, away_xg):
+        if not dry_run:
+            written[0] += write_xg(connection, table_name, ids, home_xg, away_xg)
+
+    summary = await scrape(matches, fetcher, base_url, on_batch)
+    summary['updated'] = written[0]
+    return summary
+
+
+# ---------------------------------------------------------------------- #
+# Prueba contra el servidor local
+# ---------------------------------------------------------------------- #
+
+SELF_TEST_REPORT = '/en/matches/0a1b2c3d/Manchester-United-Fulham-August-16-2024-Premier-League'
+SELF_TEST_PAGES = {
+    LEAGUES['premier-league']: (
+        '<table><tbody>'
+        '<tr><td data-stat="date">2024-08-16</td><td data-stat="home_team">Manchester Utd</td>'
+        '<td data-stat="away_team">Fulham</td>'
+        f'<td data-stat="match_report"><a href="{SELF_TEST_REPORT}">Match Report</a></td></tr>'
+        '</tbody></table>'
+    ),
+    SELF_TEST_REPORT: (
+        '<div id="team_stats"><table>'
+        '<tr><th>Manchester Utd</th><th>Fulham</th></tr>'
+        '<tr><td>2.4 xG</td><td>0.6 xG</td></tr>'
+        '</table></div>'
+    ),
+}
+
+
+def self_test():
+    """
+    Dos pasadas de scrape() sobre páginas servidas por el servidor de
+    csv_ingest.py: la primera pide la página de resultados y la del partido,
+    la segunda debe encontrar el mismo xG sin hacer ninguna petición
+    """
+    import pandas as pd
+    from http.server import ThreadingHTTPServer
+    from csv_ingest import make_handler
+
+    workdir = tempfile.mkdtemp(prefix='xg_scraper_test_')
+    root = os.path.join(workdir, 'www')
+    for path, html in SELF_TEST_PAGES.items():
+        os.makedirs(os.path.dirname(root + path), exist_ok=True)
+        with open(root + path, 'w', encoding='utf-8') as f:
+            f.write(html)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(root))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    # El segundo partido no está en la tabla de resultados
+    matches = pd.DataFrame({
+        'id': [1, 2],
+        'date': ['2024-08-16', '2024-08-17'],
+        'division': ['E0', 'E0'],
+        'home_team': ['Manchester Utd', 'Ipswich'],
+        'away_team': ['Fulham', 'Liverpool'],
+    })
+    checks = []
+
+    def check(name, summary, found, requests, cache_hits):
+        checks.append({
+            'name': name,
+            'ok': (summary['found'] == 1 and summary['not_found'] == 1 and found == [(1, 2.4, 0.6)]
+                   and summary['requests'] == requests and summary['cache_hits'] == cache_hits
+                   and summary['errors'] == 0),
+            'summary': summary,
+        })
+
+    loop = asyncio.new_event_loop()
+    try:
+        for name, requests, cache_hits in (('first_pass_downloads', 2, 0), ('second_pass_cached', 0, 2)):
+            found = []
+
+            def on_batch(ids, home_xg, away_xg):
+                found.extend(zip(ids.tolist(), home_xg.tolist(), away_xg.tolist()))
+
+            fetcher = CachedFetcher(os.path.join(workdir, 'cache'), interval=0)
+            summary = loop.run_until_complete(scrape(matches, fetcher, base_url, on_batch))
+            check(name, summary, found, requests, cache_hits)
+    finally:
+        loop.close()
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {'success': all(item['ok'] for item in checks), 'checks': checks}
+
+
+def _option(name, default=None):
+    prefix = f"--{name}="
+    for arg in sys.argv[1:]:
+        if arg.startswith(prefix):
+            return arg[len(prefix):]
+    return default
+
+
+def main():
+    root = _option('serve')
+    if root:
+        from csv_ingest import serve
+        serve(root, int(_option('port', 8766)), float(_option('latency-ms', 0)) / 1000)
+        return
+    if '--self-test' in sys.argv:
+        result = self_test()
+        print(json.dumps(result))
+        sys.exit(0 if result['success'] else 1)
+
+    connection = None
+    started = time.perf_counter()
+    try:
+        from instrumentation import instrument_connection, report, start_profiling, stage
+        start_profiling()
+        from match_loader import get_db_connection, load_db_config, matches_table
+
+        config = load_db_config(os.path.join(PYTHON_DIR, 'db_config.json'))
+        table_name = matches_table(config)
+        connection = instrument_connection(get_db_connection(config))
+
+        with stage('load'):
+            limit = _option('limit')
+            matches = load_missing(connection, table_name, int(_option('years', DEFAULT_YEARS)),
+                                   int(limit) if limit else None)
+
+        with stage('scrape'):
+            loop = asyncio.new_event_loop()
+            try:
+                result = loop.run_until_complete(run(
+                    matches, connection, table_name,
+                    base_url=_option('base-url', BASE_URL),
+                    concurrency=int(_option('concurrency', DEFAULT_CONCURRENCY)),
+                    interval=float(_option('interval', DEFAULT_INTERVAL)),
+                    refresh='--refresh' in sys.argv,
+                    dry_run='--dry-run' in sys.argv,
+                ))
+            finally:
+                loop.close()
+
+        result['success'] = True
+        result['seconds'] = round(time.perf_counter() - started, 3)
+        result['timings'] = report()
+        print(json.dumps(result))
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': f'Error obteniendo xG: {str(e)}'}))
+        sys.exit(1)
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+if __name__ == "__main__":
+    main()